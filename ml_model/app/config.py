@@ -13,20 +13,119 @@ class Config:
     APP_HOST = os.getenv("APP_HOST", "0.0.0.0")
     APP_ENV = os.getenv("APP_ENV", "development")
     DEBUG = os.getenv("DEBUG", "False").lower() == "true"
+    # Préchauffage des services (index, caches) en tâche de fond au démarrage
+    WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "True").lower() == "true"
+    # Métriques Prometheus (/metrics); requêtes plus lentes journalisées avec leur durée par étape
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", 2000))
     
     # OpenAI
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
     EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+    # LLM - client async mutualisé
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+    
+    # Disjoncteurs (DailyMed, LLM) et moniteur de santé des dépendances
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 3))
+    BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", 30))
+    HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", 30))
+    HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", 5))
+
+    # Cache des réponses LLM
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 5000))
+    ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 7 * 24 * 3600))
+    ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "./data/cache/answer_cache.sqlite")
+    ANSWER_CACHE_SEMANTIC = os.getenv("ANSWER_CACHE_SEMANTIC", "False").lower() == "true"
+    ANSWER_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("ANSWER_CACHE_SEMANTIC_THRESHOLD", 0.95))
+    
+    # Fournisseur d'embeddings du RAG: chroma (défaut ChromaDB) | openai | local (CPU, sans réseau)
+    EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "chroma")
+    EMBEDDING_LOCAL_DIM = int(os.getenv("EMBEDDING_LOCAL_DIM", 512))
+    
+    # Cache persistant des embeddings (partagé ingestion / requêtes)
+    EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "True").lower() == "true"
+    EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./data/embedding_cache")
+    
+    # Lots d'embeddings: taille en tokens, lots simultanés, retries
+    EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", 100000))
+    EMBEDDING_BATCH_MAX_INPUTS = int(os.getenv("EMBEDDING_BATCH_MAX_INPUTS", 2048))
+    EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", 4))
+    EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", 4))
+    
+    # Coalescence des requêtes concurrentes identiques
+    SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "True").lower() == "true"
+    
+    # Endpoints batch (ordonnances): taille maximale, traitements simultanés (DailyMed + LLM)
+    BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 50))
+    BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 4))
     
     # DailyMed
     DAILYMED_API_URL = os.getenv("DAILYMED_API_URL", "https://dailymed.nlm.nih.gov/dailymed/services/v2")
     DAILYMED_CACHE_DIR = os.getenv("DAILYMED_CACHE_DIR", "./data/dailymed")
+    # Dump local des noms de médicaments (autocomplétion)
+    DRUG_NAMES_PATH = os.getenv("DRUG_NAMES_PATH", "./data/dailymed/drugnames.json")
+    # Synonymes supplémentaires pour la canonicalisation (CSV "alias,ingredient")
+    DRUG_SYNONYMS_PATH = os.getenv("DRUG_SYNONYMS_PATH", "./data/dailymed/synonyms.csv")
+    # Jeu de données local des interactions entre principes actifs (CSV)
+    INTERACTIONS_PATH = os.getenv("INTERACTIONS_PATH", "./data/interactions/interactions.csv")
+    DAILYMED_TIMEOUT = float(os.getenv("DAILYMED_TIMEOUT", 10))
+    DAILYMED_MAX_RETRIES = int(os.getenv("DAILYMED_MAX_RETRIES", 2))
+    DAILYMED_MAX_CONNECTIONS = int(os.getenv("DAILYMED_MAX_CONNECTIONS", 10))
+    DAILYMED_HTTP2 = os.getenv("DAILYMED_HTTP2", "True").lower() == "true"
+    DAILYMED_HEDGING = os.getenv("DAILYMED_HEDGING", "False").lower() == "true"
+    DAILYMED_HEDGE_MIN_SAMPLES = int(os.getenv("DAILYMED_HEDGE_MIN_SAMPLES", 20))
+    # Cache des SPL: payloads compressés (SQLite), budget en octets, revalidation après TTL
+    SPL_CACHE_ENABLED = os.getenv("SPL_CACHE_ENABLED", "True").lower() == "true"
+    SPL_CACHE_PATH = os.getenv("SPL_CACHE_PATH", os.path.join(DAILYMED_CACHE_DIR, "spl_cache.sqlite"))
+    SPL_CACHE_MAX_BYTES = int(os.getenv("SPL_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+    SPL_CACHE_TTL = float(os.getenv("SPL_CACHE_TTL", 7 * 24 * 3600))
     
     # Vector DB
     CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", "./data/chroma_db")
+    # Index vectoriel du RAG: chroma | numpy (matrice memmap en processus)
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+    VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "./data/vector_index")
+    # Service multi-workers: single (chaque processus ouvre l'index maître) | snapshot (les
+    # workers mappent une génération publiée en lecture seule, les écritures passent par le
+    # spool appliqué par un écrivain unique: python -m app.ingestion.snapshot_writer)
+    SERVING_MODE = os.getenv("SERVING_MODE", "single")
+    VECTOR_SNAPSHOT_DIR = os.getenv("VECTOR_SNAPSHOT_DIR", "./data/vector_snapshots")
+    VECTOR_SNAPSHOT_POLL_INTERVAL = float(os.getenv("VECTOR_SNAPSHOT_POLL_INTERVAL", 5))
+    VECTOR_SNAPSHOT_KEEP = int(os.getenv("VECTOR_SNAPSHOT_KEEP", 3))
+    # Intervalle minimal entre deux publications (chacune recopie toute la collection)
+    VECTOR_SNAPSHOT_MIN_INTERVAL = float(os.getenv("VECTOR_SNAPSHOT_MIN_INTERVAL", 60))
+    INGESTION_SPOOL_DIR = os.getenv("INGESTION_SPOOL_DIR", "./data/ingestion/spool")
+    INGESTION_PUBLISH_INTERVAL = float(os.getenv("INGESTION_PUBLISH_INTERVAL", 10))
+    # Recherche hybride BM25 + vecteurs (fusion des rangs réciproques)
+    HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "True").lower() == "true"
+    HYBRID_CANDIDATES_FACTOR = int(os.getenv("HYBRID_CANDIDATES_FACTOR", 3))
+    RRF_K = int(os.getenv("RRF_K", 60))
     SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", 0.7))
     
+    # Découpage des sections en chunks
+    CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 256))
+    CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 32))
+    # Contexte du prompt: budget de tokens, candidats récupérés, seuil de quasi-doublon (cosinus)
+    CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", 1200))
+    CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", 8))
+    CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", 0.9))
+    
+    # Monographies précalculées (job app.ingestion.precompute_monographs)
+    MONOGRAPH_STORE_ENABLED = os.getenv("MONOGRAPH_STORE_ENABLED", "True").lower() == "true"
+    MONOGRAPH_STORE_PATH = os.getenv("MONOGRAPH_STORE_PATH", "./data/monographs/monographs.sqlite")
+    MONOGRAPH_TOP_N = int(os.getenv("MONOGRAPH_TOP_N", 2000))
+    
+    # Ingestion hors ligne
+    INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", os.cpu_count() or 2))
+    INGESTION_BATCH_SIZE = int(os.getenv("INGESTION_BATCH_SIZE", 64))
+    INGESTION_CHECKPOINT_PATH = os.getenv("INGESTION_CHECKPOINT_PATH", "./data/ingestion/checkpoint.json")
+    
     # Langues
     SUPPORTED_LANGUAGES = os.getenv("SUPPORTED_LANGUAGES", "fr,en").split(",")
     DEFAULT_LANGUAGE = os.getenv("DEFAULT_LANGUAGE", "fr")
@@ -52,22 +151,22 @@ class Config:
         """,
         
         "interaction_check": """
-        Tu es un expert en interactions médicamenteuses. Analyse ces médicaments:
+        Tu es un expert en interactions médicamenteuses. Explique les interactions ci-dessous,
+        détectées par la base d'interactions pour ces médicaments:
         
         Médicaments: {drugs}
         
-        Informations disponibles:
+        Interactions détectées:
         {context}
         
         Langue: {language}
         
-        Fournis une analyse avec:
-        1. Niveau de risque (Faible/Moyen/Élevé)
-        2. Interactions détectées
-        3. Recommandations
-        4. Alternatives possibles
+        Pour chaque interaction, dans l'ordre donné:
+        1. Niveau de gravité (tel qu'indiqué)
+        2. Mécanisme en termes simples
+        3. Conduite à tenir
         
-        Si pas d'infos, dis-le clairement.
+        N'ajoute aucune interaction absente de la liste et ne modifie pas les niveaux de gravité.
         """,
         
         "general_question": """
@@ -92,5 +191,5 @@ class Config:
         
         print(f"Configuration chargée - Environnement: {cls.APP_ENV}")
 
-config = Config()
-config.validate_config()
\ No newline at end of file
+# Validée au démarrage de l'API (startup), pas à l'import
+config = Config()
\ No newline at end of file
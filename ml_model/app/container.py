@@ -0,0 +1,273 @@
+# app/container.py
+"""
+Conteneur de dépendances: services construits au premier usage
+
+Importer app.main ne construit plus aucun service (client Chroma, client
+OpenAI, chargeur DailyMed, index en mémoire): chacun est créé au premier
+accès, une seule fois, même si plusieurs threads le demandent en même
+temps. `warmup()` (endpoint /api/warmup ou config.WARMUP_ON_STARTUP, actif
+par défaut) les construit à l'avance et précharge leurs index et caches, en
+mesurant le coût de chaque composant. Les endpoints appellent
+`resolve_dependencies()` avant d'utiliser un service: une requête arrivée
+avant la fin du préchauffage attend sa construction dans un thread, sans
+bloquer la boucle d'événements.
+
+Les instances globales historiques (`from app.llm.llm_engine import
+llm_engine`...) restent disponibles: elles sont résolues par le conteneur
+via le __getattr__ de leur module (PEP 562).
+"""
+import asyncio
+import functools
+import importlib
+import logging
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Délai avant que resolve_dependencies() retente un service dont la construction a échoué
+BUILD_RETRY_INTERVAL = 30.0
+
+
+class Container:
+    """Registre de fabriques de services, instanciés paresseusement"""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._warm: Dict[str, Callable[[Any], Any]] = {}
+        self._close: Dict[str, Callable[[Any], Any]] = {}
+        self._preload: List[str] = []
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.RLock] = {}
+        self._timings: Dict[str, Dict] = {}
+        self._failed_at: Dict[str, float] = {}
+
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        warm: Optional[Callable[[Any], Any]] = None,
+        close: Optional[Callable[[Any], Any]] = None,
+        preload: bool = True
+    ):
+        """
+        Args:
+            factory: Construit le service (importe ses dépendances lourdes)
+            warm: Précharge index et caches du service construit
+            close: Libère ses ressources à l'arrêt (synchrone ou async)
+            preload: Inclus dans warmup() par défaut (sinon construit à la demande
+                     par les services qui en dépendent)
+        """
+        self._factories[name] = factory
+        self._locks[name] = threading.RLock()
+        if warm is not None:
+            self._warm[name] = warm
+        if close is not None:
+            self._close[name] = close
+        if preload:
+            self._preload.append(name)
+
+    def get(self, name: str) -> Any:
+        """Service `name`, construit au premier appel"""
+        if name in self._instances:
+            return self._instances[name]
+        if name not in self._factories:
+            raise KeyError(f"Service inconnu: {name}")
+        with self._locks[name]:
+            if name not in self._instances:
+                start = time.perf_counter()
+                try:
+                    self._instances[name] = self._factories[name]()
+                except Exception:
+                    self._failed_at[name] = time.monotonic()
+                    raise
+                init_ms = (time.perf_counter() - start) * 1000
+                self._timings.setdefault(name, {})["init_ms"] = round(init_ms, 1)
+                logger.info(f"✅ Service {name} initialisé ({init_ms:.0f} ms)")
+        return self._instances[name]
+
+    @property
+    def names(self) -> List[str]:
+        """Services enregistrés"""
+        return list(self._factories)
+
+    def initialized(self, name: str) -> bool:
+        return name in self._instances
+
+    def peek(self, name: str) -> Any:
+        """Service `name` s'il est déjà construit, sinon None (ne construit rien)"""
+        return self._instances.get(name)
+
+    def failed_recently(self, name: str) -> bool:
+        """Vrai si la dernière construction de `name` a échoué il y a moins de BUILD_RETRY_INTERVAL"""
+        failed_at = self._failed_at.get(name)
+        return failed_at is not None and time.monotonic() - failed_at < BUILD_RETRY_INTERVAL
+
+    async def warmup(self, names: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        Construit les services et précharge leurs index (hors de la boucle d'événements)
+
+        Args:
+            names: Services à préchauffer (par défaut tous ceux enregistrés avec preload)
+
+        Returns:
+            {service: {"init_ms", "warm_ms", "error"}}
+        """
+        report = {}
+        for name in names or self._preload:
+            entry = {"init_ms": 0.0, "warm_ms": 0.0, "error": None}
+            try:
+                if not self.initialized(name):
+                    await asyncio.to_thread(self.get, name)
+                    entry["init_ms"] = self._timings[name]["init_ms"]
+                warm = self._warm.get(name)
+                if warm is not None and self._instances[name] is not None:
+                    start = time.perf_counter()
+                    await asyncio.to_thread(warm, self._instances[name])
+                    entry["warm_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                    self._timings[name]["warm_ms"] = entry["warm_ms"]
+            except Exception as e:
+                logger.error(f"❌ Préchauffage {name}: {str(e)}")
+                entry["error"] = str(e)
+            report[name] = entry
+        total = sum(entry["init_ms"] + entry["warm_ms"] for entry in report.values())
+        logger.info(f"✅ Préchauffage terminé - {len(report)} services en {total:.0f} ms")
+        return report
+
+    async def close(self):
+        """Libère les services construits (les autres ne sont pas créés pour l'occasion)"""
+        for name, close in self._close.items():
+            instance = self._instances.get(name)
+            if instance is None:
+                continue
+            try:
+                result = close(instance)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error(f"❌ Arrêt {name}: {str(e)}")
+
+    def stats(self) -> Dict:
+        return {
+            name: {"initialized": self.initialized(name), **self._timings.get(name, {})}
+            for name in self._factories
+        }
+
+
+class Dependency:
+    """
+    Attribut de classe résolu par le conteneur au premier accès
+
+    La valeur est ensuite mise en cache sur l'instance, et peut être
+    remplacée par simple affectation (tests, benchmarks).
+    """
+
+    def __init__(self, service: str):
+        self.service = service
+        self.attribute = service
+
+    def __set_name__(self, owner, name: str):
+        self.attribute = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = container.get(self.service)
+        obj.__dict__[self.attribute] = value
+        return value
+
+
+def is_resolved(obj: Any, attribute: str) -> bool:
+    """Vrai si la dépendance `attribute` de obj est affectée ou déjà construite (sans la construire)"""
+    if attribute in vars(obj):
+        return True
+    dependency = getattr(type(obj), attribute, None)
+    return isinstance(dependency, Dependency) and container.initialized(dependency.service)
+
+
+@functools.lru_cache(maxsize=None)
+def _dependencies(klass: type) -> Tuple[Tuple[str, str], ...]:
+    """(attribut, service) des Dependency de la classe et de ses parents"""
+    found = {}
+    for base in reversed(klass.__mro__):
+        for attribute, value in vars(base).items():
+            if isinstance(value, Dependency):
+                found[attribute] = value.service
+            else:
+                found.pop(attribute, None)
+    return tuple(found.items())
+
+
+async def resolve_dependencies(obj: Any, _seen: Optional[set] = None):
+    """
+    Résout les dépendances de obj, et récursivement celles des services obtenus
+
+    Les services pas encore construits le sont dans un thread: un handler async
+    qui appelle cette fonction avant d'utiliser ses services ne bloque jamais la
+    boucle d'événements (premier appel avant la fin du préchauffage). Un service
+    dont la construction a échoué n'est retenté qu'après BUILD_RETRY_INTERVAL.
+    """
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return
+    seen.add(id(obj))
+    for attribute, service in _dependencies(type(obj)):
+        if is_resolved(obj, attribute):
+            value = getattr(obj, attribute)
+        elif container.failed_recently(service):
+            # L'erreur sera levée là où le service est réellement utilisé
+            continue
+        else:
+            try:
+                value = await asyncio.to_thread(getattr, obj, attribute)
+            except Exception as e:
+                logger.warning(f"⚠️  Service {service} non construit: {str(e)}")
+                continue
+        if value is not None:
+            await resolve_dependencies(value, seen)
+
+
+def lazy_instance(module: str, attribute: str, service: str) -> Callable[[str], Any]:
+    """
+    __getattr__ de module (PEP 562) exposant le service `service` sous le nom `attribute`
+
+    Usage, en fin de module:
+        __getattr__ = lazy_instance(__name__, "llm_engine", "llm")
+    """
+    def __getattr__(name: str) -> Any:
+        if name != attribute:
+            raise AttributeError(f"module {module!r} has no attribute {name!r}")
+        value = container.get(service)
+        setattr(sys.modules[module], attribute, value)
+        return value
+
+    return __getattr__
+
+
+def _factory(module: str, name: str) -> Callable[[], Any]:
+    """Fabrique qui importe `module` et appelle `name` au premier besoin"""
+    return lambda: getattr(importlib.import_module(module), name)()
+
+
+# Instance globale
+container = Container()
+container.register("tokenizer", lambda: importlib.import_module("app.llm.tokenizer").tokenizer,
+                   warm=lambda tokenizer: tokenizer.count("warmup"))
+container.register("answer_cache", _factory("app.llm.answer_cache", "_create_answer_cache"),
+                   close=lambda cache: cache.close())
+container.register("embeddings", _factory("app.llm.embeddings_openai", "OpenAIEmbeddings"),
+                   close=lambda service: service.close(), preload=False)
+container.register("context_builder", _factory("app.llm.context_builder", "ContextBuilder"))
+container.register("llm", _factory("app.llm.llm_engine", "LLMEngine"),
+                   close=lambda engine: engine.close())
+container.register("rag", _factory("app.llm.rag_light", "create_rag_system"),
+                   warm=lambda rag: rag.warmup())
+container.register("legacy_rag", _factory("app.llm.rag", "RAGSystem"), preload=False)
+container.register("loader", _factory("app.database.dailymed_loader", "DailyMedLoader"),
+                   close=lambda loader: loader.close())
+container.register("names", _factory("app.database.drug_names_index", "DrugNameIndex"))
+container.register("canonicalizer", _factory("app.database.drug_canonicalizer", "DrugCanonicalizer"))
+container.register("interactions", _factory("app.database.interaction_index", "InteractionIndex"))
+container.register("monographs", _factory("app.database.monograph_store", "create_monograph_store"))
@@ -1,21 +1,178 @@
-import requests
-import json
-import os
+import asyncio
+import httpx
+import sqlite3
 import time
+from collections import deque
 from typing import List, Dict, Optional
 import logging
 from app.config import config
+from app.container import lazy_instance
+from app.database.spl_cache import create_spl_cache
+from app.database.spl_parser import LOINC_SECTIONS, parse_spl
+from app.llm.chunking import chunk_sections
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.utils.metrics import timed
+from app.utils.retry import backoff_delay, retry_after_seconds
 
 logger = logging.getLogger(__name__)
 
+# Erreurs réseau transitoires (toutes nos requêtes sont des GET idempotents)
+RETRYABLE_HTTP_ERRORS = (
+    httpx.TimeoutException,
+    httpx.NetworkError,
+    httpx.RemoteProtocolError,
+)
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+
+def _http2_available() -> bool:
+    """HTTP/2 nécessite le paquet optionnel h2"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class LatencyTracker:
+    """Fenêtre glissante des latences récentes pour estimer le p95"""
+    
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+    
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+    
+    def p95(self) -> Optional[float]:
+        """p95 des latences observées, None tant que l'échantillon est trop petit"""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+
 class DailyMedLoader:
-    """Chargeur de données DailyMed FDA"""
+    """Chargeur de données DailyMed FDA (client async mutualisé)"""
     
     def __init__(self):
         self.api_url = config.DAILYMED_API_URL
         self.cache_dir = config.DAILYMED_CACHE_DIR
+        # Cache SPL compressé (None si désactivé)
+        self.spl_cache = create_spl_cache()
+        self.max_retries = config.DAILYMED_MAX_RETRIES
+        self.hedging = config.DAILYMED_HEDGING
+        self.latency = LatencyTracker(min_samples=config.DAILYMED_HEDGE_MIN_SAMPLES)
+        # DailyMed en panne: les appels échouent en quelques ms au lieu d'attendre le timeout
+        self.breaker = CircuitBreaker("dailymed", config.BREAKER_FAILURE_THRESHOLD, config.BREAKER_RESET_TIMEOUT)
+        
+        # Client partagé: pool de connexions keep-alive (+ HTTP/2 si disponible)
+        self.client = httpx.AsyncClient(
+            http2=config.DAILYMED_HTTP2 and _http2_available(),
+            limits=httpx.Limits(
+                max_connections=config.DAILYMED_MAX_CONNECTIONS,
+                max_keepalive_connections=config.DAILYMED_MAX_CONNECTIONS
+            ),
+            timeout=config.DAILYMED_TIMEOUT
+        )
+    
+    @timed("dailymed_http")
+    async def _send(
+        self,
+        url: str,
+        params: Optional[Dict],
+        timeout: float,
+        headers: Optional[Dict] = None
+    ) -> httpx.Response:
+        """Envoie un GET et enregistre sa latence"""
+        start = time.perf_counter()
+        response = await self.client.get(url, params=params, headers=headers, timeout=timeout)
+        self.latency.record(time.perf_counter() - start)
+        return response
+    
+    async def _hedged_get(
+        self,
+        url: str,
+        params: Optional[Dict],
+        timeout: float,
+        headers: Optional[Dict] = None
+    ) -> httpx.Response:
+        """
+        GET avec requête "hedgée": si la première dépasse le p95 observé,
+        une seconde est lancée et la première réponse réussie l'emporte
+        """
+        hedge_after = self.latency.p95() if self.hedging else None
+        if hedge_after is None:
+            return await self._send(url, params, timeout, headers)
+        
+        primary = asyncio.ensure_future(self._send(url, params, timeout, headers))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done:
+            return primary.result()
+        
+        logger.info(f"⏱️  DailyMed lent (> {hedge_after:.2f}s) - requête de secours")
+        pending = {primary, asyncio.ensure_future(self._send(url, params, timeout, headers))}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
     
-    def search_drugs(self, query: str, limit: int = 10) -> List[Dict]:
+    async def _get(
+        self,
+        url: str,
+        params: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        headers: Optional[Dict] = None
+    ) -> httpx.Response:
+        """
+        GET avec retries et backoff sur erreurs transitoires (réseau, 429, 5xx de passerelle)
+        
+        Passe par le disjoncteur DailyMed: lève CircuitOpenError sans appel
+        réseau s'il est ouvert, l'erreur httpx d'origine une fois les retries épuisés
+        """
+        return await self.breaker.call(
+            lambda: self._get_with_retries(url, params, timeout or config.DAILYMED_TIMEOUT, headers),
+            failures=RETRYABLE_HTTP_ERRORS,
+            is_failure=lambda response: response.status_code in RETRYABLE_STATUS
+        )
+    
+    async def _get_with_retries(
+        self,
+        url: str,
+        params: Optional[Dict],
+        timeout: float,
+        headers: Optional[Dict]
+    ) -> httpx.Response:
+        attempt = 0
+        
+        while True:
+            try:
+                response = await self._hedged_get(url, params, timeout, headers)
+                if response.status_code not in RETRYABLE_STATUS or attempt >= self.max_retries:
+                    return response
+                delay = retry_after_seconds(response.headers)
+                reason = f"HTTP {response.status_code}"
+            except RETRYABLE_HTTP_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = None
+                reason = type(e).__name__
+            
+            if delay is None:
+                delay = backoff_delay(attempt, base=0.25, cap=5.0)
+            attempt += 1
+            logger.warning(f"⚠️  DailyMed {reason} - nouvel essai {attempt}/{self.max_retries} dans {delay:.2f}s")
+            await asyncio.sleep(delay)
+    
+    async def search_drugs(self, query: str, limit: int = 10) -> List[Dict]:
         """
         Recherche des médicaments dans DailyMed
         
@@ -31,7 +188,7 @@ class DailyMedLoader:
             }
             
             logger.info(f"🔍 Recherche DailyMed: {query}")
-            response = requests.get(endpoint, params=params, timeout=10)
+            response = await self._get(endpoint, params=params, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -52,48 +209,68 @@ class DailyMedLoader:
             else:
                 logger.error(f"❌ Erreur API DailyMed: {response.status_code}")
                 return []
-                
+        
+        except CircuitOpenError as e:
+            logger.info(f"⏭️  Recherche DailyMed ignorée: {str(e)}")
+            return []
         except Exception as e:
             logger.error(f"❌ Erreur recherche DailyMed: {str(e)}")
             return []
     
-    def get_drug_spl(self, spl_id: str) -> Optional[Dict]:
+    async def get_drug_spl(self, spl_id: str) -> Optional[Dict]:
         """
         Obtient le SPL (Structured Product Labeling) d'un médicament
         
+        Servi par le cache SPL tant qu'il est frais; au-delà de
+        config.SPL_CACHE_TTL, revalidé par un GET conditionnel (ETag /
+        Last-Modified, 304 sans corps). Si DailyMed ne répond pas, une
+        entrée périmée reste servie.
+        
         Args:
             spl_id: ID du SPL
         """
-        cache_file = os.path.join(self.cache_dir, f"{spl_id}.json")
+        cached = self.spl_cache.get(spl_id) if self.spl_cache else None
+        if cached is not None and cached["fresh"]:
+            return cached["data"]
         
-        # Vérifier le cache
-        if os.path.exists(cache_file):
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                pass
+        headers = {}
+        if cached is not None:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
         
         try:
             endpoint = f"{self.api_url}/spls/{spl_id}.json"
-            response = requests.get(endpoint, timeout=15)
+            response = await self._get(endpoint, timeout=15, headers=headers or None)
+            
+            if response.status_code == 304 and cached is not None:
+                self.spl_cache.revalidated(spl_id)
+                return cached["data"]
             
             if response.status_code == 200:
                 data = response.json()
-                
-                # Sauvegarder en cache
-                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
-                with open(cache_file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-                
+                self._cache_spl(spl_id, data, response.headers)
                 return data
-            else:
-                logger.error(f"❌ Erreur récupération SPL {spl_id}: {response.status_code}")
-                return None
+            
+            logger.error(f"❌ Erreur récupération SPL {spl_id}: {response.status_code}")
                 
         except Exception as e:
             logger.error(f"❌ Erreur récupération SPL: {str(e)}")
-            return None
+        
+        if cached is not None:
+            logger.warning(f"⚠️  SPL {spl_id} périmé servi depuis le cache")
+            return cached["data"]
+        return None
+    
+    def _cache_spl(self, spl_id: str, data: Dict, headers: httpx.Headers):
+        """Enregistre un SPL téléchargé (une erreur de cache n'empêche pas de le servir)"""
+        if not self.spl_cache:
+            return
+        try:
+            self.spl_cache.put(spl_id, data, etag=headers.get("ETag"), last_modified=headers.get("Last-Modified"))
+        except sqlite3.Error as e:
+            logger.error(f"❌ Écriture du cache SPL échouée {spl_id}: {str(e)}")
     
     def extract_drug_info(self, spl_data: Dict) -> Dict:
         """
@@ -125,14 +302,23 @@ class DailyMedLoader:
                 title = section.get("title", "").lower()
                 content = section.get("text", "")
                 
-                if "ingredient" in title:
+                # Classement par code LOINC quand il est disponible
+                section_type = LOINC_SECTIONS.get(section.get("code") or section.get("loinc_code"))
+                if section_type == "boxed_warning":
+                    section_type = "warnings"
+                if section_type in info and section_type != "active_ingredients":
+                    info[section_type] = content
+                    continue
+                
+                # Repli sur le titre ("contraindication" avant "indication")
+                if section_type == "active_ingredients" or "ingredient" in title:
                     info["active_ingredients"].append(content)
+                elif "contraindication" in title:
+                    info["contraindications"] = content
                 elif "indication" in title:
                     info["indications"] = content
                 elif "dosage" in title or "administration" in title:
                     info["dosage"] = content
-                elif "contraindication" in title:
-                    info["contraindications"] = content
                 elif "warning" in title or "precaution" in title:
                     info["warnings"] = content
                 elif "reaction" in title or "side effect" in title:
@@ -146,51 +332,68 @@ class DailyMedLoader:
             logger.error(f"❌ Erreur extraction info médicament: {str(e)}")
             return {}
     
-    def prepare_for_vector_db(self, drug_info: Dict) -> Dict:
+    def extract_drug_info_from_xml(self, source) -> Dict:
         """
-        Prépare les données pour la base vectorielle
+        Extrait les informations d'un SPL XML (parser streaming, sections LOINC)
         
         Args:
-            drug_info: Informations sur le médicament
+            source: Chemin, contenu XML (bytes) ou fichier binaire ouvert
+        """
+        try:
+            return parse_spl(source)
+        except Exception as e:
+            logger.error(f"❌ Erreur parsing SPL XML: {str(e)}")
+            return {}
+    
+    def prepare_for_vector_db(self, drug_info: Dict) -> List[Dict]:
         """
-        # Créer un texte structuré pour l'embedding
-        text_parts = []
+        Prépare les données pour la base vectorielle
         
-        if drug_info.get("name"):
-            text_parts.append(f"Médicament: {drug_info['name']}")
+        Chaque section est découpée en chunks bornés en tokens (avec
+        chevauchement) au lieu d'être tronquée à 500 caractères.
         
-        if drug_info.get("active_ingredients"):
-            ingredients = ", ".join(drug_info["active_ingredients"])
-            text_parts.append(f"Principes actifs: {ingredients}")
-        
-        if drug_info.get("indications"):
-            text_parts.append(f"Indications: {drug_info['indications'][:500]}...")
+        Args:
+            drug_info: Informations sur le médicament (extract_drug_info)
+            
+        Returns:
+            Liste de documents {"id", "text", "metadata"}
+        """
+        sections = []
         
-        if drug_info.get("dosage"):
-            text_parts.append(f"Posologie: {drug_info['dosage'][:500]}...")
+        if drug_info.get("active_ingredients"):
+            sections.append({
+                "section_type": "active_ingredients",
+                "text": ", ".join(drug_info["active_ingredients"])
+            })
         
-        if drug_info.get("warnings"):
-            text_parts.append(f"Précautions: {drug_info['warnings'][:500]}...")
+        for section_type in ("indications", "dosage", "contraindications", "warnings", "side_effects", "storage"):
+            if drug_info.get(section_type):
+                sections.append({"section_type": section_type, "text": drug_info[section_type]})
         
-        text = "\n".join(text_parts)
+        for section in sections:
+            section.update({
+                "drug_name": drug_info.get("name", ""),
+                "set_id": drug_info.get("set_id", ""),
+                "version": drug_info.get("version", "")
+            })
         
-        return {
-            "id": f"drug_{hash(drug_info.get('name', ''))}",
-            "text": text,
-            "metadata": {
-                "name": drug_info.get("name", ""),
-                "source": "DailyMed",
-                "timestamp": time.time()
-            }
-        }
+        return chunk_sections(sections)
     
-    def is_available(self) -> bool:
+    async def is_available(self) -> bool:
         """Vérifie si DailyMed est accessible"""
         try:
-            response = requests.get(f"{self.api_url}/drugnames.json", params={"drug_name": "aspirin"}, timeout=5)
+            response = await self.client.get(
+                f"{self.api_url}/drugnames.json",
+                params={"drug_name": "aspirin"},
+                timeout=5
+            )
             return response.status_code == 200
-        except:
+        except Exception:
             return False
+    
+    async def close(self):
+        """Ferme le pool de connexions HTTP"""
+        await self.client.aclose()
 
-# Instance globale
-dailymed_loader = DailyMedLoader()
\ No newline at end of file
+# Instance globale (construite au premier accès, voir app.container)
+__getattr__ = lazy_instance(__name__, "dailymed_loader", "loader")
\ No newline at end of file
@@ -0,0 +1,446 @@
+# app/database/drug_canonicalizer.py
+"""
+Canonicalisation des noms de médicaments vers leurs principes actifs
+
+"Doliprane", "Tylenol 500", "paracétamol" et "Acetaminophen Tablets" sont
+ramenés au même principe actif canonique (acetaminophen), pour que cache
+de réponses, RAG et moteur d'interactions ne voient qu'une seule clé.
+
+Normalisation d'une forme de surface (voir surface_key):
+- casse, accents, ponctuation et dosages (canonicalize_query);
+- dosages, formes galéniques et sels retirés ("500 mg", "tablets",
+  "hydrochloride", "chlorhydrate"...);
+- synonymes français/anglais (paracetamol -> acetaminophen).
+
+Table construite depuis les marques courantes françaises et américaines
+intégrées (BRANDS) et le dump local des noms DailyMed (noms de marque et
+génériques -> principes actifs, prioritaire quand il les renseigne), comme
+l'index des noms:
+- hachages des clés triés (int64) -> groupe de principes actifs;
+- groupes en CSR (offsets, identifiants de principes actifs);
+la résolution d'un lot se fait par un seul searchsorted sur les clés
+uniques du lot. Synonymes supplémentaires: CSV "alias,ingredient"
+(config.DRUG_SYNONYMS_PATH, principes actifs multiples séparés par "+").
+
+Test depuis ml_model/:
+    python -m app.database.drug_canonicalizer Doliprane "Tylenol 500" paracétamol
+"""
+import argparse
+import csv
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import config
+from app.container import lazy_instance
+from app.database.drug_names_index import _read_dump
+from app.llm.answer_cache import canonicalize_query
+
+logger = logging.getLogger(__name__)
+
+# Unités et mots de dosage retirés de la clé (après canonicalize_query)
+UNITS = {"mg", "g", "mcg", "ug", "ml", "l", "ui", "iu", "unit", "units", "meq", "mmol", "pct", "%"}
+_NUMBER_RE = re.compile(r"^\d+(\.\d+)?$")
+
+# Formes galéniques (anglais/français, sans accents)
+DOSAGE_FORMS = {
+    "tablet", "tablets", "tab", "tabs", "capsule", "capsules", "caps", "oral", "solution", "suspension",
+    "injection", "injectable", "syrup", "cream", "ointment", "gel", "drops", "spray", "powder",
+    "film", "coated", "chewable", "effervescent", "extended", "delayed", "release", "er", "xr", "sr",
+    "cr", "dr", "odt", "usp", "comprime", "comprimes", "gelule", "gelules", "sirop", "creme",
+    "pommade", "buvable", "pellicule", "pellicules", "secable", "secables", "orodispersible",
+    "poudre", "sachet", "sachets", "collyre", "goutte", "gouttes",
+}
+
+# Mentions de dosage ou de présentation d'une marque ("Tylenol Extra Strength"): seuls mots
+# acceptés après un préfixe connu. "plus", "pm", "cold", "sinus"... signalent au contraire
+# des principes actifs supplémentaires et ne sont jamais ignorés.
+STRENGTH_WORDS = {
+    "extra", "strength", "maximum", "max", "regular", "original", "junior", "children", "childrens",
+    "child", "infant", "infants", "pediatric", "adult", "adults", "enfant", "enfants", "nourrisson",
+    "nourrissons", "adulte", "adultes", "forte", "fort", "mite", "low", "dose", "rapid", "fast",
+    "acting", "quick", "liquid", "liquide", "caplet", "caplets", "gelcap", "gelcaps", "geltab",
+    "geltabs", "softgel", "softgels", "liqui", "gels", "liquigels", "lp",
+}
+
+# Sels et hydrates ("de" pour "chlorhydrate de metformine")
+SALTS = {
+    "hydrochloride", "hcl", "dihydrochloride", "chlorhydrate", "sodium", "sodique", "potassium",
+    "potassique", "calcium", "calcique", "magnesium", "sulfate", "sulphate", "maleate", "mesylate",
+    "besylate", "besilate", "tartrate", "succinate", "citrate", "phosphate", "acetate", "fumarate",
+    "bromide", "bromhydrate", "hyclate", "monohydrate", "dihydrate", "trihydrate", "hemihydrate",
+    "anhydrous", "anhydre", "base", "disodium", "dipropionate", "propionate", "valerate", "de",
+}
+
+# Synonymes français/anglais et DCI -> USAN (clés déjà normalisées)
+SYNONYMS = {
+    "paracetamol": "acetaminophen",
+    "acide acetylsalicylique": "aspirin",
+    "acetylsalicylic acid": "aspirin",
+    "salbutamol": "albuterol",
+    "glibenclamide": "glyburide",
+    "adrenaline": "epinephrine",
+    "noradrenaline": "norepinephrine",
+    "amoxicilline": "amoxicillin",
+    "acide clavulanique": "clavulanic acid",
+    "clavulanate": "clavulanic acid",
+    "levothyroxine sodique": "levothyroxine",
+    "acide valproique": "valproic acid",
+    "valproate": "valproic acid",
+    "pethidine": "meperidine",
+    "colecalciferol": "cholecalciferol",
+    "ciclosporine": "cyclosporine",
+    "ciclosporin": "cyclosporine",
+    "rifampicine": "rifampin",
+    "rifampicin": "rifampin",
+}
+
+# Marques françaises et américaines courantes -> principes actifs ("+" pour les associations)
+BRANDS = {
+    "doliprane": "acetaminophen",
+    "efferalgan": "acetaminophen",
+    "dafalgan": "acetaminophen",
+    "tylenol": "acetaminophen",
+    "panadol": "acetaminophen",
+    "dafalgan codeine": "acetaminophen + codeine",
+    "tylenol pm": "acetaminophen + diphenhydramine",
+    "advil": "ibuprofen",
+    "motrin": "ibuprofen",
+    "nurofen": "ibuprofen",
+    "spedifen": "ibuprofen",
+    "aleve": "naproxen",
+    "voltaren": "diclofenac",
+    "voltarene": "diclofenac",
+    "aspegic": "aspirin",
+    "kardegic": "aspirin",
+    "augmentin": "amoxicillin + clavulanic acid",
+    "clamoxyl": "amoxicillin",
+    "amoxil": "amoxicillin",
+    "zithromax": "azithromycin",
+    "ciflox": "ciprofloxacin",
+    "cipro": "ciprofloxacin",
+    "glucophage": "metformin",
+    "januvia": "sitagliptin",
+    "lantus": "insulin glargine",
+    "coumadin": "warfarin",
+    "previscan": "fluindione",
+    "eliquis": "apixaban",
+    "xarelto": "rivaroxaban",
+    "lovenox": "enoxaparin",
+    "plavix": "clopidogrel",
+    "levothyrox": "levothyroxine",
+    "synthroid": "levothyroxine",
+    "ventoline": "albuterol",
+    "ventolin": "albuterol",
+    "tahor": "atorvastatin",
+    "lipitor": "atorvastatin",
+    "crestor": "rosuvastatin",
+    "zocor": "simvastatin",
+    "amlor": "amlodipine",
+    "norvasc": "amlodipine",
+    "zestril": "lisinopril",
+    "lasilix": "furosemide",
+    "lasix": "furosemide",
+    "mopral": "omeprazole",
+    "prilosec": "omeprazole",
+    "inexium": "esomeprazole",
+    "nexium": "esomeprazole",
+    "imodium": "loperamide",
+    "spasfon": "phloroglucinol",
+    "zyrtec": "cetirizine",
+    "claritin": "loratadine",
+    "deroxat": "paroxetine",
+    "paxil": "paroxetine",
+    "prozac": "fluoxetine",
+    "zoloft": "sertraline",
+    "xanax": "alprazolam",
+    "lexomil": "bromazepam",
+    "valium": "diazepam",
+    "depakine": "valproic acid",
+    "tegretol": "carbamazepine",
+}
+
+# Résultat d'une forme non résolue
+MATCH_NONE = "none"
+# Résolue par un préfixe: le nom complet n'est pas dans la table
+MATCH_PREFIX = "prefix"
+
+
+def _strip(tokens: List[str]) -> List[str]:
+    return [
+        token for token in tokens
+        if token not in UNITS and token not in DOSAGE_FORMS and token not in SALTS
+        and not _NUMBER_RE.match(token)
+    ]
+
+
+@lru_cache(maxsize=65536)
+def surface_key(name: str) -> str:
+    """
+    Clé normalisée d'un nom de médicament ou de principe actif (mémoïsée)
+
+    "Metformin Hydrochloride 500 mg Tablets" -> "metformin"
+    "Paracétamol 1g" -> "acetaminophen"
+    """
+    key = canonicalize_query(name)
+    if key in SYNONYMS:
+        return SYNONYMS[key]
+    stripped = " ".join(_strip(key.split()))
+    # "sodium chloride": un nom fait uniquement de sels reste tel quel
+    key = stripped or key
+    return SYNONYMS.get(key, key)
+
+
+def strength_only(tokens: List[str]) -> bool:
+    """Vrai si les tokens ne sont que des mentions de dosage, de forme ou de sel"""
+    return all(
+        token in STRENGTH_WORDS or token in UNITS or token in DOSAGE_FORMS or token in SALTS
+        or _NUMBER_RE.match(token)
+        for token in tokens
+    )
+
+
+def canonical_subject(name: str, resolved: Dict) -> str:
+    """
+    Sujet de récupération, de cache et de prompt d'un nom résolu
+
+    Le principe actif canonique si le nom est entièrement résolu; le nom
+    tel quel s'il est inconnu ou résolu par préfixe (un produit combiné ne
+    doit pas partager la monographie d'un seul de ses principes actifs).
+    """
+    if resolved["ingredients"] and resolved["match"] != MATCH_PREFIX:
+        return resolved["canonical"]
+    return name
+
+
+def _french_variant(key: str) -> str:
+    """Orthographe française -> anglaise: "amoxicilline metformine" -> "amoxicillin metformin" """
+    return " ".join(
+        token[:-1] if len(token) > 5 and token.endswith("e") else token
+        for token in key.split()
+    )
+
+
+class _Snapshot:
+    """Instantané immuable de la table de canonicalisation"""
+
+    def __init__(self, records: List[Dict], synonyms: Dict[str, str], source_mtime: float = 0.0):
+        self.source_mtime = source_mtime
+        self.ingredient_ids: Dict[str, int] = {}
+        self.ingredients: List[str] = []
+        # Nombre de produits du dump contenant chaque principe actif
+        self.product_counts: Counter = Counter()
+        groups: Dict[Tuple[int, ...], int] = {}
+        # Clé -> votes par groupe (une marque peut couvrir plusieurs produits)
+        votes: Dict[str, Counter] = defaultdict(Counter)
+
+        def _ingredient(name: str) -> int:
+            key = surface_key(name)
+            if key not in self.ingredient_ids:
+                self.ingredient_ids[key] = len(self.ingredients)
+                self.ingredients.append(key)
+            return self.ingredient_ids[key]
+
+        def _group(ingredient_ids) -> int:
+            members = tuple(sorted(set(ingredient_ids)))
+            if members not in groups:
+                groups[members] = len(groups)
+            return groups[members]
+
+        for record in records:
+            names = [
+                item.get("name", "") if isinstance(item, dict) else str(item)
+                for item in record.get("active_ingredients") or []
+            ]
+            names = [name for name in names if surface_key(name)]
+            ids = [_ingredient(name) for name in names]
+            self.product_counts.update(set(ids))
+            for ingredient_id in ids:
+                votes[self.ingredients[ingredient_id]][_group([ingredient_id])] += 1
+            drug_name = record.get("drug_name") or record.get("name") or ""
+            key = surface_key(drug_name)
+            if key and ids:
+                votes[key][_group(ids)] += 1
+
+        # Un vote par alias intégré ou du CSV: le dump l'emporte dès qu'il renseigne la forme.
+        # Les principes actifs cibles deviennent des clés eux-mêmes ("metformin hydrochloride").
+        for alias, target in synonyms.items():
+            ids = [_ingredient(name) for name in target.split("+") if surface_key(name)]
+            if not ids:
+                continue
+            for ingredient_id in ids:
+                votes[self.ingredients[ingredient_id]][_group([ingredient_id])] += 1
+            votes[surface_key(alias)][_group(ids)] += 1
+
+        # Le groupe le plus fréquent l'emporte (à égalité, le plus petit)
+        members_by_group = {group: members for members, group in groups.items()}
+        table = {
+            key: min(counter.items(), key=lambda item: (-item[1], len(members_by_group[item[0]]), item[0]))[0]
+            for key, counter in votes.items() if key
+        }
+
+        pairs = sorted((hash(key), group) for key, group in table.items())
+        self.key_hashes = np.asarray([h for h, _ in pairs], dtype=np.int64)
+        self.key_groups = np.asarray([g for _, g in pairs], dtype=np.int32)
+        self.group_offsets = np.cumsum(
+            [0] + [len(members_by_group[g]) for g in range(len(groups))]
+        ).astype(np.int64)
+        self.group_ingredients = np.asarray(
+            [i for g in range(len(groups)) for i in members_by_group[g]], dtype=np.int32
+        )
+        self.max_key_tokens = max((len(key.split()) for key in table), default=0)
+
+    def __len__(self) -> int:
+        return len(self.key_hashes)
+
+    def lookup(self, keys: Sequence[str]) -> np.ndarray:
+        """Groupe de chaque clé (-1 si inconnue), un seul searchsorted"""
+        if not len(self.key_hashes) or not len(keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        hashes = np.fromiter((hash(key) for key in keys), dtype=np.int64, count=len(keys))
+        positions = np.minimum(np.searchsorted(self.key_hashes, hashes), len(self.key_hashes) - 1)
+        return np.where(self.key_hashes[positions] == hashes, self.key_groups[positions], -1)
+
+
+class DrugCanonicalizer:
+    """Noms de marque, sels, dosages et orthographes -> principes actifs canoniques"""
+
+    def __init__(self, path: Optional[str] = None, synonyms_path: Optional[str] = None):
+        """
+        Args:
+            path: Dump des noms DailyMed (config.DRUG_NAMES_PATH par défaut)
+            synonyms_path: CSV "alias,ingredient" facultatif (config.DRUG_SYNONYMS_PATH par défaut)
+        """
+        self.path = path or config.DRUG_NAMES_PATH
+        self.synonyms_path = synonyms_path or config.DRUG_SYNONYMS_PATH
+        self._snapshot = _Snapshot([], {})
+        self._reload_lock = threading.Lock()
+        self.reload()
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    def _read_synonyms(self) -> Dict[str, str]:
+        synonyms = {**SYNONYMS, **BRANDS}
+        if os.path.exists(self.synonyms_path):
+            with open(self.synonyms_path, "r", encoding="utf-8", newline="") as f:
+                for row in csv.reader(f):
+                    if len(row) >= 2 and row[0].strip() and row[1].strip() and row[0] != "alias":
+                        synonyms[row[0].strip()] = row[1].strip()
+        return synonyms
+
+    def reload(self, path: Optional[str] = None) -> bool:
+        """
+        Reconstruit la table depuis le dump puis remplace l'instantané courant
+
+        Sans dump, seuls les synonymes et marques intégrés sont chargés.
+
+        Returns:
+            True si un nouvel instantané a été chargé
+        """
+        path = path or self.path
+        with self._reload_lock:
+            try:
+                start = time.perf_counter()
+                if os.path.exists(path):
+                    records, mtime = _read_dump(path), os.path.getmtime(path)
+                else:
+                    logger.warning(f"⚠️  Dump des noms absent, synonymes et marques intégrés seulement: {path}")
+                    records, mtime = [], 0.0
+                snapshot = _Snapshot(records, self._read_synonyms(), source_mtime=mtime)
+            except Exception as e:
+                # L'instantané précédent reste en service
+                logger.error(f"❌ Erreur chargement de la table de canonicalisation: {str(e)}")
+                return False
+            self.path = path
+            self._snapshot = snapshot
+            logger.info(
+                f"✅ Table de canonicalisation chargée - {len(snapshot)} formes, "
+                f"{len(snapshot.ingredients)} principes actifs en {time.perf_counter() - start:.2f}s"
+            )
+            return True
+
+    def resolve(self, name: str) -> Dict:
+        """Canonicalise un nom (voir resolve_batch)"""
+        return self.resolve_batch([name])[0]
+
+    def resolve_batch(self, names: Sequence[str]) -> List[Dict]:
+        """
+        Canonicalise un lot de noms
+
+        Les clés uniques du lot sont résolues ensemble (un searchsorted);
+        les formes inconnues essaient ensuite l'orthographe anglaise puis le
+        plus long préfixe connu ("Tylenol Extra Strength" -> "tylenol"), à
+        condition que les mots restants ne soient que des mentions de dosage
+        ou de forme (STRENGTH_WORDS): "Tylenol PM" ou "amoxicillin
+        clavulanate" ne sont pas ramenés à un seul principe actif.
+
+        Returns:
+            Pour chaque nom: {"input", "canonical", "ingredients", "ingredient_ids", "match"}
+            ("exact", "variant", "prefix" ou "none"; canonical = clé du nom si "none")
+        """
+        snapshot = self._snapshot
+        keys = [surface_key(name or "") for name in names]
+        unique = list(dict.fromkeys(keys))
+        groups = dict(zip(unique, snapshot.lookup(unique).tolist()))
+        matches = {key: "exact" for key, group in groups.items() if group >= 0}
+
+        for key in [key for key, group in groups.items() if group < 0 and key]:
+            variant = _french_variant(key)
+            tokens = key.split()
+            candidates = [(variant, "variant")] + [
+                (" ".join(tokens[:n]), MATCH_PREFIX)
+                for n in range(min(len(tokens) - 1, snapshot.max_key_tokens), 0, -1)
+                if strength_only(tokens[n:])
+            ]
+            found = snapshot.lookup([candidate for candidate, _ in candidates]).tolist()
+            for (_, match), group in zip(candidates, found):
+                if group >= 0:
+                    groups[key], matches[key] = group, match
+                    break
+
+        results = []
+        for name, key in zip(names, keys):
+            group = groups[key]
+            if group < 0:
+                results.append({
+                    "input": name, "canonical": key, "ingredients": [], "ingredient_ids": [], "match": MATCH_NONE
+                })
+                continue
+            ids = snapshot.group_ingredients[snapshot.group_offsets[group]:snapshot.group_offsets[group + 1]].tolist()
+            ingredients = [snapshot.ingredients[i] for i in ids]
+            results.append({
+                "input": name,
+                "canonical": " + ".join(ingredients),
+                "ingredients": ingredients,
+                "ingredient_ids": ids,
+                "match": matches[key],
+            })
+        return results
+
+    def top_ingredients(self, limit: int) -> List[str]:
+        """Principes actifs canoniques les plus fréquents du dump (nombre de produits)"""
+        snapshot = self._snapshot
+        return [snapshot.ingredients[i] for i, _ in snapshot.product_counts.most_common(limit)]
+
+
+# Instance globale (construite au premier accès, voir app.container)
+__getattr__ = lazy_instance(__name__, "drug_canonicalizer", "canonicalizer")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Canonicalisation des noms de médicaments")
+    parser.add_argument("--path", default=config.DRUG_NAMES_PATH)
+    parser.add_argument("names", nargs="+", help="Noms à canonicaliser")
+    args = parser.parse_args()
+    canonicalizer = DrugCanonicalizer(args.path)
+    for result in canonicalizer.resolve_batch(args.names):
+        print(f"{result['input']:<30} {result['match']:<8} {result['canonical']}")
@@ -0,0 +1,364 @@
+# app/database/drug_names_index.py
+"""
+Index local des noms de médicaments et principes actifs (autocomplétion)
+
+Construit à partir d'un dump local des noms DailyMed:
+- tableau trié des clés normalisées (nom complet et chaque fin de nom à
+  partir d'un mot) pour la complétion par préfixe, via bisect;
+- index de trigrammes pour les fautes de frappe ("ibuprofne" -> ibuprofen).
+
+L'index est un instantané immuable: un rechargement construit un nouvel
+instantané puis le remplace en une affectation, sans bloquer les lectures.
+
+Formats du dump (config.DRUG_NAMES_PATH):
+- .json: réponse de l'API drugnames ({"data": [...]}) ou liste d'objets
+  {"drug_name", "name_type", "active_ingredients"};
+- autre: un nom par ligne.
+
+Téléchargement du dump depuis ml_model/:
+    python -m app.database.drug_names_index --download
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import config
+from app.container import lazy_instance
+from app.llm.answer_cache import canonicalize_query
+
+logger = logging.getLogger(__name__)
+
+# Types de noms DailyMed (name_type)
+NAME_TYPES = {"G": "generic", "B": "brand"}
+
+# Intervalle minimum entre deux vérifications de la date du dump
+RELOAD_CHECK_INTERVAL = 30.0
+
+# Recherche approximative: longueur minimale d'un mot indexé, candidats
+# re-notés, volume de postings de trigrammes parcouru en dernier recours
+MIN_FUZZY_WORD = 4
+FUZZY_CANDIDATES = 256
+FUZZY_MAX_POSTINGS = 5000
+
+
+def normalize_name(name: str) -> str:
+    """Clé de recherche: casse, accents et ponctuation normalisés"""
+    return canonicalize_query(name)
+
+
+def _trigrams(key: str) -> List[str]:
+    padded = f"  {key} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def _deletes(word: str) -> set:
+    """Le mot et ses variantes à un caractère supprimé"""
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _read_dump(path: str) -> List[Dict]:
+    """Lit le dump et renvoie des objets {"drug_name", "name_type", "active_ingredients"}"""
+    with open(path, "r", encoding="utf-8") as f:
+        if not path.endswith(".json"):
+            return [{"drug_name": line.strip()} for line in f if line.strip()]
+        data = json.load(f)
+    return data.get("data", []) if isinstance(data, dict) else data
+
+
+class _Snapshot:
+    """Instantané immuable de l'index"""
+
+    def __init__(self, records: List[Dict], source_mtime: float = 0.0):
+        self.source_mtime = source_mtime
+        by_key: Dict[str, Dict] = {}
+
+        def _add(name: str, kind: str, ingredients: List[str]):
+            key = normalize_name(name)
+            if not key:
+                return
+            entry = by_key.get(key)
+            if entry is None:
+                by_key[key] = {"name": name.strip(), "type": kind, "active_ingredients": list(ingredients)}
+            elif ingredients and not entry["active_ingredients"]:
+                entry["active_ingredients"] = list(ingredients)
+
+        for record in records:
+            ingredients = [
+                item.get("name", "") if isinstance(item, dict) else str(item)
+                for item in record.get("active_ingredients") or []
+            ]
+            ingredients = [name for name in ingredients if name]
+            name = record.get("drug_name") or record.get("name") or ""
+            _add(name, NAME_TYPES.get(record.get("name_type", ""), "name"), ingredients)
+            for ingredient in ingredients:
+                _add(ingredient, "ingredient", [ingredient])
+
+        self.keys_by_entry = list(by_key)
+        self.entries = [by_key[key] for key in self.keys_by_entry]
+
+        # Clés de complétion: nom complet + chaque fin de nom commençant par un mot
+        prefix_keys = []
+        for entry_id, key in enumerate(self.keys_by_entry):
+            words = key.split()
+            for start in range(len(words)):
+                prefix_keys.append((" ".join(words[start:]), entry_id, start))
+        prefix_keys.sort()
+        self.prefix_keys = [key for key, _, _ in prefix_keys]
+        self.prefix_entries = np.asarray([entry_id for _, entry_id, _ in prefix_keys], dtype=np.int32)
+        self.prefix_word_start = np.asarray([start for _, _, start in prefix_keys], dtype=np.int16)
+        # Rang de complétion: nom complet avant mot intérieur, puis noms courts d'abord
+        self.prefix_rank = np.asarray(
+            [(start > 0) * 1024 + min(len(key), 1023) for key, _, start in prefix_keys], dtype=np.int32
+        )
+
+        # Index de suppressions (SymSpell): chaque mot et ses variantes à un caractère
+        # supprimé, hachés dans un tableau trié -> mot; mot -> entrées (CSR)
+        word_ids: Dict[str, int] = {}
+        word_entries: List[List[int]] = []
+        for entry_id, key in enumerate(self.keys_by_entry):
+            for word in set(key.split()):
+                if len(word) < MIN_FUZZY_WORD:
+                    continue
+                if word not in word_ids:
+                    word_ids[word] = len(word_entries)
+                    word_entries.append([])
+                word_entries[word_ids[word]].append(entry_id)
+        self.word_offsets = np.cumsum([0] + [len(ids) for ids in word_entries]).astype(np.int64)
+        self.word_entry_ids = np.asarray([e for ids in word_entries for e in ids], dtype=np.int32)
+
+        delete_pairs = [
+            (hash(variant), word_id)
+            for word, word_id in word_ids.items()
+            for variant in _deletes(word)
+        ]
+        delete_pairs.sort()
+        self.delete_hashes = np.asarray([h for h, _ in delete_pairs], dtype=np.int64)
+        self.delete_words = np.asarray([w for _, w in delete_pairs], dtype=np.int32)
+
+        # Trigrammes -> entrées
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for entry_id, key in enumerate(self.keys_by_entry):
+            for gram in set(_trigrams(key)):
+                postings[gram].append(entry_id)
+        self.trigram_postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class DrugNameIndex:
+    """Autocomplétion et recherche approximative des noms de médicaments"""
+
+    def __init__(self, path: Optional[str] = None, min_similarity: float = 0.35):
+        """
+        Args:
+            path: Dump des noms (config.DRUG_NAMES_PATH par défaut)
+            min_similarity: Similarité de Dice minimale (trigrammes) pour la recherche approximative
+        """
+        self.path = path or config.DRUG_NAMES_PATH
+        self.min_similarity = min_similarity
+        self._snapshot = _Snapshot([])
+        self._reload_lock = threading.Lock()
+        self._last_check = 0.0
+        self.reload()
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    def reload(self, path: Optional[str] = None) -> bool:
+        """
+        Reconstruit l'index depuis le dump puis remplace l'instantané courant
+
+        Returns:
+            True si un nouvel instantané a été chargé
+        """
+        path = path or self.path
+        with self._reload_lock:
+            self._last_check = time.monotonic()
+            if not os.path.exists(path):
+                logger.warning(f"⚠️  Dump des noms de médicaments absent: {path}")
+                return False
+            try:
+                mtime = os.path.getmtime(path)
+                start = time.perf_counter()
+                snapshot = _Snapshot(_read_dump(path), source_mtime=mtime)
+            except Exception as e:
+                # L'instantané précédent reste en service
+                logger.error(f"❌ Erreur chargement des noms de médicaments: {str(e)}")
+                return False
+            self.path = path
+            self._snapshot = snapshot
+            logger.info(
+                f"✅ Index des noms chargé - {len(snapshot)} noms en {time.perf_counter() - start:.2f}s"
+            )
+            return True
+
+    def dump_changed(self) -> bool:
+        """True si le dump a été modifié depuis le chargement (vérifié au plus toutes les 30 s)"""
+        if time.monotonic() - self._last_check < RELOAD_CHECK_INTERVAL:
+            return False
+        self._last_check = time.monotonic()
+        try:
+            return os.path.getmtime(self.path) != self._snapshot.source_mtime
+        except OSError:
+            return False
+
+    def _fuzzy(self, snapshot: _Snapshot, key: str, limit: int) -> List[Tuple[int, float]]:
+        """
+        Entrées les plus proches par similarité de Dice sur les trigrammes
+
+        Candidats: mots à une suppression près de chaque côté (couvre
+        suppression, insertion, substitution et inversion d'un caractère),
+        sinon les trigrammes les plus rares de la requête. La similarité
+        exacte n'est calculée que sur ces candidats.
+        """
+        candidates = set()
+        for word in set(key.split()):
+            if len(word) < MIN_FUZZY_WORD:
+                continue
+            hashes = np.fromiter((hash(v) for v in _deletes(word)), dtype=np.int64)
+            low = np.searchsorted(snapshot.delete_hashes, hashes, side="left")
+            high = np.searchsorted(snapshot.delete_hashes, hashes, side="right")
+            for word_id in {int(w) for a, b in zip(low, high) for w in snapshot.delete_words[a:b]}:
+                entries = snapshot.word_entry_ids[snapshot.word_offsets[word_id]:snapshot.word_offsets[word_id + 1]]
+                candidates.update(entries[:FUZZY_CANDIDATES].tolist())
+
+        if not candidates:
+            candidates = set(self._trigram_candidates(snapshot, key))
+
+        grams = set(_trigrams(key))
+        scored = []
+        for entry_id in candidates:
+            entry_grams = set(_trigrams(snapshot.keys_by_entry[entry_id]))
+            similarity = 2.0 * len(grams & entry_grams) / (len(grams) + len(entry_grams))
+            if similarity >= self.min_similarity:
+                scored.append((entry_id, similarity))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+    def _trigram_candidates(self, snapshot: _Snapshot, key: str) -> List[int]:
+        """Candidats partageant le plus de trigrammes rares avec la requête"""
+        postings = sorted(
+            (snapshot.trigram_postings[g] for g in set(_trigrams(key)) if g in snapshot.trigram_postings),
+            key=len
+        )
+        if not postings:
+            return []
+
+        selected, size = [], 0
+        for ids in postings:
+            if len(selected) >= 2 and size + len(ids) > FUZZY_MAX_POSTINGS:
+                break
+            selected.append(ids)
+            size += len(ids)
+        candidates, counts = np.unique(np.concatenate(selected), return_counts=True)
+        if len(candidates) > FUZZY_CANDIDATES:
+            candidates = candidates[np.argpartition(-counts, FUZZY_CANDIDATES - 1)[:FUZZY_CANDIDATES]]
+        return candidates.tolist()
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """
+        Suggestions classées: nom exact, préfixe du nom, préfixe d'un mot, puis approximatif
+
+        Returns:
+            Entrées {"name", "type", "active_ingredients", "match", "score"}
+        """
+        snapshot = self._snapshot
+        key = normalize_name(query)
+        if not key or not len(snapshot):
+            return []
+
+        results: Dict[int, Dict] = {}
+
+        # 1. Préfixe (nom complet puis mot intérieur), les noms courts d'abord
+        start = bisect_left(snapshot.prefix_keys, key)
+        end = bisect_left(snapshot.prefix_keys, key + "\uffff", lo=start)
+        if end > start:
+            # Les meilleurs rangs seulement: coût indépendant du nombre de complétions possibles
+            ranks = snapshot.prefix_rank[start:end]
+            wanted = min(len(ranks), 3 * limit)
+            top = np.argpartition(ranks, wanted - 1)[:wanted]
+            top = top[np.argsort(ranks[top], kind="stable")]
+            for position in top:
+                entry_id = int(snapshot.prefix_entries[start + position])
+                if entry_id in results:
+                    continue
+                if snapshot.keys_by_entry[entry_id] == key:
+                    match, score = "exact", 1.0
+                elif snapshot.prefix_word_start[start + position] == 0:
+                    match, score = "prefix", 0.9
+                else:
+                    match, score = "word_prefix", 0.8
+                results[entry_id] = {**snapshot.entries[entry_id], "match": match, "score": score}
+                if len(results) >= limit:
+                    break
+
+        # 2. Approximatif (trigrammes) seulement si aucune complétion
+        if not results:
+            for entry_id, similarity in self._fuzzy(snapshot, key, limit):
+                results[entry_id] = {
+                    **snapshot.entries[entry_id],
+                    "match": "fuzzy",
+                    "score": round(similarity * 0.75, 3)
+                }
+
+        return [{**result, "source": "Index local DailyMed"} for result in results.values()]
+
+
+async def download_dump(path: str, page_size: int = 100):
+    """Télécharge tous les noms via l'API drugnames de DailyMed (une page à la fois)"""
+    from app.database.dailymed_loader import dailymed_loader
+
+    records = []
+    page = 1
+    try:
+        while True:
+            response = await dailymed_loader._get(
+                f"{dailymed_loader.api_url}/drugnames.json",
+                params={"pagesize": page_size, "page": page}
+            )
+            response.raise_for_status()
+            data = response.json()
+            records.extend(data.get("data", []))
+            total_pages = data.get("metadata", {}).get("total_pages", page)
+            logger.info(f"📥 Page {page}/{total_pages} - {len(records)} noms")
+            if page >= int(total_pages):
+                break
+            page += 1
+    finally:
+        await dailymed_loader.close()
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"data": records}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    logger.info(f"✅ {len(records)} noms écrits dans {path}")
+
+
+# Instance globale (construite au premier accès, voir app.container)
+__getattr__ = lazy_instance(__name__, "drug_name_index", "names")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Index local des noms de médicaments")
+    parser.add_argument("--path", default=config.DRUG_NAMES_PATH)
+    parser.add_argument("--download", action="store_true", help="Télécharge le dump depuis DailyMed")
+    parser.add_argument("--query", help="Teste une recherche")
+    args = parser.parse_args()
+    if args.download:
+        asyncio.run(download_dump(args.path))
+    if args.query:
+        index = DrugNameIndex(args.path)
+        for suggestion in index.search(args.query):
+            print(f"{suggestion['score']:.2f}  {suggestion['match']:<12} {suggestion['name']}")
@@ -0,0 +1,315 @@
+# app/database/interaction_index.py
+"""
+Moteur local d'interactions médicamenteuses (niveau principe actif)
+
+Les interactions d'un jeu de données local sont encodées en entiers:
+- chaque principe actif (clé canonique, voir drug_canonicalizer) reçoit
+  un identifiant;
+- la matrice d'adjacence symétrique est stockée en CSR (indptr, indices,
+  enregistrements), voisins triés dans chaque ligne;
+- les clés min * n + max des paires (triangle supérieur, entiers 32 bits
+  quand ils suffisent) forment un tableau trié: toutes les paires d'une
+  ordonnance sont résolues par un seul searchsorted sur des clés triées,
+  sans boucle Python par paire.
+
+Comme l'index des noms, l'index est un instantané immuable remplacé en une
+affectation lors d'un rechargement.
+
+Format du jeu de données (config.INTERACTIONS_PATH), CSV avec en-tête:
+    ingredient_a,ingredient_b,severity,mechanism,management
+Les exports DDInter (Drug_A, Drug_B, Level) sont acceptés tels quels.
+Sévérités: contraindicated, major, moderate, minor (ou en français).
+
+Test depuis ml_model/:
+    python -m app.database.interaction_index warfarin aspirin omeprazole
+"""
+import argparse
+import csv
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config import config
+from app.container import lazy_instance
+from app.database.drug_canonicalizer import surface_key
+from app.llm.answer_cache import canonicalize_query
+
+logger = logging.getLogger(__name__)
+
+# Sévérités, de la moins à la plus grave (code = position)
+SEVERITIES = ["unknown", "minor", "moderate", "major", "contraindicated"]
+SEVERITY_ALIASES = {
+    "mineure": "minor", "mineur": "minor", "faible": "minor",
+    "moderee": "moderate", "modere": "moderate", "moyenne": "moderate",
+    "majeure": "major", "majeur": "major", "elevee": "major",
+    "contre indiquee": "contraindicated", "contre indique": "contraindicated",
+}
+
+# Colonnes acceptées pour chaque champ (première présente)
+COLUMNS = {
+    "a": ("ingredient_a", "drug_a", "Drug_A"),
+    "b": ("ingredient_b", "drug_b", "Drug_B"),
+    "severity": ("severity", "level", "Level"),
+    "mechanism": ("mechanism", "description", "Mechanism"),
+    "management": ("management", "recommendation", "Management"),
+}
+
+
+def normalize_ingredient(name: str) -> str:
+    """Clé d'un principe actif: sels, dosages et synonymes normalisés (voir surface_key)"""
+    return surface_key(name)
+
+
+@lru_cache(maxsize=64)
+def _pair_indices(size: int):
+    """Paires (i, j), i < j, d'une liste de taille donnée"""
+    return np.triu_indices(size, k=1)
+
+
+def parse_severity(value: str) -> int:
+    """Code de sévérité (0 = inconnue)"""
+    key = canonicalize_query(value or "")
+    key = SEVERITY_ALIASES.get(key, key)
+    return SEVERITIES.index(key) if key in SEVERITIES else 0
+
+
+def _read_dataset(path: str) -> List[Dict]:
+    """Lit le CSV et renvoie des objets {"a", "b", "severity", "mechanism", "management"}"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        fields = reader.fieldnames or []
+        columns = {}
+        for field, candidates in COLUMNS.items():
+            columns[field] = next((c for c in candidates if c in fields), None)
+        if not columns["a"] or not columns["b"]:
+            raise ValueError(f"Colonnes des principes actifs introuvables: {fields}")
+        return [
+            {field: (row.get(column) or "").strip() if column else "" for field, column in columns.items()}
+            for row in reader
+        ]
+
+
+class _Snapshot:
+    """Instantané immuable de l'index"""
+
+    def __init__(self, rows: List[Dict], source_mtime: float = 0.0):
+        self.source_mtime = source_mtime
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+
+        def _id(name: str) -> int:
+            key = normalize_ingredient(name)
+            if key not in self.ids:
+                self.ids[key] = len(self.names)
+                self.names.append(name.strip().lower())
+            return self.ids[key]
+
+        # Une paire non ordonnée = un enregistrement; en cas de doublon la plus grave l'emporte
+        by_pair: Dict[tuple, int] = {}
+        severities, mechanisms, managements = [], [], []
+        for row in rows:
+            if not normalize_ingredient(row["a"]) or not normalize_ingredient(row["b"]):
+                continue
+            a, b = _id(row["a"]), _id(row["b"])
+            if a == b:
+                continue
+            pair = (min(a, b), max(a, b))
+            severity = parse_severity(row["severity"])
+            record = by_pair.get(pair)
+            if record is not None and severities[record] >= severity:
+                continue
+            if record is None:
+                record = len(severities)
+                by_pair[pair] = record
+                severities.append(severity)
+                mechanisms.append(row["mechanism"])
+                managements.append(row["management"])
+            else:
+                severities[record] = severity
+                mechanisms[record] = row["mechanism"]
+                managements[record] = row["management"]
+
+        self.severity = np.asarray(severities, dtype=np.int8)
+        self.mechanism = mechanisms
+        self.management = managements
+
+        # CSR symétrique: chaque paire apparaît dans les deux lignes
+        size = len(self.names)
+        if by_pair:
+            pairs = np.asarray(list(by_pair), dtype=np.int64)
+            records = np.asarray(list(by_pair.values()), dtype=np.int32)
+            rows_ = np.concatenate([pairs[:, 0], pairs[:, 1]])
+            cols = np.concatenate([pairs[:, 1], pairs[:, 0]])
+            records = np.concatenate([records, records])
+        else:
+            rows_ = cols = np.zeros(0, dtype=np.int64)
+            records = np.zeros(0, dtype=np.int32)
+        order = np.lexsort((cols, rows_))
+        self.indices = cols[order].astype(np.int32)
+        self.records = records[order]
+        self.indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows_, minlength=size), out=self.indptr[1:])
+
+        # Clés des paires (triangle supérieur) pour la vérification d'une ordonnance
+        self.key_dtype = np.int32 if size * size < 2 ** 31 else np.int64
+        rows_ = rows_[order]
+        upper = self.indices > rows_
+        self.pair_keys = (rows_[upper] * size + self.indices[upper]).astype(self.key_dtype)
+        self.pair_records = self.records[upper]
+
+    def __len__(self) -> int:
+        return len(self.severity)
+
+
+class InteractionIndex:
+    """Interactions entre principes actifs, résolues localement"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: Jeu de données CSV (config.INTERACTIONS_PATH par défaut)
+        """
+        self.path = path or config.INTERACTIONS_PATH
+        self._snapshot = _Snapshot([])
+        self._reload_lock = threading.Lock()
+        self.reload()
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    @property
+    def ingredient_count(self) -> int:
+        return len(self._snapshot.names)
+
+    def reload(self, path: Optional[str] = None) -> bool:
+        """
+        Reconstruit l'index depuis le jeu de données puis remplace l'instantané courant
+
+        Returns:
+            True si un nouvel instantané a été chargé
+        """
+        path = path or self.path
+        with self._reload_lock:
+            if not os.path.exists(path):
+                logger.warning(f"⚠️  Jeu de données d'interactions absent: {path}")
+                return False
+            try:
+                mtime = os.path.getmtime(path)
+                start = time.perf_counter()
+                snapshot = _Snapshot(_read_dataset(path), source_mtime=mtime)
+            except Exception as e:
+                # L'instantané précédent reste en service
+                logger.error(f"❌ Erreur chargement des interactions: {str(e)}")
+                return False
+            self.path = path
+            self._snapshot = snapshot
+            logger.info(
+                f"✅ Index d'interactions chargé - {len(snapshot)} paires, "
+                f"{len(snapshot.names)} principes actifs en {time.perf_counter() - start:.2f}s"
+            )
+            return True
+
+    def ingredient_id(self, name: str) -> Optional[int]:
+        """Identifiant d'un principe actif, None s'il n'apparaît dans aucune interaction"""
+        return self._snapshot.ids.get(normalize_ingredient(name))
+
+    def interactions_of(self, name: str) -> List[Dict]:
+        """Toutes les interactions connues d'un principe actif (ligne de la matrice)"""
+        snapshot = self._snapshot
+        row = snapshot.ids.get(normalize_ingredient(name))
+        if row is None:
+            return []
+        start, end = snapshot.indptr[row], snapshot.indptr[row + 1]
+        return [
+            self._hit(snapshot, int(record), row, int(other))
+            for other, record in zip(snapshot.indices[start:end], snapshot.records[start:end])
+        ]
+
+    def check(self, groups: Sequence[Sequence[str]]) -> List[Dict]:
+        """
+        Interactions entre les médicaments d'une ordonnance
+
+        Args:
+            groups: Principes actifs de chaque médicament; seules les paires
+                entre médicaments différents sont vérifiées
+
+        Returns:
+            [{"items": (i, j), "ingredients", "severity", "mechanism", "management"}]
+            par sévérité décroissante, i et j étant les positions dans groups
+        """
+        snapshot = self._snapshot
+        if not len(snapshot):
+            return []
+
+        # (position du médicament, id du principe actif) pour les principes connus
+        owners, ids = [], []
+        for position, ingredients in enumerate(groups):
+            for name in ingredients:
+                ingredient = snapshot.ids.get(normalize_ingredient(name))
+                if ingredient is not None:
+                    owners.append(position)
+                    ids.append(ingredient)
+        if len(ids) < 2:
+            return []
+
+        owners = np.asarray(owners, dtype=np.int64)
+        ids = np.asarray(ids, dtype=np.int64)
+        left, right = _pair_indices(len(ids))
+        if len(set(owners.tolist())) < len(ids):
+            # Principes actifs d'un même médicament: paires ignorées
+            keep = owners[left] != owners[right]
+            left, right = left[keep], right[keep]
+
+        # Une seule recherche dichotomique, clés triées (recherches successives proches)
+        a, b = ids[left], ids[right]
+        keys = (np.minimum(a, b) * len(snapshot.names) + np.maximum(a, b)).astype(snapshot.key_dtype)
+        order = np.argsort(keys)
+        positions = np.minimum(np.searchsorted(snapshot.pair_keys, keys[order]), len(snapshot.pair_keys) - 1)
+        found = np.flatnonzero(snapshot.pair_keys[positions] == keys[order])
+        if not len(found):
+            return []
+        positions, found = positions[found], order[found]
+
+        hits = {}
+        owners, ids = owners.tolist(), ids.tolist()
+        for l, r, position in zip(left[found].tolist(), right[found].tolist(), positions.tolist()):
+            record = int(snapshot.pair_records[position])
+            pair = (owners[l], owners[r])
+            # Médicaments à plusieurs principes actifs: la paire la plus grave par couple
+            current = hits.get(pair)
+            if current is None or snapshot.severity[record] > SEVERITIES.index(current["severity"]):
+                hits[pair] = {"items": pair, **self._hit(snapshot, record, ids[l], ids[r])}
+
+        return sorted(
+            hits.values(),
+            key=lambda hit: (-SEVERITIES.index(hit["severity"]), hit["items"])
+        )
+
+    @staticmethod
+    def _hit(snapshot: _Snapshot, record: int, a: int, b: int) -> Dict:
+        return {
+            "ingredients": [snapshot.names[a], snapshot.names[b]],
+            "severity": SEVERITIES[int(snapshot.severity[record])],
+            "mechanism": snapshot.mechanism[record],
+            "management": snapshot.management[record],
+        }
+
+
+# Instance globale (construite au premier accès, voir app.container)
+__getattr__ = lazy_instance(__name__, "interaction_index", "interactions")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Moteur local d'interactions médicamenteuses")
+    parser.add_argument("--path", default=config.INTERACTIONS_PATH)
+    parser.add_argument("ingredients", nargs="+", help="Principes actifs à vérifier")
+    args = parser.parse_args()
+    index = InteractionIndex(args.path)
+    for hit in index.check([[name] for name in args.ingredients]):
+        print(f"{hit['severity']:<16} {' + '.join(hit['ingredients'])}: {hit['mechanism']}")
@@ -0,0 +1,186 @@
+# app/database/monograph_store.py
+"""
+Monographies précalculées (template "drug_info") servies sans appel LLM
+
+Les monographies des principes actifs les plus demandés sont générées hors
+ligne (app.ingestion.precompute_monographs) dans chaque langue supportée et
+stockées dans SQLite (mode WAL, lisible par plusieurs workers), avec pour clé:
+- principe actif canonique (voir DrugCanonicalizer);
+- langue;
+- version du template: empreinte du texte du template et du modèle;
+- version SPL: empreinte des couples set_id/version des notices utilisées.
+
+Un changement de template (ou de modèle) rend les entrées invisibles
+immédiatement; une nouvelle version SPL est détectée au passage suivant du
+job, qui ne régénère que les entrées dont l'une des versions a changé.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from app.config import config
+from app.container import lazy_instance
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_ID = "drug_info"
+
+
+def template_version(template_id: str = TEMPLATE_ID) -> str:
+    """Empreinte du template et du modèle: change dès que la réponse générée peut changer"""
+    raw = f"{config.OPENAI_MODEL}\x00{config.PROMPT_TEMPLATES[template_id]}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def spl_version(sources: List[Dict]) -> str:
+    """Empreinte des notices SPL d'un contexte (set_id + version), "" sans source"""
+    labels = sorted({f"{s.get('set_id', '')}:{s.get('version', '')}" for s in sources if s.get("set_id")})
+    if not labels:
+        return ""
+    return hashlib.sha256("|".join(labels).encode("utf-8")).hexdigest()[:12]
+
+
+class MonographStore:
+    """Monographies précalculées: (principe actif, langue, template, SPL) -> réponse"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: Fichier SQLite (config.MONOGRAPH_STORE_PATH par défaut)
+        """
+        self.path = path or config.MONOGRAPH_STORE_PATH
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.template_version = template_version()
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS monographs (
+                drug TEXT NOT NULL,
+                language TEXT NOT NULL,
+                template_version TEXT NOT NULL,
+                spl_version TEXT NOT NULL,
+                information TEXT NOT NULL,
+                sources TEXT NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                generated_at REAL NOT NULL,
+                PRIMARY KEY (drug, language, template_version, spl_version)
+            )
+        """)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM monographs WHERE template_version = ?", (self.template_version,)
+            ).fetchone()[0]
+
+    def get(self, drug: str, language: str) -> Optional[Dict]:
+        """Monographie courante d'un principe actif (voir get_many)"""
+        return self.get_many([drug], language).get(drug)
+
+    def get_many(self, drugs: Iterable[str], language: str) -> Dict[str, Dict]:
+        """
+        Monographies courantes (template actuel) d'un lot, en une seule lecture
+
+        Returns:
+            {principe actif: {"information", "sources", "prompt_tokens",
+             "spl_version", "template_version", "generated_at"}} pour les entrées trouvées
+        """
+        drugs = list(dict.fromkeys(drugs))
+        if not drugs:
+            return {}
+
+        found = {}
+        try:
+            with self._lock:
+                for start in range(0, len(drugs), 500):
+                    chunk = drugs[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = self._db.execute(
+                        f"SELECT drug, spl_version, information, sources, prompt_tokens, generated_at "
+                        f"FROM monographs WHERE language = ? AND template_version = ? AND drug IN ({placeholders}) "
+                        f"ORDER BY generated_at",
+                        [language, self.template_version, *chunk]
+                    ).fetchall()
+                    # La plus récente l'emporte si l'ancienne n'a pas encore été supprimée
+                    for drug, spl, information, sources, prompt_tokens, generated_at in rows:
+                        found[drug] = {
+                            "information": information,
+                            "sources": json.loads(sources),
+                            "prompt_tokens": prompt_tokens,
+                            "spl_version": spl,
+                            "template_version": self.template_version,
+                            "generated_at": generated_at
+                        }
+        except sqlite3.Error as e:
+            # Le chemin de génération normal prend le relais
+            logger.error(f"❌ Lecture des monographies échouée: {str(e)}")
+            return {}
+
+        self.hits += len(found)
+        self.misses += len(drugs) - len(found)
+        return found
+
+    def put(
+        self,
+        drug: str,
+        language: str,
+        spl: str,
+        information: str,
+        sources: List[Dict],
+        prompt_tokens: int
+    ):
+        """Enregistre une monographie et supprime les versions précédentes (drug, langue)"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO monographs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        drug, language, self.template_version, spl, information,
+                        json.dumps(sources, ensure_ascii=False), prompt_tokens, time.time()
+                    )
+                )
+                self._db.execute(
+                    "DELETE FROM monographs WHERE drug = ? AND language = ? "
+                    "AND NOT (template_version = ? AND spl_version = ?)",
+                    (drug, language, self.template_version, spl)
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> Dict:
+        """Entrées du template courant et taux de hit"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "template_version": self.template_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def create_monograph_store() -> Optional[MonographStore]:
+    """Store des monographies, ou None si désactivé/inaccessible"""
+    if not config.MONOGRAPH_STORE_ENABLED:
+        return None
+    try:
+        return MonographStore()
+    except (OSError, sqlite3.Error) as e:
+        logger.error(f"❌ Store des monographies indisponible: {str(e)}")
+        return None
+
+
+# Instance globale (construite au premier accès, voir app.container)
+__getattr__ = lazy_instance(__name__, "monograph_store", "monographs")
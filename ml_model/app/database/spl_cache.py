@@ -0,0 +1,271 @@
+# app/database/spl_cache.py
+"""
+Cache des SPL DailyMed: payloads compressés dans un seul fichier SQLite
+
+Remplace l'ancien cache "un fichier JSON indenté par SPL" (inodes en
+masse, aucune expiration ni limite de taille):
+- payload JSON compact compressé zlib, une ligne par SPL (mode WAL,
+  partagé entre workers);
+- version SPL, ETag et Last-Modified conservés: passé config.SPL_CACHE_TTL,
+  l'entrée est revalidée par un GET conditionnel (304 = aucun corps);
+- budget d'octets (config.SPL_CACHE_MAX_BYTES): les entrées les moins
+  récemment lues sont évincées; le total est tenu dans la base, dans la
+  même transaction que les écritures;
+- une entrée illisible est supprimée et comptée, jamais ignorée en silence.
+
+Import des anciens fichiers depuis ml_model/:
+    python -m app.database.spl_cache --import-json ./data/dailymed
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+# Les lectures ne réécrivent la date d'accès (LRU) qu'au-delà de ce délai
+ACCESS_RESOLUTION = 60.0
+
+# Noms des anciens fichiers de cache (set id / SPL id DailyMed)
+_SPL_FILE_RE = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\.json$")
+
+
+def spl_version_of(data: Dict) -> str:
+    """Version SPL d'un payload DailyMed ("" si absente)"""
+    return str(data.get("version") or data.get("spl_version") or "")
+
+
+class SPLCache:
+    """Cache SPL compressé, borné en octets (LRU), avec métadonnées de revalidation"""
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        Args:
+            path: Fichier SQLite (config.SPL_CACHE_PATH par défaut)
+            max_bytes: Budget des payloads compressés (config.SPL_CACHE_MAX_BYTES)
+            ttl: Durée de validité avant revalidation, en secondes (config.SPL_CACHE_TTL)
+        """
+        self.path = path or config.SPL_CACHE_PATH
+        self.max_bytes = max_bytes if max_bytes is not None else config.SPL_CACHE_MAX_BYTES
+        self.ttl = ttl if ttl is not None else config.SPL_CACHE_TTL
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Un cache peut perdre sa dernière écriture en cas de coupure: pas de fsync par transaction
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS spls (
+                spl_id TEXT PRIMARY KEY,
+                version TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                raw_size INTEGER NOT NULL,
+                validated_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS spls_lru ON spls (accessed_at)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._db.execute(
+            "INSERT OR IGNORE INTO meta (name, value) SELECT 'bytes', COALESCE(SUM(size), 0) FROM spls"
+        )
+
+        self.metrics = {
+            "hits": 0, "misses": 0, "stale": 0, "revalidated": 0, "evictions": 0, "corrupt": 0,
+            "bytes_read": 0, "bytes_written": 0, "bytes_evicted": 0
+        }
+
+    def get(self, spl_id: str) -> Optional[Dict]:
+        """
+        Lit une entrée
+
+        Returns:
+            {"data", "version", "etag", "last_modified", "fresh"} ou None si absente
+            (fresh = False: à revalider par un GET conditionnel)
+        """
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT version, etag, last_modified, payload, validated_at, accessed_at "
+                    "FROM spls WHERE spl_id = ?",
+                    (spl_id,)
+                ).fetchone()
+                if row is None:
+                    self.metrics["misses"] += 1
+                    return None
+
+                version, etag, last_modified, payload, validated_at, accessed_at = row
+                try:
+                    data = json.loads(zlib.decompress(payload))
+                except (zlib.error, ValueError) as e:
+                    logger.warning(f"⚠️  Entrée SPL illisible supprimée {spl_id}: {str(e)}")
+                    self.metrics["corrupt"] += 1
+                    self.metrics["misses"] += 1
+                    self._delete(spl_id)
+                    return None
+
+                now = time.time()
+                if now - accessed_at > ACCESS_RESOLUTION:
+                    self._db.execute("UPDATE spls SET accessed_at = ? WHERE spl_id = ?", (now, spl_id))
+        except sqlite3.Error as e:
+            # Traité comme un miss: le SPL est retéléchargé
+            logger.error(f"❌ Lecture du cache SPL échouée {spl_id}: {str(e)}")
+            self.metrics["misses"] += 1
+            return None
+
+        fresh = now - validated_at < self.ttl
+        self.metrics["hits" if fresh else "stale"] += 1
+        self.metrics["bytes_read"] += len(payload)
+        return {"data": data, "version": version, "etag": etag, "last_modified": last_modified, "fresh": fresh}
+
+    def put(self, spl_id: str, data: Dict, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Enregistre (ou remplace) un SPL puis évince les entrées LRU au-delà du budget"""
+        raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        payload = zlib.compress(raw, 6)
+        if len(payload) > self.max_bytes:
+            logger.warning(f"⚠️  SPL {spl_id} plus gros que le budget du cache ({len(payload)} octets)")
+            return
+
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                previous = self._db.execute("SELECT size FROM spls WHERE spl_id = ?", (spl_id,)).fetchone()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO spls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (spl_id, spl_version_of(data), etag, last_modified, payload, len(payload), len(raw), now, now)
+                )
+                self._add_bytes(len(payload) - (previous[0] if previous else 0))
+                self._evict()
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        self.metrics["bytes_written"] += len(payload)
+
+    def revalidated(self, spl_id: str):
+        """Réponse 304: l'entrée redevient fraîche pour config.SPL_CACHE_TTL"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE spls SET validated_at = ?, accessed_at = ? WHERE spl_id = ?", (now, now, spl_id)
+            )
+        self.metrics["revalidated"] += 1
+
+    def _add_bytes(self, delta: int):
+        self._db.execute("UPDATE meta SET value = value + ? WHERE name = 'bytes'", (delta,))
+
+    def _total_bytes(self) -> int:
+        return self._db.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+
+    def _delete(self, spl_id: str):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._db.execute("SELECT size FROM spls WHERE spl_id = ?", (spl_id,)).fetchone()
+            if row:
+                self._db.execute("DELETE FROM spls WHERE spl_id = ?", (spl_id,))
+                self._add_bytes(-row[0])
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment lues jusqu'à repasser sous le budget"""
+        excess = self._total_bytes() - self.max_bytes
+        while excess > 0:
+            victims = self._db.execute(
+                "SELECT spl_id, size FROM spls ORDER BY accessed_at LIMIT 64"
+            ).fetchall()
+            if not victims:
+                return
+            removed = []
+            for spl_id, size in victims:
+                if excess <= 0:
+                    break
+                removed.append((spl_id, size))
+                excess -= size
+            self._db.executemany("DELETE FROM spls WHERE spl_id = ?", [(spl_id,) for spl_id, _ in removed])
+            freed = sum(size for _, size in removed)
+            self._add_bytes(-freed)
+            self.metrics["evictions"] += len(removed)
+            self.metrics["bytes_evicted"] += freed
+
+    def import_json_files(self, directory: str, remove: bool = False) -> int:
+        """
+        Importe les anciens fichiers "<spl_id>.json" d'un dossier
+
+        Args:
+            remove: Supprime chaque fichier importé
+
+        Returns:
+            Nombre de SPL importés
+        """
+        imported = 0
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            if not _SPL_FILE_RE.match(os.path.basename(path)):
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️  Fichier SPL illisible ignoré {path}: {str(e)}")
+                continue
+            self.put(os.path.basename(path)[:-len(".json")], data)
+            imported += 1
+            if remove:
+                os.remove(path)
+        return imported
+
+    def stats(self) -> Dict:
+        """Hits, misses, revalidations, octets lus/écrits/évincés et taille du cache"""
+        with self._lock:
+            entries, raw_bytes = self._db.execute("SELECT COUNT(*), COALESCE(SUM(raw_size), 0) FROM spls").fetchone()
+            total = self._total_bytes()
+        lookups = self.metrics["hits"] + self.metrics["stale"] + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "entries": entries,
+            "bytes": total,
+            "raw_bytes": raw_bytes,
+            "max_bytes": self.max_bytes,
+            "compression_ratio": round(raw_bytes / total, 2) if total else 0.0,
+            "hit_rate": round((self.metrics["hits"] + self.metrics["stale"]) / lookups, 4) if lookups else 0.0
+        }
+
+
+def create_spl_cache() -> Optional[SPLCache]:
+    """Cache SPL, ou None si désactivé/inaccessible"""
+    if not config.SPL_CACHE_ENABLED:
+        return None
+    try:
+        return SPLCache()
+    except (OSError, sqlite3.Error) as e:
+        logger.error(f"❌ Cache SPL indisponible: {str(e)}")
+        return None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Cache SPL compressé")
+    parser.add_argument("--path", default=config.SPL_CACHE_PATH)
+    parser.add_argument("--import-json", metavar="DOSSIER", help="Importe les anciens fichiers <spl_id>.json")
+    parser.add_argument("--remove", action="store_true", help="Supprime les fichiers importés")
+    args = parser.parse_args()
+    cache = SPLCache(args.path)
+    if args.import_json:
+        logger.info(f"✅ {cache.import_json_files(args.import_json, remove=args.remove)} SPL importés")
+    print(json.dumps(cache.stats(), indent=2))
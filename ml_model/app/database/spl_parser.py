@@ -0,0 +1,205 @@
+# app/database/spl_parser.py
+"""
+Parser SPL (HL7 v3) en streaming basé sur lxml.iterparse
+
+Les sections sont classées par code LOINC (et non par leur titre) et émises
+au fil de la lecture; chaque section traitée est libérée, la mémoire reste
+constante quelle que soit la taille du document.
+"""
+import io
+import logging
+from typing import Dict, Iterator, List, Union
+
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+V3 = "{urn:hl7-org:v3}"
+_SECTION = V3 + "section"
+_COMPONENT = V3 + "component"
+
+# Codes LOINC des sections SPL -> type de section
+LOINC_SECTIONS = {
+    # Étiquetage Rx
+    "34066-1": "boxed_warning",
+    "34067-9": "indications",
+    "34068-7": "dosage",
+    "34070-3": "contraindications",
+    "43685-7": "warnings",          # Warnings and precautions
+    "34071-1": "warnings",
+    "42232-9": "warnings",          # Precautions
+    "34084-4": "side_effects",      # Adverse reactions
+    "34073-7": "interactions",
+    "43684-0": "specific_populations",
+    "34088-5": "overdosage",
+    "34089-3": "description",
+    "34090-1": "clinical_pharmacology",
+    "34069-5": "storage",           # How supplied
+    "44425-7": "storage",           # Storage and handling
+    "34076-0": "patient_information",
+    "42230-3": "patient_information",
+    # Étiquetage OTC
+    "55106-9": "active_ingredients",
+    "55105-1": "purpose",
+    "50570-1": "warnings",          # Do not use
+    "50569-3": "warnings",          # Ask doctor
+    "50568-5": "warnings",          # Ask doctor or pharmacist
+    "50567-7": "warnings",          # When using
+    "50566-9": "warnings",          # Stop use
+    "50565-1": "warnings",          # Keep out of reach of children
+    "53414-9": "warnings",          # Pregnancy or breast feeding
+    "51727-6": "inactive_ingredients",
+    # Structure
+    "48780-1": "product_data",
+    "51945-4": "package_label",
+    "42229-5": "unclassified",
+}
+
+# Types hérités de la section parente (sous-sections sans code propre)
+_INHERITED_TYPES = {None, "unclassified"}
+
+# Types utiles pour le RAG
+INDEXED_SECTION_TYPES = {
+    "boxed_warning", "indications", "dosage", "contraindications", "warnings",
+    "side_effects", "interactions", "specific_populations", "overdosage",
+    "storage", "active_ingredients", "purpose",
+}
+
+_EVENT_TAGS = (
+    _SECTION,
+    V3 + "setId",
+    V3 + "versionNumber",
+    V3 + "title",
+    V3 + "name",
+    V3 + "effectiveTime",
+)
+
+
+def _clean_text(element) -> str:
+    if element is None:
+        return ""
+    return " ".join(" ".join(element.itertext()).split())
+
+
+def _section_code(section) -> str:
+    code = section.find(V3 + "code")
+    return code.get("code", "") if code is not None else ""
+
+
+def _section_type(section, code: str) -> str:
+    """Type LOINC de la section, hérité de la section parente si non classé"""
+    section_type = LOINC_SECTIONS.get(code)
+    if section_type not in _INHERITED_TYPES:
+        return section_type
+
+    for ancestor in section.iterancestors(_SECTION):
+        parent_type = LOINC_SECTIONS.get(_section_code(ancestor))
+        if parent_type not in _INHERITED_TYPES:
+            return parent_type
+
+    return section_type or "unclassified"
+
+
+def _release(section):
+    """Libère une section traitée et les composants frères déjà traités"""
+    section.clear(keep_tail=False)
+    component = section.getparent()
+    if component is None:
+        return
+    container = component.getparent()
+    previous = component.getprevious()
+    while container is not None and previous is not None and previous.tag == _COMPONENT:
+        container.remove(previous)
+        previous = component.getprevious()
+
+
+def iter_spl_sections(source: Union[str, bytes, io.IOBase]) -> Iterator[Dict]:
+    """
+    Émet les sections d'un SPL au fil de la lecture
+
+    Args:
+        source: Chemin de fichier, contenu XML (bytes) ou fichier binaire ouvert
+
+    Yields:
+        {"set_id", "version", "document_title", "drug_name", "active_ingredients",
+         "loinc_code", "section_type", "section_title", "text"}
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    header = {"set_id": "", "version": "", "document_title": "", "drug_name": "", "effective_time": ""}
+    ingredients: List[str] = []
+
+    for _, element in etree.iterparse(source, events=("end",), tag=_EVENT_TAGS, huge_tree=True):
+        parent = element.getparent()
+        parent_tag = parent.tag if parent is not None else None
+        tag = element.tag
+
+        if tag == _SECTION:
+            code = _section_code(element)
+            text = _clean_text(element.find(V3 + "text"))
+            if text:
+                yield {
+                    "set_id": header["set_id"],
+                    "version": header["version"],
+                    "document_title": header["document_title"],
+                    "drug_name": header["drug_name"] or header["document_title"],
+                    "active_ingredients": list(ingredients),
+                    "loinc_code": code,
+                    "section_type": _section_type(element, code),
+                    "section_title": _clean_text(element.find(V3 + "title")),
+                    "text": text,
+                }
+            _release(element)
+
+        elif parent_tag == V3 + "document":
+            if tag == V3 + "setId":
+                header["set_id"] = element.get("root", "")
+            elif tag == V3 + "versionNumber":
+                header["version"] = element.get("value", "")
+            elif tag == V3 + "title":
+                header["document_title"] = _clean_text(element)
+            elif tag == V3 + "effectiveTime":
+                header["effective_time"] = element.get("value", "")
+
+        elif tag == V3 + "name":
+            if parent_tag == V3 + "manufacturedProduct" and not header["drug_name"]:
+                header["drug_name"] = _clean_text(element)
+            elif parent_tag == V3 + "activeIngredientSubstance":
+                name = _clean_text(element)
+                if name and name not in ingredients:
+                    ingredients.append(name)
+
+
+def parse_spl(source: Union[str, bytes, io.IOBase]) -> Dict:
+    """
+    Agrège les sections d'un SPL au format de DailyMedLoader.extract_drug_info
+
+    Les sections de même type sont concaténées.
+    """
+    info = {
+        "name": "",
+        "set_id": "",
+        "version": "",
+        "active_ingredients": [],
+        "indications": "",
+        "dosage": "",
+        "contraindications": "",
+        "warnings": "",
+        "side_effects": "",
+        "storage": ""
+    }
+
+    for section in iter_spl_sections(source):
+        info["name"] = section["drug_name"]
+        info["set_id"] = section["set_id"]
+        info["version"] = section["version"]
+        info["active_ingredients"] = section["active_ingredients"]
+
+        section_type = section["section_type"]
+        if section_type == "boxed_warning":
+            section_type = "warnings"
+        if section_type in info and isinstance(info[section_type], str):
+            info[section_type] = f"{info[section_type]}\n{section['text']}".strip()
+
+    return info
@@ -0,0 +1,253 @@
+# app/ingestion/dailymed_bulk.py
+"""
+Ingestion hors ligne des archives DailyMed "full release" (SPL)
+
+Lit les zips locaux (zip de zips, un SPL XML par zip interne), parse les SPL
+dans un pool de processus, découpe en chunks et insère par lots dans la collection
+ChromaDB utilisée par LightRAGSystem. Reprise possible via un checkpoint.
+
+Exécutez depuis ml_model/:
+    python -m app.ingestion.dailymed_bulk /chemin/vers/archives --workers 4
+"""
+import argparse
+import asyncio
+import glob
+import io
+import json
+import logging
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.config import config
+from app.database.spl_parser import INDEXED_SECTION_TYPES, iter_spl_sections
+from app.llm.chunking import chunk_sections
+
+logger = logging.getLogger(__name__)
+
+def parse_spl_xml(xml_bytes: bytes) -> List[Dict]:
+    """
+    Parse un SPL XML en streaming et produit les chunks à indexer
+    (sections LOINC utiles, découpées en fenêtres de tokens)
+
+    Les identifiants sont dérivés du contenu: une ré-ingestion ne duplique
+    rien et ne ré-embedde pas les chunks inchangés.
+    """
+    sections = (
+        section for section in iter_spl_sections(xml_bytes)
+        if section["section_type"] in INDEXED_SECTION_TYPES and section["set_id"]
+    )
+    return chunk_sections(sections)
+
+
+def parse_archive_entry(entry_name: str, payload: bytes) -> List[Dict]:
+    """
+    Tâche exécutée dans le pool de processus: zip interne ou XML -> documents
+    """
+    try:
+        if entry_name.lower().endswith(".xml"):
+            return parse_spl_xml(payload)
+
+        documents = []
+        with zipfile.ZipFile(io.BytesIO(payload)) as inner:
+            for name in inner.namelist():
+                if name.lower().endswith(".xml"):
+                    documents.extend(parse_spl_xml(inner.read(name)))
+        return documents
+    except Exception as e:
+        logger.error(f"❌ SPL illisible {entry_name}: {str(e)}")
+        return []
+
+
+class Checkpoint:
+    """
+    Entrées d'archives déjà insérées, écrit atomiquement après chaque lot
+
+    Les SPL d'une archive sont numérotés dans l'ordre (fixe) de infolist().
+    Par archive, seuls sont conservés l'indice de la première entrée non
+    insérée et les quelques entrées insérées au-delà (le parsing se termine
+    dans le désordre): taille bornée par le nombre d'entrées en vol, pas
+    par la taille de l'archive.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.state = {"archives": {}, "documents": 0}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        # Archive -> [première entrée non insérée, entrées insérées au-delà]
+        self._progress = {
+            archive: [entry.get("next", 0), set(entry.get("done", []))]
+            for archive, entry in self.state["archives"].items()
+            if not entry.get("complete")
+        }
+
+    def is_done(self, archive: str, index: Optional[int] = None) -> bool:
+        archive_state = self.state["archives"].get(archive, {})
+        if archive_state.get("complete"):
+            return True
+        if index is None or archive not in self._progress:
+            return False
+        next_index, done = self._progress[archive]
+        return index < next_index or index in done
+
+    def mark(self, entries: List[Tuple[str, int]], documents: int):
+        for archive, index in entries:
+            progress = self._progress.setdefault(archive, [0, set()])
+            progress[1].add(index)
+            while progress[0] in progress[1]:
+                progress[1].remove(progress[0])
+                progress[0] += 1
+        self.state["documents"] += documents
+
+    def complete(self, archive: str):
+        self._progress.pop(archive, None)
+        self.state["archives"][archive] = {"complete": True}
+
+    def save(self):
+        for archive, (next_index, done) in self._progress.items():
+            self.state["archives"][archive] = {"complete": False, "next": next_index, "done": sorted(done)}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+
+def iter_archive_entries(archive_path: str, skip=None) -> Iterator[Tuple[int, str, bytes]]:
+    """
+    Itère paresseusement sur les SPL d'une archive (une entrée en mémoire à la fois)
+
+    Args:
+        skip: Prédicat sur l'indice du SPL: entrée ignorée sans être lue
+
+    Yields:
+        (indice du SPL dans l'archive, nom de l'entrée, contenu)
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        spls = [
+            info for info in archive.infolist()
+            if info.filename.lower().endswith(".zip") or info.filename.lower().endswith(".xml")
+        ]
+        for index, info in enumerate(spls):
+            if skip is None or not skip(index):
+                yield index, info.filename, archive.read(info)
+
+
+class BulkIngestor:
+    """Pipeline d'ingestion: lecture -> parsing (processus) -> upsert par lots"""
+
+    def __init__(self, rag, checkpoint: Checkpoint, workers: int, batch_size: int):
+        self.rag = rag
+        self.checkpoint = checkpoint
+        self.workers = workers
+        self.batch_size = batch_size
+
+        self._buffer: List[Dict] = []
+        self._buffer_entries: List[Tuple[str, int]] = []
+        self.spl_count = 0
+        self.doc_count = 0
+        self._start = time.perf_counter()
+        self._last_report = self._start
+
+    async def _flush(self):
+        """Insère le lot courant puis enregistre les entrées correspondantes"""
+        if self._buffer:
+            await self.rag.upsert_documents(self._buffer)
+        self.doc_count += len(self._buffer)
+        self.checkpoint.mark(self._buffer_entries, len(self._buffer))
+        self.checkpoint.save()
+        self._buffer, self._buffer_entries = [], []
+
+    async def _collect(self, archive: str, index: int, documents: List[Dict]):
+        self._buffer.extend(documents)
+        self._buffer_entries.append((archive, index))
+        self.spl_count += 1
+        if len(self._buffer) >= self.batch_size:
+            await self._flush()
+        self._report()
+
+    def _report(self, force: bool = False):
+        now = time.perf_counter()
+        if not force and now - self._last_report < 5:
+            return
+        self._last_report = now
+        elapsed = max(now - self._start, 1e-9)
+        logger.info(
+            f"📦 {self.spl_count} SPL, {self.doc_count} documents - "
+            f"{self.doc_count / elapsed:.1f} docs/s, {self.spl_count / elapsed:.1f} SPL/s"
+        )
+
+    async def _drain(self, archive: str, pending: Dict, return_when: str):
+        """Attend des SPL en cours de parsing et collecte leurs documents"""
+        done, _ = await asyncio.wait(pending, return_when=return_when)
+        for future in done:
+            await self._collect(archive, pending.pop(future), future.result())
+
+    async def ingest_archive(self, archive_path: str, pool: ProcessPoolExecutor):
+        archive = os.path.basename(archive_path)
+        if self.checkpoint.is_done(archive):
+            logger.info(f"⏭️  Archive déjà ingérée: {archive}")
+            return
+
+        logger.info(f"📂 Ingestion de {archive}")
+        loop = asyncio.get_running_loop()
+        pending = {}
+        # Mémoire bornée: au plus 2 SPL en attente par worker
+        max_pending = self.workers * 2
+
+        entries = iter_archive_entries(archive_path, skip=lambda index: self.checkpoint.is_done(archive, index))
+        for index, entry, payload in entries:
+            future = loop.run_in_executor(pool, parse_archive_entry, entry, payload)
+            pending[future] = index
+            del payload
+
+            if len(pending) >= max_pending:
+                await self._drain(archive, pending, asyncio.FIRST_COMPLETED)
+
+        while pending:
+            await self._drain(archive, pending, asyncio.FIRST_COMPLETED)
+
+        await self._flush()
+        self.checkpoint.complete(archive)
+        self.checkpoint.save()
+
+    async def run(self, archive_paths: List[str]):
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for archive_path in archive_paths:
+                await self.ingest_archive(archive_path, pool)
+        await self._flush()
+        self._report(force=True)
+
+
+async def main(args):
+    from app.llm.rag_light import light_rag
+
+    archive_paths = sorted(
+        path for pattern in args.archives
+        for path in (glob.glob(os.path.join(pattern, "*.zip")) if os.path.isdir(pattern) else glob.glob(pattern))
+    )
+    if not archive_paths:
+        logger.error("❌ Aucune archive trouvée")
+        return
+
+    ingestor = BulkIngestor(
+        rag=light_rag,
+        checkpoint=Checkpoint(args.checkpoint),
+        workers=args.workers,
+        batch_size=args.batch_size
+    )
+    await ingestor.run(archive_paths)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Ingestion hors ligne des archives DailyMed")
+    parser.add_argument("archives", nargs="+", help="Dossiers ou motifs glob des archives .zip")
+    parser.add_argument("--workers", type=int, default=config.INGESTION_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=config.INGESTION_BATCH_SIZE)
+    parser.add_argument("--checkpoint", default=config.INGESTION_CHECKPOINT_PATH)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,107 @@
+# app/ingestion/dedupe_collection.py
+"""
+Déduplication d'une collection ChromaDB existante (ex: pharma_drugs_v2)
+
+Les anciens ids (hash() aléatoire par processus, "doc_{i}_{hash % 10000}")
+sont remplacés par des ids dérivés du contenu. Les embeddings existants
+sont réutilisés: aucun texte n'est ré-embeddé.
+
+Exécutez depuis ml_model/:
+    python -m app.ingestion.dedupe_collection [--collection pharma_drugs_v2] [--dry-run]
+"""
+import argparse
+import logging
+from collections import defaultdict
+from typing import Dict, List
+
+import chromadb
+
+from app.config import config
+from app.llm.chunking import content_id
+
+logger = logging.getLogger(__name__)
+
+
+def scan_collection(collection, page_size: int) -> Dict[str, List[str]]:
+    """Regroupe les ids existants par id de contenu"""
+    groups: Dict[str, List[str]] = defaultdict(list)
+    offset = 0
+    while True:
+        page = collection.get(include=["documents"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        for doc_id, text in zip(page["ids"], page["documents"]):
+            groups[content_id(text or "")].append(doc_id)
+        offset += len(page["ids"])
+    return groups
+
+
+def dedupe(collection, page_size: int = 1000, dry_run: bool = False) -> Dict:
+    """
+    Ramène chaque contenu à un seul document sous son id de contenu
+
+    Returns:
+        Statistiques {"documents", "unique", "migrated", "deleted"}
+    """
+    groups = scan_collection(collection, page_size)
+    stats = {
+        "documents": sum(len(ids) for ids in groups.values()),
+        "unique": len(groups),
+        "migrated": 0,
+        "deleted": 0
+    }
+
+    pending = [(target, ids) for target, ids in groups.items() if ids != [target]]
+    for start in range(0, len(pending), page_size):
+        batch = pending[start:start + page_size]
+
+        # Contenus sans document sous l'id cible: recopie avec l'embedding existant
+        to_migrate = [(target, ids[0]) for target, ids in batch if target not in ids]
+        if to_migrate:
+            sources = collection.get(
+                ids=[source for _, source in to_migrate],
+                include=["documents", "metadatas", "embeddings"]
+            )
+            by_id = {
+                doc_id: (sources["documents"][i], sources["metadatas"][i], sources["embeddings"][i])
+                for i, doc_id in enumerate(sources["ids"])
+            }
+            targets = [target for target, source in to_migrate if source in by_id]
+            rows = [by_id[source] for _, source in to_migrate if source in by_id]
+            if targets and not dry_run:
+                collection.add(
+                    ids=targets,
+                    documents=[row[0] for row in rows],
+                    metadatas=[row[1] for row in rows],
+                    embeddings=[list(row[2]) for row in rows]
+                )
+            stats["migrated"] += len(targets)
+
+        obsolete = [doc_id for target, ids in batch for doc_id in ids if doc_id != target]
+        if obsolete and not dry_run:
+            collection.delete(ids=obsolete)
+        stats["deleted"] += len(obsolete)
+
+    return stats
+
+
+def main(args):
+    client = chromadb.PersistentClient(path=args.persist_dir)
+    collection = client.get_collection(args.collection)
+
+    logger.info(f"🔎 {collection.count()} documents dans {args.collection}")
+    stats = dedupe(collection, page_size=args.page_size, dry_run=args.dry_run)
+    logger.info(
+        f"{'[dry-run] ' if args.dry_run else ''}✅ {stats['documents']} documents, "
+        f"{stats['unique']} contenus uniques, {stats['migrated']} migrés, {stats['deleted']} supprimés"
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Déduplication d'une collection ChromaDB")
+    parser.add_argument("--collection", default="pharma_drugs_v2")
+    parser.add_argument("--persist-dir", default=config.CHROMA_PERSIST_DIR)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    main(parser.parse_args())
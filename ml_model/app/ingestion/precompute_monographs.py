@@ -0,0 +1,133 @@
+# app/ingestion/precompute_monographs.py
+"""
+Précalcul hors ligne des monographies (template "drug_info")
+
+Pour les N principes actifs les plus fréquents du dump DailyMed (ou une
+liste explicite), récupère le contexte RAG une fois puis génère la
+monographie dans chaque langue supportée. Une entrée n'est régénérée que si
+sa version SPL (notices du contexte) ou la version du template a changé:
+relancer le job après chaque ingestion est peu coûteux.
+
+Exécutez depuis ml_model/:
+    python -m app.ingestion.precompute_monographs --top 2000
+    python -m app.ingestion.precompute_monographs --drugs Doliprane Augmentin --force
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict, List
+
+from app.config import config
+from app.database.monograph_store import TEMPLATE_ID, MonographStore, spl_version
+from app.utils.fanout import bounded_fan_out
+
+logger = logging.getLogger(__name__)
+
+
+class MonographPrecomputer:
+    """Génère les monographies manquantes ou périmées d'une liste de principes actifs"""
+
+    def __init__(self, rag, llm, store: MonographStore, languages: List[str], concurrency: int):
+        self.rag = rag
+        self.llm = llm
+        self.store = store
+        self.languages = languages
+        self.concurrency = concurrency
+        self.force = False
+        self.counts = {"generated": 0, "unchanged": 0, "no_context": 0, "failed": 0}
+
+    async def _precompute(self, drug: str):
+        context, sources = await self.rag.get_drug_context_with_sources(drug)
+        version = spl_version(sources)
+        if not version:
+            # Sans notice locale, le chemin normal (DailyMed) reste utilisé
+            self.counts["no_context"] += len(self.languages)
+            return
+
+        stale = [
+            language for language in self.languages
+            if self.force or (self.store.get(drug, language) or {}).get("spl_version") != version
+        ]
+        self.counts["unchanged"] += len(self.languages) - len(stale)
+
+        async def _generate(language: str):
+            information = await self.llm.complete_template(TEMPLATE_ID, drug, context, language)
+            prompt_tokens = self.llm.count_prompt_tokens(TEMPLATE_ID, drug, context, language)
+            self.store.put(drug, language, version, information, sources, prompt_tokens)
+
+        results = await asyncio.gather(*(_generate(language) for language in stale), return_exceptions=True)
+        for language, result in zip(stale, results):
+            if isinstance(result, Exception):
+                self.counts["failed"] += 1
+                logger.error(f"❌ Monographie {drug} ({language}): {str(result)}")
+            else:
+                self.counts["generated"] += 1
+
+    async def run(self, drugs: List[str], force: bool = False) -> Dict:
+        """
+        Args:
+            drugs: Principes actifs canoniques
+            force: Régénère même les entrées à jour
+
+        Returns:
+            Compteurs {"generated", "unchanged", "no_context", "failed"}
+        """
+        self.force = force
+        start = time.perf_counter()
+        async for drug, _, error in bounded_fan_out(drugs, self._precompute, self.concurrency):
+            if error is not None:
+                self.counts["failed"] += len(self.languages)
+                logger.error(f"❌ Monographie {drug}: {str(error)}")
+        logger.info(
+            f"✅ Monographies: {self.counts['generated']} générées, {self.counts['unchanged']} à jour, "
+            f"{self.counts['no_context']} sans contexte, {self.counts['failed']} en échec "
+            f"en {time.perf_counter() - start:.1f}s"
+        )
+        return self.counts
+
+
+async def main(args):
+    from app.database.drug_canonicalizer import canonical_subject, drug_canonicalizer
+    from app.llm.llm_engine import llm_engine
+    from app.llm.rag_light import light_rag
+
+    if not config.OPENAI_API_KEY:
+        logger.error("❌ OPENAI_API_KEY requise pour générer les monographies")
+        return
+
+    if args.drugs:
+        # Même sujet que DrugService._canonical_subjects (nom inchangé si inconnu ou partiel)
+        drugs = [
+            canonical_subject(name, resolved)
+            for name, resolved in zip(args.drugs, drug_canonicalizer.resolve_batch(args.drugs))
+        ]
+    else:
+        drugs = drug_canonicalizer.top_ingredients(args.top)
+    if not drugs:
+        logger.error("❌ Aucun principe actif (dump des noms absent ?)")
+        return
+
+    precomputer = MonographPrecomputer(
+        rag=light_rag,
+        llm=llm_engine,
+        store=MonographStore(args.path),
+        languages=args.languages,
+        concurrency=args.concurrency
+    )
+    try:
+        await precomputer.run(list(dict.fromkeys(drugs)), force=args.force)
+    finally:
+        await llm_engine.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Précalcul des monographies de médicaments")
+    parser.add_argument("--top", type=int, default=config.MONOGRAPH_TOP_N, help="N principes actifs les plus fréquents")
+    parser.add_argument("--drugs", nargs="+", help="Noms explicites (canonicalisés) au lieu du top N")
+    parser.add_argument("--languages", nargs="+", default=config.SUPPORTED_LANGUAGES)
+    parser.add_argument("--concurrency", type=int, default=config.BATCH_MAX_CONCURRENCY)
+    parser.add_argument("--force", action="store_true", help="Régénère aussi les entrées à jour")
+    parser.add_argument("--path", default=config.MONOGRAPH_STORE_PATH)
+    asyncio.run(main(parser.parse_args()))
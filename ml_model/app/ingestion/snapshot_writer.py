@@ -0,0 +1,152 @@
+# app/ingestion/snapshot_writer.py
+"""
+Écrivain unique du service multi-workers (SERVING_MODE=snapshot)
+
+Applique les lots déposés dans le spool par les workers à l'index maître
+(config.VECTOR_BACKEND), puis publie une nouvelle génération en lecture
+seule quand l'index a changé. Une publication recopie toute la collection:
+deux générations sont espacées d'au moins config.VECTOR_SNAPSHOT_MIN_INTERVAL
+secondes, les lots appliqués entre-temps partent dans la suivante.
+Un seul processus de ce type par index: c'est le seul à ouvrir l'index
+maître en écriture.
+
+Exécutez depuis ml_model/:
+    python -m app.ingestion.snapshot_writer              # boucle
+    python -m app.ingestion.snapshot_writer --once       # un passage (après une ingestion)
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from app.config import config
+from app.llm.rag_snapshot import IngestionSpool, current_generation, publish_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotWriter:
+    """Spool -> index maître -> génération publiée"""
+
+    def __init__(self, rag, spool: Optional[IngestionSpool] = None, snapshot_dir: Optional[str] = None,
+                 keep: Optional[int] = None, min_interval: Optional[float] = None):
+        """
+        Args:
+            rag: RAG de l'index maître (create_rag_system(read_only=False))
+            spool: Spool des workers (config.INGESTION_SPOOL_DIR par défaut)
+            snapshot_dir: Racine des générations (config.VECTOR_SNAPSHOT_DIR par défaut)
+            keep: Générations conservées (config.VECTOR_SNAPSHOT_KEEP par défaut)
+            min_interval: Secondes minimales entre deux publications
+                          (config.VECTOR_SNAPSHOT_MIN_INTERVAL par défaut)
+        """
+        self.rag = rag
+        self.spool = spool if spool is not None else IngestionSpool()
+        self.snapshot_dir = snapshot_dir or config.VECTOR_SNAPSHOT_DIR
+        self.keep = keep or config.VECTOR_SNAPSHOT_KEEP
+        self.min_interval = min_interval if min_interval is not None else config.VECTOR_SNAPSHOT_MIN_INTERVAL
+        # Lots appliqués à l'index maître mais pas encore publiés
+        self.unpublished = False
+        self._published_at: Optional[float] = None
+        self.counts = {"batches": 0, "documents": 0, "rejected": 0, "generations": 0}
+
+    @property
+    def root(self) -> str:
+        return os.path.join(self.snapshot_dir, self.rag.collection_name)
+
+    async def drain(self) -> int:
+        """
+        Applique les lots en attente, dans l'ordre de dépôt
+
+        Chaque lot est appliqué par upsert (idempotent, erreurs propagées):
+        en cas d'échec il reste dans le spool et le passage s'arrête, pour
+        être repris au suivant sans perte ni réordonnancement.
+
+        Returns:
+            Nombre de lots appliqués
+        """
+        applied = 0
+        for path in self.spool.pending():
+            try:
+                documents = self.spool.read(path)
+            except (ValueError, KeyError) as e:
+                logger.error(f"❌ Lot illisible écarté {os.path.basename(path)}: {str(e)}")
+                self.spool.reject(path)
+                self.counts["rejected"] += 1
+                continue
+            await self.rag.upsert_documents(documents)
+            self.spool.remove(path)
+            applied += 1
+            self.counts["batches"] += 1
+            self.counts["documents"] += len(documents)
+        return applied
+
+    def publish(self) -> Optional[str]:
+        """Publie l'index maître comme nouvelle génération"""
+        if self.rag.collection is None:
+            raise RuntimeError("Index maître non initialisé")
+        if self.rag.embedder is None:
+            # Embeddings par défaut de ChromaDB: les workers ne sauraient pas embedder les requêtes
+            logger.error("❌ Publication impossible avec EMBEDDING_PROVIDER=chroma (utiliser openai ou local)")
+            return None
+        generation = publish_snapshot(self.rag.collection, self.root, self.keep)
+        self.counts["generations"] += 1
+        self.unpublished = False
+        self._published_at = time.monotonic()
+        return generation
+
+    async def run_once(self, force: bool = False) -> Optional[str]:
+        """
+        Un passage: spool appliqué, génération publiée si l'index a changé (ou s'il n'y en a aucune)
+
+        Args:
+            force: Publie sans attendre min_interval (passage unique après une ingestion)
+        """
+        if await self.drain():
+            self.unpublished = True
+        if current_generation(self.root) is None:
+            return self.publish()
+        if not self.unpublished:
+            return None
+        if not force and self._published_at is not None and time.monotonic() - self._published_at < self.min_interval:
+            return None
+        return self.publish()
+
+    async def run(self, interval: float):
+        logger.info(f"✅ Écrivain démarré - spool {self.spool.directory}, générations {self.root}")
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"❌ Écrivain: {str(e)}")
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict:
+        return {
+            **self.counts,
+            "pending": len(self.spool),
+            "unpublished": self.unpublished,
+            "generation": current_generation(self.root)
+        }
+
+
+async def main(args):
+    from app.llm.rag_light import create_rag_system
+
+    writer = SnapshotWriter(create_rag_system(read_only=False), IngestionSpool(args.spool), args.snapshot_dir)
+    if args.once:
+        await writer.run_once(force=True)
+        logger.info(f"✅ Passage terminé: {writer.stats()}")
+    else:
+        await writer.run(args.interval)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Écrivain unique: spool -> index maître -> génération publiée")
+    parser.add_argument("--once", action="store_true", help="Un seul passage puis arrêt")
+    parser.add_argument("--interval", type=float, default=config.INGESTION_PUBLISH_INTERVAL)
+    parser.add_argument("--spool", default=config.INGESTION_SPOOL_DIR)
+    parser.add_argument("--snapshot-dir", default=config.VECTOR_SNAPSHOT_DIR)
+    asyncio.run(main(parser.parse_args()))
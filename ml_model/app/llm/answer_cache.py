@@ -0,0 +1,372 @@
+# app/llm/answer_cache.py
+"""
+Cache des réponses LLM à deux niveaux
+
+1. Clé exacte: template + requête canonicalisée + langue + hash du contexte (LRU + TTL, persisté sur disque)
+2. Sémantique (optionnel): réutilise une réponse si l'embedding de la question est assez proche,
+   pour les questions libres seulement (SEMANTIC_TEMPLATES) et à contexte récupéré identique
+
+Persistance dans SQLite (mode WAL), vecteurs en float32 binaires: seules les
+entrées modifiées ou supprimées depuis la dernière écriture sont écrites,
+hors de la boucle d'événements (asyncio.to_thread).
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.config import config
+from app.container import lazy_instance
+
+logger = logging.getLogger(__name__)
+
+# "500mg", "0,5 g", "100 µg", "1%" -> "500 mg", "0.5 g", "100 mcg", "1 %"
+# (appliqué après NFKD: le signe micro "µ" y devient le mu grec "μ"; pas de \b après "%")
+_DOSAGE_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*((?:mg|mcg|\u03bcg|ug|g|ml|ui|iu)\b|%)", re.IGNORECASE)
+_UNIT_ALIASES = {"\u03bcg": "mcg", "ug": "mcg", "iu": "ui"}
+_NON_WORD_RE = re.compile(r"[^a-z0-9.%]+")
+
+# Templates éligibles au niveau sémantique: pour drug_info ou interaction_check, deux noms
+# proches (Celebrex / Celexa) désignent des médicaments différents
+SEMANTIC_TEMPLATES = {"general_question"}
+
+
+def canonicalize_query(text: str) -> str:
+    """
+    Normalise une requête: casse, accents, dosages et ponctuation
+
+    "Doliprane  500MG" et "doliprane 500 mg" donnent la même clé.
+    """
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+    def _dosage(match):
+        amount = match.group(1).replace(",", ".")
+        if "." in amount:
+            amount = amount.rstrip("0").rstrip(".")
+        unit = match.group(2).lower()
+        return f" {amount} {_UNIT_ALIASES.get(unit, unit)} "
+
+    text = _DOSAGE_RE.sub(_dosage, text)
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+
+def context_hash(context: str) -> str:
+    """Empreinte stable du contexte récupéré"""
+    return hashlib.sha256((context or "").encode("utf-8")).hexdigest()[:16]
+
+
+class AnswerCache:
+    """
+    Cache LRU + TTL des réponses LLM, avec niveau sémantique optionnel
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: float = 86400,
+        persist_path: Optional[str] = None,
+        semantic_threshold: Optional[float] = None,
+        embed_fn: Optional[Callable[[str], Awaitable[Optional[List[float]]]]] = None,
+        persist_every: int = 20
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persist_path = persist_path
+        self.semantic_threshold = semantic_threshold
+        self.embed_fn = embed_fn if semantic_threshold else None
+        self.persist_every = persist_every
+
+        # clé -> {"answer", "expires_at", "scope", "vector"}
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        # scope (template, langue, hash du contexte) -> (clés, matrice normalisée) reconstruite à la demande
+        self._semantic_index: Dict[Tuple[str, str, str], Tuple[List[str], np.ndarray]] = {}
+        # scope -> clés ayant un vecteur (évite de parcourir tout le cache)
+        self._scope_keys: Dict[Tuple[str, str, str], Dict[str, None]] = {}
+        # Modifications pas encore écrites sur disque
+        self._changed: Set[str] = set()
+        self._removed: Set[str] = set()
+        self._flush_task: Optional[asyncio.Future] = None
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+        self.stats_counters = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0
+        }
+
+        self._load()
+
+    def make_key(self, template_id: str, query: str, language: str, context: str) -> str:
+        """Clé exacte: template | requête canonicalisée | langue | hash du contexte"""
+        raw = f"{template_id}|{canonicalize_query(query)}|{language}|{context_hash(context)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, template_id: str, query: str, language: str, context: str) -> Optional[str]:
+        """
+        Cherche une réponse en cache (exact puis sémantique)
+
+        Returns:
+            La réponse ou None si absente/expirée
+        """
+        key = self.make_key(template_id, query, language, context)
+        entry = self._lookup(key)
+        if entry is not None:
+            self.stats_counters["exact_hits"] += 1
+            return entry["answer"]
+
+        if self.embed_fn and template_id in SEMANTIC_TEMPLATES:
+            # Même contexte récupéré exigé: une réponse n'est pas resservie après un changement des sources
+            answer = await self._semantic_lookup((template_id, language, context_hash(context)), query)
+            if answer is not None:
+                self.stats_counters["semantic_hits"] += 1
+                return answer
+
+        self.stats_counters["misses"] += 1
+        return None
+
+    async def set(self, template_id: str, query: str, language: str, context: str, answer: str):
+        """Enregistre une réponse"""
+        key = self.make_key(template_id, query, language, context)
+        scope = (template_id, language, context_hash(context))
+
+        vector = None
+        if self.embed_fn and template_id in SEMANTIC_TEMPLATES:
+            vector = await self._embed(query)
+
+        previous = self._entries.get(key)
+        if previous is not None:
+            # L'ancien vecteur ne doit pas survivre (embedding en échec cette fois)
+            self._invalidate_scope(key, previous)
+        if vector is not None:
+            self._semantic_index.pop(scope, None)
+            self._scope_keys.setdefault(scope, {})[key] = None
+
+        self._entries[key] = {
+            "answer": answer,
+            "expires_at": time.time() + self.ttl,
+            "scope": list(scope),
+            "vector": vector
+        }
+        self._entries.move_to_end(key)
+
+        self._mark_changed(key)
+
+        while len(self._entries) > self.max_entries:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._invalidate_scope(evicted_key, evicted)
+            self._mark_removed(evicted_key)
+            self.stats_counters["evictions"] += 1
+
+        if self._db is not None and len(self._changed) + len(self._removed) >= self.persist_every:
+            if self._flush_task is None or self._flush_task.done():
+                # Écriture en tâche de fond: la réponse n'attend pas le disque
+                self._flush_task = asyncio.ensure_future(self.flush())
+
+    def _lookup(self, key: str) -> Optional[Dict]:
+        """Lecture exacte avec TTL et mise à jour LRU"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if entry["expires_at"] < time.time():
+            del self._entries[key]
+            self._invalidate_scope(key, entry)
+            self._mark_removed(key)
+            self.stats_counters["expirations"] += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    def _mark_changed(self, key: str):
+        self._removed.discard(key)
+        self._changed.add(key)
+
+    def _mark_removed(self, key: str):
+        self._changed.discard(key)
+        self._removed.add(key)
+
+    def _invalidate_scope(self, key: str, entry: Dict):
+        if entry.get("vector") is not None:
+            scope = tuple(entry["scope"])
+            self._semantic_index.pop(scope, None)
+            members = self._scope_keys.get(scope)
+            if members is not None:
+                members.pop(key, None)
+                if not members:
+                    del self._scope_keys[scope]
+
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        try:
+            vector = await self.embed_fn(canonicalize_query(text))
+        except Exception as e:
+            logger.warning(f"⚠️  Embedding cache sémantique indisponible: {str(e)}")
+            return None
+        if not vector:
+            return None
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else None
+
+    def _scope_matrix(self, scope: Tuple[str, str, str]) -> Tuple[List[str], Optional[np.ndarray]]:
+        """Matrice des vecteurs normalisés d'un scope (template, langue, hash du contexte)"""
+        if scope not in self._scope_keys:
+            return [], None
+        if scope not in self._semantic_index:
+            keys = [
+                key for key in self._scope_keys[scope]
+                if key in self._entries and self._entries[key]["vector"] is not None
+            ]
+            if not keys:
+                return [], None
+            self._semantic_index[scope] = (keys, np.stack([self._entries[key]["vector"] for key in keys]))
+        return self._semantic_index[scope]
+
+    async def _semantic_lookup(self, scope: Tuple[str, str, str], query: str) -> Optional[str]:
+        keys, matrix = self._scope_matrix(scope)
+        if matrix is None:
+            return None
+
+        vector = await self._embed(query)
+        if vector is None:
+            return None
+
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.semantic_threshold:
+            return None
+
+        entry = self._lookup(keys[best])
+        return entry["answer"] if entry else None
+
+    def stats(self) -> Dict:
+        """Compteurs et ratios de hit/miss"""
+        counters = self.stats_counters
+        lookups = counters["exact_hits"] + counters["semantic_hits"] + counters["misses"]
+        return {
+            **counters,
+            "entries": len(self._entries),
+            "lookups": lookups,
+            "hit_ratio": round((counters["exact_hits"] + counters["semantic_hits"]) / lookups, 4) if lookups else 0.0,
+            "miss_ratio": round(counters["misses"] / lookups, 4) if lookups else 0.0,
+            "semantic_enabled": self.embed_fn is not None
+        }
+
+    def _take_changes(self) -> Tuple[List[Tuple], List[str]]:
+        """Lignes à écrire et clés à supprimer depuis la dernière écriture (remises à zéro)"""
+        rows = []
+        for key in self._changed:
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            vector = entry.get("vector")
+            rows.append((
+                key, entry["answer"], entry["expires_at"], *entry["scope"],
+                vector.astype(np.float32).tobytes() if vector is not None else None
+            ))
+        removed = list(self._removed)
+        self._changed, self._removed = set(), set()
+        return rows, removed
+
+    def _write(self, rows: List[Tuple], removed: List[str]):
+        """Écrit les changements en une transaction (appelé hors de la boucle par flush)"""
+        if self._db is None or (not rows and not removed):
+            return
+        try:
+            with self._lock:
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    self._db.executemany("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                    self._db.executemany("DELETE FROM answers WHERE key = ?", [(key,) for key in removed])
+                    self._db.execute("COMMIT")
+                except Exception:
+                    self._db.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            logger.error(f"❌ Erreur sauvegarde cache réponses: {str(e)}")
+
+    async def flush(self):
+        """Écrit les entrées modifiées depuis la dernière écriture, hors de la boucle d'événements"""
+        rows, removed = self._take_changes()
+        if rows or removed:
+            await asyncio.to_thread(self._write, rows, removed)
+
+    def save(self):
+        """Écrit les entrées modifiées (synchrone: arrêt, traitements hors ligne)"""
+        self._write(*self._take_changes())
+
+    async def close(self):
+        """Termine l'écriture en cours, écrit le reste et ferme la base"""
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+        await self.flush()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _load(self):
+        """Ouvre la base persistée et recharge les entrées non expirées (les plus récentes)"""
+        if not self.persist_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.persist_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.persist_path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, answer TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, template_id TEXT NOT NULL, language TEXT NOT NULL, "
+                "context_hash TEXT NOT NULL, vector BLOB)"
+            )
+            now = time.time()
+            self._db.execute("DELETE FROM answers WHERE expires_at <= ?", (now,))
+            rows = self._db.execute(
+                "SELECT key, answer, expires_at, template_id, language, context_hash, vector FROM answers "
+                "ORDER BY expires_at DESC LIMIT ?", (self.max_entries,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️  Cache réponses illisible, non persisté: {str(e)}")
+            self._db = None
+            return
+
+        for key, answer, expires_at, template_id, language, context, vector in reversed(rows):
+            self._entries[key] = {
+                "answer": answer,
+                "expires_at": expires_at,
+                "scope": [template_id, language, context],
+                "vector": np.frombuffer(vector, dtype=np.float32) if vector is not None else None
+            }
+            if vector is not None:
+                self._scope_keys.setdefault((template_id, language, context), {})[key] = None
+
+        logger.info(f"✅ Cache réponses chargé - {len(self._entries)} entrées")
+
+
+def _create_answer_cache() -> AnswerCache:
+    embed_fn = None
+    if config.ANSWER_CACHE_SEMANTIC:
+        from app.llm.embeddings_openai import embeddings_service
+        embed_fn = embeddings_service.embed_text
+
+    return AnswerCache(
+        max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+        ttl=config.ANSWER_CACHE_TTL,
+        persist_path=config.ANSWER_CACHE_PATH,
+        semantic_threshold=config.ANSWER_CACHE_SEMANTIC_THRESHOLD if config.ANSWER_CACHE_SEMANTIC else None,
+        embed_fn=embed_fn
+    )
+
+# Instance globale (construite au premier accès, voir app.container)
+__getattr__ = lazy_instance(__name__, "answer_cache", "answer_cache")
@@ -0,0 +1,197 @@
+# app/llm/bm25.py
+"""
+Index lexical BM25 en mémoire sur les chunks du RAG
+
+Complète la recherche vectorielle: les noms de médicaments et les dosages
+("amoxicillin 500 mg") sont des tokens exacts que les embeddings confondent
+parfois avec des noms proches. Un index nom de médicament -> chunks permet
+de résoudre sans recherche vectorielle une requête réduite à un nom connu
+(plus dosage ou forme), et de favoriser les chunks de ce médicament quand
+la requête ne fait que commencer par son nom. Les résultats lexicaux et
+vectoriels sont fusionnés par rang réciproque (voir reciprocal_rank_fusion).
+"""
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.database.drug_canonicalizer import strength_only
+from app.llm.answer_cache import canonicalize_query
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokens normalisés (casse, accents, dosages) - voir canonicalize_query"""
+    return canonicalize_query(text).split()
+
+
+class BM25Index:
+    """Index inversé BM25 avec ajouts incrémentaux et suppressions logiques"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._ids: List[str] = []
+        self._row: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._lengths: List[int] = []
+        self._alive: List[bool] = []
+        self._postings: Dict[str, Tuple[List[int], List[int]]] = defaultdict(lambda: ([], []))
+        self._by_name: Dict[str, List[int]] = defaultdict(list)
+        self._max_name_tokens = 0
+        self._total_length = 0
+        self._live = 0
+        # Postings convertis en tableaux NumPy à la demande
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._lengths_array: Optional[np.ndarray] = None
+        self._alive_array: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return self._live
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._row
+
+    def add(self, doc_id: str, text: str, drug_name: str = ""):
+        """Indexe un chunk (un id déjà présent est remplacé)"""
+        if doc_id in self._row:
+            self.remove([doc_id])
+
+        row = len(self._ids)
+        tokens = tokenize(text)
+        self._ids.append(doc_id)
+        self._row[doc_id] = row
+        self._lengths.append(len(tokens))
+        self._alive.append(True)
+        self._total_length += len(tokens)
+        self._live += 1
+
+        counts: Dict[str, int] = defaultdict(int)
+        for token in tokens:
+            counts[token] += 1
+        for token, tf in counts.items():
+            docs, tfs = self._postings[token]
+            docs.append(row)
+            tfs.append(tf)
+            self._arrays.pop(token, None)
+
+        name = " ".join(tokenize(drug_name))
+        self._names.append(name)
+        if name:
+            self._by_name[name].append(row)
+            self._max_name_tokens = max(self._max_name_tokens, len(name.split()))
+
+        self._lengths_array = None
+        self._alive_array = None
+
+    def remove(self, doc_ids: Sequence[str]):
+        """Suppression logique"""
+        for doc_id in doc_ids:
+            row = self._row.pop(doc_id, None)
+            if row is None:
+                continue
+            self._alive[row] = False
+            self._total_length -= self._lengths[row]
+            self._live -= 1
+            rows = self._by_name.get(self._names[row])
+            if rows is not None and row in rows:
+                rows.remove(row)
+                if not rows:
+                    del self._by_name[self._names[row]]
+        self._alive_array = None
+
+    def match_name(self, query: str, exact: bool = False) -> Optional[str]:
+        """
+        Nom de médicament indexé par lequel commence la requête (le plus long)
+
+        "Amoxicillin 500 mg" -> "amoxicillin" si ce nom est indexé.
+
+        Args:
+            exact: La requête n'est que ce nom, suivi au plus de dosages ou de formes
+                   ("warfarin 5 mg tablets", pas "warfarin and aspirin together")
+        """
+        tokens = tokenize(query)
+        for n in range(min(len(tokens), self._max_name_tokens), 0, -1):
+            name = " ".join(tokens[:n])
+            if name in self._by_name and (not exact or strength_only(tokens[n:])):
+                return name
+        return None
+
+    def _postings_array(self, token: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        if token not in self._postings:
+            return None
+        if token not in self._arrays:
+            docs, tfs = self._postings[token]
+            self._arrays[token] = (np.asarray(docs, dtype=np.int64), np.asarray(tfs, dtype=np.float32))
+        return self._arrays[token]
+
+    def search(self, query: str, n_results: int = 10, name: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Meilleurs chunks au sens BM25
+
+        Args:
+            name: Restreint aux chunks de ce médicament (nom normalisé, voir match_name)
+
+        Returns:
+            [(id, score)] par score décroissant
+        """
+        if not self._live:
+            return []
+        if self._lengths_array is None:
+            self._lengths_array = np.asarray(self._lengths, dtype=np.float32)
+        if self._alive_array is None:
+            self._alive_array = np.asarray(self._alive, dtype=bool)
+
+        average_length = self._total_length / self._live or 1.0
+        if name is not None:
+            # Restreint aux chunks du médicament: coût proportionnel à ses chunks, pas au corpus
+            candidates = np.asarray(self._by_name.get(name, []), dtype=np.int64)
+        else:
+            candidates = None
+        size = len(candidates) if candidates is not None else len(self._ids)
+        scores = np.zeros(size, dtype=np.float32)
+
+        for token in set(tokenize(query)):
+            postings = self._postings_array(token)
+            if postings is None:
+                continue
+            docs, tfs = postings
+            df = int(self._alive_array[docs].sum())
+            if not df:
+                continue
+            idf = math.log(1 + (self._live - df + 0.5) / (df + 0.5))
+            if candidates is not None:
+                # Postings et candidats sont triés par ligne
+                positions = np.searchsorted(candidates, docs)
+                found = positions < len(candidates)
+                found[found] = candidates[positions[found]] == docs[found]
+                docs, tfs, targets = docs[found], tfs[found], positions[found]
+            else:
+                targets = docs
+            norm = self.k1 * (1 - self.b + self.b * self._lengths_array[docs] / average_length)
+            scores[targets] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+        if candidates is None:
+            candidates = np.flatnonzero((scores > 0) & self._alive_array)
+            scores = scores[candidates]
+        if not len(candidates):
+            return []
+
+        k = min(n_results, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self._ids[candidates[i]], float(scores[i])) for i in top]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fusion de classements par rang réciproque: score = somme 1 / (k + rang)
+
+    Returns:
+        [(id, score)] par score décroissant
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,91 @@
+# app/llm/chunking.py
+"""
+Découpage des sections SPL en chunks bornés en tokens, avec chevauchement
+
+Chaque chunk porte le nom du médicament, le type de section, le set id et la
+version du SPL: la recherche renvoie des passages courts et ciblés plutôt
+que des notices entières tronquées.
+"""
+import hashlib
+from typing import Dict, Iterable, List, Optional
+
+from app.config import config
+from app.llm.tokenizer import tokenizer
+
+# Libellés des types de section dans le texte des chunks
+SECTION_LABELS = {
+    "boxed_warning": "Mise en garde encadrée",
+    "indications": "Indications",
+    "dosage": "Posologie",
+    "contraindications": "Contre-indications",
+    "warnings": "Précautions",
+    "side_effects": "Effets indésirables",
+    "interactions": "Interactions",
+    "specific_populations": "Populations particulières",
+    "overdosage": "Surdosage",
+    "storage": "Conservation",
+    "active_ingredients": "Principes actifs",
+    "purpose": "Usage",
+}
+
+
+def content_id(text: str) -> str:
+    """
+    Identifiant stable dérivé du contenu (espaces normalisés)
+
+    Contrairement à hash(), identique d'un processus à l'autre.
+    """
+    normalized = " ".join(text.split())
+    return "doc_" + hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:32]
+
+
+def chunk_text(text: str, max_tokens: Optional[int] = None, overlap: Optional[int] = None) -> List[str]:
+    """
+    Découpe un texte en fenêtres de tokens qui se chevauchent
+
+    Args:
+        max_tokens: Taille maximale d'un chunk (config.CHUNK_MAX_TOKENS par défaut)
+        overlap: Chevauchement en tokens (config.CHUNK_OVERLAP_TOKENS par défaut)
+    """
+    max_tokens = max_tokens or config.CHUNK_MAX_TOKENS
+    overlap = config.CHUNK_OVERLAP_TOKENS if overlap is None else overlap
+    return [chunk for chunk in tokenizer.windows(text, max_tokens, overlap) if chunk]
+
+
+def chunk_sections(
+    sections: Iterable[Dict],
+    max_tokens: Optional[int] = None,
+    overlap: Optional[int] = None
+) -> List[Dict]:
+    """
+    Transforme des sections SPL (voir spl_parser.iter_spl_sections) en documents RAG
+
+    Le préfixe "médicament - section" est ajouté à chaque chunk pour que
+    l'embedding reste ancré au bon médicament.
+
+    Returns:
+        Documents {"id", "text", "metadata"}
+    """
+    documents = []
+    for section in sections:
+        section_type = section.get("section_type", "")
+        label = SECTION_LABELS.get(section_type, section_type)
+        drug_name = section.get("drug_name", "")
+        set_id = section.get("set_id", "")
+
+        for index, chunk in enumerate(chunk_text(section.get("text", ""), max_tokens, overlap)):
+            text = f"{drug_name} - {label}: {chunk}"
+            documents.append({
+                "id": content_id(text),
+                "text": text,
+                "metadata": {
+                    "drug_name": drug_name,
+                    "section": section_type,
+                    "set_id": set_id,
+                    "version": section.get("version", ""),
+                    "loinc_code": section.get("loinc_code", ""),
+                    "chunk_index": index,
+                    "source": "DailyMed"
+                }
+            })
+    return documents
@@ -0,0 +1,129 @@
+# app/llm/context_builder.py
+"""
+Assemblage du contexte du prompt sous budget de tokens
+
+Les résultats de recherche sont pris par pertinence décroissante et ajoutés
+tant qu'ils tiennent dans le budget (config.CONTEXT_MAX_TOKENS), en-têtes
+"[Source i]" et séparateurs compris. Les quasi-doublons (même notice publiée
+par plusieurs laboratoires, versions successives) sont écartés: similarité
+cosinus des n-grammes de caractères hachés (embeddings locaux), calculée en
+une multiplication matricielle pour tous les candidats.
+"""
+import logging
+from typing import Dict, List, Optional
+
+from app.config import config
+from app.container import lazy_instance
+from app.llm.embeddings_local import HashingEmbeddings
+from app.llm.tokenizer import Tokenizer, tokenizer as default_tokenizer
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = "\n\n---\n\n"
+
+
+def _header(position: int) -> str:
+    return f"[Source {position}]\n"
+
+
+class ContextBuilder:
+    """Sélection des chunks du contexte: budget de tokens + suppression des quasi-doublons"""
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        duplicate_threshold: Optional[float] = None,
+        tokenizer: Optional[Tokenizer] = None
+    ):
+        """
+        Args:
+            max_tokens: Budget du contexte (config.CONTEXT_MAX_TOKENS par défaut)
+            duplicate_threshold: Similarité cosinus au-delà de laquelle un chunk est un quasi-doublon
+        """
+        self.max_tokens = max_tokens or config.CONTEXT_MAX_TOKENS
+        self.duplicate_threshold = (
+            duplicate_threshold if duplicate_threshold is not None else config.CONTEXT_DUPLICATE_THRESHOLD
+        )
+        self.tokenizer = tokenizer or default_tokenizer
+        self.embedder = HashingEmbeddings(dimension=256)
+        self.separator_tokens = self.tokenizer.count(SEPARATOR)
+        self.header_tokens = self.tokenizer.count(_header(1))
+        self.totals = {"requests": 0, "tokens": 0, "selected": 0, "duplicates": 0, "over_budget": 0}
+
+    def build(self, results: List[Dict], max_chunks: Optional[int] = None) -> Dict:
+        """
+        Sélectionne et assemble les chunks
+
+        Args:
+            results: Résultats de recherche {"text", "metadata", "relevance"}
+            max_chunks: Nombre maximum de chunks (None = budget seul)
+
+        Returns:
+            {"text", "selected" (résultats retenus, dans l'ordre du contexte),
+             "tokens", "duplicates", "over_budget"}
+        """
+        candidates = sorted(
+            (r for r in results if r.get("text")),
+            key=lambda r: r.get("relevance", 0),
+            reverse=True
+        )
+        if not candidates:
+            return {"text": "", "selected": [], "tokens": 0, "duplicates": 0, "over_budget": 0}
+
+        texts = [r["text"] for r in candidates]
+        costs = [self.tokenizer.count(text) for text in texts]
+        # Vecteurs normalisés: similarités de toutes les paires en une multiplication
+        vectors = self.embedder.embed_matrix(texts)
+        similarities = vectors @ vectors.T
+
+        selected: List[int] = []
+        texts_out: List[str] = []
+        used, duplicates, over_budget = 0, 0, 0
+        for i, cost in enumerate(costs):
+            if max_chunks is not None and len(selected) >= max_chunks:
+                break
+            if selected and similarities[i, selected].max() >= self.duplicate_threshold:
+                duplicates += 1
+                continue
+            overhead = self.header_tokens + (self.separator_tokens if selected else 0)
+            remaining = self.max_tokens - used - overhead
+            if cost > remaining:
+                if selected or remaining <= 0:
+                    # Un chunk plus court, moins pertinent, peut encore tenir
+                    over_budget += 1
+                    continue
+                # Le meilleur chunk dépasse à lui seul le budget: tronqué au budget
+                texts[i] = self.tokenizer.windows(texts[i], remaining)[0]
+                cost = self.tokenizer.count(texts[i])
+            selected.append(i)
+            texts_out.append(texts[i])
+            used += overhead + cost
+
+        text = SEPARATOR.join(_header(n + 1) + chunk for n, chunk in enumerate(texts_out))
+        self.totals["requests"] += 1
+        self.totals["tokens"] += used
+        self.totals["selected"] += len(selected)
+        self.totals["duplicates"] += duplicates
+        self.totals["over_budget"] += over_budget
+        return {
+            "text": text,
+            "selected": [candidates[i] for i in selected],
+            "tokens": used,
+            "duplicates": duplicates,
+            "over_budget": over_budget
+        }
+
+    def stats(self) -> Dict:
+        """Totaux depuis le démarrage (tokens de contexte, chunks écartés)"""
+        requests = self.totals["requests"]
+        return {
+            **self.totals,
+            "max_tokens": self.max_tokens,
+            "duplicate_threshold": self.duplicate_threshold,
+            "avg_tokens": round(self.totals["tokens"] / requests, 1) if requests else 0.0,
+            "exact_tokenizer": self.tokenizer.exact
+        }
+
+
+# Instance globale (construite au premier accès, voir app.container)
+__getattr__ = lazy_instance(__name__, "context_builder", "context_builder")
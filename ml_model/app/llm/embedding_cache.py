@@ -0,0 +1,170 @@
+# app/llm/embedding_cache.py
+"""
+Cache persistant texte -> embedding
+
+Vecteurs float32 dans un fichier memory-mappé, index des clés dans SQLite
+(mode WAL): survit aux redémarrages et peut être lu par plusieurs workers
+en même temps. Les écritures sont sérialisées par une transaction SQLite
+"BEGIN IMMEDIATE", ce qui fonctionne aussi entre processus.
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Cache d'embeddings: hash du contenu -> ligne d'une matrice float32 memmap"""
+
+    def __init__(self, directory: str, namespace: str):
+        """
+        Args:
+            directory: Dossier du cache
+            namespace: Espace de noms (modèle d'embedding): un fichier par modèle
+        """
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", namespace)
+        os.makedirs(directory, exist_ok=True)
+        self.namespace = namespace
+        self.vectors_path = os.path.join(directory, f"{safe_name}.f32")
+        self.index_path = os.path.join(directory, f"{safe_name}.sqlite")
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.index_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+
+        self.dimension = self._read_dimension()
+        self._matrix: Optional[np.memmap] = None
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        """Clé de cache: hash du modèle + texte"""
+        return hashlib.sha256(f"{self.namespace}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _read_dimension(self) -> Optional[int]:
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'dimension'").fetchone()
+        return int(row[0]) if row else None
+
+    def _rows_available(self) -> int:
+        if not self.dimension or not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (self.dimension * 4)
+
+    def _view(self, max_row: int) -> np.ndarray:
+        """Matrice memmap (re)mappée si d'autres processus ont ajouté des lignes"""
+        if self._matrix is None or self._matrix.shape[0] <= max_row:
+            rows = self._rows_available()
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dimension))
+        return self._matrix
+
+    def _lookup(self, keys: List[str]) -> Dict[str, int]:
+        """{clé: ligne} par paquets (limite de paramètres SQLite)"""
+        rows = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows.update(self._db.execute(
+                f"SELECT key, row FROM entries WHERE key IN ({placeholders})", chunk
+            ).fetchall())
+        return rows
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """
+        Lit les embeddings présents en cache
+
+        Returns:
+            {clé: vecteur} pour les clés trouvées uniquement
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+
+        found = {}
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = self._read_dimension()
+            if self.dimension is not None:
+                found = self._lookup(keys)
+
+            result = {}
+            if found:
+                matrix = self._view(max(found.values()))
+                result = {key: np.array(matrix[row]) for key, row in found.items()}
+
+        self.hits += len(result)
+        self.misses += len(keys) - len(result)
+        return result
+
+    def put_many(self, items: Dict[str, List[float]]):
+        """Ajoute des embeddings (les clés déjà présentes sont ignorées)"""
+        if not items:
+            return
+
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                dimension = self._read_dimension()
+                if dimension is None:
+                    dimension = len(next(iter(items.values())))
+                    self._db.execute("INSERT INTO meta (name, value) VALUES ('dimension', ?)", (str(dimension),))
+                self.dimension = dimension
+
+                existing = self._lookup(list(items))
+                new_items = [
+                    (key, vector) for key, vector in items.items()
+                    if key not in existing and len(vector) == dimension
+                ]
+                if not new_items:
+                    self._db.execute("COMMIT")
+                    return
+
+                # La taille du fichier fait foi (une écriture interrompue laisse des lignes orphelines)
+                first_row = self._rows_available()
+                block = np.asarray([vector for _, vector in new_items], dtype=np.float32)
+                with open(self.vectors_path, "ab") as f:
+                    f.truncate(first_row * dimension * 4)
+                    f.write(block.tobytes())
+                    f.flush()
+
+                self._db.executemany(
+                    "INSERT INTO entries (key, row) VALUES (?, ?)",
+                    [(key, first_row + i) for i, (key, _) in enumerate(new_items)]
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> Dict:
+        """Taux de hit et taille du cache"""
+        lookups = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "entries": self._rows_available(),
+            "dimension": self.dimension,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def create_embedding_cache(namespace: str) -> Optional[EmbeddingCache]:
+    """Cache du modèle `namespace`, ou None si désactivé/inaccessible"""
+    if not config.EMBEDDING_CACHE_ENABLED:
+        return None
+    try:
+        return EmbeddingCache(config.EMBEDDING_CACHE_DIR, namespace)
+    except (OSError, sqlite3.Error) as e:
+        logger.error(f"❌ Cache d'embeddings indisponible: {str(e)}")
+        return None
@@ -0,0 +1,54 @@
+# app/llm/embeddings_base.py
+"""
+Interface des fournisseurs d'embeddings et sélection via la configuration
+
+EMBEDDING_PROVIDER:
+- "chroma": fonction d'embedding par défaut de ChromaDB (comportement historique)
+- "openai": API OpenAI (embeddings_openai, avec cache persistant)
+- "local": n-grammes de caractères hachés, NumPy, sans réseau (embeddings_local)
+"""
+from typing import List, Optional
+
+from app.config import config
+
+EMBEDDING_PROVIDERS = ("chroma", "openai", "local")
+
+
+class EmbeddingProvider:
+    """Fournisseur d'embeddings utilisé par le RAG"""
+
+    # Identifiant du fournisseur (suffixe de la collection ChromaDB)
+    name = "base"
+    # Dimension des vecteurs si connue à l'avance
+    dimension: Optional[int] = None
+
+    async def embed_documents(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Embeddings d'un lot de documents (None pour un texte en échec)"""
+        raise NotImplementedError
+
+    async def embed_query(self, text: str) -> Optional[List[float]]:
+        """Embedding d'une requête"""
+        vectors = await self.embed_documents([text])
+        return vectors[0] if vectors else None
+
+
+def create_embedding_provider(name: Optional[str] = None) -> Optional[EmbeddingProvider]:
+    """
+    Fournisseur d'embeddings configuré
+
+    Args:
+        name: Fournisseur (config.EMBEDDING_PROVIDER par défaut)
+
+    Returns:
+        Le fournisseur, ou None pour "chroma" (ChromaDB calcule les embeddings)
+    """
+    name = (name or config.EMBEDDING_PROVIDER).lower()
+    if name == "chroma":
+        return None
+    if name == "openai":
+        from app.llm.embeddings_openai import embeddings_service
+        return embeddings_service
+    if name == "local":
+        from app.llm.embeddings_local import HashingEmbeddings
+        return HashingEmbeddings()
+    raise ValueError(f"Fournisseur d'embeddings inconnu: {name} (attendu: {', '.join(EMBEDDING_PROVIDERS)})")
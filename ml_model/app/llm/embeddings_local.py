@@ -0,0 +1,88 @@
+# app/llm/embeddings_local.py
+"""
+Embeddings locaux sur CPU: n-grammes de caractères hachés (NumPy)
+
+Aucun modèle à télécharger ni appel réseau. Chaque n-gramme d'octets
+(3 à 5 par défaut) est haché vers une des `dimension` composantes, avec un
+signe pseudo-aléatoire; les fréquences sont amorties (log) puis le vecteur
+est normalisé. Robuste aux fautes de frappe sur les noms de médicaments,
+mais sans notion de synonymie.
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.config import config
+from app.llm.embeddings_base import EmbeddingProvider
+from app.utils.metrics import timed
+
+# Constantes du hachage polynomial et du mélange final (murmur3 fmix64)
+_PRIME = np.uint64(0x100000001B3)
+_MIX_1 = np.uint64(0xFF51AFD7ED558CCD)
+_MIX_2 = np.uint64(0xC4CEB9FE1A85EC53)
+_SHIFT = np.uint64(33)
+_SIGN_BIT = np.uint64(63)
+
+
+class HashingEmbeddings(EmbeddingProvider):
+    """Embeddings par hachage de n-grammes de caractères, calculés par lot"""
+
+    name = "local"
+
+    def __init__(self, dimension: Optional[int] = None, ngram_range: Tuple[int, int] = (3, 5)):
+        self.dimension = dimension or config.EMBEDDING_LOCAL_DIM
+        self.ngram_sizes = range(ngram_range[0], ngram_range[1] + 1)
+
+    def embed_matrix(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeddings d'un lot sous forme de matrice (len(texts), dimension)
+
+        Tous les n-grammes du lot sont hachés en une passe vectorisée sur
+        les octets concaténés; ceux qui chevauchent deux textes sont écartés.
+        """
+        docs = [(" " + " ".join((text or "").lower().split()) + " ").encode("utf-8") for text in texts]
+        lengths = np.fromiter((len(doc) for doc in docs), dtype=np.int64, count=len(docs))
+        data = np.frombuffer(b"".join(docs), dtype=np.uint8).astype(np.uint64)
+        owner = np.repeat(np.arange(len(docs), dtype=np.int64), lengths)
+
+        counts = np.zeros(len(docs) * self.dimension, dtype=np.float64)
+        with np.errstate(over="ignore"):
+            for n in self.ngram_sizes:
+                total = len(data) - n + 1
+                if total <= 0:
+                    continue
+                hashes = np.full(total, n, dtype=np.uint64)
+                for k in range(n):
+                    hashes = hashes * _PRIME + data[k:k + total]
+                hashes ^= hashes >> _SHIFT
+                hashes *= _MIX_1
+                hashes ^= hashes >> _SHIFT
+                hashes *= _MIX_2
+                hashes ^= hashes >> _SHIFT
+
+                valid = owner[:total] == owner[n - 1:n - 1 + total]
+                hashes = hashes[valid]
+                cells = owner[:total][valid] * self.dimension + (hashes % np.uint64(self.dimension)).astype(np.int64)
+                signs = 1.0 - 2.0 * (hashes >> _SIGN_BIT).astype(np.float64)
+                counts += np.bincount(cells, weights=signs, minlength=counts.size)
+
+        matrix = counts.reshape(len(docs), self.dimension)
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).astype(np.float32)
+
+    @timed("embedding")
+    async def embed_documents(self, texts: List[str]) -> List[Optional[List[float]]]:
+        if not texts:
+            return []
+        return [
+            vector.tolist() if text and text.strip() else None
+            for text, vector in zip(texts, self.embed_matrix(texts))
+        ]
+
+    @timed("embedding")
+    async def embed_query(self, text: str) -> Optional[List[float]]:
+        if not text or not text.strip():
+            return None
+        return self.embed_matrix([text])[0].tolist()
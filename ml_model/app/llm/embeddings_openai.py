@@ -3,24 +3,81 @@
 Embeddings via OpenAI API - Léger, rapide, pas de PyTorch
 """
 import openai
+import httpx
 import numpy as np
-from typing import List, Optional
+from typing import Dict, List, Optional
 import logging
+import time
 from app.config import config
+from app.container import lazy_instance
+from app.llm.embedding_cache import EmbeddingCache, create_embedding_cache
+from app.llm.embeddings_base import EmbeddingProvider
+from app.llm.tokenizer import tokenizer
+from app.utils.metrics import timed
+from app.utils.retry import backoff_delay, retry_after_seconds
 import asyncio
 
 logger = logging.getLogger(__name__)
 
-class OpenAIEmbeddings:
+_DEFAULT_CACHE = object()
+
+# Erreurs transitoires: le même lot est renvoyé après une pause
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+# Délai maximum accepté depuis un en-tête de rate limit
+MAX_RETRY_AFTER = 60.0
+
+class OpenAIEmbeddings(EmbeddingProvider):
     """
     Service d'embeddings utilisant l'API OpenAI
     Plus léger que sentence-transformers, meilleure qualité
+
+    Les embeddings sont mis en cache sur disque (voir embedding_cache):
+    un texte déjà vu, à l'ingestion comme en requête, n'est jamais ré-envoyé.
     """
     
-    def __init__(self):
-        openai.api_key = config.OPENAI_API_KEY
+    name = "openai"
+    
+    def __init__(
+        self,
+        cache: Optional[EmbeddingCache] = _DEFAULT_CACHE,
+        base_url: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
+        max_batch_inputs: Optional[int] = None,
+        max_retries: Optional[int] = None
+    ):
         self.model = "text-embedding-3-small"  # Léger et rapide
         # Alternative: "text-embedding-ada-002"
+        self.cache = create_embedding_cache(self.model) if cache is _DEFAULT_CACHE else cache
+        self.max_concurrency = max_concurrency or config.EMBEDDING_MAX_CONCURRENCY
+        self.max_batch_tokens = max_batch_tokens or config.EMBEDDING_BATCH_MAX_TOKENS
+        self.max_batch_inputs = max_batch_inputs or config.EMBEDDING_BATCH_MAX_INPUTS
+        self.max_retries = max_retries if max_retries is not None else config.EMBEDDING_MAX_RETRIES
+        
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency
+            ),
+            timeout=config.LLM_TIMEOUT
+        )
+        # Les retries sont gérés ici (pause commune sur 429, découpage des lots en échec)
+        self.client = openai.AsyncOpenAI(
+            api_key=config.OPENAI_API_KEY,
+            base_url=base_url or config.OPENAI_BASE_URL,
+            http_client=self.http_client,
+            max_retries=0
+        )
+        
+        # Lots simultanés, et instant (horloge monotone) avant lequel aucun lot ne part
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._resume_at = 0.0
     
     async def embed_text(self, text: str) -> Optional[List[float]]:
         """
@@ -32,61 +89,185 @@ class OpenAIEmbeddings:
         Returns:
             Liste de floats (embedding) ou None en cas d'erreur
         """
-        try:
-            if not text or not text.strip():
-                return None
-                
-            response = await openai.Embedding.acreate(
-                model=self.model,
-                input=text,
-                encoding_format="float"
-            )
-            
-            return response.data[0].embedding
-            
-        except Exception as e:
-            logger.error(f"Erreur embedding OpenAI: {str(e)}")
+        if not text or not text.strip():
             return None
+        return (await self.embed_batch([text]))[0]
     
+    @timed("embedding")
     async def embed_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
         """
         Génère des embeddings pour plusieurs textes
         
+        Les textes en double ne sont encodés qu'une fois et seuls les textes
+        absents du cache sont envoyés à l'API.
+        
         Args:
             texts: Liste de textes
             
         Returns:
-            Liste d'embeddings
+            Liste d'embeddings (None pour les textes vides ou en échec)
         """
         if not texts:
             return []
         
-        # OpenAI limite à ~2048 tokens par requête, donc on batch
-        batch_size = 16  # Conservatif
-        results = []
+        valid = [bool(text and text.strip()) for text in texts]
+        if self.cache is not None:
+            keys = [self.cache.key(text) if ok else None for text, ok in zip(texts, valid)]
+            found = self.cache.get_many(key for key in keys if key)
+        else:
+            keys = [text if ok else None for text, ok in zip(texts, valid)]
+            found = {}
+        
+        # Textes manquants, dédupliqués
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key and key not in found and key not in missing:
+                missing[key] = text
         
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            try:
-                response = await openai.Embedding.acreate(
-                    model=self.model,
-                    input=batch,
-                    encoding_format="float"
-                )
-                
-                for item in response.data:
-                    results.append(item.embedding)
-                    
-            except Exception as e:
-                logger.error(f"Erreur batch embedding: {str(e)}")
-                # Ajouter None pour les textes échoués
-                results.extend([None] * len(batch))
-                
-            # Petite pause pour éviter rate limiting
-            await asyncio.sleep(0.1)
+        if missing:
+            vectors = await self._embed_uncached(list(missing.values()))
+            fetched = {key: vector for key, vector in zip(missing, vectors) if vector is not None}
+            if self.cache is not None and fetched:
+                try:
+                    self.cache.put_many(fetched)
+                except Exception as e:
+                    logger.error(f"Erreur écriture cache d'embeddings: {str(e)}")
+            found.update(fetched)
         
+        results = []
+        for key in keys:
+            vector = found.get(key) if key else None
+            results.append(vector.tolist() if isinstance(vector, np.ndarray) else vector)
         return results
     
+    async def embed_documents(self, texts: List[str]) -> List[Optional[List[float]]]:
+        return await self.embed_batch(texts)
+    
+    async def embed_query(self, text: str) -> Optional[List[float]]:
+        return await self.embed_text(text)
+    
+    def _pack_batches(self, texts: List[str]) -> List[List[int]]:
+        """
+        Regroupe les textes en lots bornés en tokens et en nombre d'entrées
+
+        Returns:
+            Lots d'indices dans `texts`
+        """
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+        for index, text in enumerate(texts):
+            tokens = tokenizer.count(text)
+            if current and (
+                current_tokens + tokens > self.max_batch_tokens
+                or len(current) >= self.max_batch_inputs
+            ):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(index)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+    
+    def _pause(self, delay: float):
+        """Suspend l'envoi de tous les lots pendant `delay` secondes"""
+        self._resume_at = max(self._resume_at, time.monotonic() + min(delay, MAX_RETRY_AFTER))
+    
+    def _throttle_from_headers(self, headers, batch_tokens: int):
+        """Pause préventive si le quota de requêtes/tokens annoncé est épuisé"""
+        try:
+            remaining_requests = int(headers.get("x-ratelimit-remaining-requests", 1))
+            remaining_tokens = int(headers.get("x-ratelimit-remaining-tokens", batch_tokens))
+        except ValueError:
+            return
+        if remaining_requests <= 0 or remaining_tokens < batch_tokens:
+            delay = retry_after_seconds({
+                key: value for key, value in headers.items() if key.startswith("x-ratelimit-reset")
+            })
+            if delay:
+                self._pause(delay)
+    
+    async def _request(self, texts: List[str]) -> List[List[float]]:
+        """
+        Envoie un lot, avec pause commune et retries sur les erreurs transitoires
+
+        Lève l'exception OpenAI d'origine si le lot est rejeté ou si les retries sont épuisés
+        """
+        attempt = 0
+        batch_tokens = sum(tokenizer.count(text) for text in texts)
+        
+        while True:
+            async with self._semaphore:
+                wait = self._resume_at - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                try:
+                    raw = await self.client.embeddings.with_raw_response.create(
+                        model=self.model,
+                        input=texts,
+                        encoding_format="float"
+                    )
+                    self._throttle_from_headers(raw.headers, batch_tokens)
+                    response = raw.parse()
+                    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+                except RETRYABLE_ERRORS as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    response = getattr(e, "response", None)
+                    delay = retry_after_seconds(response.headers if response is not None else None)
+                    if delay is None:
+                        delay = backoff_delay(attempt)
+                    attempt += 1
+                    logger.warning(
+                        f"⚠️  Embeddings {type(e).__name__} - nouvel essai {attempt}/{self.max_retries} dans {delay:.2f}s"
+                    )
+                    if isinstance(e, openai.RateLimitError):
+                        # Le quota est commun: tous les lots attendent
+                        self._pause(delay)
+                        continue
+            # Autres erreurs transitoires: attente hors sémaphore
+            await asyncio.sleep(min(delay, MAX_RETRY_AFTER))
+    
+    async def _embed_indices(self, texts: List[str], indices: List[int], results: List[Optional[List[float]]]):
+        """Encode un lot; en cas d'échec, le coupe en deux pour isoler le texte fautif"""
+        try:
+            vectors = await self._request([texts[i] for i in indices])
+            for index, vector in zip(indices, vectors):
+                results[index] = vector
+        except Exception as e:
+            if isinstance(e, openai.RateLimitError):
+                # Découper ne ferait que multiplier les requêtes
+                logger.error(f"Erreur batch embedding ({len(indices)} textes): {str(e)}")
+                return
+            if len(indices) == 1:
+                logger.error(f"Erreur embedding (texte {indices[0]}, {tokenizer.count(texts[indices[0]])} tokens): {str(e)}")
+                return
+            middle = len(indices) // 2
+            logger.warning(f"⚠️  Lot de {len(indices)} textes en échec, découpage ({type(e).__name__})")
+            await asyncio.gather(
+                self._embed_indices(texts, indices[:middle], results),
+                self._embed_indices(texts, indices[middle:], results)
+            )
+    
+    async def _embed_uncached(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Appelle l'API OpenAI par lots bornés en tokens, plusieurs lots en parallèle"""
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        await asyncio.gather(*[
+            self._embed_indices(texts, batch, results) for batch in self._pack_batches(texts)
+        ])
+        return results
+    
+    async def close(self):
+        """Ferme le pool de connexions"""
+        await self.http_client.aclose()
+    
+    def stats(self) -> Dict:
+        """Statistiques du cache d'embeddings"""
+        if self.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.stats()}
+    
     def cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """
         Calcule la similarité cosinus entre deux vecteurs
@@ -106,5 +287,5 @@ class OpenAIEmbeddings:
             
         return dot_product / (norm1 * norm2)
 
-# Instance globale
-embeddings_service = OpenAIEmbeddings()
\ No newline at end of file
+# Instance globale (construite au premier accès, voir app.container)
+__getattr__ = lazy_instance(__name__, "embeddings_service", "embeddings")
\ No newline at end of file
@@ -1,60 +1,416 @@
-# app/llm/llm_engine.py - VERSION CORRIGÉE
+# app/llm/llm_engine.py - VERSION ASYNC
+import asyncio
+import time
 import openai
-from typing import List, Dict, Optional
+import httpx
+from typing import AsyncIterator, List, Dict, Optional
 import logging
 from app.config import config
+from app.container import Dependency, lazy_instance
+from app.llm.answer_cache import AnswerCache
+from app.llm.tokenizer import tokenizer
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.utils.metrics import LLM_FIRST_TOKEN_SECONDS, record_tokens, span, timed
+from app.utils.retry import backoff_delay, retry_after_seconds
+from app.utils.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+# Erreurs transitoires qui justifient un nouvel essai
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+# Coupures en cours de lecture d'un flux (événement d'erreur SSE, connexion perdue)
+STREAM_ERRORS = (openai.APIError, httpx.TransportError)
+
+# Délai maximum accepté depuis un en-tête retry-after
+MAX_RETRY_AFTER = 60.0
+
+# Circuit ouvert: réponse construite à partir du contexte local uniquement
+LOCAL_FALLBACK_MESSAGES = {
+    "fr": ("Service d'intelligence artificielle temporairement indisponible.", "Extraits des notices disponibles localement :"),
+    "en": ("The AI service is temporarily unavailable.", "Excerpts from locally available labels:")
+}
+
 class LLMEngine:
-    """Moteur LLM pour interagir avec OpenAI"""
+    """Moteur LLM asynchrone pour interagir avec OpenAI"""
+    
+    # Cache des réponses partagé (sauf cache passé explicitement)
+    cache = Dependency("answer_cache")
     
-    def __init__(self):
-        # NOUVELLE SYNTAXE OpenAI v1.0+
-        self.client = openai.OpenAI(api_key=config.OPENAI_API_KEY)
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        base_url: Optional[str] = None,
+        cache: Optional[AnswerCache] = None
+    ):
         self.model = config.OPENAI_MODEL
+        if cache is not None:
+            self.cache = cache
+        self.flights = SingleFlight("llm", enabled=config.SINGLEFLIGHT_ENABLED)
+        self.timeout = timeout if timeout is not None else config.LLM_TIMEOUT
+        self.max_retries = max_retries if max_retries is not None else config.LLM_MAX_RETRIES
+        self.max_concurrency = max_concurrency or config.LLM_MAX_CONCURRENCY
         
-    async def generate_response(
-        self, 
-        prompt: str,
-        temperature: float = 0.3,
-        max_tokens: int = 1000
-    ) -> str:
+        # Pool de connexions keep-alive partagé par toutes les requêtes
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max(config.LLM_MAX_CONNECTIONS, self.max_concurrency),
+                max_keepalive_connections=max(config.LLM_MAX_CONNECTIONS, self.max_concurrency)
+            ),
+            timeout=self.timeout
+        )
+        
+        # Les retries sont gérés ici (backoff + en-têtes de rate limit)
+        self.client = openai.AsyncOpenAI(
+            api_key=config.OPENAI_API_KEY,
+            base_url=base_url or config.OPENAI_BASE_URL,
+            http_client=self.http_client,
+            max_retries=0
+        )
+        
+        # Limite le nombre de complétions simultanées
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        # Fournisseur en panne: refus immédiat, repli sur le contexte local
+        self.breaker = CircuitBreaker("llm", config.BREAKER_FAILURE_THRESHOLD, config.BREAKER_RESET_TIMEOUT)
+        
+        # Tokens facturés (usage renvoyé par l'API, complétions non streamées)
+        self.tokenizer = tokenizer
+        self.usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    
+    def _build_messages(self, prompt: str) -> List[Dict]:
+        """Construit les messages système + utilisateur"""
+        return [
+            {"role": "system", "content": "Tu es un assistant pharmaceutique expert."},
+            {"role": "user", "content": prompt}
+        ]
+    
+    async def _complete(self, messages: List[Dict], temperature: float, max_tokens: int):
         """
-        Génère une réponse à partir d'un prompt
+        Appelle l'API de complétion avec limite de concurrence, timeout et retries
+        
+        Lève CircuitOpenError sans appel si le disjoncteur est ouvert, l'exception
+        OpenAI d'origine une fois les retries épuisés
         """
-        try:
-            if not config.OPENAI_API_KEY:
-                return "Service LLM non configuré. Vérifiez la clé API."
-            
-            # NOUVELLE SYNTAXE OpenAI v1.0+
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "Tu es un assistant pharmaceutique expert."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-            
-            return response.choices[0].message.content.strip()
+        return await self.breaker.call(
+            lambda: self._complete_with_retries(messages, temperature, max_tokens),
+            failures=RETRYABLE_ERRORS
+        )
+    
+    async def _complete_with_retries(
+        self,
+        messages: List[Dict],
+        temperature: float,
+        max_tokens: int,
+        stream: bool = False,
+        hold: bool = False
+    ):
+        """
+        Args:
+            stream: Retourne un flux de chunks au lieu d'une réponse complète
+            hold: Conserve la place du sémaphore après succès (l'appelant la rend
+                  une fois le flux lu)
+        
+        La place n'est jamais détenue pendant l'attente entre deux essais.
+        """
+        attempt = 0
+        
+        while True:
+            await self._semaphore.acquire()
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=stream,
+                    timeout=self.timeout
+                )
+            except BaseException as e:
+                self._semaphore.release()
+                if not isinstance(e, RETRYABLE_ERRORS) or attempt >= self.max_retries:
+                    raise
+                
+                response = getattr(e, "response", None)
+                delay = retry_after_seconds(response.headers if response is not None else None)
+                if delay is None:
+                    delay = backoff_delay(attempt)
+                delay = min(delay, MAX_RETRY_AFTER)
+                
+                attempt += 1
+                logger.warning(
+                    f"⚠️  {type(e).__name__} - nouvel essai {attempt}/{self.max_retries} dans {delay:.2f}s"
+                )
+                # Attente hors sémaphore pour ne pas bloquer les autres appels
+                await asyncio.sleep(delay)
+                continue
             
-        except openai.AuthenticationError:  # ⬅️ SANS .error !
+            if not hold:
+                self._semaphore.release()
+            return response
+    
+    def _error_message(self, error: Exception) -> str:
+        """Traduit une erreur OpenAI en message utilisateur"""
+        if isinstance(error, CircuitOpenError):
+            return "Service d'intelligence artificielle temporairement indisponible. Réessayez plus tard."
+        
+        if isinstance(error, openai.AuthenticationError):  # ⬅️ SANS .error !
             logger.error("❌ Erreur d'authentification OpenAI")
             return "Erreur d'authentification. Vérifiez la clé API OpenAI."
-            
-        except openai.RateLimitError:  # ⬅️ SANS .error !
+        
+        if isinstance(error, openai.RateLimitError):
             logger.error("⚠️  Limite de taux OpenAI atteinte")
             return "Limite de requêtes atteinte. Réessayez plus tard."
-            
-        except openai.APIError:  # ⬅️ SANS .error !
+        
+        if isinstance(error, openai.APIError):
             logger.error("❌ Erreur API OpenAI")
             return "Erreur temporaire du service d'intelligence artificielle."
+        
+        logger.error(f"❌ Erreur OpenAI: {str(error)}")
+        return f"Erreur lors de la génération de la réponse: {str(error)}"
+    
+    async def _generate(self, prompt: str, temperature: float, max_tokens: int) -> str:
+        """Complétion complète - lève les erreurs OpenAI"""
+        with span("llm"):
+            response = await self._complete(
+                messages=self._build_messages(prompt),
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.usage["requests"] += 1
+            self.usage["prompt_tokens"] += usage.prompt_tokens or 0
+            self.usage["completion_tokens"] += usage.completion_tokens or 0
+            record_tokens(usage.prompt_tokens or 0, usage.completion_tokens or 0)
+        return response.choices[0].message.content.strip()
+    
+    async def _stream(self, prompt: str, temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        """
+        Complétion en streaming - lève les erreurs OpenAI
+        
+        La place du sémaphore est conservée de l'ouverture à la fin du flux (mais
+        pas pendant l'attente entre deux essais d'ouverture). Le disjoncteur juge
+        le flux entier: une coupure en cours de lecture compte comme un échec.
+        L'API ne renvoie pas l'usage des flux: les tokens sont estimés avec le tokenizer local.
+        """
+        # Circuit ouvert: refus immédiat, sans attendre une place du sémaphore
+        self.breaker.check()
+        messages = self._build_messages(prompt)
+        start = time.perf_counter()
+        tokens = []
+        with span("llm"):
+            try:
+                stream = await self._complete_with_retries(
+                    messages, temperature, max_tokens, stream=True, hold=True
+                )
+            except RETRYABLE_ERRORS:
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                self.breaker.release()
+                raise
             
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if not tokens and config.METRICS_ENABLED:
+                            LLM_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - start)
+                        tokens.append(chunk.choices[0].delta.content)
+                        yield chunk.choices[0].delta.content
+            except STREAM_ERRORS:
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                # Client déconnecté ou annulation: ne juge pas le fournisseur
+                self.breaker.release()
+                raise
+            finally:
+                self._semaphore.release()
+            self.breaker.record_success()
+        if config.METRICS_ENABLED:
+            record_tokens(
+                sum(self.tokenizer.count(message["content"]) for message in messages),
+                self.tokenizer.count("".join(tokens)),
+                source="estimated"
+            )
+    
+    async def generate_response(
+        self, 
+        prompt: str,
+        temperature: float = 0.3,
+        max_tokens: int = 1000
+    ) -> str:
+        """
+        Génère une réponse à partir d'un prompt
+        """
+        if not config.OPENAI_API_KEY:
+            return "Service LLM non configuré. Vérifiez la clé API."
+        
+        try:
+            return await self._generate(prompt, temperature, max_tokens)
+        except Exception as e:
+            return self._error_message(e)
+    
+    async def stream_response(
+        self,
+        prompt: str,
+        temperature: float = 0.3,
+        max_tokens: int = 1000
+    ) -> AsyncIterator[str]:
+        """
+        Génère une réponse token par token (streaming)
+        
+        En cas d'erreur, le message d'erreur est émis comme dernier fragment.
+        """
+        if not config.OPENAI_API_KEY:
+            yield "Service LLM non configuré. Vérifiez la clé API."
+            return
+        
+        try:
+            async for token in self._stream(prompt, temperature, max_tokens):
+                yield token
         except Exception as e:
-            logger.error(f"❌ Erreur OpenAI: {str(e)}")
-            return f"Erreur lors de la génération de la réponse: {str(e)}"
+            yield self._error_message(e)
+    
+    def _local_fallback(self, context: str, language: str) -> str:
+        """Réponse sans LLM (circuit ouvert): le contexte local tel quel, jamais mis en cache"""
+        unavailable, excerpts = LOCAL_FALLBACK_MESSAGES.get(language, LOCAL_FALLBACK_MESSAGES["fr"])
+        if not context or not context.strip() or "Aucune information" in context:
+            return unavailable
+        return f"{unavailable} {excerpts}\n\n{context}"
+    
+    @timed("prompt_build")
+    def count_prompt_tokens(self, template_id: str, question: str, context: str, language: str, **variables) -> int:
+        """Tokens du prompt (message système + template rendu) avec le tokenizer du modèle"""
+        prompt = self._render_template(template_id, question, context, language, **variables)
+        return sum(self.tokenizer.count(message["content"]) for message in self._build_messages(prompt))
+    
+    def stats(self) -> Dict:
+        """Tokens facturés depuis le démarrage (usage de l'API)"""
+        requests = self.usage["requests"]
+        return {
+            **self.usage,
+            "avg_prompt_tokens": round(self.usage["prompt_tokens"] / requests, 1) if requests else 0.0
+        }
+    
+    def _render_template(self, template_id: str, question: str, context: str, language: str, **variables) -> str:
+        return config.PROMPT_TEMPLATES[template_id].format(
+            context=context,
+            question=question,
+            language=language,
+            **variables
+        )
+    
+    async def generate_from_template(
+        self,
+        template_id: str,
+        question: str,
+        context: str,
+        language: str = "fr",
+        **variables
+    ) -> str:
+        """
+        Génère une réponse à partir d'un template, via le cache de réponses
+        
+        Args:
+            template_id: Clé de config.PROMPT_TEMPLATES
+            question: Question ou nom du médicament (clé de cache canonicalisée)
+            context: Contexte récupéré (haché dans la clé de cache)
+            language: Langue de réponse
+            variables: Variables supplémentaires du template
+        
+        Les messages d'erreur ne sont jamais mis en cache. Les appels concurrents
+        pour la même clé de cache sont coalescés.
+        """
+        cached = await self.cache.get(template_id, question, language, context)
+        if cached is not None:
+            return cached
+        
+        if not config.OPENAI_API_KEY:
+            return "Service LLM non configuré. Vérifiez la clé API."
+        
+        with span("prompt_build"):
+            prompt = self._render_template(template_id, question, context, language, **variables)
+        key = self.cache.make_key(template_id, question, language, context)
+        
+        async def _generate_and_cache() -> str:
+            answer = await self._generate(prompt, 0.3, 1000)
+            await self.cache.set(template_id, question, language, context, answer)
+            return answer
+        
+        # Les appels concurrents identiques partagent une seule complétion
+        try:
+            return await self.flights.do(key, _generate_and_cache)
+        except CircuitOpenError:
+            return self._local_fallback(context, language)
+        except Exception as e:
+            return self._error_message(e)
+    
+    async def complete_template(
+        self,
+        template_id: str,
+        question: str,
+        context: str,
+        language: str = "fr",
+        **variables
+    ) -> str:
+        """
+        Complétion directe d'un template, sans cache ni coalescence (traitements hors ligne)
+
+        Lève les erreurs OpenAI au lieu de renvoyer un message d'erreur.
+        """
+        prompt = self._render_template(template_id, question, context, language, **variables)
+        return await self._generate(prompt, 0.3, 1000)
+
+    async def stream_from_template(
+        self,
+        template_id: str,
+        question: str,
+        context: str,
+        language: str = "fr",
+        **variables
+    ) -> AsyncIterator[str]:
+        """
+        Variante streaming de generate_from_template
+        
+        Un hit de cache est émis en un seul fragment; un flux complet est mis en cache.
+        """
+        cached = await self.cache.get(template_id, question, language, context)
+        if cached is not None:
+            yield cached
+            return
+        
+        if not config.OPENAI_API_KEY:
+            yield "Service LLM non configuré. Vérifiez la clé API."
+            return
+        
+        with span("prompt_build"):
+            prompt = self._render_template(template_id, question, context, language, **variables)
+        tokens = []
+        try:
+            async for token in self._stream(prompt, 0.3, 1000):
+                tokens.append(token)
+                yield token
+        except CircuitOpenError:
+            yield self._local_fallback(context, language)
+            return
+        except Exception as e:
+            yield self._error_message(e)
+            return
+        
+        await self.cache.set(template_id, question, language, context, "".join(tokens).strip())
+    
+    async def close(self):
+        """Ferme le pool de connexions HTTP"""
+        await self.http_client.aclose()
     
     async def format_drug_info(
         self, 
@@ -65,13 +421,7 @@ class LLMEngine:
         """
         Formate les informations sur un médicament
         """
-        prompt = config.PROMPT_TEMPLATES["drug_info"].format(
-            context=context,
-            question=drug_name,
-            language=language
-        )
-        
-        response = await self.generate_response(prompt)
+        response = await self.generate_from_template("drug_info", drug_name, context, language)
         
         return {
             "drug_name": drug_name,
@@ -83,28 +433,33 @@ class LLMEngine:
     
     async def analyze_interactions(
         self,
-        context: str,
+        interactions: List[Dict],
         drugs: List[str],
         language: str = "fr"
-    ) -> Dict:
+    ) -> str:
         """
-        Analyse les interactions médicamenteuses
+        Rédige l'explication d'interactions déjà détectées
+
+        La détection est faite par le moteur local (voir InteractionService):
+        le LLM ne fait que formuler les interactions fournies.
+
+        Args:
+            interactions: Interactions {"drugs", "ingredients", "severity", "mechanism", "management"}
+            drugs: Médicaments de l'ordonnance
         """
-        prompt = config.PROMPT_TEMPLATES["interaction_check"].format(
-            context=context,
-            drugs=", ".join(drugs),
-            language=language
+        context = "\n".join(
+            f"- {' + '.join(hit['drugs'])} ({' + '.join(hit['ingredients'])}) - gravité: {hit['severity']}"
+            f"\n  Mécanisme: {hit['mechanism'] or 'non précisé'}"
+            f"\n  Conduite à tenir: {hit['management'] or 'non précisée'}"
+            for hit in interactions
+        )
+        return await self.generate_from_template(
+            "interaction_check",
+            ", ".join(sorted(drugs)),
+            context,
+            language,
+            drugs=", ".join(drugs)
         )
-        
-        response = await self.generate_response(prompt)
-        
-        return {
-            "drugs": drugs,
-            "analysis": response,
-            "has_interactions": "interaction" in response.lower() or "risque" in response.lower(),
-            "language": language,
-            "disclaimer": "Cette analyse est générée par IA. Consultez un pharmacien pour confirmation."
-        }
 
-# Instance globale
-llm_engine = LLMEngine()
\ No newline at end of file
+# Instance globale (construite au premier accès, voir app.container)
+__getattr__ = lazy_instance(__name__, "llm_engine", "llm")
\ No newline at end of file
@@ -1,10 +1,7 @@
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-import numpy as np
 from typing import List, Dict
 import logging
 from app.config import config
+from app.container import lazy_instance
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +17,9 @@ class RAGSystem:
     def _initialize(self):
         """Initialise le système RAG"""
         try:
+            import chromadb
+            from chromadb.config import Settings
+            
             # Initialiser ChromaDB
             self.chroma_client = chromadb.Client(Settings(
                 persist_directory=config.CHROMA_PERSIST_DIR,
@@ -122,5 +122,5 @@ class RAGSystem:
         """Vérifie si le système RAG est prêt"""
         return self.collection is not None and self.collection.count() > 0
 
-# Instance globale
-rag_system = RAGSystem()
\ No newline at end of file
+# Instance globale (construite au premier accès, voir app.container)
+__getattr__ = lazy_instance(__name__, "rag_system", "legacy_rag")
\ No newline at end of file
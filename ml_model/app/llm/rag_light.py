@@ -2,10 +2,14 @@
 """
 Système RAG avec nouvelle API ChromaDB (v0.4+)
 """
-import chromadb
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import logging
 from app.config import config
+from app.container import Dependency, lazy_instance
+from app.llm.bm25 import BM25Index, reciprocal_rank_fusion
+from app.llm.chunking import content_id
+from app.llm.embeddings_base import create_embedding_provider
+from app.utils.metrics import span
 
 logger = logging.getLogger(__name__)
 
@@ -14,14 +18,34 @@ class LightRAGSystem:
     Système RAG compatible avec ChromaDB v0.4+
     """
     
-    def __init__(self):
+    # Assemblage du contexte sous budget de tokens
+    context_builder = Dependency("context_builder")
+    
+    def __init__(self, embedding_provider: Optional[str] = None):
+        """
+        Args:
+            embedding_provider: Fournisseur d'embeddings (config.EMBEDDING_PROVIDER par défaut)
+        """
         self.client = None
         self.collection = None
+        # None: ChromaDB calcule les embeddings avec sa fonction par défaut
+        self.embedder = create_embedding_provider(embedding_provider)
+        # Index BM25 construit au premier besoin à partir de la collection
+        self.lexical: Optional[BM25Index] = None
         self._init_rag()
     
+    @property
+    def collection_name(self) -> str:
+        """Une collection par fournisseur: les dimensions des vecteurs diffèrent"""
+        if self.embedder is None:
+            return "pharma_drugs_v2"
+        return f"pharma_drugs_v2_{self.embedder.name}"
+    
     def _init_rag(self):
         """Initialise avec la NOUVELLE API ChromaDB"""
         try:
+            import chromadb
+            
             # NOUVELLE SYNTAXE - PersistentClient au lieu de Client
             self.client = chromadb.PersistentClient(
                 path=config.CHROMA_PERSIST_DIR
@@ -29,24 +53,85 @@ class LightRAGSystem:
             
             # Créer ou récupérer la collection
             self.collection = self.client.get_or_create_collection(
-                name="pharma_drugs_v2",
+                name=self.collection_name,
                 metadata={
                     "description": "Base médicaments Pharma Assistant",
                     "version": "2.0",
-                    "rag_mode": "light"
+                    "rag_mode": "light",
+                    "embedding_provider": self.embedder.name if self.embedder else "chroma"
                 }
             )
             
-            logger.info(f"✅ RAG v2 initialisé - Documents: {self.collection.count()}")
+            logger.info(f"✅ RAG v2 initialisé ({self.collection_name}) - Documents: {self.collection.count()}")
             
         except Exception as e:
             logger.error(f"❌ Erreur initialisation RAG: {str(e)}")
             # Mode dégradé
             self.collection = None
     
+    async def _write_documents(self, documents: List[Dict], update_metadata: bool) -> Tuple[int, int]:
+        """
+        Écrit des documents sous des ids dérivés de leur contenu
+        
+        Seuls les contenus absents de la collection sont embeddés; les
+        contenus déjà présents sont ignorés ou voient seulement leurs
+        métadonnées mises à jour (sans nouvel embedding).
+        
+        Returns:
+            (documents ajoutés, documents déjà présents)
+        """
+        # Déduplication dans le lot (même contenu -> même id)
+        unique: Dict[str, Dict] = {}
+        for doc in documents:
+            text = doc.get("text", "")
+            if text.strip():
+                unique[content_id(text)] = doc
+        if not unique:
+            return 0, 0
+        
+        ids = list(unique)
+        existing = set(self.collection.get(ids=ids, include=[])["ids"])
+        new_ids = [doc_id for doc_id in ids if doc_id not in existing]
+        
+        embeddings = None
+        if new_ids and self.embedder is not None:
+            # Embeddings calculés par lot par le fournisseur configuré
+            vectors = await self.embedder.embed_documents([unique[doc_id]["text"] for doc_id in new_ids])
+            kept = [(doc_id, vector) for doc_id, vector in zip(new_ids, vectors) if vector is not None]
+            if len(kept) < len(new_ids):
+                logger.warning(f"⚠️  {len(new_ids) - len(kept)} documents sans embedding ignorés")
+            new_ids = [doc_id for doc_id, _ in kept]
+            embeddings = [vector for _, vector in kept]
+        
+        with span("vector_store_write"):
+            if new_ids:
+                # Sans fournisseur: fonction d'embedding par défaut de ChromaDB
+                self.collection.add(
+                    ids=new_ids,
+                    documents=[unique[doc_id]["text"] for doc_id in new_ids],
+                    metadatas=[unique[doc_id].get("metadata") or None for doc_id in new_ids],
+                    embeddings=embeddings
+                )
+                if self.lexical is not None:
+                    for doc_id in new_ids:
+                        self.lexical.add(
+                            doc_id,
+                            unique[doc_id]["text"],
+                            (unique[doc_id].get("metadata") or {}).get("drug_name", "")
+                        )
+            
+            if existing and update_metadata:
+                kept_ids = [doc_id for doc_id in ids if doc_id in existing]
+                self.collection.update(
+                    ids=kept_ids,
+                    metadatas=[unique[doc_id].get("metadata") or None for doc_id in kept_ids]
+                )
+        
+        return len(new_ids), len(existing)
+    
     async def add_documents(self, documents: List[Dict]):
         """
-        Ajoute des documents (version simplifiée)
+        Ajoute des documents (idempotent: un contenu déjà indexé est ignoré)
         """
         if not self.collection:
             logger.warning("RAG non initialisé - skip add_documents")
@@ -56,87 +141,342 @@ class LightRAGSystem:
             return
         
         try:
-            # Préparer les données
-            ids = []
-            texts = []
-            metadatas = []
-            
-            for i, doc in enumerate(documents):
-                doc_id = f"doc_{i}_{hash(doc.get('text', '')) % 10000}"
-                ids.append(doc_id)
-                texts.append(doc.get("text", ""))
-                metadatas.append(doc.get("metadata", {}))
-            
-            # Ajouter avec embeddings par défaut de ChromaDB
-            self.collection.add(
-                documents=texts,
-                metadatas=metadatas,
-                ids=ids
-            )
-            
-            logger.info(f"📚 {len(documents)} documents ajoutés")
+            added, skipped = await self._write_documents(documents, update_metadata=False)
+            logger.info(f"📚 {added} documents ajoutés ({skipped} déjà présents)")
             
         except Exception as e:
             logger.error(f"❌ Erreur ajout: {str(e)}")
     
-    async def search_similar(self, query: str, n_results: int = 5) -> List[Dict]:
+    async def upsert_documents(self, documents: List[Dict]):
+        """
+        Insère ou met à jour des chunks SPL (ingestion)
+        
+        Les chunks inchangés ne sont pas ré-embeddés; les chunks des
+        anciennes versions d'un même set id sont supprimés.
+        Contrairement à add_documents, les erreurs sont propagées pour que
+        l'appelant ne marque pas le lot comme traité.
+        """
+        if not self.collection:
+            raise RuntimeError("RAG non initialisé")
+        
+        if not documents:
+            return
+        
+        await self._write_documents(documents, update_metadata=True)
+        
+        versions = {
+            (doc["metadata"]["set_id"], doc["metadata"]["version"])
+            for doc in documents
+            if doc.get("metadata", {}).get("set_id")
+        }
+        with span("vector_store_write"):
+            for set_id, version in versions:
+                stale = self.collection.get(
+                    where={"$and": [{"set_id": set_id}, {"version": {"$ne": version}}]},
+                    include=[]
+                )["ids"]
+                if stale:
+                    self.collection.delete(ids=stale)
+                    if self.lexical is not None:
+                        self.lexical.remove(stale)
+    
+    async def search_similar(
+        self,
+        query: str,
+        n_results: int = 5,
+        where: Optional[Dict] = None
+    ) -> List[Dict]:
         """
         Recherche simplifiée
+        
+        Args:
+            where: Filtre sur les métadonnées (syntaxe ChromaDB, ex: {"section": "dosage"})
+        """
+        results = await self.search_similar_batch([query], n_results, where)
+        return results[0] if results else []
+    
+    def _ensure_lexical(self) -> BM25Index:
+        """Construit l'index BM25 à partir de la collection (une seule fois)"""
+        if self.lexical is None:
+            self.lexical = self._build_lexical(self.collection)
+        return self.lexical
+    
+    @staticmethod
+    def _build_lexical(collection) -> BM25Index:
+        lexical = BM25Index()
+        offset = 0
+        while True:
+            page = collection.get(include=["documents", "metadatas"], limit=5000, offset=offset)
+            if not page["ids"]:
+                break
+            for doc_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                lexical.add(doc_id, text or "", (metadata or {}).get("drug_name", ""))
+            offset += len(page["ids"])
+        logger.info(f"✅ Index BM25 construit - {len(lexical)} documents")
+        return lexical
+    
+    def _lexical_results(
+        self,
+        ranked: List[Tuple[str, float]],
+        match: str,
+        top_score: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Résultats au format search_similar pour des ids issus de l'index BM25
+
+        Pertinence: score BM25 relatif au meilleur score de la requête.
         """
-        if not self.collection or self.collection.count() == 0:
+        if not ranked:
             return []
+        found = self.collection.get(ids=[doc_id for doc_id, _ in ranked], include=["documents", "metadatas"])
+        by_id = dict(zip(found["ids"], zip(found["documents"], found["metadatas"])))
+        top_score = top_score or max(score for _, score in ranked) or 1.0
+        results = []
+        for doc_id, score in ranked:
+            if doc_id not in by_id:
+                continue
+            text, metadata = by_id[doc_id]
+            relevance = score / top_score
+            results.append({
+                "id": doc_id,
+                "text": text,
+                "metadata": metadata or {},
+                "distance": 2.0 * (1.0 - relevance),
+                "relevance": relevance,
+                "match": match
+            })
+        return results
+    
+    async def search_similar_batch(
+        self,
+        queries: List[str],
+        n_results: int = 5,
+        where: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """
+        Recherche hybride de plusieurs requêtes
+        
+        Une requête réduite à un nom de médicament indexé (plus dosage ou
+        forme: "amoxicillin 500 mg") est résolue par l'index BM25 seul,
+        restreint à ce médicament. Les autres combinent recherche vectorielle
+        et BM25 par fusion des rangs réciproques; si elles commencent par un
+        nom indexé ("warfarin and aspirin together?"), le classement BM25
+        restreint à ce médicament s'ajoute à la fusion: ses chunks sont
+        favorisés sans écarter ceux des autres médicaments cités.
+        Avec un filtre `where`, recherche vectorielle seule.
+        
+        Returns:
+            Une liste de résultats par requête
+        """
+        if not config.HYBRID_SEARCH_ENABLED or where is not None:
+            return await self._vector_search_batch(queries, n_results, where)
+        if not queries or not self.collection or self.collection.count() == 0:
+            return [[] for _ in queries]
         
         try:
-            # ChromaDB utilise ses embeddings par défaut
+            lexical = self._ensure_lexical()
+        except Exception as e:
+            logger.error(f"❌ Index BM25 indisponible: {str(e)}")
+            return await self._vector_search_batch(queries, n_results, where)
+        
+        batch: List[Optional[List[Dict]]] = [None] * len(queries)
+        pending = []
+        for i, query in enumerate(queries):
+            name = lexical.match_name(query, exact=True)
+            if name is not None:
+                batch[i] = self._lexical_results(lexical.search(query, n_results, name=name), "exact_name")
+            else:
+                pending.append(i)
+        
+        if pending:
+            candidates = n_results * config.HYBRID_CANDIDATES_FACTOR
+            vector_batch = await self._vector_search_batch([queries[i] for i in pending], candidates)
+            for i, vector_results in zip(pending, vector_batch):
+                lexical_ranked = lexical.search(queries[i], candidates)
+                rankings = [[r["id"] for r in vector_results], [doc_id for doc_id, _ in lexical_ranked]]
+                # Mêmes idf et normalisation: scores restreints et globaux sont comparables
+                lexical_scores = dict(lexical_ranked)
+                name = lexical.match_name(queries[i])
+                if name is not None:
+                    name_ranked = lexical.search(queries[i], candidates, name=name)
+                    rankings.append([doc_id for doc_id, _ in name_ranked])
+                    lexical_scores.update(name_ranked)
+                fused = reciprocal_rank_fusion(rankings, k=config.RRF_K)[:n_results]
+                
+                # Pertinence: cosinus si trouvé par les vecteurs, sinon BM25 relatif au meilleur score
+                by_id = {r["id"]: {**r, "match": "vector"} for r in vector_results}
+                lexical_only = [
+                    (doc_id, lexical_scores[doc_id]) for doc_id, _ in fused
+                    if doc_id in lexical_scores and doc_id not in by_id
+                ]
+                top_score = max(lexical_scores.values()) if lexical_scores else None
+                for r in self._lexical_results(lexical_only, "lexical", top_score):
+                    by_id[r["id"]] = r
+                batch[i] = [by_id[doc_id] for doc_id, _ in fused if doc_id in by_id]
+        
+        return batch
+    
+    async def _vector_search_batch(
+        self,
+        queries: List[str],
+        n_results: int = 5,
+        where: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """Recherche vectorielle seule, plusieurs requêtes en un appel à l'index"""
+        if not queries or not self.collection or self.collection.count() == 0:
+            return [[] for _ in queries]
+        
+        try:
+            if self.embedder is None:
+                # ChromaDB utilise ses embeddings par défaut
+                query_args = {"query_texts": queries}
+            else:
+                embeddings = await self.embedder.embed_documents(queries)
+                if any(embedding is None for embedding in embeddings):
+                    return [[] for _ in queries]
+                query_args = {"query_embeddings": embeddings}
+            
             results = self.collection.query(
-                query_texts=[query],
                 n_results=n_results,
-                include=["documents", "metadatas", "distances"]
+                where=where,
+                include=["documents", "metadatas", "distances"],
+                **query_args
             )
             
-            formatted = []
-            if results and results.get("documents"):
-                for i in range(len(results["documents"][0])):
-                    formatted.append({
-                        "text": results["documents"][0][i],
-                        "metadata": results["metadatas"][0][i] if results.get("metadatas") else {},
-                        "distance": results["distances"][0][i] if results.get("distances") else 0,
-                        "relevance": 1.0 - (results["distances"][0][i] / 2.0 if results.get("distances") else 0)
-                    })
+            batch = []
+            for q in range(len(queries)):
+                formatted = []
+                if results and results.get("documents"):
+                    for i in range(len(results["documents"][q])):
+                        formatted.append({
+                            "id": results["ids"][q][i],
+                            "text": results["documents"][q][i],
+                            "metadata": results["metadatas"][q][i] if results.get("metadatas") else {},
+                            "distance": results["distances"][q][i] if results.get("distances") else 0,
+                            "relevance": 1.0 - (results["distances"][q][i] / 2.0 if results.get("distances") else 0)
+                        })
+                batch.append(formatted)
             
-            return formatted
+            return batch
             
         except Exception as e:
             logger.error(f"❌ Recherche échouée: {str(e)}")
-            return []
+            return [[] for _ in queries]
     
-    async def get_drug_context(self, drug_name: str, max_context: int = 3) -> str:
+    async def get_drug_context(self, drug_name: str, max_context: Optional[int] = None) -> str:
         """
         Récupère le contexte pour un médicament
         """
-        results = await self.search_similar(drug_name, n_results=max_context)
+        context, _ = await self.get_drug_context_with_sources(drug_name, max_context)
+        return context
+    
+    async def get_drug_context_with_sources(
+        self,
+        drug_name: str,
+        max_context: Optional[int] = None
+    ) -> Tuple[str, List[Dict]]:
+        """
+        Récupère le contexte et la liste des sources utilisées
+        
+        Args:
+            max_context: Nombre maximum de chunks (None = budget de tokens seul)
+        
+        Returns:
+            (contexte, sources) - sources vide si aucun résultat pertinent
+        """
+        with span("retrieval"):
+            results = await self.search_similar(drug_name, n_results=self._candidates(max_context))
+        return self._format_context(drug_name, results, max_context)
+    
+    async def get_drug_contexts_with_sources(
+        self,
+        drug_names: List[str],
+        max_context: Optional[int] = None
+    ) -> Dict[str, Tuple[str, List[Dict]]]:
+        """
+        Variante en lot: une seule recherche (un appel d'embeddings) pour les noms uniques
         
+        Returns:
+            {nom: (contexte, sources)}
+        """
+        unique = list(dict.fromkeys(drug_names))
+        with span("retrieval"):
+            results = await self.search_similar_batch(unique, n_results=self._candidates(max_context))
+        return {
+            name: self._format_context(name, found, max_context)
+            for name, found in zip(unique, results)
+        }
+    
+    def _candidates(self, max_context: Optional[int]) -> int:
+        """Résultats demandés à la recherche: le budget de tokens fait la sélection finale"""
+        return max(config.CONTEXT_CANDIDATES, max_context or 0)
+    
+    def _format_context(
+        self,
+        drug_name: str,
+        results: List[Dict],
+        max_context: Optional[int]
+    ) -> Tuple[str, List[Dict]]:
         if not results:
-            return f"Aucune information locale pour: {drug_name}"
+            return f"Aucune information locale pour: {drug_name}", []
         
         # Filtrer par pertinence
         good_results = [r for r in results if r.get("relevance", 0) > 0.3]
         
         if not good_results:
-            return f"Informations locales peu pertinentes pour: {drug_name}"
+            return f"Informations locales peu pertinentes pour: {drug_name}", []
         
-        # Construire le contexte
-        context_parts = []
-        for i, result in enumerate(good_results[:max_context]):
-            context_parts.append(
-                f"[Source {i+1}]\n{result['text'][:500]}..."
+        # Meilleurs chunks dans le budget de tokens, quasi-doublons écartés
+        with span("prompt_build"):
+            packed = self.context_builder.build(good_results, max_chunks=max_context)
+        if packed["duplicates"] or packed["over_budget"]:
+            logger.debug(
+                f"Contexte {drug_name}: {len(packed['selected'])} chunks, {packed['tokens']} tokens "
+                f"({packed['duplicates']} doublons, {packed['over_budget']} hors budget)"
             )
         
-        return "\n\n---\n\n".join(context_parts)
+        sources = []
+        for i, result in enumerate(packed["selected"]):
+            metadata = result.get("metadata") or {}
+            sources.append({
+                "index": i + 1,
+                "drug_name": metadata.get("drug_name") or metadata.get("name", ""),
+                "section": metadata.get("section", ""),
+                "set_id": metadata.get("set_id", ""),
+                "version": metadata.get("version", ""),
+                "source": metadata.get("source", ""),
+                "relevance": round(result.get("relevance", 0), 3)
+            })
+        
+        return packed["text"], sources
     
     def is_ready(self) -> bool:
         """Vérifie si le RAG est prêt"""
         return self.collection is not None
+    
+    def warmup(self):
+        """Précharge l'index BM25 (sinon construit à la première recherche hybride)"""
+        if config.HYBRID_SEARCH_ENABLED and self.collection is not None:
+            self._ensure_lexical()
+
+def create_rag_system(read_only: Optional[bool] = None) -> LightRAGSystem:
+    """
+    RAG du backend vectoriel configuré (config.VECTOR_BACKEND)
+    
+    Args:
+        read_only: Génération publiée en lecture seule, écritures via le spool
+                   (par défaut: config.SERVING_MODE == "snapshot"). L'écrivain
+                   unique passe False pour ouvrir l'index maître.
+    """
+    if read_only is None:
+        read_only = config.SERVING_MODE == "snapshot"
+    if read_only:
+        from app.llm.rag_snapshot import SnapshotRAGSystem
+        return SnapshotRAGSystem()
+    if config.VECTOR_BACKEND == "numpy":
+        from app.llm.rag_numpy import NumpyRAGSystem
+        return NumpyRAGSystem()
+    return LightRAGSystem()
 
-# Instance globale
-light_rag = LightRAGSystem()
\ No newline at end of file
+# Instance globale (construite au premier accès, voir app.container)
+__getattr__ = lazy_instance(__name__, "light_rag", "rag")
\ No newline at end of file
@@ -0,0 +1,366 @@
+# app/llm/rag_numpy.py
+"""
+Index vectoriel NumPy en processus (alternative à ChromaDB)
+
+Les vecteurs normalisés sont stockés dans un fichier float32 memory-mappé;
+documents, métadonnées et suppressions (tombstones) dans SQLite. Une requête
+est un produit matriciel suivi d'un argpartition: jusqu'à ~20k chunks plus
+rapide qu'un aller-retour par ChromaDB, et bien plus rapide quelle que soit la
+taille dès qu'un filtre sur les métadonnées réduit les candidats. Au-delà,
+le parcours exhaustif est limité par la bande passante mémoire et l'index
+HNSW de ChromaDB reprend l'avantage (voir benchmarks/bench_vector_backends.py).
+
+NumpyCollection expose le sous-ensemble de l'API Collection de ChromaDB
+utilisé par LightRAGSystem; NumpyRAGSystem hérite donc de tout le reste
+(écriture idempotente, upsert par version, contexte et sources).
+Un seul processus écrivain par index; en service multi-workers, les workers
+lisent des générations publiées en lecture seule (voir rag_snapshot).
+"""
+import json
+import logging
+import os
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.config import config
+from app.llm.embeddings_base import create_embedding_provider
+from app.llm.rag_light import LightRAGSystem
+
+logger = logging.getLogger(__name__)
+
+
+class NumpyCollection:
+    """Collection de vecteurs: matrice memmap + tombstones + filtres sur métadonnées"""
+
+    def __init__(self, path: str, read_only: bool = False):
+        """
+        Args:
+            path: Dossier de l'index (vectors.f32 + documents.sqlite)
+            read_only: Index publié, jamais modifié (génération partagée entre workers):
+                       SQLite ouvert sans verrou puis fermé après chargement
+        """
+        self.path = path
+        self.read_only = read_only
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        db_path = os.path.join(path, "documents.sqlite")
+
+        if read_only:
+            if not os.path.exists(db_path):
+                raise FileNotFoundError(f"Index absent: {db_path}")
+            self._db = sqlite3.connect(f"file:{db_path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+        else:
+            os.makedirs(path, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "row INTEGER PRIMARY KEY, id TEXT NOT NULL, document TEXT, metadata TEXT, deleted INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            self._db.commit()
+
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'dimension'").fetchone()
+        self.dimension: Optional[int] = int(row[0]) if row else None
+        self._load()
+        if read_only:
+            # Tout est en mémoire (documents) ou mappé (vecteurs): la base n'est plus lue
+            self.close()
+
+    def close(self):
+        self._db.close()
+
+    def _check_writable(self):
+        if self.read_only:
+            raise PermissionError(f"Index en lecture seule: {self.path}")
+
+    # ------------------------------------------------------------------
+    # Chargement / état en mémoire
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        """Charge documents et métadonnées; les vecteurs restent sur disque (memmap)"""
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Optional[Dict]] = []
+        alive = []
+        for doc_id, document, metadata, deleted in self._db.execute(
+            "SELECT id, document, metadata, deleted FROM documents ORDER BY row"
+        ):
+            self._ids.append(doc_id)
+            self._documents.append(document)
+            self._metadatas.append(json.loads(metadata) if metadata else None)
+            alive.append(not deleted)
+
+        self._alive = np.array(alive, dtype=bool)
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(self._ids) if self._alive[row]}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._remap()
+
+    def _remap(self):
+        """(Re)mappe les lignes validées du fichier de vecteurs"""
+        rows = len(self._ids)
+        if rows and self.dimension:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dimension))
+        else:
+            self._matrix = np.zeros((0, self.dimension or 0), dtype=np.float32)
+
+    def _column(self, key: str) -> np.ndarray:
+        """Valeurs d'une clé de métadonnée pour toutes les lignes (pour les filtres)"""
+        if key not in self._columns:
+            values = np.empty(len(self._metadatas), dtype=object)
+            values[:] = [(metadata or {}).get(key) for metadata in self._metadatas]
+            self._columns[key] = values
+        return self._columns[key]
+
+    def _mask(self, where: Optional[Dict]) -> np.ndarray:
+        """Masque des lignes vivantes satisfaisant un filtre au format ChromaDB"""
+        mask = self._alive.copy()
+        if where:
+            mask &= self._match(where)
+        return mask
+
+    def _match(self, where: Dict) -> np.ndarray:
+        mask = np.ones(len(self._ids), dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._match(clause)
+            elif key == "$or":
+                any_mask = np.zeros(len(self._ids), dtype=bool)
+                for clause in condition:
+                    any_mask |= self._match(clause)
+                mask &= any_mask
+            else:
+                column = self._column(key)
+                if not isinstance(condition, dict):
+                    condition = {"$eq": condition}
+                for op, value in condition.items():
+                    if op == "$eq":
+                        mask &= column == value
+                    elif op == "$ne":
+                        mask &= column != value
+                    elif op == "$in":
+                        mask &= np.isin(column, list(value))
+                    elif op == "$nin":
+                        mask &= ~np.isin(column, list(value))
+                    else:
+                        raise ValueError(f"Opérateur de filtre non supporté: {op}")
+        return mask
+
+    # ------------------------------------------------------------------
+    # API compatible ChromaDB (sous-ensemble utilisé par LightRAGSystem)
+    # ------------------------------------------------------------------
+
+    def count(self) -> int:
+        return len(self._id_to_row)
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        include=("documents", "metadatas")
+    ) -> Dict[str, Any]:
+        if ids is not None:
+            rows = [self._id_to_row[doc_id] for doc_id in ids if doc_id in self._id_to_row]
+        else:
+            rows = np.flatnonzero(self._mask(where)).tolist()
+        rows = rows[offset:offset + limit] if limit is not None else rows[offset:]
+        result: Dict[str, Any] = {"ids": [self._ids[row] for row in rows]}
+        if "documents" in include:
+            result["documents"] = [self._documents[row] for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self._metadatas[row] for row in rows]
+        if "embeddings" in include:
+            result["embeddings"] = np.array(self._matrix[rows]) if rows else []
+        return result
+
+    def add(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: Optional[List[Optional[Dict]]] = None,
+        embeddings: Optional[List[List[float]]] = None
+    ):
+        """Ajoute des documents (embeddings obligatoires, normalisés ici)"""
+        self._check_writable()
+        if embeddings is None:
+            raise ValueError("NumpyCollection nécessite des embeddings explicites")
+        if not ids:
+            return
+        metadatas = metadatas or [None] * len(ids)
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors /= norms
+
+        if self.dimension is None:
+            self.dimension = vectors.shape[1]
+            self._db.execute("INSERT INTO meta (name, value) VALUES ('dimension', ?)", (str(self.dimension),))
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(f"Dimension {vectors.shape[1]} incompatible avec l'index ({self.dimension})")
+
+        # Un id déjà vivant est remplacé (tombstone + nouvelle ligne)
+        replaced = [doc_id for doc_id in ids if doc_id in self._id_to_row]
+        if replaced:
+            self.delete(ids=replaced)
+
+        # Vecteurs écrits avant la validation SQLite: une ligne sans document est ignorée au chargement
+        first_row = len(self._ids)
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(first_row * self.dimension * 4)
+            f.write(vectors.tobytes())
+        self._db.executemany(
+            "INSERT INTO documents (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+            [
+                (first_row + i, doc_id, document, json.dumps(metadata, ensure_ascii=False) if metadata else None)
+                for i, (doc_id, document, metadata) in enumerate(zip(ids, documents, metadatas))
+            ]
+        )
+        self._db.commit()
+
+        for i, (doc_id, document, metadata) in enumerate(zip(ids, documents, metadatas)):
+            self._ids.append(doc_id)
+            self._documents.append(document)
+            self._metadatas.append(metadata)
+            self._id_to_row[doc_id] = first_row + i
+        self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+        self._columns.clear()
+        self._remap()
+
+    def update(self, ids: List[str], metadatas: List[Optional[Dict]]):
+        """Met à jour les métadonnées (le vecteur est conservé)"""
+        self._check_writable()
+        updates = [
+            (doc_id, metadata) for doc_id, metadata in zip(ids, metadatas) if doc_id in self._id_to_row
+        ]
+        self._db.executemany(
+            "UPDATE documents SET metadata = ? WHERE row = ?",
+            [
+                (json.dumps(metadata, ensure_ascii=False) if metadata else None, self._id_to_row[doc_id])
+                for doc_id, metadata in updates
+            ]
+        )
+        self._db.commit()
+        for doc_id, metadata in updates:
+            self._metadatas[self._id_to_row[doc_id]] = metadata
+        self._columns.clear()
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None):
+        """Suppression logique (tombstone); voir compact() pour récupérer l'espace"""
+        self._check_writable()
+        if ids is not None:
+            rows = [self._id_to_row[doc_id] for doc_id in ids if doc_id in self._id_to_row]
+        else:
+            rows = np.flatnonzero(self._mask(where)).tolist()
+        if not rows:
+            return
+        self._db.executemany("UPDATE documents SET deleted = 1 WHERE row = ?", [(row,) for row in rows])
+        self._db.commit()
+        for row in rows:
+            self._alive[row] = False
+            self._id_to_row.pop(self._ids[row], None)
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 10,
+        where: Optional[Dict] = None,
+        include=("documents", "metadatas", "distances")
+    ) -> Dict[str, List[List[Any]]]:
+        """
+        Top-k par similarité cosinus pour un lot de requêtes
+
+        Les distances suivent la convention L2² de ChromaDB sur vecteurs
+        normalisés (2 - 2·cos), pour que relevance = 1 - distance/2 reste valable.
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries /= norms
+
+        mask = self._mask(where)
+        candidates = np.flatnonzero(mask)
+        result: Dict[str, List[List[Any]]] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if not len(candidates):
+            for key in result:
+                result[key] = [[] for _ in queries]
+            return result
+
+        # Sans filtre sélectif, on évite de copier la matrice
+        if len(candidates) == len(self._ids):
+            scores = queries @ self._matrix.T
+        else:
+            scores = queries @ self._matrix[candidates].T
+
+        k = min(n_results, len(candidates))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        for positions, similarities in zip(top, top_scores):
+            rows = candidates[positions]
+            result["ids"].append([self._ids[row] for row in rows])
+            result["documents"].append([self._documents[row] for row in rows])
+            result["metadatas"].append([self._metadatas[row] for row in rows])
+            result["distances"].append([float(2.0 - 2.0 * sim) for sim in similarities])
+        return result
+
+    def compact(self):
+        """Réécrit l'index sans les lignes supprimées"""
+        self._check_writable()
+        live = np.flatnonzero(self._alive)
+        tmp_path = self.vectors_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for start in range(0, len(live), 10000):
+                f.write(np.ascontiguousarray(self._matrix[live[start:start + 10000]]).tobytes())
+
+        self._db.execute("BEGIN")
+        rows = self._db.execute(
+            "SELECT id, document, metadata FROM documents WHERE deleted = 0 ORDER BY row"
+        ).fetchall()
+        self._db.execute("DELETE FROM documents")
+        self._db.executemany(
+            "INSERT INTO documents (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+            [(i, *row) for i, row in enumerate(rows)]
+        )
+        self._matrix = None
+        os.replace(tmp_path, self.vectors_path)
+        self._db.commit()
+        self._load()
+        logger.info(f"✅ Index compacté - {len(rows)} documents")
+
+
+class NumpyRAGSystem(LightRAGSystem):
+    """RAG sur l'index NumPy (même contrat que LightRAGSystem)"""
+
+    def __init__(self, embedding_provider: Optional[str] = None, index_dir: Optional[str] = None):
+        """
+        Args:
+            embedding_provider: Fournisseur d'embeddings (config.EMBEDDING_PROVIDER par défaut)
+            index_dir: Dossier racine des index (config.VECTOR_INDEX_DIR par défaut)
+        """
+        self.index_dir = index_dir or config.VECTOR_INDEX_DIR
+        super().__init__(embedding_provider)
+        if self.embedder is None:
+            # L'index NumPy ne calcule pas d'embeddings: repli sur le fournisseur local
+            logger.warning("⚠️  Fournisseur 'chroma' incompatible avec l'index NumPy - utilisation de 'local'")
+            self.embedder = create_embedding_provider("local")
+            self._init_rag()
+
+    def _init_rag(self):
+        if self.embedder is None:
+            return
+        try:
+            self.collection = NumpyCollection(os.path.join(self.index_dir, self.collection_name))
+            logger.info(f"✅ RAG NumPy initialisé ({self.collection_name}) - Documents: {self.collection.count()}")
+        except Exception as e:
+            logger.error(f"❌ Erreur initialisation RAG NumPy: {str(e)}")
+            # Mode dégradé
+            self.collection = None
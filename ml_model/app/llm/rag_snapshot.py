@@ -0,0 +1,351 @@
+# app/llm/rag_snapshot.py
+"""
+Service multi-workers: index partagé en lecture seule, écrivain unique
+
+Un seul processus (app.ingestion.snapshot_writer) écrit dans l'index maître
+(ChromaDB ou NumPy) et publie périodiquement une génération immuable:
+
+    VECTOR_SNAPSHOT_DIR/<collection>/gen-000042/  vectors.f32 + documents.sqlite
+    VECTOR_SNAPSHOT_DIR/<collection>/CURRENT      nom de la génération courante
+
+Les workers uvicorn mappent la génération courante (les pages de la matrice
+sont partagées par le cache du noyau) et passent à la suivante sans
+redémarrer: CURRENT est relu au plus toutes les
+config.VECTOR_SNAPSHOT_POLL_INTERVAL secondes, la nouvelle génération est
+chargée hors de la boucle puis substituée d'un bloc. Aucun worker n'ouvre
+de client Chroma ni n'écrit dans l'index: add_documents et upsert_documents
+déposent les lots dans un spool sur disque, appliqué par l'écrivain.
+Un worker retrouve ses propres dépôts (par nom de médicament) en attendant
+leur publication.
+"""
+import asyncio
+import glob
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from app.config import config
+from app.llm.bm25 import BM25Index
+from app.llm.chunking import content_id
+from app.llm.rag_numpy import NumpyCollection, NumpyRAGSystem
+from app.utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+GENERATION_PREFIX = "gen-"
+
+# Au-delà de ce nombre de chunks modifiés, l'index BM25 est reconstruit plutôt que mis à jour
+LEXICAL_DELTA_MAX = 1000
+
+
+def current_generation(root: str) -> Optional[str]:
+    """Nom de la génération publiée courante (None si aucune)"""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _generation_number(name: Optional[str]) -> int:
+    try:
+        return int(name[len(GENERATION_PREFIX):])
+    except (TypeError, ValueError):
+        return 0
+
+
+def publish_snapshot(collection, root: str, keep: Optional[int] = None, page_size: int = 5000) -> str:
+    """
+    Publie une génération immuable à partir d'une collection (ChromaDB ou NumPy)
+
+    Les vecteurs sont recopiés tels quels (normalisés), sans nouvel embedding.
+    La génération est écrite dans un dossier temporaire puis renommée, et
+    CURRENT n'est remplacé qu'ensuite (os.replace, atomique): un worker ne
+    voit jamais une génération partielle.
+
+    Coût: copie complète de la collection à chaque publication (lecture de
+    tous les vecteurs et documents, écriture d'autant sur disque), quel que
+    soit le nombre de chunks modifiés. L'écrivain espace donc ses
+    publications (config.VECTOR_SNAPSHOT_MIN_INTERVAL) et regroupe les lots
+    appliqués entre deux générations.
+
+    Args:
+        keep: Générations conservées (config.VECTOR_SNAPSHOT_KEEP par défaut);
+              les plus anciennes sont supprimées
+
+    Returns:
+        Nom de la nouvelle génération
+    """
+    os.makedirs(root, exist_ok=True)
+    generation = f"{GENERATION_PREFIX}{_generation_number(current_generation(root)) + 1:06d}"
+    tmp_dir = os.path.join(root, generation + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    target = NumpyCollection(tmp_dir)
+    offset = 0
+    while True:
+        page = collection.get(include=["documents", "metadatas", "embeddings"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        target.add(
+            ids=page["ids"],
+            documents=page["documents"],
+            metadatas=page["metadatas"],
+            embeddings=page["embeddings"]
+        )
+        offset += len(page["ids"])
+    count = target.count()
+    target.close()
+
+    os.replace(tmp_dir, os.path.join(root, generation))
+    tmp_current = os.path.join(root, CURRENT_FILE + ".tmp")
+    with open(tmp_current, "w", encoding="utf-8") as f:
+        f.write(generation)
+    os.replace(tmp_current, os.path.join(root, CURRENT_FILE))
+    logger.info(f"✅ Génération {generation} publiée - {count} documents")
+
+    _prune_generations(root, generation, keep or config.VECTOR_SNAPSHOT_KEEP)
+    return generation
+
+
+def _prune_generations(root: str, current: str, keep: int):
+    """Supprime les générations les plus anciennes (jamais la courante)"""
+    generations = sorted(
+        name for name in os.listdir(root)
+        if name.startswith(GENERATION_PREFIX) and not name.endswith(".tmp")
+    )
+    for name in generations[:-max(1, keep)]:
+        if name == current:
+            continue
+        try:
+            shutil.rmtree(os.path.join(root, name))
+        except OSError as e:
+            # Windows: fichier encore mappé par un worker, nouvel essai à la prochaine publication
+            logger.warning(f"⚠️  Génération {name} non supprimée: {str(e)}")
+
+
+class IngestionSpool:
+    """File d'attente sur disque des documents à indexer (un fichier JSON par lot)"""
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Args:
+            directory: Dossier du spool (config.INGESTION_SPOOL_DIR par défaut)
+        """
+        self.directory = directory or config.INGESTION_SPOOL_DIR
+        os.makedirs(self.directory, exist_ok=True)
+        self.submitted = 0
+
+    @timed("vector_store_write")
+    def submit(self, documents: List[Dict]) -> str:
+        """
+        Dépose un lot (écriture dans un fichier temporaire puis renommage atomique)
+
+        Returns:
+            Chemin du lot; les noms sont ordonnés par date de dépôt
+        """
+        name = f"{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+        path = os.path.join(self.directory, name)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"submitted_at": time.time(), "documents": documents}, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+        self.submitted += 1
+        return path
+
+    def pending(self) -> List[str]:
+        """Lots en attente, du plus ancien au plus récent"""
+        return sorted(glob.glob(os.path.join(self.directory, "*.json")))
+
+    def read(self, path: str) -> List[Dict]:
+        """Documents d'un lot (ValueError si le fichier est illisible)"""
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["documents"]
+
+    def remove(self, path: str):
+        os.remove(path)
+
+    def reject(self, path: str):
+        """Écarte un lot illisible (conservé pour analyse, plus jamais relu)"""
+        os.replace(path, path + ".rejected")
+
+    def __len__(self) -> int:
+        return len(self.pending())
+
+
+class SnapshotRAGSystem(NumpyRAGSystem):
+    """RAG d'un worker: génération publiée en lecture seule, écritures vers le spool"""
+
+    def __init__(
+        self,
+        embedding_provider: Optional[str] = None,
+        snapshot_dir: Optional[str] = None,
+        spool: Optional[IngestionSpool] = None,
+        poll_interval: Optional[float] = None
+    ):
+        """
+        Args:
+            embedding_provider: Doit être celui de l'écrivain (la collection en dépend)
+            snapshot_dir: Racine des générations (config.VECTOR_SNAPSHOT_DIR par défaut)
+            spool: Spool des écritures (config.INGESTION_SPOOL_DIR par défaut)
+            poll_interval: Intervalle minimal entre deux lectures de CURRENT, en secondes
+        """
+        self.snapshot_dir = snapshot_dir or config.VECTOR_SNAPSHOT_DIR
+        self.spool = spool if spool is not None else IngestionSpool()
+        self.poll_interval = poll_interval if poll_interval is not None else config.VECTOR_SNAPSHOT_POLL_INTERVAL
+        self.generation: Optional[str] = None
+        self.reloads = 0
+        # Documents déposés par ce worker, pas encore publiés (id de contenu -> document)
+        self.pending: Dict[str, Dict] = {}
+        self._checked_at = time.monotonic()
+        # Chargement de génération en cours (référence conservée jusqu'à la fin)
+        self._reload_task: Optional[asyncio.Task] = None
+        super().__init__(embedding_provider)
+
+    @property
+    def root(self) -> str:
+        return os.path.join(self.snapshot_dir, self.collection_name)
+
+    def _init_rag(self):
+        if self.embedder is None:
+            return
+        generation = current_generation(self.root)
+        if generation is None:
+            logger.warning(f"⚠️  Aucune génération publiée dans {self.root} (lancer app.ingestion.snapshot_writer)")
+            self.collection = None
+            return
+        try:
+            self._install(generation, NumpyCollection(os.path.join(self.root, generation), read_only=True))
+        except Exception as e:
+            logger.error(f"❌ Erreur chargement génération {generation}: {str(e)}")
+            # Mode dégradé
+            self.collection = None
+
+    def _open_generation(self, generation: str) -> Tuple[NumpyCollection, Optional[BM25Index], Optional[Tuple]]:
+        """
+        Charge une génération (hors de la boucle)
+
+        L'index BM25 déjà construit est mis à jour par différence si la
+        génération diffère peu de la courante (cas courant: quelques lots du
+        spool), sinon reconstruit ici.
+
+        Returns:
+            (collection, index BM25 reconstruit ou None, différence (ajouts, suppressions) ou None)
+        """
+        collection = NumpyCollection(os.path.join(self.root, generation), read_only=True)
+        if self.lexical is None or self.collection is None:
+            return collection, None, None
+        old_ids = set(self.collection.get(include=[])["ids"])
+        new_ids = collection.get(include=[])["ids"]
+        added = [doc_id for doc_id in new_ids if doc_id not in old_ids]
+        removed = list(old_ids.difference(new_ids))
+        if len(added) + len(removed) > LEXICAL_DELTA_MAX:
+            return collection, self._build_lexical(collection), None
+        return collection, None, (collection.get(ids=added, include=["documents", "metadatas"]), removed)
+
+    def _install(
+        self,
+        generation: str,
+        collection: NumpyCollection,
+        lexical: Optional[BM25Index] = None,
+        delta: Optional[Tuple] = None
+    ):
+        """Substitue la génération servie (dans la boucle) et oublie les dépôts qu'elle contient"""
+        if delta is not None and self.lexical is not None:
+            added, removed = delta
+            self.lexical.remove(removed)
+            for doc_id, text, metadata in zip(added["ids"], added["documents"], added["metadatas"]):
+                self.lexical.add(doc_id, text or "", (metadata or {}).get("drug_name", ""))
+            lexical = self.lexical
+        self.collection, self.lexical, self.generation = collection, lexical, generation
+        published = set(collection.get(ids=list(self.pending), include=[])["ids"]) if self.pending else set()
+        for doc_id in published:
+            del self.pending[doc_id]
+        logger.info(f"✅ Génération {generation} chargée - Documents: {collection.count()}")
+
+    def _refresh(self):
+        """Lance le chargement de la génération courante si elle a changé"""
+        now = time.monotonic()
+        if self._reload_task is not None or now - self._checked_at < self.poll_interval:
+            return
+        self._checked_at = now
+        generation = current_generation(self.root)
+        if generation is not None and generation != self.generation:
+            self._reload_task = asyncio.ensure_future(self._reload(generation))
+
+    async def _reload(self, generation: str):
+        try:
+            # Ancienne génération servie pendant le chargement
+            self._install(generation, *await asyncio.to_thread(self._open_generation, generation))
+            self.reloads += 1
+        except Exception as e:
+            logger.error(f"❌ Erreur chargement génération {generation}: {str(e)}")
+        finally:
+            self._reload_task = None
+
+    async def search_similar_batch(
+        self,
+        queries: List[str],
+        n_results: int = 5,
+        where: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        self._refresh()
+        results = await super().search_similar_batch(queries, n_results, where)
+        if self.pending and where is None:
+            # Dépôts de ce worker en tête: correspondance de nom exacte
+            results = [
+                (self._pending_results(query, n_results) + found)[:n_results]
+                for query, found in zip(queries, results)
+            ]
+        return results
+
+    def _pending_results(self, query: str, n_results: int) -> List[Dict]:
+        """Documents déposés par ce worker dont le médicament figure dans la requête"""
+        query = query.lower()
+        results = []
+        for doc_id, doc in self.pending.items():
+            drug_name = (doc.get("metadata") or {}).get("drug_name", "").lower()
+            if drug_name and (drug_name in query or query in drug_name):
+                results.append({
+                    "id": doc_id,
+                    "text": doc["text"],
+                    "metadata": doc.get("metadata") or {},
+                    "distance": 0.0,
+                    "relevance": 1.0,
+                    "match": "pending"
+                })
+        return results[:n_results]
+
+    async def add_documents(self, documents: List[Dict]):
+        """Dépose les documents absents de la génération servie dans le spool"""
+        unique = {content_id(doc["text"]): doc for doc in documents if doc.get("text", "").strip()}
+        if self.collection is not None and unique:
+            for doc_id in self.collection.get(ids=list(unique), include=[])["ids"]:
+                del unique[doc_id]
+        new = {doc_id: doc for doc_id, doc in unique.items() if doc_id not in self.pending}
+        if not new:
+            return
+        try:
+            self.spool.submit(list(new.values()))
+            self.pending.update(new)
+            logger.info(f"📥 {len(new)} documents en attente d'ingestion")
+        except Exception as e:
+            logger.error(f"❌ Erreur dépôt spool: {str(e)}")
+
+    async def upsert_documents(self, documents: List[Dict]):
+        """Dépose un lot d'ingestion dans le spool (erreurs propagées)"""
+        if documents:
+            self.spool.submit(documents)
+
+    def stats(self) -> Dict:
+        return {
+            "generation": self.generation,
+            "documents": self.collection.count() if self.collection is not None else 0,
+            "reloads": self.reloads,
+            "pending": len(self.pending),
+            "submitted": self.spool.submitted
+        }
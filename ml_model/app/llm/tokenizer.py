@@ -0,0 +1,90 @@
+# app/llm/tokenizer.py
+"""
+Comptage et découpage en tokens
+
+Utilise le tokenizer du modèle (tiktoken) s'il est installé, sinon une
+approximation par mots/ponctuation suffisante pour borner les tailles.
+"""
+import logging
+import re
+from typing import List, Tuple
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+# Approximation: un mot ou un signe de ponctuation ~ un token
+_APPROX_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+class Tokenizer:
+    """Tokenizer du modèle LLM avec repli sans dépendance"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self._encoding = None
+        self._loaded = False
+
+    def _get_encoding(self):
+        if not self._loaded:
+            self._loaded = True
+            try:
+                import tiktoken
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.info(f"tiktoken indisponible, comptage approximatif des tokens ({str(e)})")
+                self._encoding = None
+        return self._encoding
+
+    @property
+    def exact(self) -> bool:
+        """True si le comptage utilise le vrai tokenizer du modèle"""
+        return self._get_encoding() is not None
+
+    def count(self, text: str) -> int:
+        """Nombre de tokens d'un texte"""
+        if not text:
+            return 0
+        encoding = self._get_encoding()
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+        return sum(1 for _ in _APPROX_TOKEN_RE.finditer(text))
+
+    def windows(self, text: str, max_tokens: int, overlap: int = 0) -> List[str]:
+        """
+        Découpe un texte en fenêtres d'au plus `max_tokens` tokens qui se chevauchent
+
+        Args:
+            text: Texte à découper
+            max_tokens: Taille maximale d'une fenêtre
+            overlap: Nombre de tokens repris de la fenêtre précédente
+        """
+        if not text:
+            return []
+        overlap = max(0, min(overlap, max_tokens - 1))
+        stride = max_tokens - overlap
+
+        encoding = self._get_encoding()
+        if encoding is not None:
+            tokens = encoding.encode(text, disallowed_special=())
+            return [
+                encoding.decode(tokens[start:start + max_tokens]).strip()
+                for start in range(0, max(len(tokens) - overlap, 1), stride)
+            ]
+
+        # Repli: fenêtres sur les positions des tokens approximatifs dans le texte d'origine
+        spans: List[Tuple[int, int]] = [m.span() for m in _APPROX_TOKEN_RE.finditer(text)]
+        if not spans:
+            return []
+        chunks = []
+        for start in range(0, max(len(spans) - overlap, 1), stride):
+            window = spans[start:start + max_tokens]
+            chunks.append(text[window[0][0]:window[-1][1]])
+        return chunks
+
+
+# Instance globale
+tokenizer = Tokenizer(config.OPENAI_MODEL)
@@ -1,13 +1,20 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import uvicorn
-from typing import List, Dict, Optional
+import asyncio
+import time
+from typing import AsyncIterator, List, Dict, Optional
 import logging
 
 from app.config import config
+from app.container import container, resolve_dependencies
 from app.services.drug_service import DrugService
-from app.services.interaction_service import InteractionService
+from app.services.health_monitor import health_monitor
+from app.services.interaction_service import interaction_service
+from app.utils.fanout import in_order
+from app.utils.metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from app.utils.streaming import event_stream_response
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
@@ -28,17 +35,90 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Durée des requêtes et trace par étape (voir /metrics)
+app.add_middleware(MetricsMiddleware)
 
-# Initialisation des services
+# Initialisation des services (dépendances construites au premier usage, voir app.container)
 drug_service = DrugService()
-interaction_service = InteractionService()
+
+async def _services_ready():
+    """Dépendance des endpoints métier: services construits hors de la boucle d'événements"""
+    await resolve_dependencies(drug_service)
+    await resolve_dependencies(interaction_service)
+
+async def _start_health_monitor():
+    """Sondes des dépendances: /api/status lit leur dernier état en mémoire"""
+    # Le chargeur (client HTTP, cache SPL) est construit hors de la boucle, sans retarder le démarrage
+    loader = await asyncio.to_thread(container.get, "loader")
+    health_monitor.register("dailymed", drug_service.is_dailymed_available, breaker=loader.breaker)
+    health_monitor.register("llm", drug_service.is_llm_available)
+    health_monitor.register("vector_db", drug_service.is_vector_db_ready)
+    health_monitor.start()
+
+def _service_metrics():
+    """
+    Compteurs tenus par les services, lus au scrape (services non construits omis)
+
+    Ces compteurs vivent dans les services: aucun coût par requête.
+    """
+    lookups, flights = [], []
+    answer_cache = container.peek("answer_cache")
+    if answer_cache is not None:
+        counters = answer_cache.stats_counters
+        for outcome, key in (("exact_hit", "exact_hits"), ("semantic_hit", "semantic_hits"), ("miss", "misses")):
+            lookups.append(("answer", outcome, counters[key]))
+    embeddings = container.peek("embeddings")
+    if embeddings is not None and embeddings.cache is not None:
+        lookups += [("embedding", "hit", embeddings.cache.hits), ("embedding", "miss", embeddings.cache.misses)]
+    loader = container.peek("loader")
+    if loader is not None and loader.spl_cache is not None:
+        for outcome, key in (("hit", "hits"), ("stale", "stale"), ("miss", "misses")):
+            lookups.append(("spl", outcome, loader.spl_cache.metrics[key]))
+    monographs = container.peek("monographs")
+    if monographs is not None:
+        lookups += [("monograph", "hit", monographs.hits), ("monograph", "miss", monographs.misses)]
+
+    llm = container.peek("llm")
+    for flight in (drug_service.flights, llm.flights if llm else None):
+        if flight is not None:
+            flights += [(flight.name, "executed", flight.executed), (flight.name, "shared", flight.shared)]
+
+    families = [
+        ("pharma_cache_lookups", "counter", "Consultations des caches par résultat", [
+            ("pharma_cache_lookups_total", {"cache": cache, "outcome": outcome}, value)
+            for cache, outcome, value in lookups
+        ]),
+        ("pharma_singleflight_calls", "counter", "Appels exécutés ou servis par un appel identique en cours", [
+            ("pharma_singleflight_calls_total", {"flight": name, "outcome": outcome}, value)
+            for name, outcome, value in flights
+        ])
+    ]
+    context = container.peek("context_builder")
+    if context is not None:
+        families.append(("pharma_context_tokens", "counter", "Tokens de contexte assemblés pour les prompts", [
+            ("pharma_context_tokens_total", {}, context.totals["tokens"])
+        ]))
+    return families
+
+registry.add_collector(_service_metrics)
 
 @app.on_event("startup")
 async def startup_event():
     """Initialisation au démarrage"""
     logger.info(" Démarrage du Pharma Assistant API")
+    config.validate_config()
     logger.info(f"Modèle LLM: {config.OPENAI_MODEL}")
     logger.info(f" Langues supportées: {config.SUPPORTED_LANGUAGES}")
+    asyncio.ensure_future(_start_health_monitor())
+    if config.WARMUP_ON_STARTUP:
+        # En tâche de fond: l'API accepte les requêtes pendant le préchauffage
+        asyncio.ensure_future(container.warmup())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Libération des ressources à l'arrêt"""
+    await health_monitor.stop()
+    await container.close()
 
 @app.get("/")
 async def root():
@@ -51,7 +131,11 @@ async def root():
             "/api/drug-info",
             "/api/check-interactions",
             "/api/search-drugs",
-            "/api/ask-question"
+            "/api/ask-question",
+            "/api/batch/drug-info",
+            "/api/batch/ask-question",
+            "/api/warmup",
+            "/metrics"
         ]
     }
 
@@ -64,10 +148,12 @@ async def health_check():
         "environment": config.APP_ENV
     }
 
-@app.post("/api/drug-info")
+@app.post("/api/drug-info", dependencies=[Depends(_services_ready)])
 async def get_drug_info(
     drug_name: str,
-    language: str = config.DEFAULT_LANGUAGE
+    language: str = config.DEFAULT_LANGUAGE,
+    stream: bool = False,
+    stream_format: str = Query("sse", pattern="^(sse|ndjson)$")
 ):
     """
     Obtient des informations sur un médicament
@@ -75,6 +161,8 @@ async def get_drug_info(
     Args:
         drug_name: Nom du médicament
         language: Langue de réponse (fr/en)
+        stream: Envoie les tokens au fil de l'eau
+        stream_format: Format du flux (sse/ndjson)
     """
     try:
         if language not in config.SUPPORTED_LANGUAGES:
@@ -82,6 +170,12 @@ async def get_drug_info(
             
         logger.info(f"Recherche info médicament: {drug_name} ({language})")
         
+        if stream:
+            return event_stream_response(
+                drug_service.stream_drug_information(drug_name=drug_name, language=language),
+                stream_format
+            )
+        
         result = await drug_service.get_drug_information(
             drug_name=drug_name,
             language=language
@@ -96,7 +190,7 @@ async def get_drug_info(
             detail=f"Erreur lors de la récupération des informations: {str(e)}"
         )
 
-@app.post("/api/check-interactions")
+@app.post("/api/check-interactions", dependencies=[Depends(_services_ready)])
 async def check_interactions(
     drugs: List[str],
     language: str = config.DEFAULT_LANGUAGE
@@ -136,7 +230,7 @@ async def check_interactions(
             detail=f"Erreur lors de la vérification des interactions: {str(e)}"
         )
 
-@app.get("/api/search-drugs")
+@app.get("/api/search-drugs", dependencies=[Depends(_services_ready)])
 async def search_drugs(
     query: str = Query(..., min_length=2),
     limit: int = Query(10, ge=1, le=50),
@@ -172,11 +266,13 @@ async def search_drugs(
             detail=f"Erreur lors de la recherche: {str(e)}"
         )
 
-@app.post("/api/ask-question")
+@app.post("/api/ask-question", dependencies=[Depends(_services_ready)])
 async def ask_question(
     question: str,
     context: Optional[Dict] = None,
-    language: str = config.DEFAULT_LANGUAGE
+    language: str = config.DEFAULT_LANGUAGE,
+    stream: bool = False,
+    stream_format: str = Query("sse", pattern="^(sse|ndjson)$")
 ):
     """
     Pose une question générale sur les médicaments
@@ -185,6 +281,8 @@ async def ask_question(
         question: Question à poser
         context: Contexte supplémentaire
         language: Langue de réponse
+        stream: Envoie les tokens au fil de l'eau
+        stream_format: Format du flux (sse/ndjson)
     """
     try:
         if not question or len(question.strip()) < 3:
@@ -195,6 +293,16 @@ async def ask_question(
             
         logger.info(f"❓ Question: '{question[:50]}...' ({language})")
         
+        if stream:
+            return event_stream_response(
+                drug_service.stream_answer_question(
+                    question=question,
+                    context=context or {},
+                    language=language
+                ),
+                stream_format
+            )
+        
         result = await drug_service.answer_question(
             question=question,
             context=context or {},
@@ -212,18 +320,190 @@ async def ask_question(
             detail=f"Erreur lors du traitement de la question: {str(e)}"
         )
 
+def _validate_batch(items: List[str], label: str):
+    """Lot non vide et borné (config.BATCH_MAX_ITEMS)"""
+    if not items:
+        raise HTTPException(status_code=400, detail=f"La liste de {label} est vide")
+    if len(items) > config.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Au plus {config.BATCH_MAX_ITEMS} {label} par lot (reçu: {len(items)})"
+        )
+
+async def _batch_events(
+    events: AsyncIterator[Dict],
+    ordered: bool,
+    extra: Optional[asyncio.Task] = None
+) -> AsyncIterator[Dict]:
+    """
+    Flux d'un lot: événements par élément, événement annexe éventuel, puis "done"
+    
+    Args:
+        ordered: Réémet les éléments dans l'ordre de la requête
+        extra: Tâche lancée en parallèle dont le résultat est émis après les éléments
+    """
+    counts = {"result": 0, "item_error": 0}
+    try:
+        async for event in (in_order(events) if ordered else events):
+            if event["type"] in counts:
+                counts[event["type"]] += 1
+            yield event
+        if extra is not None:
+            try:
+                yield {"type": "interactions", "result": await extra}
+            except Exception as e:
+                logger.error(f"❌ Erreur interactions du lot: {str(e)}")
+                yield {"type": "interactions_error", "message": str(e)}
+    finally:
+        if extra is not None and not extra.done():
+            extra.cancel()
+    yield {"type": "done", "results": counts["result"], "errors": counts["item_error"]}
+
+@app.post("/api/batch/drug-info", dependencies=[Depends(_services_ready)])
+async def batch_drug_info(
+    drug_names: List[str],
+    language: str = config.DEFAULT_LANGUAGE,
+    ordered: bool = False,
+    check_interactions: bool = False
+):
+    """
+    Informations sur tous les médicaments d'une ordonnance (flux NDJSON)
+    
+    Une ligne par médicament dès qu'il est prêt ("index" = position dans la
+    requête), les erreurs étant rapportées par élément.
+    
+    Args:
+        drug_names: Liste des noms de médicaments
+        language: Langue de réponse
+        ordered: Émet les résultats dans l'ordre de la requête
+        check_interactions: Ajoute la vérification des interactions de la liste
+    """
+    _validate_batch(drug_names, "médicaments")
+    if language not in config.SUPPORTED_LANGUAGES:
+        language = config.DEFAULT_LANGUAGE
+    
+    logger.info(f"📋 Lot de {len(drug_names)} médicaments ({language})")
+    
+    extra = None
+    if check_interactions and len(drug_names) >= 2:
+        extra = asyncio.ensure_future(
+            interaction_service.check_drug_interactions(drugs=drug_names, language=language)
+        )
+    
+    return event_stream_response(
+        _batch_events(drug_service.batch_drug_information(drug_names, language=language), ordered, extra),
+        "ndjson"
+    )
+
+@app.post("/api/batch/ask-question", dependencies=[Depends(_services_ready)])
+async def batch_ask_question(
+    questions: List[str],
+    context: Optional[Dict] = None,
+    language: str = config.DEFAULT_LANGUAGE,
+    ordered: bool = False
+):
+    """
+    Réponses à une liste de questions (flux NDJSON, une ligne par question)
+    
+    Args:
+        questions: Questions à poser
+        context: Contexte supplémentaire commun
+        language: Langue de réponse
+        ordered: Émet les résultats dans l'ordre de la requête
+    """
+    _validate_batch(questions, "questions")
+    if any(not q or len(q.strip()) < 3 for q in questions):
+        raise HTTPException(
+            status_code=400,
+            detail="Chaque question doit contenir au moins 3 caractères"
+        )
+    if language not in config.SUPPORTED_LANGUAGES:
+        language = config.DEFAULT_LANGUAGE
+    
+    logger.info(f"📋 Lot de {len(questions)} questions ({language})")
+    
+    return event_stream_response(
+        _batch_events(
+            drug_service.batch_answer_questions(questions, context=context or {}, language=language),
+            ordered
+        ),
+        "ndjson"
+    )
+
+@app.post("/api/warmup")
+async def warmup(services: Optional[List[str]] = Query(None)):
+    """
+    Construit les services et précharge leurs index et caches
+    
+    Args:
+        services: Services à préchauffer (tous par défaut)
+    
+    Returns:
+        Temps de construction et de préchauffage de chaque service
+    """
+    unknown = [name for name in services or [] if name not in container.names]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Services inconnus: {', '.join(unknown)}")
+    start = time.perf_counter()
+    components = await container.warmup(services)
+    return {
+        "total_ms": round((time.perf_counter() - start) * 1000, 1),
+        "components": components
+    }
+
 @app.get("/api/status")
 async def get_status():
-    """Statut du système"""
+    """Statut du système (dernier état des sondes, servi depuis la mémoire)"""
+    dependencies = health_monitor.snapshot()
+    llm = container.peek("llm")
+    if "llm" in dependencies and llm is not None:
+        dependencies["llm"]["breaker"] = llm.breaker.stats()
     return {
         "service": "Pharma Assistant ML API",
         "llm_model": config.OPENAI_MODEL,
         "environment": config.APP_ENV,
-        "dailymed_connected": drug_service.is_dailymed_available(),
-        "vector_db_ready": drug_service.is_vector_db_ready(),
+        "dailymed_connected": health_monitor.is_healthy("dailymed"),
+        "vector_db_ready": health_monitor.is_healthy("vector_db"),
+        "llm_available": health_monitor.is_healthy("llm"),
+        "dependencies": dependencies,
+        "services": container.stats(),
+        "index_generation": getattr(container.peek("rag"), "generation", None),
         "supported_languages": config.SUPPORTED_LANGUAGES
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Métriques Prometheus: latences par étape, requêtes HTTP, tokens LLM, caches"""
+    if not config.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Métriques désactivées (METRICS_ENABLED)")
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """
+    Statistiques des caches (réponses LLM, embeddings, monographies, SPL), du contexte, des tokens et de la coalescence
+    
+    Les services pas encore construits sont rapportés à None (sans les construire).
+    """
+    answers = container.peek("answer_cache")
+    llm = container.peek("llm")
+    loader = container.peek("loader")
+    embeddings = container.peek("embeddings")
+    context = container.peek("context_builder")
+    monographs = container.peek("monographs")
+    return {
+        "answers": answers.stats() if answers else None,
+        "embeddings": embeddings.stats() if embeddings else None,
+        "context": context.stats() if context else None,
+        "llm_usage": llm.stats() if llm else None,
+        "monographs": monographs.stats() if monographs else None,
+        "spl": loader.spl_cache.stats() if loader and loader.spl_cache else None,
+        "coalescing": {
+            "retrieval": drug_service.flights.stats(),
+            "llm": llm.flights.stats() if llm else None
+        }
+    }
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
@@ -2,83 +2,476 @@
 """
 Service médicaments utilisant le RAG léger
 """
-from typing import List, Dict, Optional
+import asyncio
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 import logging
-from app.llm.llm_engine import llm_engine
-from app.llm.rag_light import light_rag  # ⬅️ CHANGÉ: rag_light au lieu de rag
-from app.database.dailymed_loader import dailymed_loader
+from app.llm.answer_cache import canonicalize_query
 from app.config import config
+from app.container import Dependency, is_resolved
+from app.database.drug_canonicalizer import canonical_subject
+from app.utils.fanout import bounded_fan_out
+from app.utils.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 class DrugService:
     """Service de gestion des médicaments avec RAG léger"""
-    
+
+    # Dépendances construites au premier accès (voir app.container)
+    llm = Dependency("llm")
+    rag = Dependency("rag")  # ⬅️ Utilise le RAG léger
+    loader = Dependency("loader")
+    names = Dependency("names")
+    canonicalizer = Dependency("canonicalizer")
+    # Monographies précalculées (None si désactivé)
+    monographs = Dependency("monographs")
+
     def __init__(self):
-        self.llm = llm_engine
-        self.rag = light_rag  # ⬅️ Utilise le RAG léger
-        self.loader = dailymed_loader
-    
-    async def get_drug_information(self, drug_name: str, language: str = "fr") -> Dict:
+        self.flights = SingleFlight("drug_service", enabled=config.SINGLEFLIGHT_ENABLED)
+
+    def _canonical_subject(self, drug_name: str) -> Tuple[str, Dict]:
         """
-        Obtient des informations sur un médicament
-        Utilise le RAG léger avec OpenAI embeddings
+        Principe(s) actif(s) canonique(s) d'un nom de médicament
+
+        "Doliprane", "Tylenol 500" et "paracétamol" partagent ainsi la même
+        récupération et la même entrée de cache. Un nom inconnu, ou résolu
+        seulement par préfixe, reste tel quel.
+
+        Returns:
+            (sujet de la récupération et du prompt, résumé de la canonicalisation)
+        """
+        return self._canonical_subjects([drug_name])[0]
+
+    def _canonical_subjects(self, drug_names: List[str]) -> List[Tuple[str, Dict]]:
+        """Variante en lot de _canonical_subject (une seule résolution)"""
+        return [
+            (
+                canonical_subject(drug_name, resolved),
+                {"name": resolved["canonical"], "ingredients": resolved["ingredients"], "match": resolved["match"]}
+            )
+            for drug_name, resolved in zip(drug_names, self.canonicalizer.resolve_batch(drug_names))
+        ]
+
+    async def _prepare_drug_context(
+        self,
+        drug_name: str,
+        prefetched: Optional[Tuple[str, List[Dict]]] = None
+    ) -> Tuple[str, List[Dict]]:
+        """
+        Récupère le contexte d'un médicament (RAG léger puis DailyMed)
+
+        Les requêtes concurrentes pour le même médicament partagent une seule récupération.
+
+        Args:
+            prefetched: Résultat RAG déjà obtenu (recherche en lot), DailyMed seulement si insuffisant
+
+        Returns:
+            (contexte, sources)
         """
-        logger.info(f" Traitement: {drug_name} (langue: {language})")
-        
+        key = canonicalize_query(drug_name)
+        return await self.flights.do(f"context:{key}", lambda: self._fetch_drug_context(drug_name, prefetched))
+
+    async def _fetch_drug_context(
+        self,
+        drug_name: str,
+        prefetched: Optional[Tuple[str, List[Dict]]] = None
+    ) -> Tuple[str, List[Dict]]:
         # 1. Obtenir le contexte via RAG léger
-        context = await self.rag.get_drug_context(drug_name)
-        
+        if prefetched is not None:
+            context, sources = prefetched
+        else:
+            context, sources = await self.rag.get_drug_context_with_sources(drug_name)
+
         # 2. Si contexte insuffisant, chercher dans DailyMed
         if "Aucune information locale" in context or not context:
-            logger.info("Recherche dans DailyMed API...")
-            
-            # Recherche dans DailyMed
-            search_results = self.loader.search_drugs(drug_name, limit=2)
-            
-            if search_results:
-                # Préparer les données pour le RAG
-                documents = []
-                for result in search_results:
-                    doc_text = f"""
-                    Médicament: {result.get('name', '')}
-                    Type: {result.get('type', '')}
-                    Principe actif: {', '.join(result.get('active_ingredients', []))}
-                    Voie d'administration: {result.get('route', '')}
-                    """
-                    
-                    documents.append({
-                        "text": doc_text,
-                        "metadata": {
-                            "source": "DailyMed",
-                            "drug_name": result.get('name', ''),
-                            "timestamp": "2024-01-15"
-                        }
-                    })
-                
-                # Ajouter au RAG pour les prochaines fois
-                await self.rag.add_documents(documents)
-                
+            key = canonicalize_query(drug_name)
+            added = await self.flights.do(f"dailymed:{key}", lambda: self._import_from_dailymed(drug_name))
+
+            if added:
                 # Mettre à jour le contexte
-                context = await self.rag.get_drug_context(drug_name)
-        
-        # 3. Formater avec LLM
-        prompt = config.PROMPT_TEMPLATES["drug_info"].format(
-            context=context,
-            question=drug_name,
-            language=language
-        )
-        
-        response = await self.llm.generate_response(prompt)
-        
+                context, sources = await self.rag.get_drug_context_with_sources(drug_name)
+
+        return context, sources
+
+    async def _prefetch_contexts(self, queries: List[str]) -> Dict[str, Tuple[str, List[Dict]]]:
+        """
+        Récupération RAG partagée d'un lot (requêtes uniques, un seul appel d'embeddings)
+
+        En cas d'échec, chaque élément refait sa propre récupération.
+        """
+        try:
+            return await self.rag.get_drug_contexts_with_sources(queries)
+        except Exception as e:
+            logger.error(f"❌ Récupération en lot échouée: {str(e)}")
+            return {}
+
+    async def _import_from_dailymed(self, drug_name: str) -> bool:
+        """
+        Recherche dans DailyMed et ajoute les résultats au RAG
+
+        Returns:
+            True si des documents ont été ajoutés
+        """
+        logger.info("Recherche dans DailyMed API...")
+
+        # Recherche dans DailyMed
+        search_results = await self.loader.search_drugs(drug_name, limit=2)
+
+        if not search_results:
+            return False
+
+        # Préparer les données pour le RAG
+        documents = []
+        for result in search_results:
+            doc_text = f"""
+            Médicament: {result.get('name', '')}
+            Type: {result.get('type', '')}
+            Principe actif: {', '.join(result.get('active_ingredients', []))}
+            Voie d'administration: {result.get('route', '')}
+            """
+
+            documents.append({
+                "text": doc_text,
+                "metadata": {
+                    "source": "DailyMed",
+                    "drug_name": result.get('name', ''),
+                    "timestamp": "2024-01-15"
+                }
+            })
+
+        # Ajouter au RAG pour les prochaines fois
+        await self.rag.add_documents(documents)
+        return True
+
+    async def get_drug_information(self, drug_name: str, language: str = "fr") -> Dict:
+        """
+        Obtient des informations sur un médicament
+        Utilise le RAG léger avec OpenAI embeddings
+        """
+        subject, canonical = self._canonical_subject(drug_name)
+        logger.info(f" Traitement: {drug_name} -> {subject} (langue: {language})")
+
+        # Monographie précalculée: une lecture locale, pas de récupération ni de LLM
+        stored = self._stored_monographs([subject], language).get(subject)
+        if stored is not None:
+            return self._stored_result(drug_name, canonical, stored, language)
+
+        context, sources = await self._prepare_drug_context(subject)
+
+        # 3. Formater avec LLM (cache de réponses en amont)
+        response = await self.llm.generate_from_template("drug_info", subject, context, language)
+
+        return self._drug_information_result(drug_name, subject, canonical, response, context, sources, language)
+
+    def _drug_information_result(
+        self,
+        drug_name: str,
+        subject: str,
+        canonical: Dict,
+        response: str,
+        context: str,
+        sources: List[Dict],
+        language: str
+    ) -> Dict:
         return {
             "drug_name": drug_name,
+            "canonical": canonical,
             "information": response,
             "context_used": bool(context and "Aucune information" not in context),
+            "sources": sources,
+            "prompt_tokens": self.llm.count_prompt_tokens("drug_info", subject, context, language),
             "language": language,
             "source": "DailyMed FDA + OpenAI RAG",
             "rag_mode": "light",
+            "precomputed": False,
             "timestamp": "2024-01-15T10:30:00Z"
         }
-    
-    # ... (autres méthodes restent similaires)
\ No newline at end of file
+
+    def _stored_monographs(self, subjects: List[str], language: str) -> Dict[str, Dict]:
+        """Monographies précalculées disponibles pour ces sujets (une seule lecture)"""
+        if self.monographs is None:
+            return {}
+        return self.monographs.get_many(subjects, language)
+
+    def _stored_result(self, drug_name: str, canonical: Dict, stored: Dict, language: str) -> Dict:
+        return {
+            "drug_name": drug_name,
+            "canonical": canonical,
+            "information": stored["information"],
+            "context_used": bool(stored["sources"]),
+            "sources": stored["sources"],
+            "prompt_tokens": stored["prompt_tokens"],
+            "language": language,
+            "source": "DailyMed FDA + OpenAI RAG",
+            "rag_mode": "light",
+            "precomputed": True,
+            "spl_version": stored["spl_version"],
+            "timestamp": datetime.fromtimestamp(stored["generated_at"], timezone.utc).isoformat()
+        }
+
+    async def batch_drug_information(self, drug_names: List[str], language: str = "fr") -> AsyncIterator[Dict]:
+        """
+        Informations sur une liste de médicaments (ordonnance)
+
+        Les noms sont canonicalisés en lot; les monographies précalculées sont
+        lues en une fois et émises immédiatement. Chaque autre principe actif
+        unique est récupéré une seule fois (recherche RAG en lot) puis traité
+        une fois (DailyMed si besoin, LLM), au plus config.BATCH_MAX_CONCURRENCY à la fois.
+
+        Yields:
+            {"type": "metadata"} puis, dans l'ordre de fin, un événement par
+            élément: {"type": "result", "index", "drug_name", "result"} ou
+            {"type": "item_error", "index", "drug_name", "message"}
+        """
+        resolved = self._canonical_subjects(drug_names)
+        indices: Dict[str, List[int]] = {}
+        for index, (subject, _) in enumerate(resolved):
+            indices.setdefault(subject, []).append(index)
+
+        stored = self._stored_monographs(list(indices), language)
+        yield {
+            "type": "metadata",
+            "count": len(drug_names),
+            "unique": len(indices),
+            "precomputed": len(stored),
+            "language": language
+        }
+
+        for subject, monograph in stored.items():
+            for index in indices.pop(subject):
+                yield {
+                    "type": "result",
+                    "index": index,
+                    "drug_name": drug_names[index],
+                    "result": self._stored_result(drug_names[index], resolved[index][1], monograph, language)
+                }
+        if not indices:
+            return
+
+        prefetched = await self._prefetch_contexts(list(indices))
+
+        async def _process(subject: str):
+            context, sources = await self._prepare_drug_context(subject, prefetched.get(subject))
+            response = await self.llm.generate_from_template("drug_info", subject, context, language)
+            return context, sources, response
+
+        async for subject, outcome, error in bounded_fan_out(indices, _process, config.BATCH_MAX_CONCURRENCY):
+            for index in indices[subject]:
+                drug_name, canonical = drug_names[index], resolved[index][1]
+                if error is not None:
+                    logger.error(f"❌ Lot - {drug_name}: {str(error)}")
+                    yield {"type": "item_error", "index": index, "drug_name": drug_name, "message": str(error)}
+                    continue
+                context, sources, response = outcome
+                yield {
+                    "type": "result",
+                    "index": index,
+                    "drug_name": drug_name,
+                    "result": self._drug_information_result(
+                        drug_name, subject, canonical, response, context, sources, language
+                    )
+                }
+
+    async def stream_drug_information(self, drug_name: str, language: str = "fr") -> AsyncIterator[Dict]:
+        """
+        Variante streaming de get_drug_information
+
+        Émet d'abord les métadonnées de récupération, puis les tokens, puis "done"
+        """
+        subject, canonical = self._canonical_subject(drug_name)
+        logger.info(f" Traitement (stream): {drug_name} -> {subject} (langue: {language})")
+
+        stored = self._stored_monographs([subject], language).get(subject)
+        if stored is not None:
+            # Monographie précalculée émise en un seul fragment, comme un hit de cache
+            result = self._stored_result(drug_name, canonical, stored, language)
+            information = result.pop("information")
+            yield {"type": "metadata", **result}
+            yield {"type": "token", "content": information}
+            yield {"type": "done"}
+            return
+
+        context, sources = await self._prepare_drug_context(subject)
+
+        yield {
+            "type": "metadata",
+            "drug_name": drug_name,
+            "canonical": canonical,
+            "context_used": bool(context and "Aucune information" not in context),
+            "sources": sources,
+            "prompt_tokens": self.llm.count_prompt_tokens("drug_info", subject, context, language),
+            "language": language,
+            "source": "DailyMed FDA + OpenAI RAG",
+            "rag_mode": "light",
+            "precomputed": False
+        }
+
+        async for token in self.llm.stream_from_template("drug_info", subject, context, language):
+            yield {"type": "token", "content": token}
+
+        yield {"type": "done"}
+
+    async def _prepare_question_context(
+        self,
+        question: str,
+        context: Optional[Dict] = None,
+        prefetched: Optional[Tuple[str, List[Dict]]] = None
+    ) -> Tuple[str, List[Dict]]:
+        """
+        Contexte d'une question: recherche RAG + contexte fourni par l'appelant
+
+        Args:
+            prefetched: Résultat RAG déjà obtenu (recherche en lot)
+        """
+        if prefetched is not None:
+            rag_context, sources = prefetched
+        else:
+            key = canonicalize_query(question)
+            rag_context, sources = await self.flights.do(
+                f"question:{key}",
+                lambda: self.rag.get_drug_context_with_sources(question)
+            )
+
+        parts = [rag_context]
+        if context:
+            parts.append("\n".join(f"{key}: {value}" for key, value in context.items()))
+
+        return "\n\n".join(parts), sources
+
+    async def answer_question(
+        self,
+        question: str,
+        context: Optional[Dict] = None,
+        language: str = "fr"
+    ) -> Dict:
+        """
+        Répond à une question générale sur les médicaments
+        """
+        full_context, sources = await self._prepare_question_context(question, context)
+
+        response = await self.llm.generate_from_template("general_question", question, full_context, language)
+
+        return self._answer_result(question, response, full_context, sources, language)
+
+    def _answer_result(self, question: str, response: str, full_context: str, sources: List[Dict], language: str) -> Dict:
+        return {
+            "question": question,
+            "answer": response,
+            "context_used": bool(sources),
+            "sources": sources,
+            "prompt_tokens": self.llm.count_prompt_tokens("general_question", question, full_context, language),
+            "language": language
+        }
+
+    async def batch_answer_questions(
+        self,
+        questions: List[str],
+        context: Optional[Dict] = None,
+        language: str = "fr"
+    ) -> AsyncIterator[Dict]:
+        """
+        Réponses à une liste de questions
+
+        Les questions identiques (après normalisation) sont traitées une fois;
+        récupération RAG en lot, LLM borné à config.BATCH_MAX_CONCURRENCY.
+
+        Yields:
+            {"type": "metadata"} puis, dans l'ordre de fin, un événement par
+            élément: {"type": "result", "index", "question", "result"} ou
+            {"type": "item_error", "index", "question", "message"}
+        """
+        indices: Dict[str, List[int]] = {}
+        for index, question in enumerate(questions):
+            indices.setdefault(canonicalize_query(question), []).append(index)
+        # Une question représentative par clé
+        representative = {key: questions[positions[0]] for key, positions in indices.items()}
+
+        yield {"type": "metadata", "count": len(questions), "unique": len(indices), "language": language}
+
+        prefetched = await self._prefetch_contexts(list(representative.values()))
+
+        async def _process(key: str):
+            question = representative[key]
+            full_context, sources = await self._prepare_question_context(question, context, prefetched.get(question))
+            response = await self.llm.generate_from_template("general_question", question, full_context, language)
+            return full_context, sources, response
+
+        async for key, outcome, error in bounded_fan_out(indices, _process, config.BATCH_MAX_CONCURRENCY):
+            for index in indices[key]:
+                question = questions[index]
+                if error is not None:
+                    logger.error(f"❌ Lot - question {index}: {str(error)}")
+                    yield {"type": "item_error", "index": index, "question": question, "message": str(error)}
+                    continue
+                full_context, sources, response = outcome
+                yield {
+                    "type": "result",
+                    "index": index,
+                    "question": question,
+                    "result": self._answer_result(question, response, full_context, sources, language)
+                }
+
+    async def stream_answer_question(
+        self,
+        question: str,
+        context: Optional[Dict] = None,
+        language: str = "fr"
+    ) -> AsyncIterator[Dict]:
+        """
+        Variante streaming de answer_question
+        """
+        full_context, sources = await self._prepare_question_context(question, context)
+
+        yield {
+            "type": "metadata",
+            "question": question,
+            "context_used": bool(sources),
+            "sources": sources,
+            "prompt_tokens": self.llm.count_prompt_tokens("general_question", question, full_context, language),
+            "language": language
+        }
+
+        async for token in self.llm.stream_from_template("general_question", question, full_context, language):
+            yield {"type": "token", "content": token}
+
+        yield {"type": "done"}
+
+    async def search_drugs(self, query: str, limit: int = 10, language: str = "fr") -> List[Dict]:
+        """
+        Recherche de médicaments par nom (autocomplétion)
+
+        Index local des noms (préfixe puis approximatif); l'API DailyMed
+        n'est interrogée que si l'index local est vide.
+        """
+        if self.names.dump_changed():
+            # Reconstruction en arrière-plan; les anciens instantanés restent servis
+            loop = asyncio.get_running_loop()
+            loop.run_in_executor(None, self.names.reload)
+            loop.run_in_executor(None, self.canonicalizer.reload)
+
+        if len(self.names):
+            return self.names.search(query, limit=limit)
+
+        return await self.loader.search_drugs(query, limit=limit)
+
+    async def is_dailymed_available(self) -> bool:
+        """Vérifie si l'API DailyMed répond (appel réseau: sonde du moniteur de santé)"""
+        return await self.loader.is_available()
+
+    def is_llm_available(self) -> bool:
+        """
+        LLM utilisable: clé configurée et disjoncteur non ouvert
+
+        Sonde passive (aucune complétion facturée): l'état vient des appels
+        réels. Ne construit pas le moteur s'il n'a pas encore servi.
+        """
+        if not config.OPENAI_API_KEY:
+            return False
+        return not is_resolved(self, "llm") or not self.llm.breaker.is_open
+
+    def is_vector_db_ready(self) -> bool:
+        """Vérifie si la base vectorielle est chargée (faux avant son premier usage ou le préchauffage)"""
+        return is_resolved(self, "rag") and self.rag.is_ready()
+
+    # ... (autres méthodes restent similaires)
@@ -0,0 +1,123 @@
+# app/services/health_monitor.py
+"""
+Moniteur de santé des dépendances (DailyMed, LLM, base vectorielle)
+
+Une tâche de fond sonde chaque dépendance toutes les
+config.HEALTH_CHECK_INTERVAL secondes et garde le dernier état en mémoire:
+/api/status ne fait plus aucun appel réseau. Une sonde peut être associée
+au disjoncteur de la dépendance: un échec l'ouvre (les requêtes échouent
+vite sans attendre leur propre timeout), un succès le referme.
+"""
+import asyncio
+import inspect
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, Union
+
+from app.config import config
+from app.utils.circuit_breaker import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+Check = Callable[[], Union[bool, Awaitable[bool]]]
+
+
+class HealthMonitor:
+    """Sondes périodiques en arrière-plan, état servi depuis la mémoire"""
+
+    def __init__(self, interval: Optional[float] = None, timeout: Optional[float] = None):
+        self.interval = interval or config.HEALTH_CHECK_INTERVAL
+        self.timeout = timeout or config.HEALTH_CHECK_TIMEOUT
+        self._checks: Dict[str, Check] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._state: Dict[str, Dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, check: Check, breaker: Optional[CircuitBreaker] = None):
+        """
+        Args:
+            check: Sonde (synchrone ou async) renvoyant True si la dépendance répond
+            breaker: Disjoncteur piloté par la sonde
+        """
+        self._checks[name] = check
+        if breaker is not None:
+            self._breakers[name] = breaker
+        self._state[name] = {"healthy": None, "checked_at": None, "latency_ms": None, "error": None}
+
+    async def _probe(self, name: str, check: Check):
+        start = time.perf_counter()
+        error = None
+        try:
+            result = check()
+            if inspect.isawaitable(result):
+                result = await asyncio.wait_for(result, timeout=self.timeout)
+            healthy = bool(result)
+        except Exception as e:
+            healthy, error = False, str(e) or type(e).__name__
+
+        previous = self._state[name]["healthy"]
+        self._state[name] = {
+            "healthy": healthy,
+            "checked_at": time.time(),
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+            "error": error
+        }
+        if previous is not None and previous != healthy:
+            if healthy:
+                logger.info(f"✅ {name} de nouveau disponible")
+            else:
+                logger.warning(f"⚠️  {name} indisponible{f': {error}' if error else ''}")
+
+        breaker = self._breakers.get(name)
+        if breaker is not None:
+            if healthy and breaker.state != "closed":
+                breaker.reset()
+            elif not healthy:
+                breaker.trip()
+
+    async def check_all(self):
+        """Sonde toutes les dépendances en parallèle"""
+        await asyncio.gather(*(self._probe(name, check) for name, check in self._checks.items()))
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check_all()
+            except Exception as e:
+                logger.error(f"❌ Moniteur de santé: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Démarre la tâche de fond (première sonde immédiate)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict:
+        """
+        Dernier état connu de chaque dépendance (aucun appel réseau)
+
+        Returns:
+            {nom: {"healthy" (None avant la première sonde), "checked_at",
+             "latency_ms", "error", "breaker"}}
+        """
+        return {
+            name: {**state, "breaker": self._breakers[name].stats() if name in self._breakers else None}
+            for name, state in self._state.items()
+        }
+
+    def is_healthy(self, name: str) -> bool:
+        """Vrai si la dernière sonde a réussi (ou n'a pas encore eu lieu)"""
+        return self._state.get(name, {}).get("healthy") is not False
+
+
+# Instance globale
+health_monitor = HealthMonitor()
@@ -1,24 +1,109 @@
 # app/services/interaction_service.py
+"""
+Service d'interactions médicamenteuses
+
+La détection est déterministe (moteur local, voir interaction_index); le LLM
+ne sert qu'à rédiger l'explication des interactions trouvées.
+"""
 import logging
+from typing import Dict, List, Tuple
+
+from app.container import Dependency
+from app.database.drug_canonicalizer import MATCH_PREFIX
 
 logger = logging.getLogger(__name__)
 
+NO_INTERACTION_MESSAGES = {
+    "fr": "Aucune interaction connue entre ces médicaments dans la base d'interactions.",
+    "en": "No known interaction between these drugs in the interaction database.",
+}
+
+DISCLAIMER = "Interactions issues de la base locale. Consultez un pharmacien pour confirmation."
+
+
 class InteractionService:
-    """Service simplifié d'interactions"""
-    
-    def __init__(self):
-        pass
-    
-    async def check_drug_interactions(self, drugs: List[str], language: str = "fr") -> Dict:
+    """Service d'interactions: moteur local + explication par le LLM"""
+
+    # Dépendances construites au premier accès (voir app.container)
+    index = Dependency("interactions")
+    canonicalizer = Dependency("canonicalizer")
+    llm = Dependency("llm")
+
+    def resolve_ingredients(self, drugs: List[str]) -> Tuple[List[List[str]], List[str]]:
+        """
+        Principes actifs canoniques de chaque médicament (résolution en lot)
+
+        Un nom inconnu de la table de canonicalisation est gardé tel quel.
+
+        Returns:
+            (principes actifs de chaque médicament, noms résolus seulement par préfixe)
+        """
+        resolved = self.canonicalizer.resolve_batch(drugs)
+        ingredients = [entry["ingredients"] or [drug] for drug, entry in zip(drugs, resolved)]
+        partial = [drug for drug, entry in zip(drugs, resolved) if entry["match"] == MATCH_PREFIX]
+        return ingredients, partial
+
+    async def check_drug_interactions(self, drugs: List[str], language: str = "fr", explain: bool = True) -> Dict:
+        """
+        Vérifie toutes les paires de médicaments de la liste
+
+        Args:
+            drugs: Noms de médicaments ou de principes actifs
+            explain: Fait rédiger l'explication par le LLM (si des interactions sont trouvées)
+        """
         logger.info(f"Analyse interactions: {drugs}")
-        
+
+        ingredients, partial = self.resolve_ingredients(drugs)
+        if partial:
+            logger.warning(f"⚠️  Noms résolus partiellement (préfixe), interactions possiblement incomplètes: {partial}")
+        hits = self.index.check(ingredients)
+        interactions = [
+            {
+                "drugs": [drugs[i] for i in hit["items"]],
+                "ingredients": hit["ingredients"],
+                "severity": hit["severity"],
+                "mechanism": hit["mechanism"],
+                "management": hit["management"],
+            }
+            for hit in hits
+        ]
+        unknown = [
+            drug for drug, names in zip(drugs, ingredients)
+            if all(self.index.ingredient_id(name) is None for name in names)
+        ]
+
+        if not interactions:
+            analysis = NO_INTERACTION_MESSAGES.get(language, NO_INTERACTION_MESSAGES["fr"])
+        elif explain:
+            # Prompt et cache sur les noms canoniques: "Doliprane" et "paracétamol" partagent l'explication
+            canonical = [" + ".join(names) for names in ingredients]
+            analysis = await self.llm.analyze_interactions(
+                [{**interaction, "drugs": [canonical[i] for i in hit["items"]]} for interaction, hit in zip(interactions, hits)],
+                sorted(set(canonical[i] for hit in hits for i in hit["items"])),
+                language
+            )
+        else:
+            analysis = "\n".join(
+                " - ".join(filter(None, [
+                    f"{' + '.join(hit['drugs'])}: {hit['severity']}", hit["management"] or hit["mechanism"]
+                ]))
+                for hit in interactions
+            )
+
         return {
             "drugs": drugs,
-            "analysis": f"Analyse des interactions entre {len(drugs)} médicaments. Service en développement.",
-            "has_interactions": False,
-            "severity": "low",
-            "language": language
+            "ingredients": dict(zip(drugs, ingredients)),
+            "interactions": interactions,
+            "analysis": analysis,
+            "has_interactions": bool(interactions),
+            # Sévérité la plus grave (les interactions sont triées par gravité)
+            "severity": interactions[0]["severity"] if interactions else "none",
+            "unknown_drugs": unknown,
+            # Nom complet absent de la table: seuls les principes actifs du préfixe sont vérifiés
+            "partial_matches": partial,
+            "language": language,
+            "disclaimer": DISCLAIMER
         }
 
 # Instance GLOBALE - IMPORTANT !
-interaction_service = InteractionService()
\ No newline at end of file
+interaction_service = InteractionService()
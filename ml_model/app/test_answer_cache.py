@@ -0,0 +1,167 @@
+# app/test_answer_cache.py
+"""
+Tests du cache de réponses LLM (exact, LRU/TTL, niveau sémantique, persistance)
+
+Exécutez depuis ml_model/: python -m pytest app/test_answer_cache.py
+"""
+import asyncio
+import os
+
+from app.llm.answer_cache import AnswerCache, canonicalize_query
+
+
+class FakeEmbeddings:
+    """Vecteur fixe par texte (défaut: même direction pour tous), panne simulée à la demande"""
+
+    def __init__(self, vectors=None):
+        self.vectors = vectors or {}
+        self.down = False
+
+    async def __call__(self, text):
+        if self.down:
+            raise RuntimeError("embeddings indisponibles")
+        return self.vectors.get(text, [1.0, 0.0])
+
+
+def semantic_cache(embed, **kwargs):
+    return AnswerCache(semantic_threshold=0.9, embed_fn=embed, **kwargs)
+
+
+def test_canonicalize_query_normalizes_dosages():
+    assert canonicalize_query("Doliprane 500MG") == canonicalize_query("doliprane 500 mg")
+    assert canonicalize_query("crème 1%") == canonicalize_query("creme 1 %")
+    assert canonicalize_query("100 µg") == canonicalize_query("100 mcg") == canonicalize_query("100ug")
+
+
+def test_exact_hit_on_canonical_query():
+    cache = AnswerCache()
+
+    async def scenario():
+        await cache.set("drug_info", "Doliprane 500mg", "fr", "ctx", "réponse")
+        return (
+            await cache.get("drug_info", "doliprane 500 MG", "fr", "ctx"),
+            await cache.get("drug_info", "doliprane 500 mg", "en", "ctx"),
+            await cache.get("drug_info", "doliprane 500 mg", "fr", "autre contexte"),
+        )
+
+    assert asyncio.run(scenario()) == ("réponse", None, None)
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["misses"]) == (1, 2)
+
+
+def test_lru_eviction_keeps_recently_used():
+    cache = AnswerCache(max_entries=2)
+
+    async def scenario():
+        await cache.set("drug_info", "a", "fr", "ctx", "A")
+        await cache.set("drug_info", "b", "fr", "ctx", "B")
+        await cache.get("drug_info", "a", "fr", "ctx")
+        await cache.set("drug_info", "c", "fr", "ctx", "C")
+        return [await cache.get("drug_info", name, "fr", "ctx") for name in "abc"]
+
+    assert asyncio.run(scenario()) == ["A", None, "C"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entry_is_a_miss():
+    cache = AnswerCache(ttl=-1)
+
+    async def scenario():
+        await cache.set("drug_info", "a", "fr", "ctx", "A")
+        return await cache.get("drug_info", "a", "fr", "ctx")
+
+    assert asyncio.run(scenario()) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_semantic_hit_requires_question_template_and_same_context():
+    cache = semantic_cache(FakeEmbeddings())
+
+    async def scenario():
+        await cache.set("general_question", "peut-on écraser ce comprimé", "fr", "ctx", "Q")
+        await cache.set("drug_info", "doliprane", "fr", "ctx", "M")
+        return (
+            await cache.get("general_question", "écraser le comprimé ?", "fr", "ctx"),
+            await cache.get("general_question", "écraser le comprimé ?", "fr", "ctx modifié"),
+            await cache.get("general_question", "écraser le comprimé ?", "en", "ctx"),
+            await cache.get("drug_info", "efferalgan", "fr", "ctx"),
+        )
+
+    assert asyncio.run(scenario()) == ("Q", None, None, None)
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_semantic_miss_below_threshold():
+    embed = FakeEmbeddings({canonicalize_query("posologie"): [0.0, 1.0]})
+    cache = semantic_cache(embed)
+
+    async def scenario():
+        await cache.set("general_question", "effets indésirables", "fr", "ctx", "E")
+        return await cache.get("general_question", "posologie", "fr", "ctx")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_failed_reembedding_drops_the_stale_vector():
+    # Régression: la clé restait dans son scope avec un vecteur None -> ValueError sur matmul
+    embed = FakeEmbeddings()
+    cache = semantic_cache(embed)
+
+    async def scenario():
+        await cache.set("general_question", "question", "fr", "ctx", "v1")
+        embed.down = True
+        await cache.set("general_question", "question", "fr", "ctx", "v2")
+        embed.down = False
+        near_duplicate = await cache.get("general_question", "la question ?", "fr", "ctx")
+        exact = await cache.get("general_question", "question", "fr", "ctx")
+        return near_duplicate, exact
+
+    assert asyncio.run(scenario()) == (None, "v2")
+
+
+def test_failed_reembedding_keeps_other_vectors_of_the_scope():
+    embed = FakeEmbeddings()
+    cache = semantic_cache(embed)
+
+    async def scenario():
+        await cache.set("general_question", "première", "fr", "ctx", "A")
+        await cache.set("general_question", "seconde", "fr", "ctx", "B")
+        embed.down = True
+        await cache.set("general_question", "seconde", "fr", "ctx", "B2")
+        embed.down = False
+        return await cache.get("general_question", "autre formulation", "fr", "ctx")
+
+    assert asyncio.run(scenario()) == "A"
+
+
+def test_semantic_scope_forgets_evicted_entries():
+    cache = semantic_cache(FakeEmbeddings(), max_entries=1)
+
+    async def scenario():
+        await cache.set("general_question", "première", "fr", "ctx", "A")
+        await cache.set("general_question", "seconde", "fr", "autre ctx", "B")
+        return await cache.get("general_question", "reformulée", "fr", "ctx")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_persistence_round_trip(tmp_path):
+    path = os.path.join(tmp_path, "answers.sqlite")
+
+    async def write():
+        cache = semantic_cache(FakeEmbeddings(), persist_path=path)
+        await cache.set("general_question", "question", "fr", "ctx", "Q")
+        await cache.set("drug_info", "doliprane", "fr", "ctx", "M")
+        await cache.close()
+
+    async def read():
+        cache = semantic_cache(FakeEmbeddings(), persist_path=path)
+        result = (
+            await cache.get("drug_info", "doliprane", "fr", "ctx"),
+            await cache.get("general_question", "la question ?", "fr", "ctx"),
+        )
+        await cache.close()
+        return result
+
+    asyncio.run(write())
+    assert asyncio.run(read()) == ("M", "Q")
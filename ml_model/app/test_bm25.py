@@ -0,0 +1,78 @@
+# app/test_bm25.py
+"""
+Tests de l'index lexical BM25 (noms de médicaments, recherche restreinte, fusion RRF)
+
+Exécutez depuis ml_model/: python -m pytest app/test_bm25.py
+"""
+from app.llm.bm25 import BM25Index, reciprocal_rank_fusion
+
+
+def build_index():
+    index = BM25Index()
+    index.add("warfarin-1", "Warfarin 5 mg tablets: anticoagulant, monitor INR", "Warfarin")
+    index.add("warfarin-2", "Warfarin interactions: bleeding risk with aspirin and NSAIDs", "Warfarin")
+    index.add("aspirin-1", "Aspirin 100 mg: antiplatelet, bleeding risk with anticoagulants", "Aspirin")
+    index.add("aspirin-2", "Aspirin overdose: tinnitus, metabolic acidosis", "Aspirin")
+    index.add("amox-1", "Amoxicillin 500 mg capsules: penicillin antibiotic", "Amoxicillin")
+    index.add("amox-clav-1", "Amoxicillin and clavulanic acid 875 mg tablets", "Amoxicillin Clavulanic Acid")
+    return index
+
+
+def test_match_name_prefers_longest_indexed_name():
+    index = build_index()
+    assert index.match_name("Amoxicillin 500 mg") == "amoxicillin"
+    assert index.match_name("amoxicillin clavulanic acid 875 mg") == "amoxicillin clavulanic acid"
+    assert index.match_name("ibuprofen 400 mg") is None
+
+
+def test_exact_match_only_allows_strength_and_form():
+    index = build_index()
+    assert index.match_name("Warfarin 5 mg tablets", exact=True) == "warfarin"
+    assert index.match_name("warfarin", exact=True) == "warfarin"
+    # Régression: une question qui commence par un nom n'est pas une recherche par nom
+    assert index.match_name("warfarin and aspirin together?", exact=True) is None
+    assert index.match_name("warfarin and aspirin together?") == "warfarin"
+
+
+def test_search_ranks_by_bm25_score():
+    ranked = build_index().search("bleeding risk aspirin", 3)
+    ids = [doc_id for doc_id, _ in ranked]
+    assert set(ids[:2]) == {"warfarin-2", "aspirin-1"}
+    assert all(a[1] >= b[1] for a, b in zip(ranked, ranked[1:]))
+
+
+def test_search_restricted_to_name_keeps_global_scores():
+    index = build_index()
+    restricted = index.search("bleeding risk aspirin", 10, name="warfarin")
+    # Tous les chunks du médicament, ceux qui correspondent en tête
+    assert [doc_id for doc_id, _ in restricted] == ["warfarin-2", "warfarin-1"]
+    assert restricted[1][1] == 0.0
+    assert dict(index.search("bleeding risk aspirin", 10))["warfarin-2"] == restricted[0][1]
+    assert index.search("bleeding", 10, name="ibuprofen") == []
+
+
+def test_removed_chunks_are_not_returned():
+    index = build_index()
+    index.remove(["warfarin-2"])
+    assert "warfarin-2" not in dict(index.search("bleeding risk", 10))
+    assert [doc_id for doc_id, _ in index.search("bleeding", 10, name="warfarin")] == ["warfarin-1"]
+    index.remove(["warfarin-1"])
+    assert index.match_name("warfarin 5 mg") is None
+    assert len(index) == 4
+
+
+def test_reciprocal_rank_fusion_sums_reciprocal_ranks():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c"]], k=1)
+    assert [doc_id for doc_id, _ in fused] == ["b", "c", "a"]
+    assert dict(fused)["b"] == 1 / 3 + 1 / 2
+
+
+def test_name_ranking_boosts_without_excluding_other_drugs():
+    # Chemin hybride d'une question "warfarin ...": le classement restreint s'ajoute à la fusion
+    index = build_index()
+    query = "warfarin and aspirin together bleeding"
+    lexical = [doc_id for doc_id, _ in index.search(query, 10)]
+    by_name = [doc_id for doc_id, _ in index.search(query, 10, name=index.match_name(query))]
+    fused = [doc_id for doc_id, _ in reciprocal_rank_fusion([lexical, by_name])]
+    assert fused[0] == "warfarin-2"
+    assert "aspirin-1" in fused[:3]
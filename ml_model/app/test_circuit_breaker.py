@@ -0,0 +1,135 @@
+# app/test_circuit_breaker.py
+"""
+Tests du disjoncteur (transitions fermé / ouvert / semi-ouvert)
+
+Exécutez depuis ml_model/: python -m pytest app/test_circuit_breaker.py
+"""
+import asyncio
+
+import pytest
+
+from app.utils import circuit_breaker
+from app.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class Clock:
+    """Horloge monotone contrôlée par le test"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+
+async def succeed():
+    return "ok"
+
+
+async def fail():
+    raise ConnectionError("dépendance injoignable")
+
+
+def run(breaker, fn, **kwargs):
+    return asyncio.run(breaker.call(fn, **kwargs))
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("dailymed", failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            run(breaker, fail)
+    assert breaker.state == CLOSED
+    with pytest.raises(ConnectionError):
+        run(breaker, fail)
+    assert breaker.state == OPEN and breaker.is_open
+
+    with pytest.raises(CircuitOpenError) as error:
+        run(breaker, succeed)
+    assert error.value.retry_in == 30
+    assert breaker.stats()["rejected"] == 1 and breaker.stats()["opened"] == 1
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("dailymed", failure_threshold=2, reset_timeout=30)
+    with pytest.raises(ConnectionError):
+        run(breaker, fail)
+    assert run(breaker, succeed) == "ok"
+    with pytest.raises(ConnectionError):
+        run(breaker, fail)
+    assert breaker.state == CLOSED and breaker.failures == 1
+
+
+def test_half_open_trial_success_closes(clock):
+    breaker = CircuitBreaker("llm", failure_threshold=1, reset_timeout=30)
+    breaker.trip()
+    clock.now += 31
+    assert not breaker.is_open and breaker.stats()["state"] == HALF_OPEN
+    assert run(breaker, succeed) == "ok"
+    assert breaker.state == CLOSED and breaker.failures == 0
+
+
+def test_half_open_trial_failure_reopens(clock):
+    breaker = CircuitBreaker("llm", failure_threshold=5, reset_timeout=30)
+    breaker.trip()
+    clock.now += 31
+    with pytest.raises(ConnectionError):
+        run(breaker, fail)
+    assert breaker.state == OPEN and breaker.is_open
+    assert breaker.opened_at == clock.now
+
+
+def test_half_open_allows_a_single_trial(clock):
+    breaker = CircuitBreaker("llm", failure_threshold=1, reset_timeout=30)
+    breaker.trip()
+    clock.now += 31
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_caller_errors_and_results_flagged_as_failures(clock):
+    breaker = CircuitBreaker("dailymed", failure_threshold=1, reset_timeout=30)
+
+    async def caller_bug():
+        raise KeyError("erreur de l'appelant")
+
+    # Exception hors `failures`: neutre pour la dépendance
+    with pytest.raises(KeyError):
+        run(breaker, caller_bug, failures=(ConnectionError,))
+    assert breaker.state == CLOSED
+
+    # Résultat jugé en échec (ex: HTTP 503): renvoyé tel quel mais compté
+    assert run(breaker, succeed, is_failure=lambda result: result == "ok") == "ok"
+    assert breaker.state == OPEN
+
+
+def test_neutral_error_during_trial_releases_it(clock):
+    breaker = CircuitBreaker("dailymed", failure_threshold=1, reset_timeout=30)
+    breaker.trip()
+    clock.now += 31
+
+    async def cancelled():
+        raise asyncio.CancelledError()
+
+    with pytest.raises(asyncio.CancelledError):
+        run(breaker, cancelled)
+    assert breaker.state == HALF_OPEN
+    assert run(breaker, succeed) == "ok" and breaker.state == CLOSED
+
+
+def test_health_monitor_trip_and_reset(clock):
+    breaker = CircuitBreaker("dailymed", failure_threshold=3, reset_timeout=30)
+    breaker.trip()
+    breaker.trip()
+    assert breaker.is_open and breaker.totals["opened"] == 1
+    breaker.reset()
+    assert breaker.state == CLOSED and run(breaker, succeed) == "ok"
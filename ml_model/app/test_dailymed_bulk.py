@@ -0,0 +1,57 @@
+# app/test_dailymed_bulk.py
+"""
+Tests du checkpoint de l'ingestion DailyMed en masse (reprise, taille bornée)
+
+Exécutez depuis ml_model/: python -m pytest app/test_dailymed_bulk.py
+"""
+import json
+import os
+import zipfile
+
+from app.ingestion.dailymed_bulk import Checkpoint, iter_archive_entries
+
+
+def test_out_of_order_entries_advance_the_high_water_mark(tmp_path):
+    checkpoint = Checkpoint(os.path.join(tmp_path, "checkpoint.json"))
+    checkpoint.mark([("a.zip", 1), ("a.zip", 3)], documents=4)
+    assert not checkpoint.is_done("a.zip", 0) and checkpoint.is_done("a.zip", 1)
+
+    checkpoint.mark([("a.zip", 0), ("a.zip", 2)], documents=2)
+    checkpoint.save()
+    with open(checkpoint.path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    assert state == {"archives": {"a.zip": {"complete": False, "next": 4, "done": []}}, "documents": 6}
+
+
+def test_resume_from_saved_checkpoint(tmp_path):
+    path = os.path.join(tmp_path, "checkpoint.json")
+    checkpoint = Checkpoint(path)
+    checkpoint.mark([("a.zip", 0), ("a.zip", 2), ("b.zip", 0)], documents=3)
+    checkpoint.complete("b.zip")
+    checkpoint.save()
+
+    resumed = Checkpoint(path)
+    assert [resumed.is_done("a.zip", i) for i in range(4)] == [True, False, True, False]
+    assert resumed.is_done("b.zip") and not resumed.is_done("a.zip")
+    assert not resumed.is_done("c.zip", 0)
+    assert resumed.state["documents"] == 3
+
+
+def test_saved_size_does_not_grow_with_the_archive(tmp_path):
+    checkpoint = Checkpoint(os.path.join(tmp_path, "checkpoint.json"))
+    for start in range(0, 100000, 100):
+        checkpoint.mark([("a.zip", i) for i in range(start, start + 100)], documents=100)
+    checkpoint.save()
+    assert os.path.getsize(checkpoint.path) < 200
+
+
+def test_archive_entries_are_numbered_in_archive_order(tmp_path):
+    path = os.path.join(tmp_path, "release.zip")
+    with zipfile.ZipFile(path, "w") as archive:
+        for name in ["b.zip", "README.txt", "a.xml", "c.zip"]:
+            archive.writestr(name, name)
+
+    entries = [(index, name) for index, name, _ in iter_archive_entries(path)]
+    assert entries == [(0, "b.zip"), (1, "a.xml"), (2, "c.zip")]
+    remaining = [index for index, _, _ in iter_archive_entries(path, skip=lambda index: index < 2)]
+    assert remaining == [2]
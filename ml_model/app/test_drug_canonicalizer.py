@@ -0,0 +1,77 @@
+# app/test_drug_canonicalizer.py
+"""
+Tests de la canonicalisation des noms (marques, sels, associations, dump DailyMed)
+
+Exécutez depuis ml_model/: python -m pytest app/test_drug_canonicalizer.py
+"""
+import json
+import os
+
+from app.database.drug_canonicalizer import MATCH_NONE, MATCH_PREFIX, DrugCanonicalizer, canonical_subject
+
+
+def builtin_canonicalizer(tmp_path):
+    """Sans dump ni CSV: synonymes et marques intégrés seulement"""
+    return DrugCanonicalizer(os.path.join(tmp_path, "absent.json"), os.path.join(tmp_path, "absent.csv"))
+
+
+def canonicals(canonicalizer, names):
+    return [(r["canonical"], r["match"]) for r in canonicalizer.resolve_batch(names)]
+
+
+def test_builtin_brands_resolve_without_dump(tmp_path):
+    canonicalizer = builtin_canonicalizer(tmp_path)
+    assert canonicals(canonicalizer, ["Doliprane", "Tylenol 500", "Efferalgan 1g", "Advil 400 mg"]) == [
+        ("acetaminophen", "exact"), ("acetaminophen", "exact"), ("acetaminophen", "exact"), ("ibuprofen", "exact"),
+    ]
+
+
+def test_salts_and_french_spellings(tmp_path):
+    canonicalizer = builtin_canonicalizer(tmp_path)
+    assert canonicals(canonicalizer, [
+        "Metformin Hydrochloride 500 mg", "chlorhydrate de metformine", "Paracétamol 1g", "Levothyroxine sodique",
+    ]) == [
+        ("metformin", "exact"), ("metformin", "variant"), ("acetaminophen", "exact"), ("levothyroxine", "exact"),
+    ]
+
+
+def test_combinations_keep_every_ingredient(tmp_path):
+    canonicalizer = builtin_canonicalizer(tmp_path)
+    augmentin, tylenol_pm = canonicalizer.resolve_batch(["Augmentin 1g", "Tylenol PM"])
+    assert augmentin["ingredients"] == ["amoxicillin", "clavulanic acid"]
+    assert augmentin["canonical"] == "amoxicillin + clavulanic acid"
+    assert tylenol_pm["ingredients"] == ["acetaminophen", "diphenhydramine"]
+
+
+def test_prefix_only_accepts_strength_words(tmp_path):
+    canonicalizer = builtin_canonicalizer(tmp_path)
+    extra, cold = canonicalizer.resolve_batch(["Tylenol Extra Strength", "Tylenol Cold and Flu"])
+    assert (extra["canonical"], extra["match"]) == ("acetaminophen", MATCH_PREFIX)
+    assert extra["ingredients"] and canonical_subject("Tylenol Extra Strength", extra) == "Tylenol Extra Strength"
+    assert cold["match"] == MATCH_NONE and cold["ingredients"] == []
+
+
+def test_unknown_and_empty_names(tmp_path):
+    canonicalizer = builtin_canonicalizer(tmp_path)
+    assert canonicals(canonicalizer, ["unknownium 5 mg", ""]) == [("unknownium", MATCH_NONE), ("", MATCH_NONE)]
+
+
+def test_dump_and_csv_extend_the_builtin_table(tmp_path):
+    dump = os.path.join(tmp_path, "drugnames.json")
+    with open(dump, "w", encoding="utf-8") as f:
+        json.dump({"data": [
+            {"drug_name": "Janumet", "active_ingredients": [{"name": "Sitagliptin"}, {"name": "Metformin Hydrochloride"}]},
+            {"drug_name": "Glucophage", "active_ingredients": [{"name": "Metformin Hydrochloride"}]},
+        ]}, f)
+    synonyms = os.path.join(tmp_path, "synonyms.csv")
+    with open(synonyms, "w", encoding="utf-8") as f:
+        f.write("alias,ingredient\nstagid,metformin\nrhinadvil,ibuprofen + pseudoephedrine\n")
+
+    canonicalizer = DrugCanonicalizer(dump, synonyms)
+    assert canonicals(canonicalizer, ["Janumet 50/1000", "Glucophage", "Stagid 700", "Rhinadvil"]) == [
+        ("sitagliptin + metformin", "exact"),
+        ("metformin", "exact"),
+        ("metformin", "exact"),
+        ("ibuprofen + pseudoephedrine", "exact"),
+    ]
+    assert canonicalizer.top_ingredients(1) == ["metformin"]
@@ -0,0 +1,98 @@
+# app/test_interaction_index.py
+"""
+Tests du moteur local d'interactions (paires d'une ordonnance, sévérités, jeu vide)
+
+Exécutez depuis ml_model/: python -m pytest app/test_interaction_index.py
+"""
+import os
+
+from app.database.interaction_index import InteractionIndex, parse_severity
+
+DATASET = """ingredient_a,ingredient_b,severity,mechanism,management
+Warfarin,Aspirin,major,Risque hémorragique,Éviter
+Aspirin,Warfarin,minor,Doublon moins grave,Ignoré
+Warfarin Sodium,Omeprazole,moderate,Inhibition CYP2C19,Surveiller l'INR
+Amoxicillin,Clavulanic Acid,minor,Association fixe,Aucune
+Amoxicillin,Methotrexate,major,Clairance réduite,Surveiller
+Clavulanic Acid,Methotrexate,minor,Mineure,Aucune
+Simvastatin,Clarithromycin,contre-indiquée,Inhibition CYP3A4,Contre-indiqué
+"""
+
+
+def write_index(tmp_path, content=DATASET):
+    path = os.path.join(tmp_path, "interactions.csv")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return InteractionIndex(path)
+
+
+def test_parse_severity_accepts_french_labels():
+    assert parse_severity("Major") == parse_severity("majeure") == 3
+    assert parse_severity("contre-indiquée") == 4
+    assert parse_severity("") == parse_severity("inconnue") == 0
+
+
+def test_duplicate_pairs_keep_the_most_severe(tmp_path):
+    index = write_index(tmp_path)
+    assert len(index) == 6
+    hits = index.check([["warfarin"], ["aspirin"]])
+    assert [(hit["items"], hit["severity"], hit["mechanism"]) for hit in hits] == [
+        ((0, 1), "major", "Risque hémorragique"),
+    ]
+
+
+def test_results_sorted_by_decreasing_severity(tmp_path):
+    index = write_index(tmp_path)
+    hits = index.check([["omeprazole"], ["clarithromycin"], ["warfarin sodium"], ["aspirin"], ["simvastatin"]])
+    assert [(hit["items"], hit["severity"]) for hit in hits] == [
+        ((1, 4), "contraindicated"),
+        ((2, 3), "major"),
+        ((0, 2), "moderate"),
+    ]
+
+
+def test_pairs_within_one_drug_are_ignored(tmp_path):
+    index = write_index(tmp_path)
+    # Augmentin: amoxicilline + acide clavulanique, interaction connue mais même médicament
+    assert index.check([["amoxicillin", "clavulanic acid"]]) == []
+    assert index.check([["amoxicillin", "clavulanic acid"], ["omeprazole"]]) == []
+
+
+def test_multi_ingredient_drug_reports_the_most_severe_pair(tmp_path):
+    index = write_index(tmp_path)
+    hits = index.check([["methotrexate"], ["amoxicilline", "acide clavulanique"]])
+    assert len(hits) == 1
+    assert hits[0]["items"] == (0, 1) and hits[0]["severity"] == "major"
+    assert hits[0]["ingredients"] == ["methotrexate", "amoxicillin"]
+
+
+def test_unknown_ingredients_and_single_drug(tmp_path):
+    index = write_index(tmp_path)
+    assert index.check([["warfarin"]]) == []
+    assert index.check([["warfarin"], ["unknownium"]]) == []
+    assert index.ingredient_id("unknownium") is None
+    assert {hit["ingredients"][1] for hit in index.interactions_of("warfarin")} == {"aspirin", "omeprazole"}
+
+
+def test_empty_dataset(tmp_path):
+    index = write_index(tmp_path, "ingredient_a,ingredient_b,severity,mechanism,management\n")
+    assert len(index) == 0 and index.ingredient_count == 0
+    assert index.check([["warfarin"], ["aspirin"]]) == []
+    assert index.interactions_of("warfarin") == []
+
+
+def test_missing_dataset_and_failed_reload_keep_previous_snapshot(tmp_path):
+    missing = InteractionIndex(os.path.join(tmp_path, "absent.csv"))
+    assert len(missing) == 0 and missing.check([["warfarin"], ["aspirin"]]) == []
+
+    index = write_index(tmp_path)
+    broken = os.path.join(tmp_path, "broken.csv")
+    with open(broken, "w", encoding="utf-8") as f:
+        f.write("foo,bar\n1,2\n")
+    assert not index.reload(broken)
+    assert len(index.check([["warfarin"], ["aspirin"]])) == 1
+
+
+def test_ddinter_export_columns(tmp_path):
+    index = write_index(tmp_path, "DDInterID_A,Drug_A,DDInterID_B,Drug_B,Level\nx,Warfarin,y,Aspirin,Major\n")
+    assert [hit["severity"] for hit in index.check([["aspirin"], ["warfarin"]])] == ["major"]
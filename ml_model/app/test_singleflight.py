@@ -0,0 +1,129 @@
+# app/test_singleflight.py
+"""
+Tests de la coalescence des appels concurrents (SingleFlight)
+
+Exécutez depuis ml_model/: python -m pytest app/test_singleflight.py
+"""
+import asyncio
+
+import pytest
+
+from app.utils.singleflight import SingleFlight
+
+
+class SlowCall:
+    """Appel lent comptant ses exécutions, en échec à la demande"""
+
+    def __init__(self, result="ok", error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.release = None
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    call = SlowCall("réponse")
+
+    async def scenario():
+        call.release = asyncio.Event()
+        callers = [asyncio.create_task(flight.do("k", call)) for _ in range(5)]
+        await asyncio.sleep(0)
+        call.release.set()
+        return await asyncio.gather(*callers)
+
+    assert asyncio.run(scenario()) == ["réponse"] * 5
+    assert call.calls == 1
+    assert flight.stats() == {"executed": 1, "shared": 4, "in_flight": 0, "shared_ratio": 0.8}
+
+
+def test_distinct_keys_and_later_calls_run_again():
+    flight = SingleFlight()
+    call = SlowCall()
+
+    async def scenario():
+        call.release = asyncio.Event()
+        call.release.set()
+        await asyncio.gather(flight.do("a", call), flight.do("b", call))
+        await flight.do("a", call)
+
+    asyncio.run(scenario())
+    assert call.calls == 3
+
+
+def test_error_is_propagated_to_every_caller_and_not_cached():
+    flight = SingleFlight()
+    call = SlowCall(error=ValueError("pipeline en échec"))
+
+    async def scenario():
+        call.release = asyncio.Event()
+        callers = [asyncio.create_task(flight.do("k", call)) for _ in range(3)]
+        await asyncio.sleep(0)
+        call.release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        call.error = None
+        return results, await flight.do("k", call)
+
+    results, retry = asyncio.run(scenario())
+    assert [type(r) for r in results] == [ValueError] * 3
+    assert retry == "ok" and call.calls == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    flight = SingleFlight()
+    call = SlowCall("réponse")
+
+    async def scenario():
+        call.release = asyncio.Event()
+        first = asyncio.create_task(flight.do("k", call))
+        second = asyncio.create_task(flight.do("k", call))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        call.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "réponse"
+    assert call.calls == 1
+
+
+def test_all_callers_cancelled_lets_the_call_finish():
+    flight = SingleFlight()
+    call = SlowCall("réponse")
+
+    async def scenario():
+        call.release = asyncio.Event()
+        caller = asyncio.create_task(flight.do("k", call))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.sleep(0)
+        assert flight.stats()["in_flight"] == 1
+        call.release.set()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return flight.stats()["in_flight"]
+
+    assert asyncio.run(scenario()) == 0
+    assert call.calls == 1
+
+
+def test_disabled_runs_every_call():
+    flight = SingleFlight(enabled=False)
+    call = SlowCall()
+
+    async def scenario():
+        call.release = asyncio.Event()
+        call.release.set()
+        await asyncio.gather(*(flight.do("k", call) for _ in range(3)))
+
+    asyncio.run(scenario())
+    assert call.calls == 3 and flight.stats()["shared"] == 0
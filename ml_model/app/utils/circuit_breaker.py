@@ -0,0 +1,145 @@
+# app/utils/circuit_breaker.py
+"""
+Disjoncteur ("circuit breaker") pour les dépendances externes
+
+Après `failure_threshold` échecs consécutifs, le circuit s'ouvre: les
+appels sont refusés immédiatement (CircuitOpenError) au lieu d'attendre un
+timeout. Passé `reset_timeout`, un seul appel d'essai est autorisé
+(semi-ouvert): son succès referme le circuit, son échec le rouvre.
+Le moniteur de santé peut aussi ouvrir (trip) ou refermer (reset) le circuit.
+"""
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Type, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Appel refusé: le circuit de la dépendance est ouvert"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} indisponible (circuit ouvert, nouvel essai dans {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Disjoncteur à trois états (fermé, ouvert, semi-ouvert)"""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        """
+        Args:
+            name: Nom de la dépendance (logs, statistiques)
+            failure_threshold: Échecs consécutifs avant ouverture
+            reset_timeout: Durée d'ouverture avant l'appel d'essai, en secondes
+        """
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self.totals = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def is_open(self) -> bool:
+        """Vrai tant que les appels sont refusés (ouvert, essai non encore dû)"""
+        return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def allow(self) -> bool:
+        """Un appel peut-il passer ? (passe en semi-ouvert à l'échéance)"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = HALF_OPEN
+            self._trial_running = False
+        # Semi-ouvert: un seul appel d'essai à la fois
+        if self._trial_running:
+            return False
+        self._trial_running = True
+        return True
+
+    def check(self):
+        """Lève CircuitOpenError si l'appel doit être refusé"""
+        if not self.allow():
+            self.totals["rejected"] += 1
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            raise CircuitOpenError(self.name, retry_in)
+
+    def record_success(self):
+        self.totals["calls"] += 1
+        if self.state != CLOSED:
+            logger.info(f"✅ Circuit {self.name} refermé")
+        self.reset()
+
+    def record_failure(self):
+        self.totals["calls"] += 1
+        self.totals["failures"] += 1
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.trip()
+
+    def release(self):
+        """Appel terminé sans verdict (erreur de l'appelant, annulation): libère l'essai"""
+        self._trial_running = False
+
+    def trip(self):
+        """Ouvre le circuit (échecs répétés ou sonde de santé en échec)"""
+        if self.state != OPEN:
+            self.totals["opened"] += 1
+            logger.warning(f"⚠️  Circuit {self.name} ouvert pour {self.reset_timeout:.0f}s")
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self._trial_running = False
+
+    def reset(self):
+        """Referme le circuit"""
+        self.state = CLOSED
+        self.failures = 0
+        self._trial_running = False
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        failures: Tuple[Type[BaseException], ...] = (Exception,),
+        is_failure: Optional[Callable[[T], bool]] = None
+    ) -> T:
+        """
+        Exécute fn() à travers le disjoncteur
+
+        Args:
+            failures: Exceptions comptées comme échec de la dépendance (les autres sont neutres)
+            is_failure: Résultat compté comme échec (ex: réponse HTTP 503), renvoyé tel quel
+        """
+        self.check()
+        try:
+            result = await fn()
+        except failures:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Erreur de l'appelant ou annulation: ne juge pas la dépendance
+            self.release()
+            raise
+        if is_failure is not None and is_failure(result):
+            self.record_failure()
+        else:
+            self.record_success()
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            "state": OPEN if self.is_open else (HALF_OPEN if self.state != CLOSED else CLOSED),
+            "consecutive_failures": self.failures,
+            **self.totals
+        }
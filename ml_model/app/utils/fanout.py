@@ -0,0 +1,62 @@
+# app/utils/fanout.py
+"""
+Exécution concurrente bornée d'un lot, résultats au fil de l'eau
+
+Utilisé par les endpoints batch: chaque clé unique est traitée une seule
+fois, au plus `limit` à la fois, et chaque résultat (ou erreur) est émis dès
+qu'il est prêt. Une erreur n'interrompt pas le reste du lot.
+"""
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+
+async def bounded_fan_out(
+    keys: Iterable[Hashable],
+    worker: Callable[[Hashable], Awaitable[Any]],
+    limit: int
+) -> AsyncIterator[Tuple[Hashable, Any, Optional[Exception]]]:
+    """
+    Exécute worker(clé) pour chaque clé, au plus `limit` en parallèle
+
+    Yields:
+        (clé, résultat, None) ou (clé, None, exception), dans l'ordre de fin
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def _run(key):
+        async with semaphore:
+            return await worker(key)
+
+    pending = {asyncio.ensure_future(_run(key)): key for key in dict.fromkeys(keys)}
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                key = pending.pop(task)
+                error = task.exception()
+                yield key, (None if error else task.result()), error
+    finally:
+        # Client déconnecté ou générateur fermé: le reste du lot est abandonné
+        for task in pending:
+            task.cancel()
+
+
+async def in_order(events: AsyncIterator[Dict], key: str = "index") -> AsyncIterator[Dict]:
+    """
+    Réémet les événements indexés (0, 1, ...) dans l'ordre des index
+
+    Un événement est émis dès que tous les précédents l'ont été; les
+    événements sans index passent tels quels.
+    """
+    buffered: Dict[int, Dict] = {}
+    next_index = 0
+    async for event in events:
+        if key not in event:
+            yield event
+            continue
+        buffered[event[key]] = event
+        while next_index in buffered:
+            yield buffered.pop(next_index)
+            next_index += 1
+    for index in sorted(buffered):
+        yield buffered[index]
@@ -0,0 +1,340 @@
+# app/utils/metrics.py
+"""
+Métriques Prometheus (format texte 0.0.4) et spans de latence par étape
+
+Chaque étape du pipeline (récupération, embeddings, HTTP DailyMed, écriture
+de l'index, construction du prompt, LLM) est chronométrée par `span(stage)`
+ou `@timed(stage)`: la durée alimente l'histogramme pharma_stage_duration_seconds
+et, pendant une requête HTTP, la trace de la requête (`start_trace`), qui
+permet de journaliser la répartition du temps des requêtes lentes.
+
+Les spans peuvent s'imbriquer (ex. l'écriture dans l'index inclut les
+embeddings des nouveaux documents): chaque étape est mesurée séparément.
+
+Coût: deux perf_counter, une recherche dichotomique et un verrou par span.
+Les compteurs déjà tenus par les services (caches, coalescence, contexte)
+sont lus au moment du scrape par des collecteurs, sans coût par requête.
+"""
+import asyncio
+import bisect
+import contextvars
+import functools
+import logging
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Secondes: de la recherche en mémoire (ms) aux complétions LLM (dizaines de s)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Métrique à étiquettes: une série par combinaison de valeurs"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, values: Tuple[str, ...]) -> Tuple[str, ...]:
+        if len(values) != len(self.labels):
+            raise ValueError(f"{self.name}: étiquettes attendues {self.labels}, reçu {values}")
+        return values
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Compteur monotone"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *values: str, amount: float = 1.0):
+        key = self._key(values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *values: str) -> float:
+        return self._values.get(tuple(values), 0.0)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = list(self._values.items())
+        return [(f"{self.name}_total", dict(zip(self.labels, key)), value) for key, value in items]
+
+
+class Histogram(_Metric):
+    """Histogramme à seaux fixes (sum, count et seaux cumulés à l'export)"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Par série: [compte par seau (non cumulé, +Inf en dernier), somme, nombre]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *values: str):
+        key = self._key(values)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *values: str) -> int:
+        series = self._series.get(tuple(values))
+        return series[2] if series else 0
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = [(key, list(series[0]), series[1], series[2]) for key, series in self._series.items()]
+        samples = []
+        for key, counts, total, count in items:
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, math.inf), counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class Registry:
+    """Métriques enregistrées + collecteurs appelés au scrape"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        # Collecteur: () -> [(nom, type, aide, [(nom d'échantillon, étiquettes, valeur)])]
+        self._collectors: List[Callable[[], List[Tuple[str, str, str, List[Sample]]]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def add_collector(self, collector: Callable[[], List[Tuple[str, str, str, List[Sample]]]]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Exposition au format texte Prometheus"""
+        families = [
+            (metric.name, metric.kind, metric.documentation, metric.samples())
+            for metric in self._metrics.values()
+        ]
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                logger.error(f"❌ Collecteur de métriques: {str(e)}")
+        lines = []
+        for name, kind, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Instance globale
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "pharma_stage_duration_seconds",
+    "Durée des étapes du pipeline (retrieval, embedding, dailymed_http, vector_store_write, prompt_build, llm)",
+    ["stage"]
+)
+STAGE_ERRORS = registry.counter(
+    "pharma_stage_errors",
+    "Étapes terminées par une exception",
+    ["stage"]
+)
+LLM_TOKENS = registry.counter(
+    "pharma_llm_tokens",
+    "Tokens des complétions LLM (source: api = usage facturé, estimated = tokenizer local pour les flux)",
+    ["type", "source"]
+)
+LLM_FIRST_TOKEN_SECONDS = registry.histogram(
+    "pharma_llm_first_token_seconds",
+    "Délai avant le premier token des complétions en streaming"
+)
+HTTP_SECONDS = registry.histogram(
+    "pharma_http_request_duration_seconds",
+    "Durée des requêtes HTTP (route = modèle de chemin), corps streamé compris",
+    ["method", "route", "status"]
+)
+
+# Durées cumulées par étape de la requête HTTP en cours (None hors requête)
+_trace: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("metrics_trace", default=None)
+
+
+class span:
+    """
+    Chronomètre une étape (bloc `with`)
+
+    Usage:
+        with span("retrieval"):
+            ...
+    """
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not config.METRICS_ENABLED:
+            return False
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(elapsed, self.stage)
+        if exc_type is not None and not issubclass(exc_type, (asyncio.CancelledError, GeneratorExit)):
+            STAGE_ERRORS.inc(self.stage)
+        trace = _trace.get()
+        if trace is not None:
+            trace[self.stage] = trace.get(self.stage, 0.0) + elapsed
+        return False
+
+
+def timed(stage: str):
+    """Décorateur: span(stage) autour de chaque appel (fonction ou coroutine)"""
+    def decorate(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def start_trace() -> Tuple[Dict[str, float], contextvars.Token]:
+    """
+    Ouvre la trace d'une requête
+
+    Le dictionnaire est partagé avec les tâches et threads lancés pendant la
+    requête (contexte copié): leurs spans y sont cumulés.
+    """
+    trace: Dict[str, float] = {}
+    return trace, _trace.set(trace)
+
+
+def end_trace(token: contextvars.Token):
+    _trace.reset(token)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: durée de chaque requête HTTP et trace de ses étapes
+
+    Middleware ASGI pur (pas BaseHTTPMiddleware): la mesure couvre les
+    réponses streamées jusqu'au dernier octet. Les requêtes plus lentes que
+    config.SLOW_REQUEST_MS sont journalisées avec leur durée par étape.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not config.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status = ["500"]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        start = time.perf_counter()
+        trace, token = start_trace()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            end_trace(token)
+            elapsed = time.perf_counter() - start
+            # Modèle de chemin de la route (cardinalité bornée), pas le chemin brut
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_SECONDS.observe(elapsed, scope["method"], route, status[0])
+            if elapsed * 1000 >= config.SLOW_REQUEST_MS:
+                stages = ", ".join(
+                    f"{stage} {seconds * 1000:.0f} ms"
+                    for stage, seconds in sorted(trace.items(), key=lambda item: -item[1])
+                )
+                logger.warning(
+                    f"⏱️  Requête lente {scope['method']} {route} ({status[0]}): "
+                    f"{elapsed * 1000:.0f} ms - {stages or 'aucune étape mesurée'}"
+                )
+
+
+def record_tokens(prompt_tokens: int, completion_tokens: int, source: str = "api"):
+    if not config.METRICS_ENABLED:
+        return
+    LLM_TOKENS.inc("prompt", source, amount=prompt_tokens)
+    LLM_TOKENS.inc("completion", source, amount=completion_tokens)
@@ -0,0 +1,83 @@
+# app/utils/retry.py
+"""
+Outils de retry: backoff exponentiel avec jitter et lecture des en-têtes de rate limit
+"""
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+# Durées au format OpenAI: "1s", "6m0s", "20ms", "1h2m3.5s"
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 20.0) -> float:
+    """
+    Délai de backoff exponentiel avec "full jitter"
+
+    Args:
+        attempt: Numéro de la tentative (0 pour le premier retry)
+        base: Délai de base en secondes
+        cap: Délai maximum en secondes
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Convertit "6m0s" / "20ms" / "1.5" en secondes"""
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in parts)
+
+
+def retry_after_seconds(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """
+    Extrait le délai demandé par le fournisseur à partir des en-têtes HTTP
+
+    Gère retry-after-ms, retry-after (secondes ou date HTTP) et
+    x-ratelimit-reset-requests / x-ratelimit-reset-tokens.
+
+    Returns:
+        Délai en secondes ou None si aucun en-tête exploitable
+    """
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000.0)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        delay = _parse_duration(retry_after)
+        if delay is not None:
+            return max(0.0, delay)
+        try:
+            retry_date = parsedate_to_datetime(retry_after)
+            return max(0.0, retry_date.timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+
+    resets = []
+    for header in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        value = headers.get(header)
+        if value:
+            delay = _parse_duration(value)
+            if delay is not None:
+                resets.append(delay)
+
+    return max(resets) if resets else None
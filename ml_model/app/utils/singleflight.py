@@ -0,0 +1,64 @@
+# app/utils/singleflight.py
+"""
+Coalescence des appels concurrents identiques ("single-flight")
+
+Les appelants qui demandent la même clé pendant qu'un appel est en cours
+partagent son résultat au lieu de relancer le même pipeline.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Partage un future en cours entre les appelants d'une même clé"""
+
+    def __init__(self, name: str = "singleflight", enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Exécute fn() une seule fois pour tous les appelants concurrents de `key`
+
+        L'appel tourne dans sa propre tâche: l'annulation d'un appelant
+        n'interrompt pas les autres. Les exceptions sont propagées à tous.
+        """
+        if not self.enabled:
+            self.executed += 1
+            return await fn()
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(fn())
+        self._inflight[key] = future
+        self.executed += 1
+        future.add_done_callback(lambda f: self._done(key, f))
+        return await asyncio.shield(future)
+
+    def _done(self, key: str, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        # Évite "exception was never retrieved" si tous les appelants ont été annulés
+        if not future.cancelled() and future.exception() is not None:
+            logger.debug(f"{self.name}: échec partagé pour {key}: {future.exception()}")
+
+    def stats(self) -> Dict:
+        """Appels exécutés vs appels servis par un future partagé"""
+        total = self.executed + self.shared
+        return {
+            "executed": self.executed,
+            "shared": self.shared,
+            "in_flight": len(self._inflight),
+            "shared_ratio": round(self.shared / total, 4) if total else 0.0
+        }
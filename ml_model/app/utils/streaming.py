@@ -0,0 +1,60 @@
+# app/utils/streaming.py
+"""
+Encodage des événements de streaming (Server-Sent Events ou NDJSON)
+"""
+import json
+import logging
+from typing import AsyncIterator, Dict
+
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+STREAM_FORMATS = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def encode_event(event: Dict, stream_format: str = "sse") -> str:
+    """
+    Encode un événement pour le format demandé
+
+    SSE: "event: <type>\\ndata: <json>\\n\\n" - NDJSON: une ligne JSON
+    """
+    payload = json.dumps(event, ensure_ascii=False)
+    if stream_format == "ndjson":
+        return payload + "\n"
+    return f"event: {event.get('type', 'message')}\ndata: {payload}\n\n"
+
+
+async def _encode_stream(events: AsyncIterator[Dict], stream_format: str) -> AsyncIterator[str]:
+    """Encode les événements au fil de l'eau, erreur émise comme événement final"""
+    try:
+        async for event in events:
+            yield encode_event(event, stream_format)
+    except Exception as e:
+        logger.error(f"❌ Erreur streaming: {str(e)}")
+        yield encode_event({"type": "error", "message": str(e)}, stream_format)
+
+
+def event_stream_response(events: AsyncIterator[Dict], stream_format: str = "sse") -> StreamingResponse:
+    """
+    Construit une StreamingResponse à partir d'un générateur d'événements
+
+    Args:
+        events: Générateur async d'événements (dicts avec une clé "type")
+        stream_format: "sse" ou "ndjson"
+    """
+    if stream_format not in STREAM_FORMATS:
+        stream_format = "sse"
+
+    return StreamingResponse(
+        _encode_stream(events, stream_format),
+        media_type=STREAM_FORMATS[stream_format],
+        headers={
+            "Cache-Control": "no-cache",
+            # Désactive le buffering des reverse proxies (nginx)
+            "X-Accel-Buffering": "no"
+        }
+    )
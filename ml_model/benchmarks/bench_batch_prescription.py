@@ -0,0 +1,140 @@
+# benchmarks/bench_batch_prescription.py
+"""
+Ordonnance de 10 lignes: appels séquentiels par médicament vs endpoint batch
+
+Backends simulés (RAG, DailyMed, LLM stub). Séquentiel = 10 appels
+get_drug_information successifs (comme 10 requêtes HTTP); batch =
+batch_drug_information (canonicalisation en lot, récupération partagée,
+fan-out borné). Compare durée totale, délai du premier résultat, appels
+backend; une ligne inconnue de DailyMed échoue sans interrompre le lot.
+Exécutez depuis ml_model/: python -m benchmarks.bench_batch_prescription
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+
+from app.database.drug_canonicalizer import DrugCanonicalizer
+from app.llm.answer_cache import AnswerCache
+from app.llm.llm_engine import LLMEngine
+from app.services.drug_service import DrugService
+from benchmarks.stub_openai_server import StubServer
+
+PRESCRIPTION = [
+    "Doliprane 1000 mg", "paracétamol", "Amoxicilline 500mg", "Augmentin", "Metformine 850",
+    "Glucophage", "Kardegic 75", "Atorvastatine 20 mg", "Inexium 40", "Introuvable X",
+]
+DUMP = [
+    ("Doliprane", ["Acetaminophen"]), ("Augmentin", ["Amoxicillin", "Clavulanate Potassium"]),
+    ("Glucophage", ["Metformin Hydrochloride"]), ("Kardegic", ["Aspirin"]),
+    ("Tahor", ["Atorvastatin Calcium"]), ("Inexium", ["Esomeprazole Magnesium"]),
+    ("Amoxicillin", ["Amoxicillin"]), ("Metformin", ["Metformin Hydrochloride"]),
+    ("Atorvastatin", ["Atorvastatin Calcium"]),
+]
+
+
+class StubRAG:
+    """RAG simulé: contexte pour les sujets déjà importés, latence par appel"""
+
+    def __init__(self, latency: float, known):
+        self.latency = latency
+        self.known = set(known)
+        self.calls = {"retrieval": 0}
+
+    def _context(self, name):
+        if name not in self.known:
+            return f"Aucune information locale pour: {name}", []
+        return f"Notice de {name}", [{"index": 1, "drug_name": name}]
+
+    async def get_drug_context_with_sources(self, drug_name, max_context=3):
+        self.calls["retrieval"] += 1
+        await asyncio.sleep(self.latency)
+        return self._context(drug_name)
+
+    async def get_drug_contexts_with_sources(self, drug_names, max_context=3):
+        self.calls["retrieval"] += 1
+        await asyncio.sleep(self.latency)
+        return {name: self._context(name) for name in dict.fromkeys(drug_names)}
+
+    async def add_documents(self, documents):
+        await asyncio.sleep(self.latency)
+        self.known.update(d["metadata"]["drug_name"] for d in documents)
+
+
+class StubLoader:
+    """DailyMed simulé; "introuvable" lève une erreur"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = {"dailymed": 0}
+
+    async def search_drugs(self, query, limit=10):
+        self.calls["dailymed"] += 1
+        await asyncio.sleep(self.latency)
+        if "introuvable" in query.lower():
+            raise RuntimeError(f"DailyMed: aucun résultat pour {query}")
+        return [{"name": query, "type": "HUMAN PRESCRIPTION DRUG", "active_ingredients": [query]}]
+
+
+def make_service(base_url: str, canonicalizer, latency: float) -> DrugService:
+    service = DrugService()
+    service.rag = StubRAG(latency, known=["acetaminophen", "metformin", "aspirin"])
+    service.loader = StubLoader(latency)
+    service.canonicalizer = canonicalizer
+    service.llm = LLMEngine(base_url=base_url, cache=AnswerCache(persist_path=None))
+    return service
+
+
+async def sequential(service):
+    start, first, errors = time.perf_counter(), None, 0
+    for name in PRESCRIPTION:
+        try:
+            await service.get_drug_information(name, "fr")
+        except Exception:
+            errors += 1
+        first = first or time.perf_counter() - start
+    return time.perf_counter() - start, first, errors
+
+
+async def batch(service):
+    start, first, errors = time.perf_counter(), None, 0
+    async for event in service.batch_drug_information(PRESCRIPTION, "fr"):
+        if event["type"] in ("result", "item_error"):
+            first = first or time.perf_counter() - start
+            errors += event["type"] == "item_error"
+    return time.perf_counter() - start, first, errors
+
+
+async def main(args):
+    path = os.path.join(tempfile.mkdtemp(prefix="prescription_"), "drugnames.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"data": [
+            {"drug_name": name, "active_ingredients": [{"name": i} for i in ingredients]}
+            for name, ingredients in DUMP
+        ]}, f)
+    canonicalizer = DrugCanonicalizer(path)
+
+    with StubServer(port=args.port, latency=args.llm_latency) as server:
+        print(f"{'mode':<12}{'durée s':>9}{'1er résultat s':>16}{'erreurs':>9}{'retrieval':>11}{'dailymed':>10}{'llm':>6}")
+        for label, run in (("séquentiel", sequential), ("batch", batch)):
+            service = make_service(server.base_url, canonicalizer, args.backend_latency)
+            try:
+                elapsed, first, errors = await run(service)
+            finally:
+                await service.llm.close()
+            print(
+                f"{label:<12}{elapsed:>9.2f}{first:>16.2f}{errors:>9}{service.rag.calls['retrieval']:>11}"
+                f"{service.loader.calls['dailymed']:>10}{service.llm.flights.executed:>6}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--port", type=int, default=8771)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,133 @@
+# benchmarks/bench_canonicalization.py
+"""
+Benchmark de la canonicalisation marque -> principe actif
+
+Dump synthétique des noms (principes actifs réels, marques générées, sels)
+et flux de requêtes Zipf sous des formes variées: marque, marque + dosage,
+générique + sel + forme, orthographe française, casse. Compare la clé brute
+(canonicalize_query) à la clé canonique pour:
+- le taux de hit d'un cache de réponses (nombre de clés distinctes);
+- la précision de la récupération (P@k sur un index de notices
+  génériques: NumpyRAGSystem + embeddings locaux);
+- le coût de resolve_batch par nom.
+Exécutez depuis ml_model/: python -m benchmarks.bench_canonicalization
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app.database.drug_canonicalizer import DrugCanonicalizer
+from app.llm.answer_cache import canonicalize_query
+from app.llm.chunking import SECTION_LABELS
+from app.llm.rag_numpy import NumpyRAGSystem
+from benchmarks.bench_hybrid_retrieval import DRUG_NAMES, SECTIONS, VOCABULARY
+
+SYLLABLES = ["do", "li", "pra", "ne", "ty", "le", "nol", "zo", "max", "vi", "ra", "cor", "gen", "fa", "tri", "xa"]
+SALTS = ["", " hydrochloride", " sodium", " potassium"]
+FORMS = ["", " tablets", " 500 mg", " 20mg", " capsules", " comprimé pelliculé", " 1 g"]
+
+
+def make_dump(path: str, brands_per_drug: int, seed: int = 0):
+    """Dump {"data": [...]}; renvoie {marque: principes actifs}"""
+    rng = random.Random(seed)
+    records, brands = [], {}
+    for drug in DRUG_NAMES:
+        records.append({"drug_name": drug + rng.choice(SALTS), "name_type": "G", "active_ingredients": [{"name": drug}]})
+        for _ in range(brands_per_drug):
+            brand = "".join(rng.choice(SYLLABLES) for _ in range(3)).capitalize()
+            ingredients = [drug] if rng.random() > 0.1 else [drug, rng.choice(DRUG_NAMES)]
+            brands[brand] = ingredients
+            records.append({"drug_name": brand, "name_type": "B", "active_ingredients": [{"name": n} for n in ingredients]})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"data": records}, f)
+    return brands
+
+
+def make_queries(brands, count: int, seed: int = 1):
+    """(forme de surface, principes actifs attendus), popularité Zipf"""
+    rng = random.Random(seed)
+    single = [(brand, ingredients) for brand, ingredients in brands.items() if len(ingredients) == 1]
+    weights = 1.0 / np.arange(1, len(DRUG_NAMES) + 1)
+    queries = []
+    for drug in rng.choices(DRUG_NAMES, weights=weights, k=count):
+        form = rng.choice(["brand", "generic", "french", "upper"])
+        if form == "brand":
+            brand = rng.choice([b for b, ingredients in single if ingredients == [drug]] or [drug])
+            surface = brand + rng.choice(FORMS)
+        elif form == "generic":
+            surface = drug + rng.choice(SALTS) + rng.choice(FORMS)
+        elif form == "french":
+            surface = (drug + "e" if drug.endswith(("in", "ol", "an", "am")) else drug) + rng.choice(FORMS)
+        else:
+            surface = drug.upper()
+        queries.append((surface, drug))
+    return queries
+
+
+async def retrieval_precision(rag, queries, keys, k: int):
+    precisions = []
+    for (_, drug), key in zip(queries, keys):
+        results = await rag.search_similar(key, k)
+        precisions.append(sum((r.get("metadata") or {}).get("drug_name") == drug for r in results) / k)
+    return float(np.mean(precisions))
+
+
+async def main(args):
+    path = os.path.join(tempfile.mkdtemp(prefix="canonical_"), "drugnames.json")
+    brands = make_dump(path, args.brands_per_drug)
+    start = time.perf_counter()
+    canonicalizer = DrugCanonicalizer(path, synonyms_path=os.path.join(os.path.dirname(path), "none.csv"))
+    print(f"Table: {len(canonicalizer)} formes - construite en {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    queries = make_queries(brands, args.queries)
+    surfaces = [surface for surface, _ in queries]
+    resolved = canonicalizer.resolve_batch(surfaces)
+    correct = sum(r["ingredients"] == [drug] for r, (_, drug) in zip(resolved, queries)) / len(queries)
+    raw_keys = [canonicalize_query(s) for s in surfaces]
+    canonical_keys = [r["canonical"] for r in resolved]
+    print(f"Formes résolues vers le bon principe actif: {correct:.1%}")
+
+    print(f"{'clé':<12}{'clés distinctes':>17}{'hit cache':>11}")
+    for label, keys in (("brute", raw_keys), ("canonique", canonical_keys)):
+        distinct = len(set(keys))
+        print(f"{label:<12}{distinct:>17}{1 - distinct / len(keys):>11.1%}")
+
+    # Récupération: notices génériques, requêtes brutes vs canoniques
+    rag = NumpyRAGSystem("local", index_dir=tempfile.mkdtemp(prefix="bench_canonical_"))
+    rng = random.Random(2)
+    documents = [
+        {
+            "text": f"{drug} - {SECTION_LABELS[section]}: " + " ".join(rng.choice(VOCABULARY) for _ in range(60)),
+            "metadata": {"drug_name": drug, "section": section, "set_id": f"{drug}-set", "version": "1", "chunk_index": 0}
+        }
+        for drug in DRUG_NAMES for section in SECTIONS
+    ]
+    await rag.upsert_documents(documents)
+    sample = queries[:args.retrieval_queries]
+    for label, keys in (("brute", surfaces), ("canonique", canonical_keys)):
+        precision = await retrieval_precision(rag, sample, keys[:len(sample)], args.k)
+        print(f"P@{args.k} récupération ({label}): {precision:.2f}")
+
+    # Coût de la résolution
+    for batch in (1, 32, 1000):
+        names = surfaces[:batch]
+        repeats = max(1, 2000 // batch)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            canonicalizer.resolve_batch(names)
+        print(f"resolve_batch({batch}): {(time.perf_counter() - start) * 1e6 / (repeats * batch):.1f} µs/nom")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--brands-per-drug", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--retrieval-queries", type=int, default=300)
+    parser.add_argument("-k", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,109 @@
+# benchmarks/bench_circuit_breaker.py
+"""
+DailyMed en panne: latence de /api/drug-info et /api/status avec et sans disjoncteur
+
+DailyMed simulé (httpx.MockTransport) qui ne répond qu'au bout de son
+timeout; RAG simulé sans contexte local pour les médicaments demandés (chaque
+requête tente donc l'import DailyMed); LLM stub. Compare:
+- sans disjoncteur: chaque requête attend timeout x (1 + retries);
+- avec disjoncteur: après config.BREAKER_FAILURE_THRESHOLD échecs, les
+  requêtes échouent vite et utilisent le contexte local;
+- /api/status: sonde réseau à chaque appel vs état du moniteur en mémoire.
+Exécutez depuis ml_model/: python -m benchmarks.bench_circuit_breaker
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+
+import httpx
+import numpy as np
+
+from app.config import config
+from app.database.dailymed_loader import DailyMedLoader
+from app.database.drug_canonicalizer import DrugCanonicalizer
+from app.services.health_monitor import HealthMonitor
+from benchmarks.bench_batch_prescription import make_service
+from benchmarks.stub_openai_server import StubServer
+
+
+def down_loader(timeout: float, breaker_threshold: int) -> DailyMedLoader:
+    """Chargeur dont chaque requête expire au bout de `timeout`"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(timeout)
+        raise httpx.ConnectTimeout("DailyMed ne répond pas", request=request)
+
+    loader = DailyMedLoader()
+    loader.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    loader.spl_cache = None
+    loader.breaker.failure_threshold = breaker_threshold
+    return loader
+
+
+async def drug_info_latencies(service, requests: int):
+    latencies = []
+    for i in range(requests):
+        start = time.perf_counter()
+        result = await service.get_drug_information(f"medicament{i}", "fr")
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, result
+
+
+async def main(args):
+    canonicalizer = DrugCanonicalizer(os.path.join(tempfile.mkdtemp(), "absent.json"))
+    with StubServer(port=args.port, latency=args.llm_latency) as server:
+        print(f"{'drug-info (DailyMed en panne)':<32}{'p50 ms':>9}{'p99 ms':>9}{'total s':>9}{'rejets':>8}")
+        for label, threshold in (("sans disjoncteur", 10 ** 9), ("avec disjoncteur", config.BREAKER_FAILURE_THRESHOLD)):
+            service = make_service(server.base_url, canonicalizer, 0.005)
+            service.loader = down_loader(args.dailymed_timeout, threshold)
+            try:
+                start = time.perf_counter()
+                latencies, _ = await drug_info_latencies(service, args.requests)
+                total = time.perf_counter() - start
+            finally:
+                await service.llm.close()
+                await service.loader.close()
+            print(
+                f"{label:<32}{np.percentile(latencies, 50):>9.1f}{np.percentile(latencies, 99):>9.1f}"
+                f"{total:>9.2f}{service.loader.breaker.totals['rejected']:>8}"
+            )
+
+        # LLM en panne: disjoncteur ouvert -> repli immédiat sur le contexte local
+        service = make_service(server.base_url, canonicalizer, 0.005)
+        service.llm.breaker.trip()
+        start = time.perf_counter()
+        result = await service.get_drug_information("acetaminophen", "fr")
+        print(
+            f"\nLLM en panne (circuit ouvert): {(time.perf_counter() - start) * 1000:.1f} ms, "
+            f"réponse: {result['information'][:70]!r}..."
+        )
+        await service.llm.close()
+
+    loader = down_loader(args.dailymed_timeout, config.BREAKER_FAILURE_THRESHOLD)
+    monitor = HealthMonitor(interval=3600, timeout=args.dailymed_timeout * 2)
+    monitor.register("dailymed", loader.is_available, breaker=loader.breaker)
+    await monitor.check_all()
+    print(f"\n{'/api/status':<32}{'ms/appel':>9}")
+    for label, probe in (
+        ("sonde réseau à chaque appel", loader.is_available),
+        ("moniteur (mémoire)", lambda: asyncio.sleep(0, monitor.snapshot())),
+    ):
+        start = time.perf_counter()
+        for _ in range(args.status_calls):
+            await probe()
+        print(f"{label:<32}{(time.perf_counter() - start) / args.status_calls * 1000:>9.2f}")
+    print(f"disjoncteur DailyMed après la sonde: {loader.breaker.stats()['state']}")
+    await loader.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--dailymed-timeout", type=float, default=0.2, help="Timeout simulé (10 s en production)")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--status-calls", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8775)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,117 @@
+# benchmarks/bench_context_budget.py
+"""
+Benchmark de l'assemblage du contexte: top-3 brut vs budget de tokens + dédoublonnage
+
+Corpus synthétique où chaque section existe en trois versions de
+laboratoires différents (quasi-doublons). Pour les mêmes résultats de
+recherche (NumpyRAGSystem + embeddings locaux), compare:
+- tokens du contexte et du prompt, chunks distincts (hors doublons);
+- coût de l'assemblage;
+- latence de complétion sur le serveur stub (latence proportionnelle aux
+  tokens du prompt) et tokens facturés rapportés par l'API.
+Exécutez depuis ml_model/: python -m benchmarks.bench_context_budget
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+
+import numpy as np
+
+from app.llm.answer_cache import AnswerCache
+from app.llm.chunking import SECTION_LABELS
+from app.llm.context_builder import ContextBuilder
+from app.llm.llm_engine import LLMEngine
+from app.llm.rag_numpy import NumpyRAGSystem
+from benchmarks.bench_hybrid_retrieval import DRUG_NAMES, SECTIONS, VOCABULARY
+from benchmarks.stub_openai_server import StubServer
+
+LABELERS = ["Teva", "Mylan", "Sandoz"]
+
+
+def make_documents(chunks_per_section: int, seed: int = 0):
+    """Chaque chunk existe en trois versions quasi identiques (laboratoires)"""
+    rng = random.Random(seed)
+    documents = []
+    for drug in DRUG_NAMES[:20]:
+        for section in SECTIONS:
+            for index in range(chunks_per_section):
+                words = [rng.choice(VOCABULARY) for _ in range(180)]
+                for labeler in LABELERS:
+                    variant = list(words)
+                    for position in rng.sample(range(len(variant)), 3):
+                        variant[position] = rng.choice(VOCABULARY)
+                    documents.append({
+                        "text": f"{drug} ({labeler}) - {SECTION_LABELS[section]}: {' '.join(variant)}",
+                        "metadata": {
+                            "drug_name": drug, "section": section, "set_id": f"{drug}-{labeler}",
+                            "version": "1", "chunk_index": index, "labeler": labeler
+                        }
+                    })
+    return documents
+
+
+def distinct_chunks(selected):
+    return len({
+        (r["metadata"]["drug_name"], r["metadata"]["section"], r["metadata"]["chunk_index"]) for r in selected
+    })
+
+
+async def main(args):
+    rag = NumpyRAGSystem("local", index_dir=tempfile.mkdtemp(prefix="bench_context_"))
+    await rag.upsert_documents(make_documents(args.chunks_per_section))
+    rng = random.Random(1)
+    queries = [
+        f"{SECTION_LABELS[rng.choice(SECTIONS)].lower()} de {rng.choice(DRUG_NAMES[:20])}"
+        for _ in range(args.queries)
+    ]
+    results = await rag.search_similar_batch(queries, n_results=args.candidates)
+
+    configurations = [
+        ("top-3 brut", ContextBuilder(max_tokens=10 ** 6, duplicate_threshold=1.01), 3),
+        ("top-3 dédoublonné", ContextBuilder(max_tokens=10 ** 6), 3),
+        ("budget 600", ContextBuilder(max_tokens=600), None),
+        ("budget 1200", ContextBuilder(max_tokens=1200), None),
+    ]
+
+    with StubServer(port=args.port, latency=0.05, latency_per_prompt_token=args.ms_per_token / 1000) as server:
+        print(
+            f"{'contexte':<20}{'tok. ctx':>9}{'tok. prompt':>12}{'distincts':>10}{'doublons':>9}"
+            f"{'assemblage µs':>15}{'LLM p50 ms':>12}{'facturés':>10}"
+        )
+        for label, builder, max_chunks in configurations:
+            engine = LLMEngine(base_url=server.base_url, cache=AnswerCache(persist_path=None))
+            tokens, prompts, distinct, duplicates, build_times, latencies = [], [], [], [], [], []
+            try:
+                for query, found in zip(queries, results):
+                    start = time.perf_counter()
+                    packed = builder.build(found, max_chunks=max_chunks)
+                    build_times.append((time.perf_counter() - start) * 1e6)
+                    tokens.append(packed["tokens"])
+                    distinct.append(distinct_chunks(packed["selected"]))
+                    duplicates.append(packed["duplicates"])
+                    prompts.append(engine.count_prompt_tokens("general_question", query, packed["text"], "fr"))
+                    start = time.perf_counter()
+                    await engine.generate_from_template("general_question", query, packed["text"], "fr")
+                    latencies.append((time.perf_counter() - start) * 1000)
+            finally:
+                await engine.close()
+            print(
+                f"{label:<20}{np.mean(tokens):>9.0f}{np.mean(prompts):>12.0f}{np.mean(distinct):>10.2f}"
+                f"{np.mean(duplicates):>9.2f}{np.median(build_times):>15.0f}{np.median(latencies):>12.0f}"
+                f"{engine.stats()['avg_prompt_tokens']:>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks-per-section", type=int, default=2)
+    parser.add_argument("--queries", type=int, default=60)
+    parser.add_argument("--candidates", type=int, default=8)
+    parser.add_argument("--ms-per-token", type=float, default=0.2)
+    parser.add_argument("--port", type=int, default=8773)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,116 @@
+# benchmarks/bench_drug_names.py
+"""
+Benchmark de l'index local des noms de médicaments (autocomplétion)
+
+Dump synthétique (noms génériques, marques, principes actifs), puis latence
+p50/p99 par type de requête: préfixes courts, noms complets, mot intérieur,
+fautes de frappe. Mesure aussi la latence pendant un rechargement en
+arrière-plan (remplacement atomique de l'instantané).
+Exécutez depuis ml_model/: python -m benchmarks.bench_drug_names
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from app.database.drug_names_index import DrugNameIndex
+
+SYLLABLES = [
+    "am", "ox", "ci", "lin", "pro", "fen", "ibu", "met", "for", "min", "zol", "pra", "sta", "tin",
+    "lo", "sar", "tan", "cef", "ale", "xin", "dro", "hy", "cor", "ti", "sone", "val", "dip", "ine",
+    "pam", "aze", "ol", "ro", "su", "va", "ma", "dol", "tra", "za", "pine", "cla", "ri", "thro", "my", "cin",
+]
+SUFFIXES = ["", " hydrochloride", " sodium", " potassium", " tablets", " extended release", " oral solution"]
+
+
+def make_name(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def make_dump(path: str, count: int, seed: int = 0):
+    rng = random.Random(seed)
+    ingredients = [make_name(rng) for _ in range(count // 5)]
+    records = []
+    for _ in range(count):
+        active = rng.sample(ingredients, rng.randint(1, 2))
+        if rng.random() < 0.5:
+            name, name_type = active[0] + rng.choice(SUFFIXES), "G"
+        else:
+            name, name_type = make_name(rng).capitalize() + rng.choice(["", " XR", " Forte", " 500"]), "B"
+        records.append({"drug_name": name, "name_type": name_type, "active_ingredients": [{"name": a} for a in active]})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"data": records}, f)
+    return records
+
+
+def misspell(rng: random.Random, word: str) -> str:
+    i = rng.randrange(1, len(word) - 1)
+    operation = rng.choice(["swap", "drop", "double"])
+    if operation == "swap":
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if operation == "drop":
+        return word[:i] + word[i + 1:]
+    return word[:i] + word[i] + word[i:]
+
+
+def measure(index: DrugNameIndex, queries, limit: int):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, limit=limit)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return np.percentile(latencies, [50, 99])
+
+
+def main(args):
+    rng = random.Random(1)
+    path = os.path.join(tempfile.mkdtemp(prefix="drugnames_"), "drugnames.json")
+    records = make_dump(path, args.names)
+
+    start = time.perf_counter()
+    index = DrugNameIndex(path)
+    print(f"Dump: {len(records)} enregistrements -> {len(index)} noms indexés en {time.perf_counter() - start:.2f}s")
+
+    names = [r["drug_name"] for r in rng.sample(records, args.queries)]
+    long_names = [n for n in (r["active_ingredients"][0]["name"] for r in records) if len(n) >= 6]
+    query_sets = {
+        "préfixe 1-2 car.": [n[:rng.randint(1, 2)] for n in names],
+        "préfixe 3-6 car.": [n[:rng.randint(3, 6)] for n in names],
+        "nom complet": names,
+        "mot intérieur": [n.split()[-1] for n in names if " " in n] or names,
+        "faute de frappe": [misspell(rng, rng.choice(long_names)) for _ in range(args.queries)],
+    }
+
+    print(f"{'requêtes':<20}{'p50 µs':>10}{'p99 µs':>10}")
+    for label, queries in query_sets.items():
+        p50, p99 = measure(index, queries, args.limit)
+        print(f"{label:<20}{p50:>10.0f}{p99:>10.0f}")
+
+    # Exactitude des corrections: le nom d'origine est-il dans les suggestions ?
+    hits = 0
+    for _ in range(200):
+        word = rng.choice(long_names)
+        suggestions = index.search(misspell(rng, word), limit=args.limit)
+        hits += any(s["name"].lower() == word for s in suggestions)
+    print(f"fautes de frappe corrigées (top {args.limit}): {hits / 200:.0%}")
+
+    # Rechargement en arrière-plan pendant les recherches
+    reloader = threading.Thread(target=index.reload)
+    reloader.start()
+    all_queries = [q for queries in query_sets.values() for q in queries]
+    p50, p99 = measure(index, all_queries, args.limit)
+    reloader.join()
+    print(f"{'pendant rechargement':<20}{p50:>10.0f}{p99:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--names", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=10)
+    main(parser.parse_args())
@@ -0,0 +1,93 @@
+# benchmarks/bench_embedding_batching.py
+"""
+Benchmark du débit d'embeddings contre un serveur stub local
+
+Compare l'ancien chemin (lots fixes de 16, séquentiels, pause de 0.1 s) aux
+lots bornés en tokens envoyés en parallèle, puis vérifie le comportement
+avec des 429 et un texte invalide (isolé par découpage du lot).
+Exécutez depuis ml_model/: python -m benchmarks.bench_embedding_batching
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+
+import openai
+
+from app.llm.embeddings_openai import OpenAIEmbeddings
+from benchmarks.stub_openai_server import INVALID_INPUT_MARKER, StubServer
+
+
+def make_texts(count: int):
+    """Textes de la taille d'un chunk RAG (~120 tokens)"""
+    return [
+        f"Médicament {i} - Posologie: " + " ".join(f"mot{j}" for j in range(i % 40, i % 40 + 110))
+        for i in range(count)
+    ]
+
+
+async def run_legacy(base_url: str, texts) -> float:
+    """Ancien embed_batch: lots de 16 séquentiels + pause de 0.1 s"""
+    client = openai.AsyncOpenAI(api_key="sk-stub", base_url=base_url)
+    start = time.perf_counter()
+    for i in range(0, len(texts), 16):
+        await client.embeddings.create(model="stub", input=texts[i:i + 16], encoding_format="float")
+        await asyncio.sleep(0.1)
+    elapsed = time.perf_counter() - start
+    await client.close()
+    return elapsed
+
+
+async def run_batched(base_url: str, texts, concurrency: int, max_batch_inputs: int):
+    """Nouveau embed_batch (sans cache pour mesurer les appels réels)"""
+    service = OpenAIEmbeddings(
+        cache=None,
+        base_url=base_url,
+        max_concurrency=concurrency,
+        max_batch_inputs=max_batch_inputs
+    )
+    try:
+        start = time.perf_counter()
+        vectors = await service.embed_batch(texts)
+        return time.perf_counter() - start, vectors
+    finally:
+        await service.close()
+
+
+async def main(args):
+    texts = make_texts(args.count)
+
+    print(f"{'mode':<30}{'concurrence':>12}{'textes/s':>10}{'échecs':>8}")
+    with StubServer(port=args.port, embedding_latency_per_input=args.latency_per_input) as server:
+        elapsed = await run_legacy(server.base_url, texts)
+        print(f"{'lots fixes de 16':<30}{'1':>12}{len(texts) / elapsed:>10.1f}{0:>8}")
+
+        for concurrency in args.levels:
+            elapsed, vectors = await run_batched(server.base_url, texts, concurrency, args.max_batch_inputs)
+            failures = sum(1 for v in vectors if v is None)
+            print(f"{'lots par tokens':<30}{concurrency:>12}{len(texts) / elapsed:>10.1f}{failures:>8}")
+
+    # 429 toutes les 3 requêtes + un texte invalide au milieu du corpus
+    faulty = list(texts)
+    faulty[len(faulty) // 2] += " " + INVALID_INPUT_MARKER
+    with StubServer(
+        port=args.port + 1,
+        embedding_latency_per_input=args.latency_per_input,
+        embedding_rate_limit_every=3
+    ) as server:
+        concurrency = max(args.levels)
+        elapsed, vectors = await run_batched(server.base_url, faulty, concurrency, args.max_batch_inputs)
+        failures = sum(1 for v in vectors if v is None)
+        print(f"{'429 + 1 texte invalide':<30}{concurrency:>12}{len(texts) / elapsed:>10.1f}{failures:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--max-batch-inputs", type=int, default=256)
+    parser.add_argument("--latency-per-input", type=float, default=0.002)
+    parser.add_argument("--port", type=int, default=8775)
+    asyncio.run(main(parser.parse_args()))
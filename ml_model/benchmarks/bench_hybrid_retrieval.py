@@ -0,0 +1,125 @@
+# benchmarks/bench_hybrid_retrieval.py
+"""
+Benchmark de la recherche hybride (BM25 + vecteurs) contre la recherche vectorielle seule
+
+Corpus synthétique de médicaments aux noms proches (amoxicillin / amoxapine /
+ampicillin...) dont les sections partagent le même vocabulaire: seul le nom
+distingue les chunks. Deux familles de requêtes:
+- "nom + dosage" ("amoxicillin 500 mg"): résolues par le nom exact
+- "section + nom" ("effets indésirables de amoxicillin"): fusion des rangs
+
+Index NumPy + embeddings locaux dans un dossier temporaire (aucun réseau).
+Exécutez depuis ml_model/: python -m benchmarks.bench_hybrid_retrieval
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app.llm.chunking import SECTION_LABELS
+from app.llm.rag_numpy import NumpyRAGSystem
+
+DRUG_NAMES = [
+    "amoxicillin", "amoxapine", "ampicillin", "azithromycin", "erythromycin", "clarithromycin",
+    "cefalexin", "cefazolin", "cefuroxime", "ceftriaxone", "hydroxyzine", "hydralazine",
+    "hydrochlorothiazide", "hydrocortisone", "metformin", "metronidazole", "metoprolol", "methotrexate",
+    "clonidine", "clozapine", "clonazepam", "clopidogrel", "lamotrigine", "lamivudine",
+    "levetiracetam", "levofloxacin", "levothyroxine", "losartan", "valsartan", "irbesartan",
+    "atorvastatin", "rosuvastatin", "simvastatin", "pravastatin", "omeprazole", "esomeprazole",
+    "pantoprazole", "lansoprazole", "sertraline", "citalopram", "escitalopram", "paroxetine",
+    "fluoxetine", "duloxetine", "venlafaxine", "tramadol", "tapentadol", "trazodone",
+    "prednisone", "prednisolone", "propranolol", "carvedilol", "bisoprolol", "atenolol",
+]
+SECTIONS = ["indications", "dosage", "contraindications", "warnings", "side_effects", "interactions"]
+VOCABULARY = (
+    "patients adultes traitement dose quotidienne prise orale comprimé gélule insuffisance rénale "
+    "hépatique surveillance effets nausées vomissements céphalées vertiges éruption allergie "
+    "grossesse allaitement enfants âgés associations contre-indiquées précautions emploi arrêt "
+    "progressif posologie recommandée maximale intervalle heures repas"
+).split()
+
+
+def make_documents(chunks_per_section: int, seed: int = 0):
+    rng = random.Random(seed)
+    documents = []
+    for drug in DRUG_NAMES:
+        for section in SECTIONS:
+            for index in range(chunks_per_section):
+                body = " ".join(rng.choice(VOCABULARY) for _ in range(60))
+                dose = rng.choice([5, 10, 20, 50, 100, 250, 500])
+                text = f"{drug} - {SECTION_LABELS[section]}: {body} {dose} mg"
+                documents.append({
+                    "text": text,
+                    "metadata": {"drug_name": drug, "section": section, "set_id": f"{drug}-set", "version": "1", "chunk_index": index}
+                })
+    return documents
+
+
+def make_queries(seed: int = 1):
+    rng = random.Random(seed)
+    by_name = [(f"{drug} {rng.choice([250, 500])} mg", drug, None) for drug in DRUG_NAMES]
+    by_section = []
+    for drug in DRUG_NAMES:
+        section = rng.choice(SECTIONS)
+        by_section.append((f"{SECTION_LABELS[section].lower()} de {drug}", drug, section))
+    return by_name, by_section
+
+
+def score(results, drug, section):
+    """Rang (0-based) du premier résultat correct, None si absent"""
+    for rank, r in enumerate(results):
+        metadata = r.get("metadata") or {}
+        if metadata.get("drug_name") == drug and (section is None or metadata.get("section") == section):
+            return rank
+    return None
+
+
+async def evaluate(label, search, queries, n_results):
+    ranks, latencies = [], []
+    for query, drug, section in queries:
+        start = time.perf_counter()
+        results = await search(query, n_results)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        ranks.append(score(results, drug, section))
+    recall_1 = sum(1 for r in ranks if r == 0) / len(ranks)
+    recall_k = sum(1 for r in ranks if r is not None) / len(ranks)
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"{label:<34}{recall_1:>8.2f}{recall_k:>8.2f}{p50:>11.0f}{p99:>11.0f}")
+
+
+async def main(args):
+    rag = NumpyRAGSystem("local", index_dir=tempfile.mkdtemp(prefix="bench_hybrid_"))
+    documents = make_documents(args.chunks_per_section)
+    await rag.upsert_documents(documents)
+    start = time.perf_counter()
+    rag._ensure_lexical()
+    print(f"Corpus: {len(documents)} chunks, {len(DRUG_NAMES)} médicaments - index BM25 en {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    async def vector_only(query, n):
+        return (await rag._vector_search_batch([query], n))[0]
+
+    async def hybrid(query, n):
+        return await rag.search_similar(query, n)
+
+    by_name, by_section = make_queries()
+    print(f"{'requêtes / mode':<34}{'R@1':>8}{'R@' + str(args.k):>8}{'p50 µs':>11}{'p99 µs':>11}")
+    for label, queries in (("nom + dosage", by_name), ("section + nom", by_section)):
+        await evaluate(f"{label} - vecteurs", vector_only, queries, args.k)
+        await evaluate(f"{label} - hybride", hybrid, queries, args.k)
+
+    lexical = rag.lexical
+    start = time.perf_counter()
+    for query, _, _ in by_name * 20:
+        lexical.search(query, args.k, name=lexical.match_name(query, exact=True))
+    elapsed = (time.perf_counter() - start) * 1e6 / (len(by_name) * 20)
+    print(f"résolution lexicale seule (nom exact): {elapsed:.0f} µs/requête")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks-per-section", type=int, default=4)
+    parser.add_argument("-k", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,114 @@
+# benchmarks/bench_interactions.py
+"""
+Benchmark du moteur local d'interactions (CSR sur les principes actifs)
+
+Jeu de données synthétique (principes actifs, paires, sévérités) écrit en
+CSV, puis latence p50/p99 de la vérification d'une ordonnance de 15
+médicaments (105 paires), comparée à une boucle Python sur un dict de
+paires. Mesure aussi le service complet sans LLM (explain=False).
+Aucun appel réseau; le client OpenAI exige toutefois une clé à l'import.
+Exécutez depuis ml_model/: OPENAI_API_KEY=x python -m benchmarks.bench_interactions
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app.database.interaction_index import SEVERITIES, InteractionIndex, normalize_ingredient
+
+
+def make_dataset(path: str, ingredients: int, pairs: int, seed: int = 0):
+    """CSV synthétique; renvoie la liste des principes actifs"""
+    rng = random.Random(seed)
+    names = [f"ingredient{i:05d}" for i in range(ingredients)]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ingredient_a", "ingredient_b", "severity", "mechanism", "management"])
+        for _ in range(pairs):
+            a, b = rng.sample(names, 2)
+            writer.writerow([a, b, rng.choice(SEVERITIES[1:]), "Inhibition du CYP3A4", "Surveiller"])
+    return names
+
+
+def naive_check(pairs_dict, groups):
+    """Référence: double boucle Python sur un dict de paires normalisées"""
+    hits = []
+    for (i, a), (j, b) in itertools.combinations(enumerate(groups), 2):
+        for x in a:
+            for y in b:
+                record = pairs_dict.get((normalize_ingredient(x), normalize_ingredient(y)))
+                if record is not None:
+                    hits.append((i, j, record))
+    return hits
+
+
+def measure(function, prescriptions):
+    latencies = []
+    for prescription in prescriptions:
+        start = time.perf_counter()
+        function(prescription)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return np.percentile(latencies, [50, 99])
+
+
+def main(args):
+    path = os.path.join(tempfile.mkdtemp(prefix="interactions_"), "interactions.csv")
+    names = make_dataset(path, args.ingredients, args.pairs)
+
+    start = time.perf_counter()
+    index = InteractionIndex(path)
+    print(
+        f"Jeu de données: {len(index)} paires, {index.ingredient_count} principes actifs "
+        f"- index en {time.perf_counter() - start:.2f}s"
+    )
+
+    pairs_dict = {}
+    with open(path, encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            a, b = normalize_ingredient(row["ingredient_a"]), normalize_ingredient(row["ingredient_b"])
+            pairs_dict[(a, b)] = pairs_dict[(b, a)] = row
+
+    rng = random.Random(1)
+    prescriptions = [[[name] for name in rng.sample(names, args.drugs)] for _ in range(args.queries)]
+    hits = sum(len(index.check(p)) for p in prescriptions) / len(prescriptions)
+    print(f"Ordonnances de {args.drugs} médicaments: {hits:.1f} interactions en moyenne")
+
+    print(f"{'méthode':<26}{'p50 µs':>10}{'p99 µs':>10}")
+    for label, function in (
+        ("index CSR", index.check),
+        ("dict + boucle Python", lambda p: naive_check(pairs_dict, p)),
+    ):
+        p50, p99 = measure(function, prescriptions)
+        print(f"{label:<26}{p50:>10.1f}{p99:>10.1f}")
+
+    # Service complet sans LLM (résolution des noms + mise en forme)
+    from app.services.interaction_service import InteractionService
+    service = InteractionService()
+    service.index = index
+
+    async def run_service():
+        latencies = []
+        for prescription in prescriptions:
+            drugs = [group[0] for group in prescription]
+            start = time.perf_counter()
+            await service.check_drug_interactions(drugs, explain=False)
+            latencies.append((time.perf_counter() - start) * 1e6)
+        return np.percentile(latencies, [50, 99])
+
+    p50, p99 = asyncio.run(run_service())
+    print(f"{'service (sans LLM)':<26}{p50:>10.1f}{p99:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ingredients", type=int, default=5000)
+    parser.add_argument("--pairs", type=int, default=200000)
+    parser.add_argument("--drugs", type=int, default=15)
+    parser.add_argument("--queries", type=int, default=2000)
+    main(parser.parse_args())
@@ -0,0 +1,67 @@
+# benchmarks/bench_llm_concurrency.py
+"""
+Benchmark du débit de LLMEngine en fonction de la concurrence
+
+Compare le client async (pool + sémaphore) à l'ancien appel synchrone
+contre un serveur de complétion local.
+Exécutez depuis ml_model/: python -m benchmarks.bench_llm_concurrency
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+
+import openai
+
+from app.llm.llm_engine import LLMEngine
+from benchmarks.stub_openai_server import StubServer
+
+
+async def run_async(base_url: str, concurrency: int, requests_per_level: int) -> float:
+    """Débit (req/s) du moteur async avec une limite de concurrence donnée"""
+    engine = LLMEngine(max_concurrency=concurrency, base_url=base_url)
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            engine.generate_response(f"Question {i}") for i in range(requests_per_level)
+        ])
+        return requests_per_level / (time.perf_counter() - start)
+    finally:
+        await engine.close()
+
+
+async def run_blocking(base_url: str, requests_per_level: int) -> float:
+    """Débit de l'ancien chemin: client synchrone appelé depuis une coroutine"""
+    client = openai.OpenAI(api_key="sk-stub", base_url=base_url)
+
+    async def call(i: int):
+        client.chat.completions.create(
+            model="stub",
+            messages=[{"role": "user", "content": f"Question {i}"}]
+        )
+
+    start = time.perf_counter()
+    await asyncio.gather(*[call(i) for i in range(requests_per_level)])
+    return requests_per_level / (time.perf_counter() - start)
+
+
+async def main(args):
+    with StubServer(port=args.port, latency=args.latency) as server:
+        blocking = await run_blocking(server.base_url, args.requests)
+        print(f"{'mode':<22}{'concurrence':>12}{'req/s':>10}")
+        print(f"{'sync (bloquant)':<22}{'-':>12}{blocking:>10.1f}")
+
+        for concurrency in args.levels:
+            throughput = await run_async(server.base_url, concurrency, args.requests)
+            print(f"{'async':<22}{concurrency:>12}{throughput:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,55 @@
+# benchmarks/bench_local_embeddings.py
+"""
+Benchmark du fournisseur d'embeddings local (n-grammes hachés, NumPy)
+
+Mesure la latence d'embedding d'une requête (p50/p99) et le débit par lot
+sur des chunks de la taille de ceux de l'ingestion.
+Exécutez depuis ml_model/: python -m benchmarks.bench_local_embeddings
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.llm.embeddings_local import HashingEmbeddings
+
+QUERIES = [
+    "paracetamol posologie adulte",
+    "ibuprofène contre-indications grossesse",
+    "amoxicilline effets indésirables",
+    "Interactions entre warfarine et aspirine ?",
+]
+
+
+def main(args):
+    embedder = HashingEmbeddings(dimension=args.dimension)
+
+    latencies = []
+    for i in range(args.queries):
+        start = time.perf_counter()
+        embedder.embed_matrix([QUERIES[i % len(QUERIES)]])
+        latencies.append((time.perf_counter() - start) * 1000)
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"requête (dim {embedder.dimension}): p50 {p50:.3f} ms, p99 {p99:.3f} ms")
+
+    # Chunks de ~120 tokens, comme à l'ingestion
+    texts = [
+        f"Médicament {i} - Posologie: " + " ".join(f"mot{j}" for j in range(i % 40, i % 40 + 110))
+        for i in range(args.documents)
+    ]
+    print(f"{'lot':>8}{'docs/s':>12}")
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, len(texts), batch_size):
+            embedder.embed_matrix(texts[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+        print(f"{batch_size:>8}{len(texts) / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--documents", type=int, default=20000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 64, 1024])
+    parser.add_argument("--dimension", type=int, default=None)
+    main(parser.parse_args())
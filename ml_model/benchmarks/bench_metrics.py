@@ -0,0 +1,151 @@
+# benchmarks/bench_metrics.py
+"""
+Coût de l'instrumentation: spans, middleware HTTP, scrape de /metrics
+
+- span seul (with span(...)) et coroutine décorée @timed, métriques
+  activées puis désactivées (config.METRICS_ENABLED);
+- récupération de contexte réelle (RAG NumPy, embeddings locaux, spans
+  retrieval/embedding/prompt_build): débit avec et sans métriques;
+- requête HTTP minimale via l'ASGI de l'application: avec et sans
+  MetricsMiddleware;
+- rendu de /metrics une fois toutes les séries remplies.
+Exécutez depuis ml_model/: python -m benchmarks.bench_metrics
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+import numpy as np
+from fastapi import FastAPI
+
+from app.config import config
+from app.llm.rag_numpy import NumpyRAGSystem
+from app.utils.metrics import MetricsMiddleware, registry, span, timed
+from benchmarks.bench_vector_backends import make_corpus
+
+
+def per_call_ns(fn, calls: int) -> float:
+    start = time.perf_counter()
+    fn(calls)
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def spans(calls: int):
+    for _ in range(calls):
+        with span("bench"):
+            pass
+
+
+async def bare():
+    return None
+
+
+@timed("bench")
+async def decorated():
+    return None
+
+
+def coroutines(fn):
+    async def run(calls: int):
+        for _ in range(calls):
+            await fn()
+    return lambda calls: asyncio.run(run(calls))
+
+
+async def retrieval_rate(rag, queries, batch_size: int, duration: float) -> float:
+    done, deadline = 0, time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        batch = [queries[(done + i) % len(queries)] for i in range(batch_size)]
+        await rag.get_drug_contexts_with_sources(batch)
+        done += batch_size
+    return done / duration
+
+
+async def http_rate(app, requests: int) -> float:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await client.get("/api/health")
+        start = time.perf_counter()
+        for _ in range(requests):
+            await client.get("/api/health")
+        return requests / (time.perf_counter() - start)
+
+
+def health_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+
+    @app.get("/api/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+def toggled(enabled: bool, fn):
+    config.METRICS_ENABLED = enabled
+    try:
+        return fn()
+    finally:
+        config.METRICS_ENABLED = True
+
+
+def main(args):
+    print(f"{'span':<36}{'activé ns':>12}{'désactivé ns':>14}")
+    for label, fn in (
+        ("with span(...)", spans),
+        ("coroutine nue", coroutines(bare)),
+        ("coroutine @timed", coroutines(decorated)),
+    ):
+        on = per_call_ns(fn, args.calls)
+        off = toggled(False, lambda: per_call_ns(fn, args.calls))
+        print(f"{label:<36}{on:>12.0f}{off:>14.0f}")
+
+    config.SLOW_REQUEST_MS = float("inf")
+    ids, texts, metadatas = make_corpus(args.documents, args.drugs)
+    rag = NumpyRAGSystem("local", index_dir=os.path.join(tempfile.mkdtemp(prefix="metrics_"), "index"))
+    rag.collection.add(ids=ids, documents=texts, metadatas=metadatas, embeddings=rag.embedder.embed_matrix(texts))
+    rag.warmup()
+    rng = np.random.default_rng(0)
+    queries = [
+        texts[i][:40] if n % 2 else texts[i].split(": ", 1)[1][:60]
+        for n, i in enumerate(rng.integers(0, len(texts), size=256))
+    ]
+
+    def measure(coroutine_fn):
+        # Alterné pour ne pas favoriser l'un des modes (cache CPU, fréquence)
+        rates = {True: [], False: []}
+        for _ in range(args.rounds):
+            for enabled in (True, False):
+                rates[enabled].append(toggled(enabled, lambda: asyncio.run(coroutine_fn())))
+        return np.median(rates[True]), np.median(rates[False])
+
+    on, off = measure(lambda: retrieval_rate(rag, queries, args.batch_size, args.duration))
+    print(f"\n{'débit':<36}{'activé':>12}{'désactivé':>14}{'surcoût':>10}")
+    print(f"{'récupération de contexte (req/s)':<36}{on:>12.0f}{off:>14.0f}{off / on - 1:>10.1%}")
+
+    instrumented, plain = health_app(True), health_app(False)
+    on = np.median([asyncio.run(http_rate(instrumented, args.requests)) for _ in range(args.rounds)])
+    off = np.median([asyncio.run(http_rate(plain, args.requests)) for _ in range(args.rounds)])
+    print(f"{'GET minimal + middleware (req/s)':<36}{on:>12.0f}{off:>14.0f}{off / on - 1:>10.1%}")
+
+    start = time.perf_counter()
+    for _ in range(20):
+        body = registry.render()
+    render_ms = (time.perf_counter() - start) / 20 * 1000
+    print(f"\n/metrics: {len(body.splitlines())} lignes, rendu en {render_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--documents", type=int, default=20000)
+    parser.add_argument("--drugs", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,108 @@
+# benchmarks/bench_monograph_store.py
+"""
+Monographies précalculées vs génération à la demande
+
+Backends simulés (RAG, LLM stub). Mesure:
+- le job de précalcul: premier passage, relance sans changement, relance
+  après mise à jour de quelques notices SPL, puis après changement du template;
+- la latence de get_drug_information servie par le store, par le chemin
+  normal à froid (récupération + LLM) et avec le cache de réponses chaud.
+Exécutez depuis ml_model/: python -m benchmarks.bench_monograph_store
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+
+import numpy as np
+
+from app.config import config
+from app.database.drug_canonicalizer import DrugCanonicalizer
+from app.database.monograph_store import MonographStore
+from app.ingestion.precompute_monographs import MonographPrecomputer
+from benchmarks.bench_batch_prescription import StubRAG, make_service
+from benchmarks.stub_openai_server import StubServer
+
+LANGUAGES = ["fr", "en"]
+
+
+class VersionedRAG(StubRAG):
+    """RAG simulé dont les sources portent un set_id et une version SPL"""
+
+    def __init__(self, latency: float, known):
+        super().__init__(latency, known)
+        self.versions = {name: 1 for name in known}
+
+    def _context(self, name):
+        context, sources = super()._context(name)
+        for source in sources:
+            source.update({"set_id": f"{name}-set", "version": str(self.versions[name])})
+        return context, sources
+
+
+async def run_job(label, service, store, drugs):
+    precomputer = MonographPrecomputer(service.rag, service.llm, store, LANGUAGES, config.BATCH_MAX_CONCURRENCY)
+    start = time.perf_counter()
+    counts = await precomputer.run(drugs)
+    print(
+        f"{label:<28}{time.perf_counter() - start:>8.2f}{counts['generated']:>10}"
+        f"{counts['unchanged']:>10}{counts['failed']:>8}"
+    )
+
+
+async def timed(service, drugs):
+    latencies = []
+    for name in drugs:
+        start = time.perf_counter()
+        await service.get_drug_information(name, "fr")
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+async def main(args):
+    directory = tempfile.mkdtemp(prefix="monographs_")
+    drugs = [f"ingredient{i:04d}" for i in range(args.drugs)]
+    canonicalizer = DrugCanonicalizer(os.path.join(directory, "absent.json"))
+
+    with StubServer(port=args.port, latency=args.llm_latency) as server:
+        service = make_service(server.base_url, canonicalizer, args.backend_latency)
+        service.rag = VersionedRAG(args.backend_latency, known=drugs)
+        store = MonographStore(os.path.join(directory, "monographs.sqlite"))
+        try:
+            print(f"{'job':<28}{'durée s':>8}{'générées':>10}{'à jour':>10}{'échecs':>8}")
+            await run_job("premier passage", service, store, drugs)
+            await run_job("relance sans changement", service, store, drugs)
+            for name in drugs[:args.updated]:
+                service.rag.versions[name] += 1
+            await run_job(f"{args.updated} notices mises à jour", service, store, drugs)
+            config.PROMPT_TEMPLATES["drug_info"] += "\n"
+            store = MonographStore(store.path)
+            await run_job("template modifié", service, store, drugs)
+            print(f"{'entrées':<28}{len(store):>8}")
+
+            sample = drugs[:args.requests]
+            print(f"\n{'drug-info':<28}{'p50 ms':>8}{'p99 ms':>10}")
+            service.monographs = store
+            p50, p99 = await timed(service, sample)
+            print(f"{'store (1 lecture SQLite)':<28}{p50:>8.2f}{p99:>10.2f}")
+            service.monographs = None
+            p50, p99 = await timed(service, sample)
+            print(f"{'génération à froid':<28}{p50:>8.2f}{p99:>10.2f}")
+            p50, p99 = await timed(service, sample)
+            print(f"{'cache de réponses chaud':<28}{p50:>8.2f}{p99:>10.2f}")
+        finally:
+            await service.llm.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--drugs", type=int, default=100)
+    parser.add_argument("--updated", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--backend-latency", type=float, default=0.02)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--port", type=int, default=8774)
+    asyncio.run(main(parser.parse_args()))
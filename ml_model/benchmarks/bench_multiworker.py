@@ -0,0 +1,170 @@
+# benchmarks/bench_multiworker.py
+"""
+Service multi-workers: débit de récupération selon le nombre de workers
+
+Un index maître synthétique (fournisseur local) est publié comme génération
+en lecture seule; N processus (spawn, un thread BLAS chacun) chargent un
+SnapshotRAGSystem et enchaînent des récupérations de contexte en lot
+(recherche hybride + assemblage du contexte) pendant une durée fixe.
+Mesure:
+- débit total et efficacité par rapport à N x le débit d'un worker;
+- mémoire par worker: RSS et PSS (pages de la matrice partagées comptées
+  au prorata, Linux uniquement);
+- délai de prise en compte d'une génération publiée en cours de mesure;
+- dépôt d'un lot dans le spool (latence) et application par l'écrivain.
+Le passage à l'échelle est borné par le nombre de cœurs (affiché).
+Exécutez depuis ml_model/: python -m benchmarks.bench_multiworker
+"""
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.llm.embeddings_local import HashingEmbeddings
+from app.llm.rag_numpy import NumpyRAGSystem
+from app.llm.rag_snapshot import IngestionSpool, SnapshotRAGSystem
+from app.ingestion.snapshot_writer import SnapshotWriter
+from benchmarks.bench_vector_backends import make_corpus
+
+SERIAL_ENV = {"OMP_NUM_THREADS": "1", "OPENBLAS_NUM_THREADS": "1", "MKL_NUM_THREADS": "1"}
+
+
+def memory_mb():
+    """(RSS, PSS) du processus en Mo (PSS: None hors Linux)"""
+    values = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    values[key] = int(rest.split()[0]) / 1024
+    except OSError:
+        pass
+    return values.get("Rss"), values.get("Pss")
+
+
+def worker(snapshot_dir, spool_dir, queries, batch_size, duration, ready, results):
+    """Exécuté dans un processus neuf: boucle de récupérations jusqu'à l'échéance"""
+    rag = SnapshotRAGSystem("local", snapshot_dir, IngestionSpool(spool_dir), poll_interval=0.2)
+    rag.warmup()
+    initial = rag.generation
+    # Départ commun une fois tous les workers chargés
+    ready.wait()
+    start_at = time.time()
+
+    async def run():
+        done, switched_at = 0, None
+        while time.time() < start_at + duration:
+            batch = [queries[(done + i) % len(queries)] for i in range(batch_size)]
+            await rag.get_drug_contexts_with_sources(batch)
+            done += batch_size
+            if switched_at is None and rag.generation != initial:
+                switched_at = time.time()
+            # Laisse le chargement d'une nouvelle génération progresser
+            await asyncio.sleep(0)
+        return done, switched_at
+
+    done, switched_at = asyncio.run(run())
+    rss, pss = memory_mb()
+    results.put({"queries": done, "switched_at": switched_at, "rss": rss, "pss": pss})
+
+
+def run_workers(ctx, count, snapshot_dir, spool_dir, queries, args, publish=None):
+    results, ready = ctx.Queue(), ctx.Barrier(count + 1)
+    processes = [
+        ctx.Process(target=worker, args=(snapshot_dir, spool_dir, queries, args.batch_size, args.duration, ready, results))
+        for _ in range(count)
+    ]
+    for process in processes:
+        process.start()
+    ready.wait()
+    published_at = None
+    if publish is not None:
+        time.sleep(args.duration / 3)
+        published_at = publish()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return reports, published_at
+
+
+def main(args):
+    os.environ.update(SERIAL_ENV)
+    root = tempfile.mkdtemp(prefix="multiworker_")
+    snapshot_dir, spool_dir = os.path.join(root, "snapshots"), os.path.join(root, "spool")
+
+    ids, texts, metadatas = make_corpus(args.documents, args.drugs)
+    embedder = HashingEmbeddings()
+    master = NumpyRAGSystem("local", index_dir=os.path.join(root, "master"))
+    for i in range(0, len(ids), 5000):
+        master.collection.add(
+            ids=ids[i:i + 5000], documents=texts[i:i + 5000], metadatas=metadatas[i:i + 5000],
+            embeddings=embedder.embed_matrix(texts[i:i + 5000])
+        )
+    writer = SnapshotWriter(master, IngestionSpool(spool_dir), snapshot_dir)
+    start = time.perf_counter()
+    writer.publish()
+    publish_s = time.perf_counter() - start
+    vectors_mb = len(ids) * embedder.dimension * 4 / 1e6
+    print(f"Index: {len(ids)} chunks, dim {embedder.dimension} ({vectors_mb:.0f} Mo de vecteurs), "
+          f"publication en {publish_s:.2f}s; cœurs: {os.cpu_count()}")
+
+    rng = np.random.default_rng(0)
+    picks = rng.integers(0, len(texts), size=512)
+    # Moitié nom + section (BM25 seul), moitié texte libre (vecteurs + BM25)
+    queries = [texts[i][:40] if n % 2 else texts[i].split(": ", 1)[1][:60] for n, i in enumerate(picks)]
+
+    ctx = mp.get_context("spawn")
+    counts = [int(n) for n in args.workers.split(",")]
+    print(f"\n{'workers':>8}{'req/s':>10}{'efficacité':>12}{'RSS Mo/w':>10}{'PSS Mo/w':>10}{'bascule s':>11}")
+    single = None
+    for count in counts:
+        def publish():
+            master.collection.add(
+                ids=["extra"], documents=["extra drug - dosage: terme1"], metadatas=[{"drug_name": "extra"}],
+                embeddings=embedder.embed_matrix(["extra drug - dosage: terme1"])
+            )
+            writer.publish()
+            return time.time()
+
+        reports, published_at = run_workers(ctx, count, snapshot_dir, spool_dir, queries, args, publish)
+        rate = sum(report["queries"] for report in reports) / args.duration
+        single = single or rate / count
+        switches = [report["switched_at"] - published_at for report in reports if report["switched_at"]]
+        pss = [report["pss"] for report in reports if report["pss"] is not None]
+        print(
+            f"{count:>8}{rate:>10.0f}{rate / (single * count):>12.0%}"
+            f"{np.mean([report['rss'] or 0 for report in reports]):>10.0f}"
+            f"{np.mean(pss) if pss else float('nan'):>10.0f}"
+            f"{max(switches) if len(switches) == count else float('nan'):>11.2f}"
+        )
+
+    spool = IngestionSpool(spool_dir)
+    documents = [{"text": f"Médicament {i}: posologie {i} mg", "metadata": {"drug_name": f"spool{i}"}} for i in range(5)]
+    latencies = []
+    for _ in range(args.spool_batches):
+        start = time.perf_counter()
+        spool.submit(documents)
+        latencies.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    applied = asyncio.run(writer.drain())
+    drain_s = time.perf_counter() - start
+    print(
+        f"\nspool: dépôt p50 {np.percentile(latencies, 50):.2f} ms, p99 {np.percentile(latencies, 99):.2f} ms; "
+        f"écrivain: {applied} lots appliqués en {drain_s:.2f}s ({applied / drain_s:.0f} lots/s)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=20000)
+    parser.add_argument("--drugs", type=int, default=2000)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=6.0)
+    parser.add_argument("--spool-batches", type=int, default=200)
+    main(parser.parse_args())
@@ -0,0 +1,98 @@
+# benchmarks/bench_singleflight.py
+"""
+Test de rafale: N requêtes identiques simultanées sur /api/drug-info (backends simulés)
+
+Compare le nombre d'appels backend et la durée avec/sans coalescence.
+Exécutez depuis ml_model/: python -m benchmarks.bench_singleflight
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+
+from app.llm.answer_cache import AnswerCache
+from app.llm.llm_engine import LLMEngine
+from app.services.drug_service import DrugService
+from app.utils.singleflight import SingleFlight
+from benchmarks.stub_openai_server import StubServer
+
+
+class StubRAG:
+    """RAG simulé: vide jusqu'au premier add_documents"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.documents = []
+        self.calls = {"retrieval": 0, "add_documents": 0}
+
+    async def get_drug_context_with_sources(self, drug_name, max_context=3):
+        self.calls["retrieval"] += 1
+        await asyncio.sleep(self.latency)
+        if not self.documents:
+            return f"Aucune information locale pour: {drug_name}", []
+        return self.documents[0]["text"], [{"index": 1, "drug_name": drug_name}]
+
+    async def add_documents(self, documents):
+        self.calls["add_documents"] += 1
+        await asyncio.sleep(self.latency)
+        self.documents.extend(documents)
+
+
+class StubLoader:
+    """DailyMed simulé"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = {"dailymed": 0}
+
+    async def search_drugs(self, query, limit=10):
+        self.calls["dailymed"] += 1
+        await asyncio.sleep(self.latency)
+        return [{"name": query.upper(), "type": "HUMAN OTC DRUG", "active_ingredients": ["ACETAMINOPHEN"]}]
+
+
+async def burst(base_url: str, requests: int, enabled: bool, latency: float) -> dict:
+    service = DrugService()
+    service.rag = StubRAG(latency)
+    service.loader = StubLoader(latency)
+    service.flights = SingleFlight("drug_service", enabled=enabled)
+    service.llm = LLMEngine(base_url=base_url, cache=AnswerCache(persist_path=None))
+    service.llm.flights = SingleFlight("llm", enabled=enabled)
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            service.get_drug_information("Doliprane", "fr") for _ in range(requests)
+        ])
+        elapsed = time.perf_counter() - start
+    finally:
+        await service.llm.close()
+
+    return {
+        "elapsed": elapsed,
+        **service.rag.calls,
+        **service.loader.calls,
+        "llm": service.llm.flights.executed
+    }
+
+
+async def main(args):
+    with StubServer(port=args.port, latency=args.llm_latency) as server:
+        print(f"{'coalescence':<13}{'durée (s)':>10}{'retrieval':>11}{'dailymed':>10}{'add_docs':>10}{'llm':>6}")
+        for enabled in (False, True):
+            r = await burst(server.base_url, args.requests, enabled, args.backend_latency)
+            print(
+                f"{'oui' if enabled else 'non':<13}{r['elapsed']:>10.2f}{r['retrieval']:>11}"
+                f"{r['dailymed']:>10}{r['add_documents']:>10}{r['llm']:>6}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--backend-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--port", type=int, default=8770)
+    asyncio.run(main(parser.parse_args()))
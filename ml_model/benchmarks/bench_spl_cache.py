@@ -0,0 +1,158 @@
+# benchmarks/bench_spl_cache.py
+"""
+Cache SPL: un fichier JSON indenté par SPL vs SQLite compressé
+
+Payloads synthétiques au format JSON DailyMed (texte tiré d'un vocabulaire
+de 3000 mots en loi de Zipf, compressibilité proche d'une notice réelle).
+Compare:
+- stockage: octets sur disque, nombre de fichiers;
+- lecture de tous les SPL (json.load vs SPLCache.get);
+- revalidation après expiration: octets transférés (200 complet vs 304);
+- budget d'octets: taille et taux de hit sous accès Zipf avec éviction LRU.
+Exécutez depuis ml_model/: python -m benchmarks.bench_spl_cache
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+
+import httpx
+import numpy as np
+
+from app.database.dailymed_loader import DailyMedLoader
+from app.database.spl_cache import SPLCache
+
+SECTION_TITLES = [
+    "INDICATIONS & USAGE", "DOSAGE & ADMINISTRATION", "CONTRAINDICATIONS", "WARNINGS AND PRECAUTIONS",
+    "ADVERSE REACTIONS", "DRUG INTERACTIONS", "STORAGE AND HANDLING",
+]
+
+
+def make_payloads(count: int, words_per_section: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    vocabulary = ["".join(rng.choice(letters, size=rng.integers(3, 11))) for _ in range(3000)]
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1)
+    weights /= weights.sum()
+    payloads = {}
+    for i in range(count):
+        words = rng.choice(len(vocabulary), size=(len(SECTION_TITLES), words_per_section), p=weights)
+        payloads[str(uuid.UUID(int=i + 1))] = {
+            "title": f"DRUG {i} TABLETS",
+            "version": "1",
+            "spl_product_data_elements": {"product_data_elements": [
+                {"title": title, "text": " ".join(vocabulary[w] for w in row)}
+                for title, row in zip(SECTION_TITLES, words)
+            ]}
+        }
+    return payloads
+
+
+def storage(payloads, directory):
+    legacy_dir = os.path.join(directory, "legacy")
+    os.makedirs(legacy_dir)
+    start = time.perf_counter()
+    for spl_id, data in payloads.items():
+        with open(os.path.join(legacy_dir, f"{spl_id}.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+    legacy_write = time.perf_counter() - start
+    files = glob.glob(os.path.join(legacy_dir, "*.json"))
+    legacy_bytes = sum(os.path.getsize(path) for path in files)
+
+    cache = SPLCache(os.path.join(directory, "spl_cache.sqlite"), max_bytes=10 ** 12)
+    start = time.perf_counter()
+    for spl_id, data in payloads.items():
+        cache.put(spl_id, data)
+    cache_write = time.perf_counter() - start
+    cache_bytes = sum(os.path.getsize(path) for path in glob.glob(cache.path + "*"))
+
+    order = list(payloads)
+    random.Random(1).shuffle(order)
+    start = time.perf_counter()
+    for spl_id in order:
+        with open(os.path.join(legacy_dir, f"{spl_id}.json"), "r", encoding="utf-8") as f:
+            json.load(f)
+    legacy_read = time.perf_counter() - start
+    start = time.perf_counter()
+    for spl_id in order:
+        cache.get(spl_id)
+    cache_read = time.perf_counter() - start
+
+    print(f"{'stockage':<22}{'fichiers':>9}{'Mo':>8}{'écriture s':>12}{'lecture ms/SPL':>16}")
+    print(f"{'JSON indent=2':<22}{len(files):>9}{legacy_bytes / 1e6:>8.1f}{legacy_write:>12.2f}"
+          f"{legacy_read / len(order) * 1000:>16.3f}")
+    print(f"{'SQLite + zlib':<22}{len(glob.glob(cache.path + '*')):>9}{cache_bytes / 1e6:>8.1f}{cache_write:>12.2f}"
+          f"{cache_read / len(order) * 1000:>16.3f}")
+    stats = cache.stats()
+    print(f"compression: x{stats['compression_ratio']} (JSON compact -> zlib)")
+
+
+async def revalidation(payloads, directory):
+    """DailyMed simulé avec ETag: les GET conditionnels reçoivent un 304 sans corps"""
+    transferred = {"bytes": 0, "requests": 0}
+    bodies = {spl_id: json.dumps(data).encode() for spl_id, data in payloads.items()}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        spl_id = request.url.path.rsplit("/", 1)[-1][:-len(".json")]
+        etag = f'"{spl_id}-v1"'
+        transferred["requests"] += 1
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        transferred["bytes"] += len(bodies[spl_id])
+        return httpx.Response(200, content=bodies[spl_id], headers={"ETag": etag, "Content-Type": "application/json"})
+
+    loader = DailyMedLoader()
+    await loader.client.aclose()
+    loader.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    # TTL nul: chaque lecture après la première est une revalidation
+    loader.spl_cache = SPLCache(os.path.join(directory, "revalidation.sqlite"), max_bytes=10 ** 12, ttl=0)
+    sample = list(payloads)[:200]
+
+    print(f"\n{'revalidation':<22}{'requêtes':>9}{'Ko transférés':>15}")
+    for label in ("premier accès (200)", "expiré (304)"):
+        transferred.update(bytes=0, requests=0)
+        for spl_id in sample:
+            assert await loader.get_drug_spl(spl_id) is not None
+        print(f"{label:<22}{transferred['requests']:>9}{transferred['bytes'] / 1e3:>15.1f}")
+    print(f"revalidations: {loader.spl_cache.stats()['revalidated']}")
+    await loader.close()
+
+
+def budget(payloads, directory, fraction: float, accesses: int):
+    sizes = SPLCache(os.path.join(directory, "spl_cache.sqlite"), max_bytes=10 ** 12).stats()["bytes"]
+    cache = SPLCache(os.path.join(directory, "budget.sqlite"), max_bytes=int(sizes * fraction))
+    ids = list(payloads)
+    weights = 1.0 / np.arange(1, len(ids) + 1)
+    picks = np.random.default_rng(2).choice(len(ids), size=accesses, p=weights / weights.sum())
+    for pick in picks:
+        spl_id = ids[pick]
+        if cache.get(spl_id) is None:
+            cache.put(spl_id, payloads[spl_id])
+    stats = cache.stats()
+    print(
+        f"\nbudget {fraction:.0%} ({stats['max_bytes'] / 1e6:.1f} Mo): {stats['entries']} entrées, "
+        f"{stats['bytes'] / 1e6:.1f} Mo, hit rate {stats['hit_rate']:.1%}, {stats['evictions']} évictions, "
+        f"{stats['bytes_evicted'] / 1e6:.1f} Mo évincés"
+    )
+
+
+async def main(args):
+    directory = tempfile.mkdtemp(prefix="spl_cache_")
+    payloads = make_payloads(args.count, args.words)
+    storage(payloads, directory)
+    await revalidation(payloads, directory)
+    budget(payloads, directory, args.budget, args.accesses)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=400, help="Mots par section")
+    parser.add_argument("--budget", type=float, default=0.25, help="Budget en fraction du cache complet")
+    parser.add_argument("--accesses", type=int, default=10000)
+    asyncio.run(main(parser.parse_args()))
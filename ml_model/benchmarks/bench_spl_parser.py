@@ -0,0 +1,103 @@
+# benchmarks/bench_spl_parser.py
+"""
+Benchmark de parsing SPL sur un corpus local
+
+Compare:
+- "json": json.load du cache SPL (indent=2) + extract_drug_info (chemin actuel)
+- "dom + titres": etree.parse complet + classement par titre
+- "iterparse LOINC": app.database.spl_parser.iter_spl_sections
+
+Exécutez depuis ml_model/: python -m benchmarks.bench_spl_parser [--corpus DOSSIER]
+"""
+import argparse
+import glob
+import json
+import os
+import tempfile
+import time
+
+from lxml import etree
+
+from app.database.dailymed_loader import dailymed_loader
+from app.database.spl_parser import iter_spl_sections
+from benchmarks.spl_corpus import write_corpus
+
+V3 = {"v3": "urn:hl7-org:v3"}
+
+
+def _text(element) -> str:
+    return " ".join(" ".join(element.itertext()).split()) if element is not None else ""
+
+
+def to_json_shape(path: str) -> dict:
+    """Convertit un SPL XML au format JSON attendu par extract_drug_info"""
+    root = etree.parse(path).getroot()
+    return {
+        "title": _text(root.find("v3:title", V3)),
+        "spl_product_data_elements": {
+            "product_data_elements": [
+                {"title": _text(section.find("v3:title", V3)), "text": _text(section.find("v3:text", V3))}
+                for section in root.iter("{urn:hl7-org:v3}section")
+            ]
+        }
+    }
+
+
+def bench(label: str, paths, fn, total_bytes: int):
+    start = time.perf_counter()
+    sections = 0
+    for path in paths:
+        sections += fn(path)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<18}{len(paths) / elapsed:>10.1f}{total_bytes / elapsed / 1e6:>10.1f}"
+        f"{sections:>11}{elapsed:>10.2f}"
+    )
+
+
+def main(args):
+    corpus = args.corpus
+    if not corpus:
+        corpus = tempfile.mkdtemp(prefix="spl_corpus_")
+        write_corpus(corpus, args.count)
+
+    xml_paths = sorted(glob.glob(os.path.join(corpus, "*.xml")))
+    if not xml_paths:
+        print(f"Aucun fichier XML dans {corpus}")
+        return
+    xml_bytes = sum(os.path.getsize(p) for p in xml_paths)
+
+    # Cache JSON au format de l'ancien cache de get_drug_spl (hors chronométrage)
+    json_dir = tempfile.mkdtemp(prefix="spl_json_")
+    json_paths = []
+    for path in xml_paths:
+        json_path = os.path.join(json_dir, os.path.basename(path) + ".json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(to_json_shape(path), f, ensure_ascii=False, indent=2)
+        json_paths.append(json_path)
+    json_bytes = sum(os.path.getsize(p) for p in json_paths)
+
+    def json_path_fn(path):
+        with open(path, "r", encoding="utf-8") as f:
+            info = dailymed_loader.extract_drug_info(json.load(f))
+        return sum(1 for key in ("indications", "dosage", "contraindications", "warnings", "side_effects", "storage") if info.get(key))
+
+    def dom_fn(path):
+        info = dailymed_loader.extract_drug_info(to_json_shape(path))
+        return sum(1 for key in ("indications", "dosage", "contraindications", "warnings", "side_effects", "storage") if info.get(key))
+
+    def iterparse_fn(path):
+        return sum(1 for _ in iter_spl_sections(path))
+
+    print(f"Corpus: {len(xml_paths)} SPL, {xml_bytes / 1e6:.1f} Mo XML, {json_bytes / 1e6:.1f} Mo JSON")
+    print(f"{'chemin':<18}{'SPL/s':>10}{'Mo/s':>10}{'sections':>11}{'durée':>10}")
+    bench("json", json_paths, json_path_fn, json_bytes)
+    bench("dom + titres", xml_paths, dom_fn, xml_bytes)
+    bench("iterparse LOINC", xml_paths, iterparse_fn, xml_bytes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", help="Dossier de SPL XML (généré si absent)")
+    parser.add_argument("--count", type=int, default=300)
+    main(parser.parse_args())
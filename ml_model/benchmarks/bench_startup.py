@@ -0,0 +1,86 @@
+# benchmarks/bench_startup.py
+"""
+Coût du démarrage: import de app.main, bibliothèques, construction des services
+
+Chaque mesure tourne dans un processus neuf (comme un worker qui redémarre),
+dans un dossier de travail temporaire (données absentes, base Chroma vide):
+- import de app.main (services paresseux: aucun client construit);
+- import de chaque bibliothèque lourde seule;
+- container.warmup(): construction et préchauffage de chaque service, dans
+  l'ordre d'enregistrement (un service paie les imports qu'il est le premier
+  à faire).
+Exécutez depuis ml_model/: python -m benchmarks.bench_startup
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LIBRARIES = ["fastapi", "numpy", "httpx", "openai", "chromadb"]
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+WARMUP_SCRIPT = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import app.main
+from app.container import container
+imported = time.perf_counter() - start
+report = asyncio.run(container.warmup())
+print(json.dumps({"import": imported, "components": report, "modules": sorted(
+    name for name in ("chromadb", "openai", "sentence_transformers") if name in sys.modules
+)}))
+"""
+
+
+def run(script: str, workdir: str) -> str:
+    env = {**os.environ, "PYTHONPATH": ROOT, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-stub")}
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=workdir, env=env, capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip().splitlines()[-1]
+
+
+def median_ms(script: str, workdir: str, runs: int) -> float:
+    return float(np.median([float(run(script, workdir)) for _ in range(runs)])) * 1000
+
+
+def main(args):
+    workdir = tempfile.mkdtemp(prefix="startup_")
+    lazy = run("import sys, app.main; print(sorted(m for m in ('chromadb', 'openai', 'sentence_transformers') "
+               "if m in sys.modules))", workdir)
+    print(f"{'import':<28}{'médiane ms':>12}")
+    print(f"{'app.main':<28}{median_ms(IMPORT_SCRIPT.format(module='app.main'), workdir, args.runs):>12.0f}")
+    print(f"  bibliothèques lourdes chargées par l'import: {lazy}")
+    for module in LIBRARIES:
+        print(f"{'  ' + module + ' (seul)':<28}{median_ms(IMPORT_SCRIPT.format(module=module), workdir, args.runs):>12.0f}")
+
+    reports = [json.loads(run(WARMUP_SCRIPT, workdir)) for _ in range(args.runs)]
+    print(f"\n{'préchauffage':<28}{'init ms':>10}{'warm ms':>10}")
+    for name in reports[0]["components"]:
+        init = np.median([report["components"][name]["init_ms"] for report in reports])
+        warm = np.median([report["components"][name]["warm_ms"] for report in reports])
+        error = reports[-1]["components"][name]["error"]
+        print(f"{name:<28}{init:>10.1f}{warm:>10.1f}{'  erreur: ' + error if error else ''}")
+    total = np.median([
+        sum(entry["init_ms"] + entry["warm_ms"] for entry in report["components"].values()) for report in reports
+    ])
+    print(f"{'total':<28}{total:>20.0f}")
+    print(f"chargées après préchauffage: {reports[-1]['modules']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5, help="Processus par mesure (médiane)")
+    main(parser.parse_args())
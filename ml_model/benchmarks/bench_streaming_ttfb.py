@@ -0,0 +1,50 @@
+# benchmarks/bench_streaming_ttfb.py
+"""
+Benchmark du temps jusqu'au premier token (TTFB) en streaming vs réponse complète
+
+Exécutez depuis ml_model/: python -m benchmarks.bench_streaming_ttfb
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+
+from app.llm.llm_engine import LLMEngine
+from benchmarks.stub_openai_server import StubServer
+
+
+async def main(args):
+    with StubServer(
+        port=args.port,
+        tokens=args.tokens,
+        token_delay=args.token_delay,
+        latency=args.tokens * args.token_delay
+    ) as server:
+        engine = LLMEngine(base_url=server.base_url)
+        try:
+            start = time.perf_counter()
+            await engine.generate_response("Doliprane")
+            full = time.perf_counter() - start
+
+            start = time.perf_counter()
+            first = None
+            async for _ in engine.stream_response("Doliprane"):
+                if first is None:
+                    first = time.perf_counter() - start
+            total = time.perf_counter() - start
+        finally:
+            await engine.close()
+
+    print(f"{'mode':<12}{'premier octet (s)':>20}{'total (s)':>12}")
+    print(f"{'complet':<12}{full:>20.3f}{full:>12.3f}")
+    print(f"{'streaming':<12}{first:>20.3f}{total:>12.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--token-delay", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8767)
+    asyncio.run(main(parser.parse_args()))
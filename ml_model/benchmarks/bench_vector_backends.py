@@ -0,0 +1,148 @@
+# benchmarks/bench_vector_backends.py
+"""
+Benchmark des index vectoriels: ChromaDB vs NumpyCollection (memmap)
+
+Même corpus synthétique et mêmes embeddings (fournisseur local) pour les
+deux backends. Chaque backend est mesuré dans un processus neuf: mémoire
+(RSS) après chargement, latence p50/p99 d'une requête, coût par requête en
+lot, requête filtrée sur le nom du médicament.
+Exécutez depuis ml_model/: python -m benchmarks.bench_vector_backends
+"""
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.llm.embeddings_local import HashingEmbeddings
+from app.llm.rag_numpy import NumpyCollection
+
+SECTIONS = ["indications", "dosage", "contraindications", "warnings", "side_effects", "interactions"]
+
+
+def make_corpus(count: int, drugs: int):
+    """Chunks synthétiques: (ids, textes, métadonnées)"""
+    ids, texts, metadatas = [], [], []
+    for i in range(count):
+        drug = f"drug{i % drugs}"
+        section = SECTIONS[i % len(SECTIONS)]
+        words = " ".join(f"terme{(i * 7 + j) % 997}" for j in range(80))
+        ids.append(f"doc_{i}")
+        texts.append(f"{drug} - {section}: {words}")
+        metadatas.append({"drug_name": drug, "section": section})
+    return ids, texts, metadatas
+
+
+def rss_mb() -> float:
+    """Mémoire résidente du processus (Linux), sinon pic via resource"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def open_collection(backend: str, path: str):
+    if backend == "numpy":
+        return NumpyCollection(path)
+    import chromadb
+    return chromadb.PersistentClient(path=path).get_collection("bench")
+
+
+def measure(backend: str, path: str, queries, filters, batch_size: int, results):
+    """Exécuté dans un processus neuf"""
+    before = rss_mb()
+    start = time.perf_counter()
+    collection = open_collection(backend, path)
+    # Première requête: chargement effectif de l'index
+    collection.query(query_embeddings=queries[:1], n_results=5)
+    load_time = time.perf_counter() - start
+    loaded = rss_mb()
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        collection.query(query_embeddings=[query], n_results=5, include=["documents", "metadatas", "distances"])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        collection.query(query_embeddings=queries[i:i + batch_size], n_results=5, include=["documents", "metadatas", "distances"])
+    batched = (time.perf_counter() - start) * 1000 / len(queries)
+
+    filtered = []
+    for query, drug in zip(queries, filters):
+        start = time.perf_counter()
+        collection.query(query_embeddings=[query], n_results=5, where={"drug_name": drug}, include=["documents", "metadatas", "distances"])
+        filtered.append((time.perf_counter() - start) * 1000)
+
+    p50, p99 = np.percentile(latencies, [50, 99])
+    results.put({
+        "backend": backend,
+        "load_s": load_time,
+        "rss_mb": loaded - before,
+        "p50": p50,
+        "p99": p99,
+        "batched": batched,
+        "filtered_p50": float(np.percentile(filtered, 50)),
+    })
+
+
+def main(args):
+    ids, texts, metadatas = make_corpus(args.documents, args.drugs)
+    embedder = HashingEmbeddings(dimension=args.dimension)
+    start = time.perf_counter()
+    embeddings = embedder.embed_matrix(texts)
+    print(f"Corpus: {len(texts)} chunks, dim {embedder.dimension}, embeddings en {time.perf_counter() - start:.1f}s")
+
+    rng = np.random.default_rng(0)
+    picks = rng.integers(0, len(texts), size=args.queries)
+    queries = embedder.embed_matrix([texts[i][:60] for i in picks]).tolist()
+    filters = [metadatas[i]["drug_name"] for i in picks]
+
+    root = tempfile.mkdtemp(prefix="bench_vectors_")
+    paths = {"chroma": os.path.join(root, "chroma"), "numpy": os.path.join(root, "numpy")}
+
+    import chromadb
+    build = {}
+    start = time.perf_counter()
+    chroma = chromadb.PersistentClient(path=paths["chroma"]).create_collection("bench", embedding_function=None)
+    for i in range(0, len(ids), 5000):
+        chroma.add(ids=ids[i:i + 5000], documents=texts[i:i + 5000], metadatas=metadatas[i:i + 5000], embeddings=embeddings[i:i + 5000])
+    build["chroma"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    numpy_index = NumpyCollection(paths["numpy"])
+    for i in range(0, len(ids), 5000):
+        numpy_index.add(ids=ids[i:i + 5000], documents=texts[i:i + 5000], metadatas=metadatas[i:i + 5000], embeddings=embeddings[i:i + 5000])
+    build["numpy"] = time.perf_counter() - start
+    del chroma, numpy_index
+
+    ctx = mp.get_context("spawn")
+    print(f"{'backend':<9}{'build s':>9}{'load s':>8}{'RSS Mo':>8}{'p50 ms':>9}{'p99 ms':>9}{'lot ms/req':>12}{'filtré p50':>12}")
+    for backend in ("chroma", "numpy"):
+        results = ctx.Queue()
+        process = ctx.Process(target=measure, args=(backend, paths[backend], queries, filters, args.batch_size, results))
+        process.start()
+        r = results.get()
+        process.join()
+        print(
+            f"{backend:<9}{build[backend]:>9.1f}{r['load_s']:>8.2f}{r['rss_mb']:>8.0f}{r['p50']:>9.2f}"
+            f"{r['p99']:>9.2f}{r['batched']:>12.2f}{r['filtered_p50']:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=50000)
+    parser.add_argument("--drugs", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--dimension", type=int, default=None)
+    main(parser.parse_args())
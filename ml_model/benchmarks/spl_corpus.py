@@ -0,0 +1,83 @@
+# benchmarks/spl_corpus.py
+"""
+Génère un corpus SPL synthétique (XML HL7 v3) pour les benchmarks
+
+Exécutez depuis ml_model/: python -m benchmarks.spl_corpus /tmp/spl_corpus --count 200
+"""
+import argparse
+import io
+import os
+import random
+import uuid
+import zipfile
+
+SECTIONS = [
+    ("34067-9", "INDICATIONS &amp; USAGE"),
+    ("34068-7", "DOSAGE &amp; ADMINISTRATION"),
+    ("34070-3", "CONTRAINDICATIONS"),
+    ("43685-7", "WARNINGS AND PRECAUTIONS"),
+    ("34084-4", "ADVERSE REACTIONS"),
+    ("34073-7", "DRUG INTERACTIONS"),
+    ("44425-7", "STORAGE AND HANDLING"),
+]
+WORDS = ["take", "tablet", "daily", "liver", "dose", "mg", "patients", "risk", "renal", "children", "adults", "hours"]
+
+
+def _paragraphs(words: int) -> str:
+    return "".join(
+        f"<paragraph>{' '.join(random.choice(WORDS) for _ in range(60))}</paragraph>"
+        for _ in range(max(1, words // 60))
+    )
+
+
+def make_spl(drug_name: str, ingredient: str, words_per_section: int = 600) -> bytes:
+    """Construit un SPL XML minimal mais structurellement réaliste"""
+    sections = "".join(
+        f'<component><section ID="s{i}"><id root="{uuid.uuid4()}"/>'
+        f'<code code="{code}" codeSystem="2.16.840.1.113883.6.1" displayName="{title}"/>'
+        f'<title>{title}</title><text>{_paragraphs(words_per_section)}</text>'
+        f'<component><section><code code="42229-5" codeSystem="2.16.840.1.113883.6.1"/>'
+        f'<title>{i + 1}.1 Details</title><text>{_paragraphs(words_per_section // 3)}</text></section></component>'
+        f'</section></component>'
+        for i, (code, title) in enumerate(SECTIONS)
+    )
+    return f'''<?xml version="1.0" encoding="UTF-8"?>
+<document xmlns="urn:hl7-org:v3">
+<id root="{uuid.uuid4()}"/><code code="34391-3" displayName="HUMAN PRESCRIPTION DRUG LABEL"/>
+<title>{drug_name.upper()} - {ingredient.lower()} tablet</title>
+<effectiveTime value="20240115"/><setId root="{uuid.uuid4()}"/><versionNumber value="{random.randint(1, 12)}"/>
+<component><structuredBody>
+<component><section><code code="48780-1" displayName="SPL PRODUCT DATA ELEMENTS SECTION"/>
+<subject><manufacturedProduct><manufacturedProduct><name>{drug_name}</name>
+<activeIngredient><activeIngredientSubstance><name>{ingredient}</name></activeIngredientSubstance></activeIngredient>
+</manufacturedProduct></manufacturedProduct></subject></section></component>
+{sections}
+</structuredBody></component></document>'''.encode("utf-8")
+
+
+def write_corpus(directory: str, count: int, archive: bool = False):
+    """Écrit `count` SPL en fichiers XML, ou en archive zip de zips (format full release)"""
+    os.makedirs(directory, exist_ok=True)
+    spls = [(f"spl_{i}", make_spl(f"Drug{i}", f"INGREDIENT{i % 50}")) for i in range(count)]
+
+    if not archive:
+        for name, payload in spls:
+            with open(os.path.join(directory, f"{name}.xml"), "wb") as f:
+                f.write(payload)
+        return
+
+    with zipfile.ZipFile(os.path.join(directory, "dm_spl_release_synthetic.zip"), "w") as outer:
+        for name, payload in spls:
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w") as inner:
+                inner.writestr(f"{name}.xml", payload)
+            outer.writestr(f"prescription/{name}.zip", buffer.getvalue())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directory")
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--archive", action="store_true")
+    args = parser.parse_args()
+    write_corpus(args.directory, args.count, args.archive)
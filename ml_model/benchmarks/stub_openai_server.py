@@ -0,0 +1,170 @@
+# benchmarks/stub_openai_server.py
+"""
+Serveur local imitant l'API OpenAI pour les benchmarks (aucun appel réseau externe)
+
+Latence simulée configurable, rate limit optionnel (429 + retry-after).
+Les embeddings contenant INVALID_INPUT_MARKER sont rejetés (400).
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Un texte contenant ce marqueur fait échouer tout le lot d'embeddings (400)
+INVALID_INPUT_MARKER = "<<invalid>>"
+
+
+def create_stub_app(
+    latency: float = 0.2,
+    rate_limit_every: int = 0,
+    tokens: int = 50,
+    token_delay: float = 0.0,
+    embedding_latency: float = 0.1,
+    embedding_latency_per_input: float = 0.0005,
+    embedding_dim: int = 64,
+    embedding_rate_limit_every: int = 0,
+    latency_per_prompt_token: float = 0.0
+) -> FastAPI:
+    """
+    Crée l'application stub
+
+    Args:
+        latency: Latence simulée par complétion (secondes)
+        rate_limit_every: Renvoie un 429 toutes les N requêtes (0 = jamais)
+        tokens: Nombre de tokens émis en mode streaming
+        token_delay: Délai entre deux tokens en mode streaming (secondes)
+        embedding_latency: Latence fixe par requête d'embeddings (secondes)
+        embedding_latency_per_input: Latence supplémentaire par texte encodé
+        embedding_dim: Dimension des embeddings renvoyés
+        embedding_rate_limit_every: 429 toutes les N requêtes d'embeddings (0 = jamais)
+        latency_per_prompt_token: Latence supplémentaire par token du prompt (traitement du prompt)
+    """
+    app = FastAPI()
+    state = {"requests": 0, "embedding_requests": 0, "embedding_inputs": 0}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        state["requests"] += 1
+
+        if rate_limit_every and state["requests"] % rate_limit_every == 0:
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                headers={"retry-after-ms": "50"}
+            )
+
+        if body.get("stream"):
+            return StreamingResponse(
+                _stream_chunks(body.get("model", "stub"), tokens, token_delay),
+                media_type="text/event-stream"
+            )
+
+        # Tokens du prompt approximés par mots et ponctuation
+        prompt_tokens = sum(len(re.findall(r"\w+|[^\w\s]", m.get("content") or "")) for m in body["messages"])
+        await asyncio.sleep(latency + prompt_tokens * latency_per_prompt_token)
+        content = "Réponse simulée pour: " + body["messages"][-1]["content"][:40]
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 10, "total_tokens": prompt_tokens + 10}
+        }
+
+    async def _stream_chunks(model: str, count: int, delay: float):
+        # Premier token rapide, puis un token toutes les `delay` secondes
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        for i in range(count):
+            if i:
+                await asyncio.sleep(delay)
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": f"tok{i} "}, "finish_reason": None}]
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        state["embedding_requests"] += 1
+
+        if embedding_rate_limit_every and state["embedding_requests"] % embedding_rate_limit_every == 0:
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                headers={"retry-after-ms": "100"}
+            )
+        if any(INVALID_INPUT_MARKER in text for text in inputs):
+            return JSONResponse(
+                status_code=400,
+                content={"error": {"message": "Invalid input", "type": "invalid_request_error"}}
+            )
+
+        await asyncio.sleep(embedding_latency + embedding_latency_per_input * len(inputs))
+        state["embedding_inputs"] += len(inputs)
+        return {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": _fake_embedding(text, embedding_dim)}
+                for i, text in enumerate(inputs)
+            ],
+            "model": body.get("model", "stub"),
+            "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)}
+        }
+
+    @app.get("/v1/stats")
+    async def stats():
+        return state
+
+    return app
+
+
+def _fake_embedding(text: str, dim: int):
+    """Vecteur déterministe dérivé du texte"""
+    seed = sum(ord(c) for c in text) or 1
+    return [((seed * (i + 1)) % 97) / 97.0 for i in range(dim)]
+
+
+class StubServer:
+    """Lance le serveur stub dans un thread en arrière-plan"""
+
+    def __init__(self, port: int = 8765, **app_kwargs):
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(
+            create_stub_app(**app_kwargs),
+            host="127.0.0.1",
+            port=port,
+            log_level="warning"
+        ))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)